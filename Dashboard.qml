@@ -435,44 +435,6 @@ ScrollView {
                 for (var i = 0; i < alertasInventario.length; i++) {
                     console.log("   - " + alertasInventario[i].Tipo_Alerta + ": " + alertasInventario[i].Producto)
                 }
-                alertasRetryTimer.stop()
-            }
-        }
-    }
-    
-    // ✅ TIMER: CARGAR ALERTAS SI NO SE CARGARON AUTOMÁTICAMENTE
-    Timer {
-        id: alertasRetryTimer
-        interval: 1000
-        running: true
-        repeat: true
-        triggeredOnStart: true
-        
-        onTriggered: {
-            if (inventarioModel && (!alertasInventario || alertasInventario.length === 0)) {
-                console.log("⏱️ Cargando alertas del modelo...")
-                inventarioModel.obtener_alertas_inventario()
-            } else if (alertasInventario && alertasInventario.length > 0) {
-                console.log("✅ Alertas cargadas - Timer detenido")
-                stop()
-            }
-        }
-    }
-
-    Timer {
-        id: autoRefreshAlertas
-        interval: 5000
-        running: true
-        repeat: true
-        
-        onTriggered: {
-            if (inventarioModel) {
-                console.log("🔄 Auto-refreshing alertas...")
-                var nuevasAlertas = inventarioModel.obtener_alertas_inventario()
-                if (nuevasAlertas) {
-                    alertasInventario = nuevasAlertas
-                    console.log("✅ Alertas actualizadas: " + alertasInventario.length)
-                }
             }
         }
     }
@@ -849,8 +811,19 @@ ScrollView {
                                 property var ingresosData: generateIngresosData()
                                 property var egresosData: generateEgresosData()
                                 property var labels: generateLabels()
+                                property real maxValue: calculateMaxValue()
                                 property int hoveredIndex: -1
-                                
+
+                                // Series reales del modelo (por hora, día, semana o mes según el período)
+                                Connections {
+                                    target: dashboardModel
+                                    function onGraficoDataChanged() {
+                                        chartCanvas.updateChart()
+                                    }
+                                }
+
+                                Component.onCompleted: updateChart()
+
                                 function generateIngresosData() {
                                     var data = []
                                     var totalIngresos = calculateTotalIngresos()
@@ -912,7 +885,12 @@ ScrollView {
                                 function generateLabels() {
                                     switch(currentPeriodType) {
                                         case "hoy":
-                                            return ["00", "02", "04", "06", "08", "10", "12", "14", "16", "18", "20", "22"]
+                                            // Un tramo por hora, igual que las series del modelo
+                                            var horas = []
+                                            for (var h = 0; h < 24; h++) {
+                                                horas.push((h < 10 ? "0" : "") + h + ":00")
+                                            }
+                                            return horas
                                         case "semana":
                                             return ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
                                         case "mes":
@@ -924,6 +902,18 @@ ScrollView {
                                     }
                                 }
                                 
+                                // Tope del eje Y a partir de las series; sin movimientos (p. ej. a primera hora) usa 100
+                                function calculateMaxValue() {
+                                    var maximo = 0
+                                    for (var i = 0; i < ingresosData.length; i++) {
+                                        maximo = Math.max(maximo, ingresosData[i] || 0)
+                                    }
+                                    for (var j = 0; j < egresosData.length; j++) {
+                                        maximo = Math.max(maximo, egresosData[j] || 0)
+                                    }
+                                    return maximo > 0 ? maximo * 1.2 : 100
+                                }
+                                
                                 function updateChart() {
                                     if (dashboardModel) {
                                         ingresosData = dashboardModel.datosGraficoIngresos || []
@@ -934,6 +924,9 @@ ScrollView {
                                         egresosData = generateEgresosData()
                                         labels = generateLabels()
                                     }
+                                    maxValue = calculateMaxValue()
+                                    hoveredIndex = -1
+                                    tooltip.visible = false
                                     requestPaint()
                                 }
         
@@ -941,7 +934,10 @@ ScrollView {
                                     var ctx = getContext("2d")
                                     ctx.clearRect(0, 0, width, height)
                                     
-                                    var maxValue = Math.max(Math.max.apply(Math, ingresosData), Math.max.apply(Math, egresosData)) * 1.2
+                                    if (ingresosData.length === 0 && egresosData.length === 0) {
+                                        return
+                                    }
+                                    
                                     var minValue = 0
                                     var stepX = width / Math.max(1, (ingresosData.length - 1))
                                     var chartHeight = height - 20
@@ -1040,10 +1036,10 @@ ScrollView {
                                     }
                                     
                                     // Tooltip en hover
-                                    if (hoveredIndex >= 0) {
+                                    if (hoveredIndex >= 0 && hoveredIndex < ingresosData.length) {
                                         var hx = hoveredIndex * stepX
-                                        var hy1 = getY(ingresosData[hoveredIndex])
-                                        var hy2 = getY(egresosData[hoveredIndex])
+                                        var hy1 = getY(ingresosData[hoveredIndex] || 0)
+                                        var hy2 = getY(egresosData[hoveredIndex] || 0)
                                         
                                         // Línea vertical
                                         ctx.strokeStyle = "#6b7280"
@@ -1104,10 +1100,10 @@ ScrollView {
                                 
                                 Repeater {
                                     model: {
-                                        var maxValue = Math.max(calculateTotalIngresos(), calculateTotalEgresos())
+                                        // Misma escala que el gráfico (máximo de las series, no totales del período)
                                         var labels = []
                                         for (var i = 6; i >= 0; i--) {
-                                            var value = (maxValue * 1.2) * i / 6
+                                            var value = chartCanvas.maxValue * i / 6
                                             labels.push("Bs " + Math.round(value))
                                         }
                                         return labels
@@ -1137,6 +1133,8 @@ ScrollView {
                                         color: "#6b7280"
                                         x: index * ((parent.width) / Math.max(1, (chartCanvas.labels.length - 1))) - width/2
                                         anchors.bottom: parent.bottom
+                                        // Con 24 horas se muestra una de cada dos para que no se encimen
+                                        visible: chartCanvas.labels.length <= 12 || index % 2 === 0
                                     }
                                 }
                             }                           
@@ -1156,10 +1154,10 @@ ScrollView {
                                 property string egresosText: ""
                                 
                                 function updateData(index) {
-                                    if (index >= 0 && index < chartCanvas.labels.length) {
-                                        periodText = chartCanvas.labels[index]
-                                        ingresosText = "Ingresos: Bs " + chartCanvas.ingresosData[index].toFixed(2)
-                                        egresosText = "Egresos: Bs " + chartCanvas.egresosData[index].toFixed(2)
+                                    if (index >= 0 && index < chartCanvas.ingresosData.length) {
+                                        periodText = chartCanvas.labels[index] || ""
+                                        ingresosText = "Ingresos: Bs " + (chartCanvas.ingresosData[index] || 0).toFixed(2)
+                                        egresosText = "Egresos: Bs " + (chartCanvas.egresosData[index] || 0).toFixed(2)
                                     }
                                 }
                                 
@@ -6,6 +6,9 @@ Componentes principales:
 - cache_system: Sistema de caché thread-safe con TTL
 - excepciones: Manejo de errores personalizado
 - base_repository: Clase base para repositories CRUD
+- alertas_inventario: Motor de alertas de vencimiento y stock bajo
+- diario_ventas: Diario local de ventas con reenvío en segundo plano
+- libro_caja: Libro de caja en memoria del turno abierto
 """
 
 from .database_conexion import DatabaseConnection
@@ -17,6 +20,9 @@ from .excepciones import (
 )
 from .base_repository import BaseRepository
 from .config_fifo import ConfigFIFO
+from .alertas_inventario import MotorAlertasInventario, get_motor_alertas
+from .diario_ventas import DiarioVentas, ReenvioDiarioVentas, get_diario_ventas
+from .libro_caja import LibroCaja
 
 __all__ = [
     'DatabaseConnection',
@@ -26,6 +32,9 @@ __all__ = [
     'ValidationError', 'ExceptionHandler',
     'BaseRepository',
     'ConfigFIFO',
+    'MotorAlertasInventario', 'get_motor_alertas',
+    'DiarioVentas', 'ReenvioDiarioVentas', 'get_diario_ventas',
+    'LibroCaja',
 ]
 
 print("🔧 Core Backend cargado")
\ No newline at end of file
@@ -0,0 +1,512 @@
+"""
+Motor de alertas de inventario (vencimientos y stock bajo)
+Mantiene los lotes ordenados por fecha de vencimiento y los productos por stock,
+se actualiza con los eventos de lotes y re-evalúa los umbrales de fecha una vez al día.
+Todos los consumidores leen el mismo snapshot precalculado.
+También mantiene la valoración del inventario (costo y venta) como totales acumulados
+ajustados por el delta de cada producto releído.
+El hilo de alertas calcula el snapshot para los modelos fuera del hilo de la interfaz.
+"""
+
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Días de anticipación para la alerta "PRODUCTO PRÓXIMO A VENCER"
+DIAS_ALERTA_PROXIMO_VENCER = 30
+
+# cargador(producto_ids) -> (productos, lotes) o None si falló la consulta
+CargadorAlertas = Callable[[Optional[List[int]]], Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]]
+
+# calculo() -> dict con las listas de alertas (lo arma ProductoRepository)
+CalculoAlertas = Callable[[], Dict[str, Any]]
+
+
+def _normalizar_fecha(valor) -> Optional[date]:
+    """Convierte la fecha de vencimiento devuelta por pyodbc a date"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return datetime.strptime(str(valor)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+class MotorAlertasInventario:
+    """Índice en memoria de lotes y stock para alertas de inventario (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()  # una sola lectura a la BD a la vez (no bloquea a los lectores)
+        self._cargador: Optional[CargadorAlertas] = None
+
+        # Estado indexado
+        self._productos: Dict[int, Dict[str, Any]] = {}
+        self._lotes: Dict[int, Dict[str, Any]] = {}
+        self._lotes_por_producto: Dict[int, set] = {}
+        self._orden_vencimiento: List[Tuple[date, int]] = []  # (Fecha_Vencimiento, lote_id)
+        self._orden_stock: List[Tuple[int, int]] = []         # (Stock_Total, producto_id)
+
+        # Valoración acumulada (solo productos con stock > 0)
+        self._valoracion = self._valoracion_vacia()
+
+        # Cambios pendientes de aplicar
+        self._cargado = False
+        self._recarga_completa = True
+        self._productos_pendientes: set = set()
+
+        # Snapshot precalculado
+        self._version = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+        self._recargas = 0
+        self._recargas_parciales = 0
+
+    # ===============================
+    # CONFIGURACIÓN Y EVENTOS
+    # ===============================
+
+    def configurar_cargador(self, cargador: CargadorAlertas):
+        """Define la función que lee productos y lotes desde la BD"""
+        with self._lock:
+            self._cargador = cargador
+
+    def registrar_cambio_lotes(self, producto_ids: Optional[Iterable[int]] = None):
+        """
+        Evento de lotes: marca productos a releer en la próxima lectura.
+        Sin producto_ids se programa una recarga completa.
+        """
+        with self._lock:
+            if producto_ids is None:
+                self._recarga_completa = True
+                self._productos_pendientes.clear()
+            elif not self._recarga_completa:
+                self._productos_pendientes.update(int(pid) for pid in producto_ids if pid)
+
+    # ===============================
+    # CONSULTAS SOBRE EL SNAPSHOT
+    # ===============================
+
+    def obtener_alertas(self) -> List[Dict[str, Any]]:
+        """Alertas con el mismo formato que la antigua consulta UNION"""
+        snapshot = self._obtener_snapshot()
+        return [dict(alerta) for alerta in snapshot['alertas']]
+
+    def lotes_vencidos(self) -> List[Dict[str, Any]]:
+        """Lotes vencidos con stock, ordenados por fecha de vencimiento"""
+        snapshot = self._obtener_snapshot()
+        return [dict(lote) for lote in snapshot['lotes_vencidos']]
+
+    def lotes_por_vencer(self, dias_adelante: int) -> List[Dict[str, Any]]:
+        """Lotes con stock que vencen entre mañana y hoy + dias_adelante"""
+        self._sincronizar()
+        with self._lock:
+            snapshot = self._snapshot_vigente()
+            por_vencer = snapshot['por_vencer']
+            if dias_adelante not in por_vencer:
+                hoy = snapshot['fecha']
+                inicio = bisect_right(self._orden_vencimiento, (hoy, float('inf')))
+                fin = bisect_right(self._orden_vencimiento, (hoy + timedelta(days=dias_adelante), float('inf')))
+                por_vencer[dias_adelante] = [
+                    self._formatear_lote(self._lotes[lote_id], 'Dias_Para_Vencer', (fecha - hoy).days)
+                    for fecha, lote_id in self._orden_vencimiento[inicio:fin]
+                ]
+            return [dict(lote) for lote in por_vencer[dias_adelante]]
+
+    def productos_bajo_stock(self, stock_minimo: int) -> List[Dict[str, Any]]:
+        """Productos con stock total <= stock_minimo, ordenados por stock"""
+        self._sincronizar()
+        with self._lock:
+            self._snapshot_vigente()
+            fin = bisect_right(self._orden_stock, (stock_minimo, float('inf')))
+            resultado = []
+            for stock, producto_id in self._orden_stock[:fin]:
+                producto = dict(self._productos[producto_id]['datos'])
+                producto['Stock_Total'] = stock
+                resultado.append(producto)
+            return resultado
+
+    def valoracion(self) -> Dict[str, Any]:
+        """Valor del inventario a costo y a precio de venta (tiempo constante)"""
+        self._sincronizar()
+        with self._lock:
+            self._snapshot_vigente()
+            return {
+                'Valor_Compra': round(self._valoracion['Valor_Compra'], 2),
+                'Valor_Venta': round(self._valoracion['Valor_Venta'], 2),
+                'Total_Productos': self._valoracion['Total_Productos'],
+                'Total_Unidades': self._valoracion['Total_Unidades']
+            }
+
+    def stock_local(self, codigos: Iterable[str]) -> Optional[Dict[str, int]]:
+        """
+        Stock indexado por código sin consultar la BD (para operar sin conexión).
+        Retorna None si el motor todavía no se cargó.
+        """
+        with self._lock:
+            if not self._cargado:
+                return None
+            buscados = {str(codigo).strip() for codigo in codigos}
+            resultado = {}
+            for entrada in self._productos.values():
+                codigo = str(entrada['datos'].get('Codigo') or '').strip()
+                if codigo in buscados:
+                    resultado[codigo] = entrada['stock']
+            return resultado
+
+    def get_version(self) -> int:
+        """Versión de los datos indexados (cambia con cada evento aplicado)"""
+        with self._lock:
+            return self._version
+
+    def get_estadisticas(self) -> Dict[str, Any]:
+        """Estado del motor para diagnóstico"""
+        with self._lock:
+            return {
+                'productos': len(self._productos),
+                'lotes': len(self._lotes),
+                'version': self._version,
+                'fecha_evaluacion': self._snapshot['fecha'].isoformat() if self._snapshot else None,
+                'recargas_completas': self._recargas,
+                'recargas_parciales': self._recargas_parciales,
+                'pendientes': 'todos' if self._recarga_completa else len(self._productos_pendientes)
+            }
+
+    # ===============================
+    # SINCRONIZACIÓN CON LA BD
+    # ===============================
+
+    def _obtener_snapshot(self) -> Dict[str, Any]:
+        """Aplica eventos pendientes y re-evalúa fechas si cambió el día"""
+        self._sincronizar()
+        with self._lock:
+            return self._snapshot_vigente()
+
+    def _snapshot_vigente(self) -> Dict[str, Any]:
+        """Con el lock tomado: reconstruye el snapshot si cambió la versión o el día"""
+        hoy = date.today()
+        if (self._snapshot is None or self._snapshot['fecha'] != hoy
+                or self._snapshot['version'] != self._version):
+            self._snapshot = self._construir_snapshot(hoy)
+        return self._snapshot
+
+    def _sincronizar(self):
+        """
+        Relee desde la BD solo lo marcado por eventos de lotes.
+        La consulta corre sin el lock de los índices: eventos y lecturas no esperan al SQL.
+        El lock solo se toma para retirar los pendientes y para aplicar el resultado;
+        si otro hilo ya está consultando, se responde con los índices actuales.
+        """
+        if not self._lock_carga.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                cargador = self._cargador
+                if cargador is None:
+                    return
+                completa = self._recarga_completa or not self._cargado
+                if completa:
+                    producto_ids = None
+                elif self._productos_pendientes:
+                    producto_ids = sorted(self._productos_pendientes)
+                else:
+                    return
+                # Los eventos que lleguen durante la consulta quedan para la próxima
+                self._recarga_completa = False
+                self._productos_pendientes.clear()
+
+            datos = cargador(producto_ids)
+
+            with self._lock:
+                if datos is None:
+                    # Falló la consulta: se vuelve a marcar lo que se intentó releer
+                    if completa:
+                        self._recarga_completa = True
+                        self._productos_pendientes.clear()
+                    elif not self._recarga_completa:
+                        self._productos_pendientes.update(producto_ids)
+                    return
+
+                productos, lotes = datos
+                if completa:
+                    self._reiniciar_indices()
+                    self._cargado = True
+                    self._recargas += 1
+                else:
+                    for producto_id in producto_ids:
+                        self._quitar_producto(producto_id)
+                    self._recargas_parciales += 1
+                self._indexar(productos, lotes)
+                self._version += 1
+                if completa:
+                    print(f"🔔 Motor de alertas cargado: {len(self._productos)} productos, {len(self._lotes)} lotes")
+        finally:
+            self._lock_carga.release()
+
+    def _reiniciar_indices(self):
+        self._productos.clear()
+        self._lotes.clear()
+        self._lotes_por_producto.clear()
+        self._orden_vencimiento = []
+        self._orden_stock = []
+        self._valoracion = self._valoracion_vacia()
+
+    @staticmethod
+    def _valoracion_vacia() -> Dict[str, Any]:
+        return {'Valor_Compra': 0.0, 'Valor_Venta': 0.0, 'Total_Productos': 0, 'Total_Unidades': 0}
+
+    def _ajustar_valoracion(self, producto_id: int, signo: int):
+        """Suma (signo=1) o resta (signo=-1) la contribución de un producto"""
+        entrada = self._productos[producto_id]
+        stock = entrada['stock']
+        if stock <= 0:
+            return
+        datos = entrada['datos']
+        self._valoracion['Valor_Compra'] += signo * stock * float(datos.get('Precio_compra') or 0)
+        self._valoracion['Valor_Venta'] += signo * stock * float(datos.get('Precio_venta') or 0)
+        self._valoracion['Total_Productos'] += signo
+        self._valoracion['Total_Unidades'] += signo * stock
+
+    def _indexar(self, productos: List[Dict[str, Any]], lotes: List[Dict[str, Any]]):
+        """Inserta productos y lotes en las estructuras ordenadas"""
+        for producto in productos:
+            producto_id = producto['id']
+            self._productos[producto_id] = {'datos': producto, 'stock': 0}
+            self._lotes_por_producto[producto_id] = set()
+
+        for lote in lotes:
+            producto_id = lote['Id_Producto']
+            if producto_id not in self._productos:
+                continue
+            lote_id = lote['id']
+            cantidad = int(lote.get('Cantidad_Unitario') or 0)
+            fecha = _normalizar_fecha(lote.get('Fecha_Vencimiento'))
+
+            self._lotes[lote_id] = {'datos': lote, 'fecha': fecha, 'cantidad': cantidad}
+            self._lotes_por_producto[producto_id].add(lote_id)
+            self._productos[producto_id]['stock'] += cantidad
+            if fecha is not None and cantidad > 0:
+                insort(self._orden_vencimiento, (fecha, lote_id))
+
+        for producto in productos:
+            producto_id = producto['id']
+            insort(self._orden_stock, (self._productos[producto_id]['stock'], producto_id))
+            self._ajustar_valoracion(producto_id, 1)
+
+    def _quitar_producto(self, producto_id: int):
+        """Elimina un producto y sus lotes de los índices"""
+        if producto_id in self._productos:
+            self._ajustar_valoracion(producto_id, -1)
+        entrada = self._productos.pop(producto_id, None)
+        if entrada is not None:
+            self._quitar_ordenado(self._orden_stock, (entrada['stock'], producto_id))
+
+        for lote_id in self._lotes_por_producto.pop(producto_id, set()):
+            lote = self._lotes.pop(lote_id, None)
+            if lote and lote['fecha'] is not None and lote['cantidad'] > 0:
+                self._quitar_ordenado(self._orden_vencimiento, (lote['fecha'], lote_id))
+
+    @staticmethod
+    def _quitar_ordenado(lista: list, clave: tuple):
+        posicion = bisect_left(lista, clave)
+        if posicion < len(lista) and lista[posicion] == clave:
+            del lista[posicion]
+
+    # ===============================
+    # CONSTRUCCIÓN DEL SNAPSHOT
+    # ===============================
+
+    def _construir_snapshot(self, hoy: date) -> Dict[str, Any]:
+        """Calcula alertas y lotes vencidos para el día indicado"""
+        limite_vencidos = bisect_right(self._orden_vencimiento, (hoy, float('inf')))
+        limite_proximos = bisect_right(
+            self._orden_vencimiento,
+            (hoy + timedelta(days=DIAS_ALERTA_PROXIMO_VENCER), float('inf'))
+        )
+
+        lotes_vencidos = []
+        alertas_vencidos = []
+        for fecha, lote_id in self._orden_vencimiento[:limite_vencidos]:
+            lote = self._lotes[lote_id]
+            producto = self._productos[lote['datos']['Id_Producto']]['datos']
+            dias = (hoy - fecha).days
+            lotes_vencidos.append(self._formatear_lote(lote, 'Dias_Vencido', dias))
+            alertas_vencidos.append({
+                'Tipo_Alerta': 'PRODUCTO VENCIDO',
+                'Codigo': producto.get('Codigo'),
+                'Producto': producto.get('Nombre'),
+                'Stock_Minimo': producto.get('Stock_Minimo'),
+                'Stock_Actual': lote['cantidad'],
+                'Detalle': f"Venció el {fecha.strftime('%d/%m/%Y')} ({dias} días atrás)",
+                'Prioridad': 3
+            })
+
+        alertas_proximos = []
+        for fecha, lote_id in self._orden_vencimiento[limite_vencidos:limite_proximos]:
+            lote = self._lotes[lote_id]
+            producto = self._productos[lote['datos']['Id_Producto']]['datos']
+            alertas_proximos.append({
+                'Tipo_Alerta': 'PRODUCTO PRÓXIMO A VENCER',
+                'Codigo': producto.get('Codigo'),
+                'Producto': producto.get('Nombre'),
+                'Stock_Minimo': producto.get('Stock_Minimo'),
+                'Stock_Actual': lote['cantidad'],
+                'Detalle': f"Vence el {fecha.strftime('%d/%m/%Y')} ({(fecha - hoy).days} días)",
+                'Prioridad': 2
+            })
+
+        # Stock bajo: 0 < stock <= Stock_Minimo (solo productos activos)
+        maximo_minimo = max(
+            (int(p['datos'].get('Stock_Minimo') or 0) for p in self._productos.values()),
+            default=0
+        )
+        inicio = bisect_right(self._orden_stock, (0, float('inf')))
+        fin = bisect_right(self._orden_stock, (maximo_minimo, float('inf')))
+        alertas_stock = []
+        for stock, producto_id in self._orden_stock[inicio:fin]:
+            producto = self._productos[producto_id]['datos']
+            stock_minimo = int(producto.get('Stock_Minimo') or 0)
+            if not producto.get('Activo') or stock > stock_minimo:
+                continue
+            alertas_stock.append({
+                'Tipo_Alerta': 'STOCK BAJO',
+                'Codigo': producto.get('Codigo'),
+                'Producto': producto.get('Nombre'),
+                'Stock_Minimo': stock_minimo,
+                'Stock_Actual': stock,
+                'Detalle': f"Stock actual: {stock} unidades (mínimo: {stock_minimo})",
+                'Prioridad': 2
+            })
+
+        return {
+            'fecha': hoy,
+            'version': self._version,
+            'alertas': alertas_vencidos + alertas_proximos + alertas_stock,
+            'lotes_vencidos': lotes_vencidos,
+            'por_vencer': {}
+        }
+
+    def _formatear_lote(self, lote: Dict[str, Any], campo_dias: str, dias: int) -> Dict[str, Any]:
+        """Lote con los mismos campos que SELECT l.*, p.Codigo, ... de ProductoRepository"""
+        producto = self._productos[lote['datos']['Id_Producto']]['datos']
+        resultado = dict(lote['datos'])
+        resultado['Codigo'] = producto.get('Codigo')
+        resultado['Producto_Nombre'] = producto.get('Nombre')
+        resultado['Marca_Nombre'] = producto.get('Marca_Nombre')
+        resultado['Stock_Lote'] = lote['cantidad']
+        resultado[campo_dias] = dias
+        return resultado
+
+
+# Instancia global singleton
+_motor_instance = None
+_motor_lock = threading.Lock()
+
+def get_motor_alertas() -> MotorAlertasInventario:
+    """Obtiene la instancia singleton del motor de alertas"""
+    global _motor_instance
+    if _motor_instance is None:
+        with _motor_lock:
+            if _motor_instance is None:
+                _motor_instance = MotorAlertasInventario()
+                print("🔔 Motor de alertas de inventario inicializado")
+    return _motor_instance
+
+
+def congelar_snapshot(datos: Dict[str, Any]) -> MappingProxyType:
+    """Snapshot inmutable (listas → tuplas de solo lectura) con el hash de su contenido"""
+    contenido = json.dumps(datos, sort_keys=True, default=str)
+    congelado = {
+        clave: (tuple(MappingProxyType(dict(item)) for item in valor) if isinstance(valor, list)
+                else MappingProxyType(dict(valor)) if isinstance(valor, dict) else valor)
+        for clave, valor in datos.items()
+    }
+    congelado['hash'] = hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+    return MappingProxyType(congelado)
+
+
+class HiloAlertasInventario(threading.Thread):
+    """
+    Calcula las alertas de inventario en segundo plano (las lecturas del motor pueden
+    sincronizar contra la BD). Las solicitudes que llegan mientras calcula se fusionan
+    en un solo cálculo más. Cada suscriptor recibe el snapshot desde este hilo:
+    los modelos lo reemiten por una señal encolada hacia el hilo de la interfaz.
+    """
+
+    def __init__(self):
+        super().__init__(name="HiloAlertasInventario", daemon=True)
+        self._calculo: Optional[CalculoAlertas] = None
+        self._suscriptores: List[Callable[[MappingProxyType], None]] = []
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self.ultimo: Optional[MappingProxyType] = None
+
+    def configurar_calculo(self, calculo: CalculoAlertas):
+        self._calculo = calculo
+
+    def suscribir(self, callback: Callable[[MappingProxyType], None]):
+        with self._lock:
+            if callback not in self._suscriptores:
+                self._suscriptores.append(callback)
+
+    def desuscribir(self, callback: Callable[[MappingProxyType], None]):
+        with self._lock:
+            if callback in self._suscriptores:
+                self._suscriptores.remove(callback)
+
+    def solicitar(self):
+        """Pide un cálculo (no bloquea); arranca el hilo la primera vez"""
+        with self._lock:
+            if not self.is_alive() and not self._detener.is_set():
+                self.start()
+        self._despertar.set()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+
+    @property
+    def detenido(self) -> bool:
+        return self._detener.is_set()
+
+    def run(self):
+        print("🔔 Hilo de alertas de inventario iniciado")
+        while not self._detener.is_set():
+            self._despertar.wait()
+            self._despertar.clear()
+            if self._detener.is_set() or self._calculo is None:
+                continue
+            try:
+                snapshot = congelar_snapshot(self._calculo())
+            except Exception as e:
+                print(f"⚠️ Error calculando alertas de inventario: {e}")
+                continue
+            self.ultimo = snapshot
+            with self._lock:
+                suscriptores = list(self._suscriptores)
+            for callback in suscriptores:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"⚠️ Error publicando alertas de inventario: {e}")
+
+
+_hilo_alertas_instance = None
+
+def get_hilo_alertas() -> HiloAlertasInventario:
+    """Obtiene el hilo singleton de cálculo de alertas (se inicia con la primera solicitud)"""
+    global _hilo_alertas_instance
+    if _hilo_alertas_instance is None or _hilo_alertas_instance.detenido:
+        with _motor_lock:
+            if _hilo_alertas_instance is None or _hilo_alertas_instance.detenido:
+                _hilo_alertas_instance = HiloAlertasInventario()
+    return _hilo_alertas_instance
@@ -7,11 +7,55 @@ import decimal
 
 from .database_conexion import DatabaseConnection
 from .cache_system import get_cache, cached_query, invalidate_after_update
+from .alertas_inventario import get_motor_alertas
 from .excepciones import (
     DatabaseQueryError, DatabaseTransactionError, DatabaseConnectionError,
     ExceptionHandler, safe_execute, validate_required
 )
 
+# Expresiones de agrupación por fecha para los agregados (el campo se sustituye)
+AGRUPACIONES_FECHA = {
+    'dia': "CAST({campo} AS DATE)",
+    'hora': "DATEPART(HOUR, {campo})",
+    'mes': "MONTH({campo})"
+}
+
+
+def construir_query_agregados(valor: str, from_clause: str, campo_fecha: str,
+                              agrupaciones: Dict[str, str] = None, agrupar_por: str = None,
+                              where_extra: str = "") -> str:
+    """
+    Construye un SELECT con SUM/COUNT/AVG de `valor` en [fecha_inicio, fecha_fin).
+    `agrupaciones` mapea nombres (usuario, tipo...) a columnas; las de fecha ya están incluidas.
+    Parámetros esperados: (fecha_inicio, fecha_fin) seguidos de los de `where_extra`.
+    """
+    where_sql = f"{campo_fecha} >= ? AND {campo_fecha} < ?"
+    if where_extra:
+        where_sql += f" AND {where_extra}"
+
+    if not agrupar_por:
+        return f"""
+        SELECT ISNULL(SUM({valor}), 0) as total, COUNT(*) as cantidad, ISNULL(AVG({valor}), 0) as promedio
+        FROM {from_clause}
+        WHERE {where_sql}
+        """
+
+    if agrupar_por in AGRUPACIONES_FECHA:
+        grupo = AGRUPACIONES_FECHA[agrupar_por].format(campo=campo_fecha)
+    elif agrupaciones and agrupar_por in agrupaciones:
+        grupo = agrupaciones[agrupar_por]
+    else:
+        raise ValueError(f"Agrupación no soportada: {agrupar_por}")
+
+    return f"""
+    SELECT {grupo} as grupo, ISNULL(SUM({valor}), 0) as total, COUNT(*) as cantidad, ISNULL(AVG({valor}), 0) as promedio
+    FROM {from_clause}
+    WHERE {where_sql}
+    GROUP BY {grupo}
+    ORDER BY grupo
+    """
+
+
 class BaseRepository(ABC):
     """
     Clase base para todos los repositories con CRUD + Caché + Transacciones
@@ -303,12 +347,14 @@ class BaseRepository(ABC):
                 # Lotes afecta productos y stock
                 cache_types_to_invalidate = ['productos', 'stock_producto', 'lotes_activos']
                 invalidate_after_update(cache_types_to_invalidate)
+                get_motor_alertas().registrar_cambio_lotes()
                 print(f"   🔄 Caches cruzados invalidados para lotes: {cache_types_to_invalidate}")
                 
             elif self.cache_type == 'compras' or self.table_name == 'Compras':
                 # Compras afecta productos, lotes, stock
                 cache_types_to_invalidate = ['productos', 'lotes_activos', 'stock_producto']
                 invalidate_after_update(cache_types_to_invalidate)
+                get_motor_alertas().registrar_cambio_lotes()
                 print(f"   🔄 Caches cruzados invalidados para compras: {cache_types_to_invalidate}")
             
             # ✅ LIMPIAR CACHES INTERNOS DEL OBJETO
@@ -665,6 +711,34 @@ class BaseRepository(ABC):
             'pages': (total + per_page - 1) // per_page
         }
     
+    # ===============================
+    # AGREGADOS EN SQL
+    # ===============================
+
+    def _get_agregados(self, valor: str, from_clause: str, campo_fecha: str,
+                       fecha_inicio: datetime, fecha_fin: datetime,
+                       agrupaciones: Dict[str, str] = None, agrupar_por: str = None,
+                       where_extra: str = "", params_extra: tuple = ()) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Total, cantidad y promedio calculados en SQL para un rango [inicio, fin).
+        Sin `agrupar_por` retorna {'total', 'cantidad', 'promedio'};
+        con agrupación retorna una lista con 'grupo' además de esos campos.
+        """
+        query = construir_query_agregados(
+            valor, from_clause, campo_fecha, agrupaciones, agrupar_por, where_extra
+        )
+        params = (fecha_inicio, fecha_fin) + tuple(params_extra)
+
+        if not agrupar_por:
+            resultado = self._execute_query(query, params, fetch_one=True, use_cache=False) or {}
+            return {
+                'total': round(float(resultado.get('total') or 0), 2),
+                'cantidad': int(resultado.get('cantidad') or 0),
+                'promedio': round(float(resultado.get('promedio') or 0), 2)
+            }
+
+        return self._execute_query(query, params, use_cache=False) or []
+    
     # ===============================
     # MÉTODOS ABSTRACTOS
     # ===============================
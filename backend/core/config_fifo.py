@@ -14,7 +14,7 @@ class ConfigFIFO:
     USE_VENTA_FIFO_V2 = True  # True = Usa sp_Vender_Producto_FIFO, False = Usa lógica Python
     
     # Sistema de compras
-    USE_COMPRA_SP = True  # True = Usa sp_Registrar_Compra_Con_Lotes, False = Usa lógica Python
+    USE_COMPRA_SP = True  # True = Registra la factura en un solo lote SQL (OPENJSON), False = Registro por item
     
     # Vistas para consultas
     USE_VISTAS_SQL = True  # True = Usa vistas (vw_Stock_Actual, etc), False = Usa queries directas
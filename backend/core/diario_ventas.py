@@ -0,0 +1,335 @@
+"""
+Diario local de ventas (write-ahead) con reenvío en segundo plano
+Las ventas se guardan primero en un SQLite local y se confirman al instante;
+un hilo las envía a SQL Server por el flujo normal de crear_venta, con su hora local
+y una clave única que evita registrarlas dos veces si se pierde la respuesta del commit.
+Los cortes de conexión se reintentan sin límite y los deadlocks hasta MAX_INTENTOS_ENVIO;
+cualquier otro error (sin stock, producto inexistente, datos inválidos) pasa la venta
+a la cola de conflictos para que el usuario la reintente o descarte.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .excepciones import es_error_concurrencia, es_error_conexion
+
+# Estados de una venta en el diario
+PENDIENTE = 'PENDIENTE'
+ENVIANDO = 'ENVIANDO'
+ENVIADA = 'ENVIADA'
+CONFLICTO = 'CONFLICTO'
+DESCARTADA = 'DESCARTADA'
+
+INTERVALO_REENVIO = 5        # segundos entre intentos con ventas pendientes
+INTERVALO_REENVIO_MAX = 60   # espera máxima tras fallos de conexión consecutivos
+DIAS_RETENCION_ENVIADAS = 7  # las ventas enviadas se purgan después de estos días
+MAX_INTENTOS_ENVIO = 5       # deadlocks seguidos antes de pasar la venta a conflicto
+
+
+def _directorio_datos() -> Path:
+    """Misma ubicación que la configuración: APPDATA en ejecutable, proyecto en desarrollo"""
+    if getattr(sys, 'frozen', False):
+        base_dir = Path(os.environ['APPDATA']) / 'ClinicaMariaInmaculada'
+    else:
+        base_dir = Path(__file__).resolve().parent.parent.parent
+    base_dir.mkdir(parents=True, exist_ok=True)
+    return base_dir
+
+
+class DiarioVentas:
+    """Diario durable de ventas en SQLite (thread-safe)"""
+
+    def __init__(self, ruta: Optional[str] = None):
+        self.ruta = str(ruta or _directorio_datos() / 'diario_ventas.db')
+        self._lock = threading.RLock()
+        self._crear_tabla()
+        self._recuperar_interrumpidas()
+
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.ruta, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _crear_tabla(self):
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS ventas_diario (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        usuario_id INTEGER NOT NULL,
+                        items TEXT NOT NULL,
+                        total REAL NOT NULL,
+                        fecha_local TEXT NOT NULL,
+                        estado TEXT NOT NULL,
+                        venta_id INTEGER,
+                        error TEXT,
+                        intentos INTEGER NOT NULL DEFAULT 0,
+                        fecha_actualizacion TEXT NOT NULL,
+                        clave TEXT
+                    )
+                """)
+                columnas = {fila['name'] for fila in conn.execute("PRAGMA table_info(ventas_diario)")}
+                if 'clave' not in columnas:
+                    # Diario anterior a la clave: lo que quedó enviándose sin clave no se puede verificar
+                    conn.execute("ALTER TABLE ventas_diario ADD COLUMN clave TEXT")
+                    conn.execute(
+                        "UPDATE ventas_diario SET estado = ?, error = ? WHERE estado = ?",
+                        (CONFLICTO, "Envío interrumpido: verifique si la venta se registró antes de reintentar", ENVIANDO)
+                    )
+                    conn.execute("UPDATE ventas_diario SET clave = lower(hex(randomblob(16))) WHERE clave IS NULL")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_ventas_diario_estado ON ventas_diario (estado, id)")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _recuperar_interrumpidas(self):
+        """
+        Una venta que quedó ENVIANDO (cierre durante el envío) pudo haberse registrado o no;
+        vuelve a la cola: si ya se registró, crear_venta la reconoce por su clave.
+        """
+        with self._lock:
+            conn = self._conectar()
+            try:
+                filas = conn.execute(
+                    "UPDATE ventas_diario SET estado = ?, error = ?, fecha_actualizacion = ? WHERE estado = ?",
+                    (PENDIENTE, "Envío interrumpido", datetime.now().isoformat(), ENVIANDO)
+                ).rowcount
+                conn.commit()
+                if filas:
+                    print(f"⚠️ Diario de ventas: {filas} envíos interrumpidos devueltos a pendientes")
+            finally:
+                conn.close()
+
+    # ===============================
+    # ESCRITURA
+    # ===============================
+
+    def registrar(self, usuario_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Guarda una venta en el diario (durable al retornar)"""
+        total = round(sum(float(i['cantidad']) * float(i['precio']) for i in items), 2)
+        ahora = datetime.now().isoformat()
+        clave = uuid.uuid4().hex
+        with self._lock:
+            conn = self._conectar()
+            try:
+                cursor = conn.execute("""
+                    INSERT INTO ventas_diario (usuario_id, items, total, fecha_local, estado, fecha_actualizacion, clave)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (usuario_id, json.dumps(items), total, ahora, PENDIENTE, ahora, clave))
+                conn.commit()
+                return {'id': cursor.lastrowid, 'usuario_id': usuario_id, 'items': items,
+                        'total': total, 'fecha_local': ahora, 'estado': PENDIENTE, 'clave': clave}
+            finally:
+                conn.close()
+
+    def _cambiar_estado(self, entrada_id: int, estado: str, venta_id: int = None,
+                        error: str = None, sumar_intento: bool = False, estados_previos: tuple = None,
+                        reiniciar_intentos: bool = False) -> bool:
+        with self._lock:
+            conn = self._conectar()
+            try:
+                query = """
+                    UPDATE ventas_diario
+                    SET estado = ?, venta_id = COALESCE(?, venta_id), error = ?,
+                        intentos = CASE WHEN ? THEN 0 ELSE intentos + ? END, fecha_actualizacion = ?
+                    WHERE id = ?
+                """
+                params = [estado, venta_id, error, 1 if reiniciar_intentos else 0, 1 if sumar_intento else 0,
+                          datetime.now().isoformat(), entrada_id]
+                if estados_previos:
+                    query += f" AND estado IN ({', '.join('?' for _ in estados_previos)})"
+                    params.extend(estados_previos)
+                filas = conn.execute(query, params).rowcount
+                conn.commit()
+                return filas > 0
+            finally:
+                conn.close()
+
+    def marcar_enviando(self, entrada_id: int) -> bool:
+        return self._cambiar_estado(entrada_id, ENVIANDO, estados_previos=(PENDIENTE,))
+
+    def marcar_enviada(self, entrada_id: int, venta_id: int):
+        self._cambiar_estado(entrada_id, ENVIADA, venta_id=venta_id, sumar_intento=True)
+
+    def marcar_conflicto(self, entrada_id: int, error: str):
+        self._cambiar_estado(entrada_id, CONFLICTO, error=error, sumar_intento=True)
+
+    def devolver_a_pendiente(self, entrada_id: int, error: str, sumar_intento: bool = True):
+        self._cambiar_estado(entrada_id, PENDIENTE, error=error, sumar_intento=sumar_intento)
+
+    def reintentar(self, entrada_id: int) -> bool:
+        """Devuelve un conflicto a la cola de envío con los intentos en cero"""
+        return self._cambiar_estado(entrada_id, PENDIENTE, estados_previos=(CONFLICTO,), reiniciar_intentos=True)
+
+    def descartar(self, entrada_id: int, motivo: str = "Descartada por el usuario") -> bool:
+        """Descarta un conflicto (la venta no se registrará)"""
+        return self._cambiar_estado(entrada_id, DESCARTADA, error=motivo, estados_previos=(CONFLICTO,))
+
+    def purgar_enviadas(self, dias: int = DIAS_RETENCION_ENVIADAS) -> int:
+        """Elimina del diario las ventas ya enviadas hace más de `dias` días"""
+        limite = datetime.fromordinal(datetime.now().toordinal() - dias).isoformat()
+        with self._lock:
+            conn = self._conectar()
+            try:
+                filas = conn.execute(
+                    "DELETE FROM ventas_diario WHERE estado IN (?, ?) AND fecha_actualizacion < ?",
+                    (ENVIADA, DESCARTADA, limite)
+                ).rowcount
+                conn.commit()
+                return filas
+            finally:
+                conn.close()
+
+    # ===============================
+    # LECTURA
+    # ===============================
+
+    def _listar(self, estados: tuple, limite: int = None) -> List[Dict[str, Any]]:
+        query = f"SELECT * FROM ventas_diario WHERE estado IN ({', '.join('?' for _ in estados)}) ORDER BY id"
+        if limite:
+            query += f" LIMIT {int(limite)}"
+        with self._lock:
+            conn = self._conectar()
+            try:
+                filas = conn.execute(query, estados).fetchall()
+            finally:
+                conn.close()
+        resultado = []
+        for fila in filas:
+            entrada = dict(fila)
+            entrada['items'] = json.loads(entrada['items'])
+            resultado.append(entrada)
+        return resultado
+
+    def pendientes(self, limite: int = None) -> List[Dict[str, Any]]:
+        return self._listar((PENDIENTE,), limite)
+
+    def conflictos(self) -> List[Dict[str, Any]]:
+        return self._listar((CONFLICTO,))
+
+    def unidades_sin_confirmar(self) -> Dict[str, int]:
+        """Unidades por código comprometidas en ventas aún no registradas en SQL Server"""
+        unidades: Dict[str, int] = {}
+        for entrada in self._listar((PENDIENTE, ENVIANDO)):
+            for item in entrada['items']:
+                codigo = str(item['codigo']).strip()
+                unidades[codigo] = unidades.get(codigo, 0) + int(item['cantidad'])
+        return unidades
+
+    def get_estadisticas(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._conectar()
+            try:
+                filas = conn.execute("SELECT estado, COUNT(*) FROM ventas_diario GROUP BY estado").fetchall()
+            finally:
+                conn.close()
+        return {estado: cantidad for estado, cantidad in filas}
+
+
+class ReenvioDiarioVentas(threading.Thread):
+    """
+    Hilo que envía las ventas pendientes del diario en orden de llegada.
+    enviar(usuario_id, items, fecha, clave) -> venta registrada (dict con 'id' y 'Total');
+    fecha es la hora en que se confirmó la venta localmente y clave la identifica en el diario.
+    al_procesar(entrada, venta | None, error | None) se llama tras cada envío o conflicto.
+    """
+
+    def __init__(self, diario: DiarioVentas, enviar: Callable, al_procesar: Callable = None):
+        super().__init__(name="ReenvioDiarioVentas", daemon=True)
+        self.diario = diario
+        self.enviar = enviar
+        self.al_procesar = al_procesar
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._fallos_conexion = 0
+
+    def notificar(self):
+        """Despierta el hilo (nueva venta o reintento)"""
+        self._despertar.set()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+
+    def run(self):
+        print("📮 Reenvío del diario de ventas iniciado")
+        self.diario.purgar_enviadas()
+        while not self._detener.is_set():
+            try:
+                self.procesar_pendientes()
+            except Exception as e:
+                print(f"⚠️ Error en reenvío del diario de ventas: {e}")
+
+            espera = min(INTERVALO_REENVIO * (2 ** self._fallos_conexion), INTERVALO_REENVIO_MAX)
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def procesar_pendientes(self):
+        """
+        Envía las pendientes en orden. Sin conexión se detiene y espera; un deadlock deja la venta
+        pendiente hasta MAX_INTENTOS_ENVIO y cualquier otro error la pasa a conflicto.
+        En ambos casos sigue con las siguientes para que una venta fallida no bloquee la cola.
+        """
+        for entrada in self.diario.pendientes(limite=50):
+            if self._detener.is_set():
+                return
+            if not self.diario.marcar_enviando(entrada['id']):
+                continue
+
+            try:
+                venta = self.enviar(entrada['usuario_id'], entrada['items'],
+                                    datetime.fromisoformat(entrada['fecha_local']), entrada['clave'])
+            except Exception as e:
+                if es_error_conexion(e):
+                    # Sin servidor fallarían todas: se reintenta en orden tras la espera
+                    self._fallos_conexion += 1
+                    self.diario.devolver_a_pendiente(entrada['id'], str(e), sumar_intento=False)
+                    print(f"📴 Diario de ventas: sin conexión, reintento en espera ({self._fallos_conexion}): {e}")
+                    return
+                if es_error_concurrencia(e) and entrada['intentos'] + 1 < MAX_INTENTOS_ENVIO:
+                    self._fallos_conexion = 0
+                    self.diario.devolver_a_pendiente(entrada['id'], str(e))
+                    print(f"🔁 Venta local {entrada['id']}: deadlock, se reintentará ({entrada['intentos'] + 1}): {e}")
+                    continue
+                self._registrar_conflicto(entrada, str(e))
+                continue
+
+            self._fallos_conexion = 0
+            self.diario.marcar_enviada(entrada['id'], int(venta['id']))
+            print(f"📮 Venta local {entrada['id']} registrada como venta {venta['id']}")
+            if self.al_procesar:
+                self.al_procesar(entrada, venta, None)
+
+    def _registrar_conflicto(self, entrada: Dict[str, Any], error: str):
+        self._fallos_conexion = 0
+        self.diario.marcar_conflicto(entrada['id'], error)
+        print(f"⚠️ Venta local {entrada['id']} en conflicto: {error}")
+        if self.al_procesar:
+            self.al_procesar(entrada, None, error)
+
+
+# ===============================
+# INSTANCIA GLOBAL
+# ===============================
+
+_diario_instance = None
+_diario_lock = threading.Lock()
+
+def get_diario_ventas() -> DiarioVentas:
+    """Obtiene la instancia singleton del diario de ventas"""
+    global _diario_instance
+    if _diario_instance is None:
+        with _diario_lock:
+            if _diario_instance is None:
+                _diario_instance = DiarioVentas()
+                print(f"📒 Diario local de ventas: {_diario_instance.ruta}")
+    return _diario_instance
@@ -50,6 +50,48 @@ class DatabaseTransactionError(ClinicaBaseException):
         details = {"operation": operation} if operation else {}
         super().__init__(message, "DB_TRANSACTION_ERROR", details)
 
+class ConflictoConcurrenciaError(ClinicaBaseException):
+    """Conflicto con otra transacción (deadlock o lote consumido por otra caja); se puede reintentar completa"""
+    def __init__(self, message: str = "Conflicto de concurrencia", operation: str = None,
+                 original_error: Exception = None):
+        self.original_error = original_error
+        details = {"operation": operation} if operation else {}
+        if original_error is not None:
+            details["original_error"] = str(original_error)
+        super().__init__(message, "DB_CONCURRENCY_CONFLICT", details)
+
+# SQLSTATE de pyodbc para víctima de deadlock / fallo de serialización (error nativo 1205)
+SQLSTATE_DEADLOCK = '40001'
+ERROR_NATIVO_DEADLOCK = 1205
+
+def es_error_concurrencia(error: BaseException) -> bool:
+    """
+    True si el error (o su causa encadenada) es un deadlock de SQL Server.
+    pyodbc.Error trae args = (sqlstate, mensaje) y el número nativo va en el mensaje: '... (1205) ...'
+    """
+    while error is not None:
+        args = getattr(error, 'args', ())
+        if len(args) >= 2 and isinstance(args[0], str) and isinstance(args[1], str):
+            if args[0] == SQLSTATE_DEADLOCK or f"({ERROR_NATIVO_DEADLOCK})" in args[1]:
+                return True
+        error = error.__cause__
+    return False
+
+def es_error_conexion(error: BaseException) -> bool:
+    """
+    True si el error (o su causa encadenada) es de conexión con SQL Server: no se pudo conectar,
+    se cortó el enlace (SQLSTATE 08xxx) o expiró el tiempo de espera (HYT00/HYT01)
+    """
+    while error is not None:
+        if isinstance(error, DatabaseConnectionError):
+            return True
+        args = getattr(error, 'args', ())
+        if len(args) >= 2 and isinstance(args[0], str) and isinstance(args[1], str):
+            if args[0].startswith('08') or args[0] in ('HYT00', 'HYT01'):
+                return True
+        error = error.__cause__
+    return False
+
 # ===============================
 # EXCEPCIONES DE FARMACIA
 # ===============================
@@ -193,7 +235,7 @@ class ExceptionHandler:
                     "function": func.__name__,
                     "original_error": str(e),
                     "args": str(args[1:]) if len(args) > 1 else None  # Excluir 'self'
-                })
+                }) from e
         return wrapper
     
     @staticmethod
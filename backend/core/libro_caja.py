@@ -0,0 +1,91 @@
+"""
+Libro de caja en memoria para el turno abierto
+Acumula por categoría (farmacia, consultas, laboratorio, enfermería, ingresos extras,
+gastos y compras) los totales, la cantidad de transacciones y los movimientos.
+Cada transacción registrada solo agrega los movimientos nuevos (id mayor al último
+conocido); contra SQL se reconcilia al abrir el cierre o si el checksum no coincide.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+FUENTES_CAJA = ('farmacia', 'consultas', 'laboratorio', 'enfermeria', 'ingresos_extras', 'gastos', 'compras')
+
+TOLERANCIA_CHECKSUM = 0.01  # Bs de diferencia admitidos por redondeo
+
+
+class LibroCaja:
+    """Totales, conteos y movimientos del turno abierto (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.turno: Optional[Tuple[str, str]] = None
+        self.reiniciar()
+
+    def reiniciar(self, turno: Optional[Tuple[str, str]] = None):
+        """Vacía el libro; turno = (fecha, hora_inicio)"""
+        with self._lock:
+            self.turno = turno
+            self.movimientos: Dict[str, List[Dict[str, Any]]] = {f: [] for f in FUENTES_CAJA}
+            self.totales: Dict[str, float] = {f: 0.0 for f in FUENTES_CAJA}
+            self.ultimos_ids: Dict[str, int] = {f: 0 for f in FUENTES_CAJA}
+            self._ids_vistos: Dict[str, set] = {f: set() for f in FUENTES_CAJA}
+
+    @property
+    def cargado(self) -> bool:
+        return self.turno is not None
+
+    def es_turno(self, fecha: str, hora_inicio: str) -> bool:
+        return self.turno == (fecha, hora_inicio)
+
+    def cargar(self, turno: Tuple[str, str], fuentes: Dict[str, List[Dict[str, Any]]]):
+        """Reemplaza el libro con los movimientos completos leídos de SQL"""
+        with self._lock:
+            self.reiniciar(turno)
+            self.aplicar(fuentes)
+
+    def aplicar(self, fuentes: Dict[str, List[Dict[str, Any]]]) -> int:
+        """Agrega movimientos nuevos; ignora los ya contabilizados. Retorna cuántos agregó"""
+        agregados = 0
+        with self._lock:
+            for fuente in FUENTES_CAJA:
+                for movimiento in fuentes.get(fuente) or []:
+                    movimiento_id = int(movimiento.get('id') or 0)
+                    if movimiento_id in self._ids_vistos[fuente]:
+                        continue
+                    self._ids_vistos[fuente].add(movimiento_id)
+                    self.movimientos[fuente].append(movimiento)
+                    self.totales[fuente] += float(movimiento.get('Total') or 0)
+                    self.ultimos_ids[fuente] = max(self.ultimos_ids[fuente], movimiento_id)
+                    agregados += 1
+        return agregados
+
+    def checksum(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                fuente: {
+                    'transacciones': len(self.movimientos[fuente]),
+                    'total': round(self.totales[fuente], 2),
+                    'ultimo_id': self.ultimos_ids[fuente]
+                }
+                for fuente in FUENTES_CAJA
+            }
+
+    def coincide_con(self, checksum_sql: Dict[str, Dict[str, Any]]) -> bool:
+        """Compara contra el checksum de SQL (cantidad, suma e id máximo por fuente)"""
+        propio = self.checksum()
+        for fuente in FUENTES_CAJA:
+            sql = checksum_sql.get(fuente)
+            if sql is None:
+                return False
+            if (sql['transacciones'] != propio[fuente]['transacciones'] or
+                    sql['ultimo_id'] != propio[fuente]['ultimo_id'] or
+                    abs(sql['total'] - propio[fuente]['total']) > TOLERANCIA_CHECKSUM):
+                print(f"⚠️ Libro de caja desincronizado en '{fuente}': libro={propio[fuente]} sql={sql}")
+                return False
+        return True
+
+    def fuentes(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Copia de las listas por fuente (para armar la estructura del cierre)"""
+        with self._lock:
+            return {fuente: list(self.movimientos[fuente]) for fuente in FUENTES_CAJA}
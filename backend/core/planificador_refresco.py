@@ -0,0 +1,287 @@
+"""
+Planificador central de refrescos de los modelos
+Los modelos registran sus tareas de actualización en lugar de tener un QTimer propio.
+Una tarea solo corre cuando hay un cambio de datos en las fuentes que escucha o cuando
+su vista se vuelve visible; mientras la vista está visible y no hay cambios, el sondeo de
+respaldo (cambios hechos desde otros equipos) se espacia exponencialmente.
+Con la vista oculta o la aplicación minimizada no se consulta la BD: el cambio queda
+pendiente y se aplica al volver. Los refrescos superpuestos se fusionan en uno.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from PySide6.QtCore import QObject, QTimer, Qt
+from PySide6.QtGui import QGuiApplication, QWindow
+
+DEMORA_COALESCENCIA_MS = 300      # ventana para fusionar eventos de cambio seguidos
+INTERVALO_MAX_DEFECTO_MS = 1800000  # 30 minutos de sondeo como máximo en reposo
+
+# callback() -> True si encontró datos nuevos (reinicia el intervalo); otro valor = reposo
+CallbackRefresco = Callable[[], Any]
+
+
+class _TareaRefresco:
+    """Estado de una tarea registrada"""
+
+    def __init__(self, nombre: str, callback: CallbackRefresco, vistas: Iterable[str],
+                 fuentes: Iterable[str], intervalo_base_ms: Optional[int], intervalo_max_ms: int):
+        self.nombre = nombre
+        self.callback = callback
+        self.vistas = tuple(vistas)
+        self.fuentes = set(fuentes)
+        self.intervalo_base_ms = intervalo_base_ms
+        self.intervalo_max_ms = max(intervalo_max_ms, intervalo_base_ms or 0)
+        self.intervalo_actual_ms = intervalo_base_ms
+        self.visible = False
+        self.sucia = False
+        self.en_ejecucion = False
+        self.proxima: Optional[float] = None  # instante monotónico de la próxima ejecución
+        self.ultima: Optional[float] = None
+        self.ejecuciones = 0
+        self.omitidas = {'fusionadas': 0, 'vista_oculta': 0, 'minimizada': 0}
+
+    def es_visible_en(self, modulo: str) -> bool:
+        # Sin vistas = siempre visible (p. ej. tareas de fondo ligadas solo a eventos)
+        return not self.vistas or any(modulo.startswith(vista) for vista in self.vistas)
+
+
+class PlanificadorRefresco(QObject):
+    """Agenda los refrescos de todos los modelos con un único QTimer"""
+
+    def __init__(self):
+        super().__init__()
+        self._tareas: Dict[str, _TareaRefresco] = {}
+        self._modulo_visible = "Dashboard"
+        self._aplicacion_activa = True
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._ejecutar_vencidas)
+
+        app = QGuiApplication.instance()
+        if app is not None:
+            app.applicationStateChanged.connect(self._on_estado_aplicacion)
+
+        print("⏱️ PlanificadorRefresco inicializado")
+
+    # ===============================
+    # REGISTRO
+    # ===============================
+
+    def registrar(self, nombre: str, callback: CallbackRefresco, vistas: Iterable[str] = (),
+                  fuentes: Iterable[str] = (), intervalo_base_ms: Optional[int] = None,
+                  intervalo_max_ms: int = INTERVALO_MAX_DEFECTO_MS):
+        """
+        Registra (o reemplaza) una tarea de refresco.
+        vistas: prefijos de módulo (los de navigateToModule) donde la tarea es visible.
+        fuentes: eventos de datos que la marcan como pendiente (ver marcar_cambio).
+        intervalo_base_ms: sondeo de respaldo con la vista visible; None = solo por eventos.
+        """
+        tarea = _TareaRefresco(nombre, callback, vistas, fuentes, intervalo_base_ms, intervalo_max_ms)
+        tarea.visible = tarea.es_visible_en(self._modulo_visible)
+        self._tareas[nombre] = tarea
+        if tarea.visible and tarea.intervalo_base_ms:
+            tarea.proxima = time.monotonic() + tarea.intervalo_base_ms / 1000
+            self._rearmar_timer()
+
+    def desregistrar(self, nombre: str):
+        if self._tareas.pop(nombre, None) is not None:
+            self._rearmar_timer()
+
+    def detener(self):
+        """Cierre de sesión/aplicación: suelta todas las tareas (y sus modelos)"""
+        self._timer.stop()
+        self.imprimir_estadisticas()
+        self._tareas.clear()
+
+    # ===============================
+    # EVENTOS
+    # ===============================
+
+    def marcar_cambio(self, *fuentes: str):
+        """Un cambio de datos en estas fuentes: refresca las tareas visibles (fusionadas)"""
+        fuentes_cambio = set(fuentes)
+        for tarea in self._tareas.values():
+            if tarea.fuentes & fuentes_cambio:
+                tarea.intervalo_actual_ms = tarea.intervalo_base_ms
+                self._pedir_ejecucion(tarea)
+        self._rearmar_timer()
+
+    def vista_activa(self, modulo: str):
+        """El usuario navegó a otro módulo: aplica los cambios pendientes de lo que ahora se ve"""
+        self._modulo_visible = modulo or "Dashboard"
+        for tarea in self._tareas.values():
+            visible = tarea.es_visible_en(self._modulo_visible)
+            if visible and not tarea.visible:
+                tarea.visible = True
+                if tarea.sucia or self._esta_vencida(tarea):
+                    self._programar(tarea, DEMORA_COALESCENCIA_MS)
+                elif tarea.intervalo_base_ms:
+                    self._programar(tarea, tarea.intervalo_actual_ms)
+            elif not visible:
+                tarea.visible = False
+                tarea.proxima = None
+        self._rearmar_timer()
+
+    def forzar(self, nombre: str):
+        """Refresco explícito (botón de actualizar): corre ya aunque no haya cambios"""
+        tarea = self._tareas.get(nombre)
+        if tarea:
+            tarea.intervalo_actual_ms = tarea.intervalo_base_ms
+            self._ejecutar(tarea)
+            self._rearmar_timer()
+
+    def _on_estado_aplicacion(self, estado):
+        self._conectar_ventanas()
+        self._actualizar_pausa()
+
+    def _conectar_ventanas(self):
+        """Escucha la minimización de cada ventana (la ventana QML se crea después del planificador)"""
+        for ventana in QGuiApplication.topLevelWindows():
+            if not ventana.property("planificadorConectado"):
+                ventana.setProperty("planificadorConectado", True)
+                ventana.visibilityChanged.connect(lambda *_: self._actualizar_pausa())
+
+    def _aplicacion_visible(self) -> bool:
+        """
+        Perder el foco (ApplicationInactive, p. ej. el dashboard en otro monitor) no pausa;
+        solo la aplicación oculta o suspendida, o con todas sus ventanas minimizadas
+        """
+        estado = QGuiApplication.applicationState()
+        if estado in (Qt.ApplicationState.ApplicationHidden, Qt.ApplicationState.ApplicationSuspended):
+            return False
+        visibilidades = [
+            ventana.visibility() for ventana in QGuiApplication.topLevelWindows()
+            if ventana.visibility() != QWindow.Visibility.Hidden
+        ]
+        return not visibilidades or any(v != QWindow.Visibility.Minimized for v in visibilidades)
+
+    def _actualizar_pausa(self):
+        activa = self._aplicacion_visible()
+        if activa == self._aplicacion_activa:
+            return
+        self._aplicacion_activa = activa
+        if activa:
+            # Al volver: solo lo visible que quedó pendiente o cuyo sondeo ya venció
+            for tarea in self._tareas.values():
+                if tarea.visible and (tarea.sucia or self._esta_vencida(tarea)):
+                    self._programar(tarea, DEMORA_COALESCENCIA_MS)
+            self._rearmar_timer()
+        else:
+            self._timer.stop()
+
+    # ===============================
+    # EJECUCIÓN
+    # ===============================
+
+    def _pedir_ejecucion(self, tarea: _TareaRefresco):
+        if not tarea.visible:
+            tarea.sucia = True
+            tarea.omitidas['vista_oculta'] += 1
+        elif not self._aplicacion_activa:
+            tarea.sucia = True
+            tarea.omitidas['minimizada'] += 1
+        elif tarea.en_ejecucion or tarea.sucia:
+            # Ya hay un refresco en curso o agendado que verá este cambio
+            tarea.sucia = True
+            tarea.omitidas['fusionadas'] += 1
+        else:
+            tarea.sucia = True
+            self._programar(tarea, DEMORA_COALESCENCIA_MS)
+
+    def _programar(self, tarea: _TareaRefresco, demora_ms: int):
+        proxima = time.monotonic() + demora_ms / 1000
+        if tarea.proxima is None or proxima < tarea.proxima:
+            tarea.proxima = proxima
+
+    def _esta_vencida(self, tarea: _TareaRefresco) -> bool:
+        if not tarea.intervalo_base_ms:
+            return False
+        return tarea.ultima is None or (time.monotonic() - tarea.ultima) * 1000 >= tarea.intervalo_actual_ms
+
+    def _rearmar_timer(self):
+        if not self._aplicacion_activa:
+            self._timer.stop()
+            return
+        pendientes = [t.proxima for t in self._tareas.values() if t.visible and t.proxima is not None]
+        if not pendientes:
+            self._timer.stop()
+            return
+        demora_ms = max(0, int((min(pendientes) - time.monotonic()) * 1000))
+        self._timer.start(demora_ms)
+
+    def _ejecutar_vencidas(self):
+        ahora = time.monotonic()
+        for tarea in list(self._tareas.values()):
+            if tarea.visible and tarea.proxima is not None and tarea.proxima <= ahora:
+                self._ejecutar(tarea)
+        self._rearmar_timer()
+
+    def _ejecutar(self, tarea: _TareaRefresco):
+        if tarea.en_ejecucion:
+            tarea.sucia = True
+            tarea.omitidas['fusionadas'] += 1
+            return
+
+        por_cambio = tarea.sucia
+        tarea.sucia = False
+        tarea.proxima = None
+        tarea.en_ejecucion = True
+        hubo_datos_nuevos = False
+        try:
+            hubo_datos_nuevos = tarea.callback() is True
+        except Exception as e:
+            print(f"❌ Error en refresco '{tarea.nombre}': {e}")
+        finally:
+            tarea.en_ejecucion = False
+            tarea.ultima = time.monotonic()
+            tarea.ejecuciones += 1
+
+        if tarea.intervalo_base_ms:
+            if por_cambio or hubo_datos_nuevos:
+                tarea.intervalo_actual_ms = tarea.intervalo_base_ms
+            else:
+                # Sondeo sin novedades: duplicar la espera hasta el máximo
+                tarea.intervalo_actual_ms = min(tarea.intervalo_actual_ms * 2, tarea.intervalo_max_ms)
+            self._programar(tarea, tarea.intervalo_actual_ms)
+
+        if tarea.sucia:
+            # Llegaron cambios mientras corría: un único refresco más
+            self._programar(tarea, DEMORA_COALESCENCIA_MS)
+
+    # ===============================
+    # DIAGNÓSTICO
+    # ===============================
+
+    def get_estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        """Ejecuciones, refrescos omitidos por motivo e intervalo actual de cada tarea"""
+        return {
+            nombre: {
+                'ejecuciones': tarea.ejecuciones,
+                'omitidas': dict(tarea.omitidas),
+                'total_omitidas': sum(tarea.omitidas.values()),
+                'visible': tarea.visible,
+                'pendiente': tarea.sucia,
+                'intervalo_actual_s': (tarea.intervalo_actual_ms or 0) / 1000
+            }
+            for nombre, tarea in self._tareas.items()
+        }
+
+    def imprimir_estadisticas(self):
+        for nombre, stats in self.get_estadisticas().items():
+            print(f"⏱️ {nombre}: {stats['ejecuciones']} refrescos, "
+                  f"{stats['total_omitidas']} omitidos {stats['omitidas']}, "
+                  f"intervalo {stats['intervalo_actual_s']:.0f}s")
+
+
+# ===== SINGLETON =====
+_planificador_instance: Optional[PlanificadorRefresco] = None
+
+
+def get_planificador_refresco() -> PlanificadorRefresco:
+    """Obtiene la instancia única del planificador (se crea en el hilo de la GUI)"""
+    global _planificador_instance
+    if _planificador_instance is None:
+        _planificador_instance = PlanificadorRefresco()
+    return _planificador_instance
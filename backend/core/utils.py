@@ -285,17 +285,61 @@ def formatear_precio(precio: Union[float, Decimal, int], simbolo: str = "Bs") ->
     except (ValueError, TypeError):
         return f"{simbolo}0.00"
 
+def parsear_numero(valor: Any, entero: bool = False) -> float:
+    """
+    Convierte un número escrito con separadores a float, ignorando el prefijo o sufijo
+    de moneda ('Bs.', '$', 'Bs'). El último separador es el decimal; si uno solo se repite,
+    es de miles. Con entero=True un separador único seguido de exactamente tres dígitos
+    es de miles y un resultado con decimales es inválido.
+    Lanza ValueError si no es numérico.
+    
+    >>> parsear_numero('1.234,56'), parsear_numero('1,234.56'), parsear_numero('1.234.567')
+    (1234.56, 1234.56, 1234567.0)
+    >>> parsear_numero('Bs. 12.50'), parsear_numero('$ 1 200,5'), parsear_numero('12,50 Bs')
+    (12.5, 1200.5, 12.5)
+    >>> parsear_numero('2,000', entero=True), parsear_numero('1.200', entero=True), parsear_numero('12', entero=True)
+    (2000.0, 1200.0, 12.0)
+    >>> parsear_numero('1.200')
+    1.2
+    >>> parsear_numero('2,5', entero=True)
+    Traceback (most recent call last):
+    ...
+    ValueError: No es un número entero: 2,5
+    """
+    if isinstance(valor, (int, float, Decimal)):
+        if entero and float(valor) != int(valor):
+            raise ValueError(f"No es un número entero: {valor}")
+        return float(valor)
+    
+    # Quitar moneda antes y después del número ('Bs. 12.50' no debe leer el punto de 'Bs.')
+    texto = re.sub(r'^[^\d+-]+|[^\d]+$', '', str(valor or '').strip())
+    texto = re.sub(r"[\s']", '', texto)
+    if not re.fullmatch(r'[+-]?\d[\d.,]*', texto):
+        raise ValueError(f"No es un número: {valor}")
+    
+    ultimo = max(texto.rfind(','), texto.rfind('.'))
+    if ultimo >= 0:
+        separador = texto[ultimo]
+        otro = ',' if separador == '.' else '.'
+        solo_un_tipo = texto.count(otro) == 0
+        if solo_un_tipo and (texto.count(separador) > 1 or (entero and len(texto) - ultimo - 1 == 3)):
+            # '1.234.567', '1,234,567' o, en cantidades, '2,000': solo separadores de miles
+            texto = texto.replace(separador, '')
+        else:
+            texto = re.sub(r'[.,]', '', texto[:ultimo]) + '.' + texto[ultimo + 1:]
+    
+    numero = float(texto)
+    if entero and not numero.is_integer():
+        raise ValueError(f"No es un número entero: {valor}")
+    return numero
+
 def parsear_precio(precio_str: str) -> float:
     """Convierte string de precio a float, eliminando símbolos"""
     if not precio_str:
         return 0.0
     
-    # Remover símbolos monetarios y espacios
-    precio_limpio = re.sub(r'[^\d.,]', '', str(precio_str))
-    precio_limpio = precio_limpio.replace(',', '.')
-    
     try:
-        return float(precio_limpio)
+        return parsear_numero(precio_str)
     except ValueError:
         return 0.0
 
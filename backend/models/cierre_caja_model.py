@@ -9,6 +9,11 @@ from PySide6.QtCore import QObject, Signal, Slot, QUrl, QTimer, Property, QSetti
 
 from ..repositories.cierre_caja_repository import CierreCajaRepository
 from ..core.excepciones import ExceptionHandler, ValidationError, DatabaseQueryError
+from ..core.libro_caja import LibroCaja
+
+# Cada cuántas transacciones se compara el libro de caja contra SQL (checksum)
+VERIFICAR_CHECKSUM_CADA = 10
+
 
 class CierreCajaModel(QObject):
     """
@@ -77,6 +82,11 @@ class CierreCajaModel(QObject):
         self._operation_lock = False
         self._pending_operations = 0
 
+        # Libro de caja del turno abierto (se actualiza por transacción, sin recalcular el día)
+        self._libro_caja = LibroCaja()
+        self._libro_desactualizado = False
+        self._transacciones_sin_verificar = 0
+
         
         
         print("ðŸ’° CierreCajaModel inicializado - Modo independiente")
@@ -441,12 +451,12 @@ class CierreCajaModel(QObject):
             # âœ… VALIDAR ESTRUCTURA DE DATOS ANTES DE USAR
             if datos_cierre and self._validar_estructura_datos(datos_cierre):
                 self._datos_cierre = datos_cierre
+                self._cargar_libro_caja(datos_cierre)
                 
-                # Generar resumen estructurado
-                self._resumen_estructurado = self.repository.get_resumen_por_categorias(
-                    self._fecha_actual,
-                    self._hora_inicio,
-                    self._hora_fin
+                # Resumen estructurado derivado de los mismos datos (sin volver a consultar)
+                self._resumen_estructurado = (
+                    datos_cierre.get('resumen_categorias') or
+                    self.repository.construir_resumen_por_categorias(datos_cierre)
                 )
                 
                 # âœ… CARGAR CIERRES CON MANEJO DE ERRORES
@@ -485,6 +495,108 @@ class CierreCajaModel(QObject):
             print("ðŸ”“ Lock liberado en consultarDatos")
 
     
+    # ===============================
+    # LIBRO DE CAJA DEL TURNO ABIERTO
+    # ===============================
+
+    def _ventana_abierta(self) -> bool:
+        """La ventana consultada es de hoy y su hora fin no pasó: los movimientos nuevos caen dentro"""
+        ahora = datetime.now()
+        return (self._fecha_actual == ahora.strftime("%d/%m/%Y") and
+                self._hora_fin >= ahora.strftime("%H:%M"))
+
+    def _cargar_libro_caja(self, datos_cierre: Dict):
+        """Al consultar una ventana de hoy aún abierta, el libro de caja parte de los datos recién leídos"""
+        if not self._ventana_abierta():
+            # Ventana pasada (otro día o ya cerrada hoy): sus datos no cambian con ventas nuevas
+            self._libro_caja.reiniciar()
+            return
+        ingresos = datos_cierre.get('ingresos', {})
+        egresos = datos_cierre.get('egresos', {})
+        self._libro_caja.cargar((self._fecha_actual, self._hora_inicio), {
+            'farmacia': ingresos.get('farmacia', []),
+            'consultas': ingresos.get('consultas', []),
+            'laboratorio': ingresos.get('laboratorio', []),
+            'enfermeria': ingresos.get('enfermeria', []),
+            'ingresos_extras': ingresos.get('ingresos_extras', []),
+            'gastos': egresos.get('gastos', []),
+            'compras': egresos.get('compras', []),
+        })
+        self._libro_desactualizado = False
+        self._transacciones_sin_verificar = 0
+
+    def _reconciliar_libro_caja(self):
+        """Vuelve a leer el turno completo desde SQL"""
+        fecha, hora_inicio = self._libro_caja.turno
+        self._libro_caja.cargar((fecha, hora_inicio), self.repository.get_movimientos_turno(fecha, hora_inicio))
+        self._libro_desactualizado = False
+        self._transacciones_sin_verificar = 0
+        print("🔁 Libro de caja reconciliado con la base de datos")
+
+    def _verificar_libro_caja(self):
+        """Compara cantidad/suma/id máximo por fuente; si no coincide, reconcilia"""
+        fecha, hora_inicio = self._libro_caja.turno
+        checksum = self.repository.get_checksum_turno(fecha, hora_inicio)
+        self._transacciones_sin_verificar = 0
+        if not self._libro_caja.coincide_con(checksum):
+            self._reconciliar_libro_caja()
+
+    def _publicar_libro_caja(self):
+        """
+        Refleja el libro en la pantalla si está mostrando su ventana y esta sigue abierta.
+        La hora fin es la que eligió el usuario: si ya pasó, el libro se suelta y los datos
+        mostrados quedan como los dejó la última consulta.
+        """
+        if self._loading or not self._libro_caja.es_turno(self._fecha_actual, self._hora_inicio):
+            return
+        if not self._ventana_abierta():
+            self._libro_caja.reiniciar()
+            print(f"📒 Libro de caja desacoplado: la hora fin {self._hora_fin} ya pasó")
+            return
+
+        self._datos_cierre = self.repository.armar_datos_cierre(self._libro_caja.fuentes())
+        self._resumen_estructurado = self._datos_cierre['resumen_categorias']
+
+        self.datosChanged.emit()
+        self.resumenChanged.emit()
+        self._actualizar_validacion()
+
+    @Slot(str)
+    def registrarTransaccion(self, origen: str = ""):
+        """
+        Una transacción financiera fue registrada (venta, consulta, laboratorio, enfermería,
+        gasto o ingreso extra): solo se leen los movimientos nuevos del turno.
+        """
+        if not self._libro_caja.cargado:
+            return  # El cierre aún no se consultó: no hay nada que actualizar
+
+        try:
+            if self._libro_desactualizado:
+                self._reconciliar_libro_caja()
+            else:
+                fecha, hora_inicio = self._libro_caja.turno
+                nuevos = self.repository.get_movimientos_turno(fecha, hora_inicio, self._libro_caja.ultimos_ids)
+                agregados = self._libro_caja.aplicar(nuevos)
+                print(f"📒 Libro de caja: {agregados} movimiento(s) nuevo(s) ({origen})")
+
+                self._transacciones_sin_verificar += 1
+                if self._transacciones_sin_verificar >= VERIFICAR_CHECKSUM_CADA:
+                    self._verificar_libro_caja()
+
+            self._publicar_libro_caja()
+
+        except Exception as e:
+            print(f"⚠️ Error actualizando libro de caja ({origen}): {e}")
+            self._libro_desactualizado = True
+
+    @Slot(str)
+    def invalidarLibroCaja(self, origen: str = ""):
+        """Una edición o eliminación no se puede sumar: se reconcilia el turno contra SQL"""
+        if not self._libro_caja.cargado:
+            return
+        self._libro_desactualizado = True
+        self.registrarTransaccion(origen)
+
     def _validar_estructura_datos(self, datos: Dict) -> bool:
         """âœ… NUEVO: Valida que los datos tengan la estructura correcta"""
         try:
@@ -537,6 +649,14 @@ class CierreCajaModel(QObject):
             print(f"âŒ {error_msg}")
             return False, error_msg
 
+    def _movimientos_pdf_consulta_actual(self) -> List[Dict]:
+        """Movimientos para PDF de la consulta actual, preparados una sola vez por consulta"""
+        movimientos = self._datos_cierre.get('movimientos_pdf')
+        if movimientos is None:
+            movimientos = self._preparar_movimientos_para_pdf(self._datos_cierre)
+            self._datos_cierre['movimientos_pdf'] = movimientos
+        return movimientos
+
     def _preparar_movimientos_para_pdf(self, datos_cierre: Dict) -> List[Dict]:
         """
         ✅ CORREGIDO: Accede a la estructura anidada correctamente
@@ -735,7 +855,7 @@ class CierreCajaModel(QObject):
             print(f"👤 Usuario responsable para PDF: {usuario_nombre} ({usuario_rol})")
             
             # ✅ PREPARAR MOVIMIENTOS VALIDANDO ESTRUCTURA
-            movimientos = self._preparar_movimientos_para_pdf(self._datos_cierre)
+            movimientos = self._movimientos_pdf_consulta_actual()
             
             if not movimientos or len(movimientos) == 0:
                 self.operacionError.emit("No hay movimientos para generar el PDF")
@@ -1119,8 +1239,8 @@ class CierreCajaModel(QObject):
                 'Observaciones': observaciones or self._generar_observaciones_automaticas()
             }
             
-            # Guardar en BD
-            if self.repository.guardar_cierre_caja(datos_cierre):
+            # Guardar en BD junto con el snapshot de lo consultado
+            if self.repository.guardar_cierre_caja(datos_cierre, self._datos_cierre):
                 self._cierre_completado = True
                 self.cierreCompletadoChanged.emit()
                 
@@ -1657,6 +1777,7 @@ class CierreCajaModel(QObject):
             # Limpiar datos internos
             self._datos_cierre = {}
             self._resumen_estructurado = {}
+            self._libro_caja.reiniciar()
             
             # Resetear efectivo real
             self._efectivo_real = 0.0
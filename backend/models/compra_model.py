@@ -9,10 +9,13 @@ CompraModel - VERSIÓN 2.0 SIMPLIFICADA CORREGIDA
 ✅ Compatible con repositorio corregido
 """
 
-from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer, Qt
+from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer, Qt, QUrl
 from PySide6.QtQml import qmlRegisterType
 from typing import List, Dict, Any, Optional
+import os
+import csv
 import json
+import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -22,6 +25,8 @@ from ..core.excepciones import (
     CompraError, ProductoNotFoundError, ValidationError,
     ExceptionHandler, safe_execute, validate_required
 )
+from ..core.planificador_refresco import get_planificador_refresco
+from ..core.utils import parsear_numero
 
 class CompraModel(QObject):
     """Model QObject para gestión de compras - V2.0 CORREGIDA"""
@@ -43,6 +48,7 @@ class CompraModel(QObject):
     loadingChanged = Signal()
     procesandoCompraChanged = Signal()
     itemsCompraCambiado = Signal()
+    lineasPorConfirmarChanged = Signal()
     modoEdicionChanged = Signal()
     datosOriginalesChanged = Signal()
     proveedorCompraCompletada = Signal(int, float)
@@ -66,6 +72,7 @@ class CompraModel(QObject):
         self._estadisticas = {}
         self._top_productos_comprados = []
         self._items_compra = []
+        self._lineas_por_confirmar = []  # Líneas de factura emparejadas solo por nombre
         self._loading = False
         self._procesando_compra = False
         self._modo_edicion = False
@@ -76,10 +83,11 @@ class CompraModel(QObject):
         self._proveedor_seleccionado = 0
         self._compra_id_edicion = 0
         
-        # Timer para actualización automática
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self._auto_update_compras)
-        self.update_timer.start(120000)  # 2 minutos
+        # Sondeo de compras de otros equipos: solo con Compras visible, espaciado si no hay novedades
+        get_planificador_refresco().registrar(
+            'compras', self._auto_update_compras, vistas=('Farmacia - Compras',),
+            intervalo_base_ms=120000  # 2 minutos, luego se espacia
+        )
 
         # Variable interna
         self._compra_actual = {}
@@ -146,6 +154,11 @@ class CompraModel(QObject):
     def items_compra(self):
         return self._items_compra
     
+    @Property(list, notify=lineasPorConfirmarChanged)
+    def lineasPorConfirmar(self):
+        """Líneas de la factura importada emparejadas por nombre, pendientes de confirmar"""
+        return self._lineas_por_confirmar
+    
     @Property(bool, notify=loadingChanged)
     def loading(self):
         return self._loading
@@ -242,7 +255,7 @@ class CompraModel(QObject):
             self.estadisticasChanged.emit()
     
     def _auto_update_compras(self):
-        """Actualización automática periódica"""
+        """Actualización agendada por el planificador"""
         if not self._procesando_compra:
             self._cargar_compras_recientes()
             self._cargar_estadisticas()
@@ -423,6 +436,199 @@ class CompraModel(QObject):
             self.operacionError.emit(error_msg)
             return False
     
+    # ===============================
+    # IMPORTACIÓN DE FACTURA DE PROVEEDOR
+    # ===============================
+    
+    # Nombres de columna/atributo aceptados en el archivo de factura
+    CAMPOS_FACTURA = {
+        'codigo': ('codigo', 'código', 'cod', 'code'),
+        'nombre': ('nombre', 'producto', 'descripcion', 'descripción'),
+        'cantidad': ('cantidad', 'cant', 'unidades'),
+        'precio_total': ('precio_total', 'total', 'importe', 'subtotal'),
+        'precio_unitario': ('precio_unitario', 'precio', 'costo_unitario'),
+        'vencimiento': ('vencimiento', 'fecha_vencimiento', 'vence'),
+        'precio_venta': ('precio_venta', 'pvp'),
+    }
+    
+    @Slot(str, result='QVariantMap')
+    def importar_factura_proveedor(self, ruta_archivo: str):
+        """
+        Carga una factura de proveedor (CSV o XML) como items de la compra actual.
+        Los productos se emparejan en bloque: las líneas con código exacto se agregan y las
+        emparejadas por nombre quedan en lineasPorConfirmar hasta que el usuario las confirme.
+        La compra se guarda después con completar_compra en un solo envío.
+        """
+        if not self._verificar_autenticacion():
+            return {}
+        
+        self._set_procesando(True)
+        try:
+            lineas = []
+            errores = []
+            for numero, fila in enumerate(self._leer_archivo_factura(ruta_archivo), start=1):
+                linea = self._normalizar_linea_factura(fila)
+                if linea.get('error'):
+                    errores.append({'fila': numero, 'error': linea['error']})
+                    continue
+                linea['fila'] = numero
+                lineas.append(linea)
+            
+            resultado = self.compra_repo.emparejar_lineas_factura(lineas)
+            
+            for linea in resultado['emparejadas']:
+                self._items_compra.append(self._item_desde_linea_factura(linea))
+            
+            self._lineas_por_confirmar = [
+                dict(self._item_desde_linea_factura(linea), fila=linea['fila'],
+                     nombre_factura=linea.get('nombre', ''))
+                for linea in resultado['por_confirmar']
+            ]
+            
+            for linea in resultado['no_encontradas']:
+                errores.append({
+                    'fila': linea['fila'],
+                    'error': f"Producto no encontrado: {linea.get('codigo') or linea.get('nombre')}"
+                })
+            
+            if resultado['emparejadas']:
+                self.itemsCompraCambiado.emit()
+            self.lineasPorConfirmarChanged.emit()
+            
+            agregados = len(resultado['emparejadas'])
+            por_confirmar = len(self._lineas_por_confirmar)
+            mensaje = f"Factura importada: {agregados} de {agregados + por_confirmar + len(errores)} líneas"
+            if por_confirmar:
+                mensaje += f" ({por_confirmar} emparejadas por nombre, confirmar)"
+            self.operacionExitosa.emit(mensaje)
+            
+            return {
+                'agregados': agregados,
+                'por_confirmar': self._lineas_por_confirmar,
+                'errores': sorted(errores, key=lambda e: e['fila'])
+            }
+            
+        except (ValueError, ET.ParseError, csv.Error) as e:
+            self.operacionError.emit(f"Archivo de factura inválido: {str(e)}")
+        except Exception as e:
+            self.operacionError.emit(f"Error importando factura: {str(e)}")
+        finally:
+            self._set_procesando(False)
+        
+        return {}
+    
+    @Slot(int, result=bool)
+    def confirmar_linea_factura(self, fila: int):
+        """Agrega a la compra una línea de factura emparejada por nombre, tras revisarla"""
+        for i, linea in enumerate(self._lineas_por_confirmar):
+            if linea['fila'] == fila:
+                item = {k: v for k, v in self._lineas_por_confirmar.pop(i).items()
+                        if k not in ('fila', 'nombre_factura')}
+                self._items_compra.append(item)
+                self.itemsCompraCambiado.emit()
+                self.lineasPorConfirmarChanged.emit()
+                return True
+        return False
+    
+    @Slot(int, result=bool)
+    def descartar_linea_factura(self, fila: int):
+        """Descarta una línea de factura emparejada por nombre (no es el producto correcto)"""
+        for i, linea in enumerate(self._lineas_por_confirmar):
+            if linea['fila'] == fila:
+                self._lineas_por_confirmar.pop(i)
+                self.lineasPorConfirmarChanged.emit()
+                return True
+        return False
+    
+    def _item_desde_linea_factura(self, linea: Dict[str, Any]) -> Dict[str, Any]:
+        """Item de compra a partir de una línea de factura emparejada con su producto"""
+        producto = linea['producto']
+        item = {
+            "codigo": producto.get('Codigo', ''),
+            "nombre": producto.get('Nombre', ''),
+            "cantidad": linea['cantidad'],
+            "precio_unitario": linea['precio_total'] / linea['cantidad'],
+            "precio_total": linea['precio_total'],
+            "vencimiento": linea['vencimiento'] or "Sin vencimiento",
+            "subtotal": linea['precio_total']
+        }
+        if linea.get('precio_venta'):
+            item["precio_venta"] = linea['precio_venta']
+        return item
+    
+    def _leer_archivo_factura(self, ruta_archivo: str):
+        """Recorre las líneas de un CSV (con encabezados) o XML (<linea .../> o <item>...</item>) sin cargarlo entero"""
+        ruta = (ruta_archivo or '').strip()
+        if ruta.startswith('file:'):
+            ruta = QUrl(ruta).toLocalFile()
+        if not ruta or not os.path.isfile(ruta):
+            raise ValueError(f"No se encontró el archivo: {ruta_archivo}")
+        
+        if ruta.lower().endswith('.xml'):
+            for _, elemento in ET.iterparse(ruta, events=('end',)):
+                if elemento.tag.split('}')[-1].lower() not in ('linea', 'item', 'detalle'):
+                    continue
+                fila = {clave.lower(): valor for clave, valor in elemento.attrib.items()}
+                for hijo in elemento:
+                    fila[hijo.tag.split('}')[-1].lower()] = (hijo.text or '').strip()
+                elemento.clear()
+                yield fila
+            return
+        
+        with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+            except csv.Error:
+                dialecto = csv.excel
+            for fila in csv.DictReader(archivo, dialect=dialecto):
+                yield {str(clave).strip().lower(): valor for clave, valor in fila.items() if clave}
+    
+    def _normalizar_linea_factura(self, fila: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte una fila del archivo en {codigo, nombre, cantidad, precio_total, vencimiento, precio_venta}"""
+        valores = {}
+        for campo, alias in self.CAMPOS_FACTURA.items():
+            valores[campo] = next(
+                (str(fila[a]).strip() for a in alias if fila.get(a) not in (None, '')), ''
+            )
+        
+        if not valores['codigo'] and not valores['nombre']:
+            return {'error': "Línea sin código ni nombre"}
+        
+        try:
+            cantidad = int(parsear_numero(valores['cantidad'] or 0, entero=True))
+            if valores['precio_total']:
+                precio_total = parsear_numero(valores['precio_total'])
+            else:
+                precio_total = parsear_numero(valores['precio_unitario'] or 0) * cantidad
+            precio_venta = parsear_numero(valores['precio_venta'] or 0)
+        except ValueError:
+            return {'error': "Cantidad o precio no numérico"}
+        
+        if cantidad <= 0 or precio_total <= 0:
+            return {'error': "Cantidad y precio deben ser mayores a 0"}
+        
+        vencimiento = None
+        if valores['vencimiento']:
+            for formato in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+                try:
+                    vencimiento = datetime.strptime(valores['vencimiento'][:10], formato).strftime('%Y-%m-%d')
+                    break
+                except ValueError:
+                    continue
+            if not vencimiento:
+                return {'error': f"Fecha de vencimiento inválida: {valores['vencimiento']}"}
+        
+        return {
+            'codigo': valores['codigo'],
+            'nombre': valores['nombre'],
+            'cantidad': cantidad,
+            'precio_total': round(precio_total, 2),
+            'vencimiento': vencimiento,
+            'precio_venta': precio_venta if precio_venta > 0 else None
+        }
+    
     # ===============================
     # MÉTODO LEGACY (mantener compatibilidad)
     # ===============================
@@ -576,7 +782,9 @@ class CompraModel(QObject):
     def limpiar_items(self):
         """Limpia todos los items de la compra actual"""
         self._items_compra = []
+        self._lineas_por_confirmar = []
         self.itemsCompraCambiado.emit()
+        self.lineasPorConfirmarChanged.emit()
         print("🧹 Items de compra limpiados")
     
     def _set_procesando(self, estado: bool):
@@ -4,11 +4,17 @@ Corrige métodos inexistentes y mejora manejo de errores
 AHORA CON ALERTAS DE INVENTARIO Y PRODUCTOS BAJO STOCK
 """
 
+import calendar
+import threading
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer
+from bisect import bisect_right
+from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer, Qt
 from PySide6.QtQml import qmlRegisterType
 
+from backend.core.planificador_refresco import get_planificador_refresco
+from backend.core.alertas_inventario import get_hilo_alertas
+
 # IMPORTS CORREGIDOS - Usar importaciones absolutas
 try:
     from backend.repositories.estadistica_repository import EstadisticaRepository
@@ -18,7 +24,9 @@ try:
     from backend.repositories.laboratorio_repository import LaboratorioRepository
     from backend.repositories.enfermeria_repository import EnfermeriaRepository
     from backend.repositories.compra_repository import CompraRepository 
+    from backend.repositories.resumen_financiero_repository import ResumenFinancieroRepository
     from backend.core.database_conexion import DatabaseConnection
+    from backend.core.config_fifo import config_fifo
 except ImportError:
     # Fallback para importaciones relativas
     try:
@@ -29,7 +37,9 @@ except ImportError:
         from ..repositories.laboratorio_repository import LaboratorioRepository
         from ..repositories.enfermeria_repository import EnfermeriaRepository
         from ..repositories.compra_repository import CompraRepository  # ✅ NUEVO
+        from ..repositories.resumen_financiero_repository import ResumenFinancieroRepository
         from ..core.database_conexion import DatabaseConnection
+        from ..core.config_fifo import config_fifo
     except ImportError as e:
         print(f"❌ Error importando repositorios: {e}")
         # Crear clases dummy para evitar crashes
@@ -45,32 +55,31 @@ except ImportError:
         ConsultaRepository = DummyRepository
         LaboratorioRepository = DummyRepository
         EnfermeriaRepository = DummyRepository
+        ResumenFinancieroRepository = DummyRepository
         DatabaseConnection = DummyRepository
 
 class DashboardModel(QObject):
     """Model QObject para Dashboard con datos reales de BD - TOTALMENTE CORREGIDO
     AHORA CON ALERTAS DE INVENTARIO Y PRODUCTOS BAJO STOCK"""
     
+    MAX_PERIODOS_CACHE_GRAFICO = 24  # Series de gráfico guardadas (período, inicio)
+    MAX_PERIODOS_CACHE = 36          # Resultados guardados (período, año, mes)
+    VIGENCIA_PERIODO_ABIERTO = 60    # segundos que se reutiliza un período que incluye el presente
+    
     # ===============================
     # SIGNALS
     # ===============================
     
-    # Signals para KPI Cards
-    farmaciaDataChanged = Signal()
-    consultasDataChanged = Signal()
-    laboratorioDataChanged = Signal()
-    enfermeriaDataChanged = Signal()
-    serviciosBasicosDataChanged = Signal()
-    
     # Signals para gráficos y alertas
     graficoDataChanged = Signal()
     alertasChanged = Signal()
     alertasInventarioChanged = Signal()  # ✅ NUEVO: Para alertas de inventario
     periodoChanged = Signal()
     
-    # Signal general de actualización
+    # Signal general de actualización (tarjetas KPI y totales del período)
     dashboardUpdated = Signal()
     errorOccurred = Signal(str)
+    _alertasSnapshotListo = Signal(object)  # snapshot inmutable (desde el hilo de alertas)
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -85,6 +94,7 @@ class DashboardModel(QObject):
             # CORREGIDO: Usar DatabaseConnection para EnfermeriaRepository
             self.enfermeria_repo = EnfermeriaRepository(DatabaseConnection())
             self.compra_repo = CompraRepository()  # ✅ Para calcular egresos
+            self.resumen_financiero_repo = ResumenFinancieroRepository()  # Totales por categoría y hora
             print("📊 Repositorios inicializados correctamente")
         except Exception as e:
             print(f"⚠️ Error inicializando repositorios: {e}")
@@ -96,6 +106,7 @@ class DashboardModel(QObject):
             self.laboratorio_repo = None
             self.enfermeria_repo = None
             self.compra_repo = None
+            self.resumen_financiero_repo = None
         
         # Estado interno
         self._periodo_actual = "mes"  # hoy, semana, mes, año
@@ -111,19 +122,32 @@ class DashboardModel(QObject):
         
         self._grafico_ingresos = []
         self._grafico_egresos = []
+        self._cache_grafico: Dict[tuple, Dict[str, Any]] = {}  # (período, inicio) -> series y tramos cerrados
+        self._cache_periodos: Dict[tuple, Dict[str, Any]] = {}  # (período, año, mes) -> totales y series
+        self._lock_cache = threading.RLock()  # Cachés compartidas con el hilo de precarga
+        self._cola_prefetch: List[tuple] = []
+        self._hilo_prefetch: Optional[threading.Thread] = None
         self._alertas_vencimientos = []
         self._alertas_inventario = []  # ✅ NUEVO: Alertas de inventario
         self._productos_bajo_stock = []  # ✅ NUEVO: Productos con stock bajo específicamente
+        self._valor_inventario = {}
         
-        # Timer para auto-refresh
-        self._refresh_timer = QTimer(self)
-        self._refresh_timer.timeout.connect(self._auto_refresh)
-        self._refresh_timer.start(300000)  # 5 minutos
+        # Alertas calculadas en segundo plano; aquí solo se reemplaza el snapshot
+        self._hash_alertas = None
+        self._hilo_alertas = get_hilo_alertas()
+        self._alertasSnapshotListo.connect(self._aplicar_snapshot_alertas, Qt.QueuedConnection)
+        self._hilo_alertas.suscribir(self._publicar_snapshot_alertas)
         
-        # Timer para actualizar alertas de inventario
-        self._alertas_timer = QTimer(self)
-        self._alertas_timer.timeout.connect(self._actualizar_alertas_inventario)
-        self._alertas_timer.start(10000)  # 10 segundos (más frecuente)
+        # Refrescos por cambios de datos o al volver al Dashboard (sin timers propios)
+        self._planificador = get_planificador_refresco()
+        self._planificador.registrar(
+            'dashboard', self._auto_refresh, vistas=('Dashboard',),
+            fuentes=('financiero',), intervalo_base_ms=300000  # 5 minutos, luego se espacia
+        )
+        self._planificador.registrar(
+            'dashboard_alertas', self._actualizar_alertas, vistas=('Dashboard',),
+            fuentes=('inventario',), intervalo_base_ms=60000, intervalo_max_ms=900000
+        )
         
         print("📊 DashboardModel inicializado con datos reales - CON ALERTAS DE INVENTARIO")
         
@@ -134,27 +158,27 @@ class DashboardModel(QObject):
     # PROPERTIES - KPI CARDS
     # ===============================
     
-    @Property(float, notify=farmaciaDataChanged)
+    @Property(float, notify=dashboardUpdated)
     def farmaciaTotal(self):
         """Total de ingresos por farmacia según período"""
         return round(self._farmacia_total, 2)
     
-    @Property(float, notify=consultasDataChanged) 
+    @Property(float, notify=dashboardUpdated) 
     def consultasTotal(self):
         """Total de ingresos por consultas según período"""
         return round(self._consultas_total, 2)
     
-    @Property(float, notify=laboratorioDataChanged)
+    @Property(float, notify=dashboardUpdated)
     def laboratorioTotal(self):
         """Total de ingresos por laboratorio según período"""
         return round(self._laboratorio_total, 2)
     
-    @Property(float, notify=enfermeriaDataChanged)
+    @Property(float, notify=dashboardUpdated)
     def enfermeriaTotal(self):
         """Total de ingresos por enfermería según período"""
         return round(self._enfermeria_total, 2)
     
-    @Property(float, notify=serviciosBasicosDataChanged)
+    @Property(float, notify=dashboardUpdated)
     def serviciosBasicosTotal(self):
         """Total de egresos por servicios básicos según período"""
         return round(self._servicios_basicos_total, 2)
@@ -226,6 +250,11 @@ class DashboardModel(QObject):
     def productosBajoStockDashboard(self):
         """✅ NUEVO: Productos con stock bajo específicamente para dashboard"""
         return self._productos_bajo_stock
+
+    @Property('QVariantMap', notify=alertasInventarioChanged)
+    def valorInventario(self):
+        """Valor del inventario a costo y a venta (totales acumulados)"""
+        return self._valor_inventario
     
     # ===============================
     # SLOTS PÚBLICOS - FILTRADO
@@ -239,7 +268,7 @@ class DashboardModel(QObject):
                 print(f"📅 Cambiando período de '{self._periodo_actual}' a '{nuevo_periodo}'")
                 self._periodo_actual = nuevo_periodo
                 self.periodoChanged.emit()
-                self._actualizar_todos_los_datos()
+                self._actualizar_todos_los_datos(incluir_alertas=False)
         except Exception as e:
             print(f"❌ Error cambiando período: {e}")
             self.errorOccurred.emit(f"Error cambiando período: {str(e)}")
@@ -262,7 +291,7 @@ class DashboardModel(QObject):
             
             if cambio_realizado:
                 self.periodoChanged.emit()
-                self._actualizar_todos_los_datos()
+                self._actualizar_todos_los_datos(incluir_alertas=False)
                 
         except Exception as e:
             print(f"❌ Error cambiando fecha específica: {e}")
@@ -276,8 +305,11 @@ class DashboardModel(QObject):
             # Invalidar caches solo si los repositorios existen
             if self.estadistica_repo:
                 self.estadistica_repo.invalidate_statistics_caches()
+            with self._lock_cache:
+                # Por si se editaron movimientos de tramos o períodos ya cerrados
+                self._cache_grafico.clear()
+                self._cache_periodos.clear()
             self._actualizar_todos_los_datos()
-            self._actualizar_alertas_inventario()  # ✅ Actualizar alertas también
             print("✅ Datos del dashboard refrescados")
         except Exception as e:
             print(f"❌ Error refrescando datos: {e}")
@@ -285,73 +317,52 @@ class DashboardModel(QObject):
     
     @Slot(result='QVariant')
     def obtenerAlertasDashboard(self):
-        """✅ NUEVO: Obtiene alertas para el dashboard desde el inventario"""
+        """Alertas de stock bajo desde el último snapshot del hilo de alertas (no consulta la BD)"""
         try:
-            # Importar el modelo de inventario dinámicamente
-            try:
-                from backend.models.inventario_model import InventarioModel
-                
-                # Crear una instancia temporal del inventario
-                inventario_temp = InventarioModel()
-                alertas = inventario_temp.obtener_alertas_inventario()
-                
-                if not alertas:
-                    return []
-                
-                # Filtrar solo alertas de stock bajo
-                alertas_stock_bajo = []
-                for alerta in alertas:
-                    if alerta.get('Tipo_Alerta') == 'STOCK BAJO':
-                        alertas_stock_bajo.append({
-                            'codigo': alerta.get('Codigo', ''),
-                            'nombre': alerta.get('Producto', ''),
-                            'stock_actual': alerta.get('Stock_Actual', 0),
-                            'stock_minimo': alerta.get('Minimo', 10),
-                            'detalle': alerta.get('Detalle', ''),
-                            'prioridad': alerta.get('Prioridad', 2)
-                        })
-                
-                print(f"📊 Dashboard: {len(alertas_stock_bajo)} alertas de stock bajo encontradas")
-                return alertas_stock_bajo
-                
-            except ImportError as e:
-                print(f"❌ No se pudo importar InventarioModel: {e}")
+            snapshot = self._hilo_alertas.ultimo
+            self._actualizar_alertas()
+            if not snapshot:
                 return []
             
+            # Filtrar solo alertas de stock bajo
+            alertas_stock_bajo = []
+            for alerta in snapshot['alertas']:
+                if alerta.get('Tipo_Alerta') == 'STOCK BAJO':
+                    alertas_stock_bajo.append({
+                        'codigo': alerta.get('Codigo', ''),
+                        'nombre': alerta.get('Producto', ''),
+                        'stock_actual': alerta.get('Stock_Actual', 0),
+                        'stock_minimo': alerta.get('Minimo', 10),
+                        'detalle': alerta.get('Detalle', ''),
+                        'prioridad': alerta.get('Prioridad', 2)
+                    })
+            
+            print(f"📊 Dashboard: {len(alertas_stock_bajo)} alertas de stock bajo encontradas")
+            return alertas_stock_bajo
+            
         except Exception as e:
             print(f"❌ Error obteniendo alertas para dashboard: {e}")
             return []
     
     @Slot(result='QVariant')
     def obtenerProductosBajoStockDashboard(self):
-        """✅ NUEVO: Obtiene productos con stock bajo específicamente para dashboard"""
+        """Productos con stock bajo desde el último snapshot del hilo de alertas"""
         try:
-            # Importar el repositorio directamente
-            try:
-                from backend.repositories.producto_repository import ProductoRepository
-                
-                producto_repo = ProductoRepository()
-                productos_bajo_stock = producto_repo.get_productos_bajo_stock(10) or []
-                
-                productos_formateados = []
-                for producto in productos_bajo_stock:
-                    productos_formateados.append({
-                        'id': producto.get('id', 0),
-                        'codigo': producto.get('Codigo', ''),
-                        'nombre': producto.get('Nombre', ''),
-                        'stock_total': producto.get('Stock_Total', 0),
-                        'stock_minimo': producto.get('Stock_Minimo', 10),
-                        'marca': producto.get('Marca_Nombre', ''),
-                        'precio_venta': producto.get('Precio_venta', 0),
-                        'estado': 'CRÍTICO' if producto.get('Stock_Total', 0) <= 0 else 'BAJO'
-                    })
-                
-                print(f"📦 Dashboard: {len(productos_formateados)} productos bajo stock")
-                return productos_formateados
-                
-            except ImportError as e:
-                print(f"❌ No se pudo importar ProductoRepository: {e}")
-                return []
+            productos_formateados = []
+            for producto in self._productos_bajo_stock:
+                productos_formateados.append({
+                    'id': producto.get('id', 0),
+                    'codigo': producto.get('Codigo', ''),
+                    'nombre': producto.get('Nombre', ''),
+                    'stock_total': producto.get('Stock_Total', 0),
+                    'stock_minimo': producto.get('Stock_Minimo', 10),
+                    'marca': producto.get('Marca_Nombre', ''),
+                    'precio_venta': producto.get('Precio_venta', 0),
+                    'estado': 'CRÍTICO' if producto.get('Stock_Total', 0) <= 0 else 'BAJO'
+                })
+            
+            print(f"📦 Dashboard: {len(productos_formateados)} productos bajo stock")
+            return productos_formateados
             
         except Exception as e:
             print(f"❌ Error obteniendo productos bajo stock: {e}")
@@ -360,13 +371,12 @@ class DashboardModel(QObject):
     def cleanup(self):
         """Limpia recursos del dashboard"""
         try:
-            if hasattr(self, '_refresh_timer') and self._refresh_timer.isActive():
-                self._refresh_timer.stop()
-                print("⏹️ Timer del dashboard detenido")
-            
-            if hasattr(self, '_alertas_timer') and self._alertas_timer.isActive():
-                self._alertas_timer.stop()
-                print("⏹️ Timer de alertas detenido")
+            if hasattr(self, '_planificador'):
+                self._planificador.desregistrar('dashboard')
+                self._planificador.desregistrar('dashboard_alertas')
+                print("⏹️ Refrescos del dashboard desregistrados")
+            if hasattr(self, '_hilo_alertas'):
+                self._hilo_alertas.desuscribir(self._publicar_snapshot_alertas)
         except Exception as e:
             print(f"Error limpiando dashboard: {e}")
             
@@ -383,81 +393,88 @@ class DashboardModel(QObject):
             if not self._verificar_repositorios():
                 print("⚠️ Algunos repositorios no están disponibles")
             
-            # Cargar datos
+            # Cargar datos (las alertas se piden al hilo de alertas)
             self._actualizar_todos_los_datos()
             
-            # Cargar alertas de inventario
-            self._actualizar_alertas_inventario()
-            
-            # ✅ NUEVO: Forzar emisión de todos los signals después de carga inicial
-            self.farmaciaDataChanged.emit()
-            self.consultasDataChanged.emit()
-            self.laboratorioDataChanged.emit()
-            self.enfermeriaDataChanged.emit()
-            self.serviciosBasicosDataChanged.emit()
-            self.dashboardUpdated.emit()
-            
             # Verificación post-carga
             QTimer.singleShot(2000, self.debug_comparar_con_cierre_caja)
             
-            print("✅ Datos iniciales cargados y signals emitidos")
+            print("✅ Datos iniciales cargados")
         except Exception as e:
             print(f"❌ Error cargando datos iniciales: {e}")
             self.errorOccurred.emit(f"Error inicial: {str(e)}")
     
-    def _actualizar_todos_los_datos(self):
-        """Actualiza todos los datos según el período actual"""
+    def _actualizar_todos_los_datos(self, incluir_alertas: bool = True):
+        """
+        Actualiza todos los datos según el período actual.
+        incluir_alertas=False al cambiar de período: las alertas no dependen del período.
+        """
         try:
-            # Calcular rango de fechas según período
-            fecha_inicio, fecha_fin = self._obtener_rango_fechas()
+            clave = self._clave_periodo(self._periodo_actual, self._ano_seleccionado, self._mes_seleccionado)
+            fecha_inicio, _ = self._obtener_rango_fechas(*clave)
+            
+            # Períodos ya vistos o precargados salen de la caché sin consultar la BD
+            with self._lock_cache:
+                entrada = self._cache_periodos.get(clave)
+            if entrada and self._entrada_vigente(entrada, fecha_inicio):
+                print(f"⚡ Dashboard - Período {clave} desde caché")
+            else:
+                entrada = self._calcular_periodo(*clave)
+                self._guardar_periodo(clave, entrada)
             
-            # Actualizar cada módulo
-            self._actualizar_farmacia_data(fecha_inicio, fecha_fin)
-            self._actualizar_consultas_data(fecha_inicio, fecha_fin)
-            self._actualizar_laboratorio_data(fecha_inicio, fecha_fin)
-            self._actualizar_enfermeria_data(fecha_inicio, fecha_fin)
-            self._actualizar_servicios_basicos_data(fecha_inicio, fecha_fin)  # ✅ Incluye gastos + compras
+            # Totales de todos los módulos en una sola asignación
+            self._aplicar_totales_periodo(entrada['totales'])
             
             # Actualizar gráficos y alertas
-            self._actualizar_datos_grafico(fecha_inicio, fecha_fin)
-            self._actualizar_alertas()
+            self._grafico_ingresos = entrada['ingresos']
+            self._grafico_egresos = entrada['egresos']
+            self.graficoDataChanged.emit()
+            if incluir_alertas:
+                self._actualizar_alertas()
             
-            # Emitir signal general
+            # Una sola notificación para todas las tarjetas y totales
             self.dashboardUpdated.emit()
             
+            # Los meses (o años) vecinos quedan listos para cuando el usuario navegue
+            self._programar_prefetch()
+            
         except Exception as e:
             print(f"❌ Error actualizando datos: {e}")
             self.errorOccurred.emit(f"Error actualizando: {str(e)}")
     
-    def _obtener_rango_fechas(self):
-        """Obtiene rango de fechas según período seleccionado"""
+    def _obtener_rango_fechas(self, periodo: str = None, ano: int = None, mes: int = None):
+        """Obtiene rango de fechas según período seleccionado (o el indicado)"""
         ahora = datetime.now()
+        periodo = periodo or self._periodo_actual
+        ano = ano or self._ano_seleccionado
+        mes = mes or self._mes_seleccionado
+        
+        if periodo in ("hoy", "semana"):
+            # ✅ Usar año/mes seleccionado, no fecha actual (día acotado a los del mes)
+            dia = min(ahora.day, calendar.monthrange(ano, mes)[1])
+            fecha_base = datetime(ano, mes, dia)
         
-        if self._periodo_actual == "hoy":
-            # ✅ Usar año/mes seleccionado, no fecha actual
-            fecha_base = datetime(self._ano_seleccionado, self._mes_seleccionado, datetime.now().day)
+        if periodo == "hoy":
             inicio = fecha_base.replace(hour=0, minute=0, second=0, microsecond=0)
             fin = inicio + timedelta(days=1)
-        elif self._periodo_actual == "semana":
-            # ✅ Usar año/mes seleccionado para calcular la semana
-            fecha_base = datetime(self._ano_seleccionado, self._mes_seleccionado, datetime.now().day)
+        elif periodo == "semana":
             dias_desde_lunes = fecha_base.weekday()
             inicio = fecha_base - timedelta(days=dias_desde_lunes)
             inicio = inicio.replace(hour=0, minute=0, second=0, microsecond=0)
             fin = inicio + timedelta(days=7)
-        elif self._periodo_actual == "mes":
+        elif periodo == "mes":
             # ✅ CORREGIDO: Siempre usa día 1 para calcular rangos de mes
-            inicio = datetime(self._ano_seleccionado, self._mes_seleccionado, 1, 0, 0, 0, 0)
+            inicio = datetime(ano, mes, 1, 0, 0, 0, 0)
             
             # Calcular el primer día del mes siguiente
-            if self._mes_seleccionado == 12:
-                fin = datetime(self._ano_seleccionado + 1, 1, 1, 0, 0, 0, 0)
+            if mes == 12:
+                fin = datetime(ano + 1, 1, 1, 0, 0, 0, 0)
             else:
-                fin = datetime(self._ano_seleccionado, self._mes_seleccionado + 1, 1, 0, 0, 0, 0)
-        elif self._periodo_actual == "año":
+                fin = datetime(ano, mes + 1, 1, 0, 0, 0, 0)
+        elif periodo == "año":
             # Año completo seleccionado
-            inicio = datetime(self._ano_seleccionado, 1, 1)
-            fin = datetime(self._ano_seleccionado + 1, 1, 1)
+            inicio = datetime(ano, 1, 1)
+            fin = datetime(ano + 1, 1, 1)
         else:
             # Fallback: mes actual
             inicio = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -466,429 +483,284 @@ class DashboardModel(QObject):
             else:
                 fin = datetime(ahora.year, ahora.month + 1, 1)
         
-        print(f"📅 Rango calculado: {inicio.strftime('%Y-%m-%d')} a {fin.strftime('%Y-%m-%d')}")
         return inicio, fin
+    
     # ===============================
-    # ACTUALIZACIÓN POR MÓDULO - CON VALIDACIÓN DE REPOSITORIOS
+    # CACHÉ POR PERÍODO Y PRECARGA
     # ===============================
     
-    def _actualizar_farmacia_data(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Actualiza datos de farmacia/ventas - USA get_ventas_by_date_range"""
-        try:
-            if not self.venta_repo:
-                print("⚠️ VentaRepository no disponible")
-                self._farmacia_total = 0.00
-                self.farmaciaDataChanged.emit()
-                return
-            
-            print(f"🔍 Dashboard - Buscando ventas entre {fecha_inicio.strftime('%Y-%m-%d')} y {fecha_fin.strftime('%Y-%m-%d')}")
-            
-            # ✅ Usar el método correcto que ahora existe
-            ventas = self.venta_repo.get_ventas_by_date_range(fecha_inicio, fecha_fin)
-            
-            # Calcular total
-            total = 0.00
-            for venta in ventas:
-                # El método devuelve tanto 'Total' como 'Venta_Total' (son iguales)
-                total += round(float(venta.get('Total', 0)), 2)
-            
-            print(f"💊 Dashboard - Farmacia calculada: Bs {total:.2f} ({len(ventas)} ventas)")
-            
-            # ✅ Siempre actualizar y emitir, incluso si el valor no cambió
-            self._farmacia_total = round(float(total), 2)
-            self.farmaciaDataChanged.emit()
-                
-        except Exception as e:
-            print(f"❌ Error actualizando farmacia en dashboard: {e}")
-            import traceback
-            traceback.print_exc()  # ✅ Agregar traceback para debugging
-            self._farmacia_total = 0.00
-            self.farmaciaDataChanged.emit()
-            
-    def _actualizar_consultas_data(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """CORREGIDO: Usar precios reales de especialidades en lugar de precios fijos"""
-        try:
-            if not self.consulta_repo:
-                self._consultas_total = 0.00
-                self.consultasDataChanged.emit()
-                return
-                
-            fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
-            fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
-            
-            print(f"🔍 Dashboard - Buscando consultas entre {fecha_inicio_str} y {fecha_fin_str}")
-            
-            # CORREGIDO: Usar el método con detalles para obtener precios reales
-            try:
-                # Intentar usar el mismo método que CierreCaja
-                if hasattr(self.consulta_repo, 'get_consultations_by_date_range'):  # ✅ CORRECTO
-                    consultas = self.consulta_repo.get_consultations_by_date_range(fecha_inicio, fecha_fin)
-                else:
-                    consultas = self.consulta_repo.get_all_with_details(1000)
-                    # Filtrar manualmente si no hay método específico
-                    consultas_filtradas = []
-                    for consulta in consultas:
-                        fecha_consulta = consulta.get('Fecha')
-                        if fecha_consulta:
-                            if isinstance(fecha_consulta, str):
-                                try:
-                                    fecha_consulta = datetime.fromisoformat(fecha_consulta.replace('Z', '+00:00'))
-                                except:
-                                    continue
-                            if fecha_inicio <= fecha_consulta < fecha_fin:
-                                consultas_filtradas.append(consulta)
-                    consultas = consultas_filtradas
-            except Exception as e:
-                print(f"Error obteniendo consultas: {e}")
-                consultas = []
-            
-            total = 0.0
-            for consulta in consultas:
-                # CORREGIDO: Usar precios reales de especialidades
-                tipo_consulta = consulta.get('Tipo_Consulta', 'Normal')
-                
-                # Obtener precio real según especialidad y tipo
-                if tipo_consulta.lower() == 'emergencia':
-                    precio = float(consulta.get('Precio_Emergencia', 80))
-                else:
-                    precio = float(consulta.get('Precio_Normal', 50))
-                
-                total += precio
-            
-            print(f"🩺 Dashboard - Consultas calculadas: Bs {total:.2f} ({len(consultas)} consultas)")
-            
-            self._consultas_total = round(total, 2)
-            self.consultasDataChanged.emit()
-            
-        except Exception as e:
-            print(f"❌ Error actualizando consultas en dashboard: {e}")
-            self._consultas_total = 0.00
-            self.consultasDataChanged.emit()
+    @staticmethod
+    def _clave_periodo(periodo: str, ano: int, mes: int) -> tuple:
+        """(período, año, mes); la vista anual no depende del mes seleccionado"""
+        return (periodo, ano, 1 if periodo == "año" else mes)
     
-    def _actualizar_laboratorio_data(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """CORREGIDO: Mejorar obtención de datos de laboratorio"""
+    def _calcular_periodo(self, periodo: str, ano: int, mes: int) -> Dict[str, Any]:
+        """Totales y series del gráfico de un período (no toca el estado visible; sirve a la precarga)"""
+        fecha_inicio, fecha_fin = self._obtener_rango_fechas(periodo, ano, mes)
+        print(f"📅 Rango calculado: {fecha_inicio.strftime('%Y-%m-%d')} a {fecha_fin.strftime('%Y-%m-%d')}")
+        calculado = datetime.now()
+        
+        # Totales de todos los módulos en una consulta
         try:
-            if not self.laboratorio_repo:
-                print("⚠️ LaboratorioRepository no disponible")
-                self._laboratorio_total = 0.0
-                self.laboratorioDataChanged.emit()
-                return
-                
-            fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
-            fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
-            
-            print(f"🔍 Dashboard - Buscando laboratorios entre {fecha_inicio_str} y {fecha_fin_str}")
-            
-            # CORREGIDO: Usar método más amplio para obtener datos
-            try:
-                resultado = self.laboratorio_repo.get_paginated_exams_with_details(
-                    page=0, 
-                    page_size=10000,  # Aumentar para obtener todos los registros
-                    fecha_desde=fecha_inicio_str,
-                    fecha_hasta=fecha_fin_str
-                )
-                examenes = resultado.get('examenes', [])
-            except Exception as e:
-                print(f"Error con método paginado: {e}")
-                # Fallback: usar método genérico
-                examenes = []
-            
-            total = 0.0
-            for examen in examenes:
-                # Usar múltiples campos posibles para el precio
-                precio = (examen.get('precioNumerico') or 
-                        examen.get('Precio_Total') or 
-                        examen.get('precio') or 0)
-                if precio:
-                    total += round(float(precio), 2)
-            
-            print(f"🔬 Dashboard - Laboratorio calculado: Bs {total:.2f} ({len(examenes)} exámenes)")
-            
-            # ✅ Siempre actualizar y emitir
-            self._laboratorio_total = round(total, 2)
-            self.laboratorioDataChanged.emit()
-                
+            totales = self._cargar_totales_periodo(fecha_inicio, fecha_fin)
         except Exception as e:
-            print(f"❌ Error actualizando laboratorio en dashboard: {e}")
-            self._laboratorio_total = 0.00
-            self.laboratorioDataChanged.emit()
+            print(f"❌ Error cargando totales del período: {e}")
+            totales = {}
+        
+        ingresos, egresos = self._calcular_datos_grafico(periodo, fecha_inicio, fecha_fin)
+        return {
+            'inicio': fecha_inicio, 'fin': fecha_fin, 'calculado': calculado,
+            'totales': totales, 'ingresos': ingresos, 'egresos': egresos
+        }
     
-    def _actualizar_enfermeria_data(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """CORREGIDO: Mejorar obtención de datos de enfermería"""
-        try:
-            if not self.enfermeria_repo:
-                print("⚠️ EnfermeriaRepository no disponible")
-                self._enfermeria_total = 0.00
-                self.enfermeriaDataChanged.emit()
-                return
-                
-            fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
-            fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
-            
-            print(f"🔍 Dashboard - Buscando enfermería entre {fecha_inicio_str} y {fecha_fin_str}")
-            
-            # CORREGIDO: Usar el método correcto sin filtros restrictivos
+    def _entrada_vigente(self, entrada: Dict[str, Any], fecha_inicio: datetime) -> bool:
+        """Un período cerrado al calcularse no cambia; uno abierto se reutiliza poco tiempo"""
+        if entrada['inicio'] != fecha_inicio:
+            return False  # hoy/semana dependen del día actual
+        if entrada['fin'] <= entrada['calculado']:
+            return True
+        return (datetime.now() - entrada['calculado']).total_seconds() < self.VIGENCIA_PERIODO_ABIERTO
+    
+    def _guardar_periodo(self, clave: tuple, entrada: Dict[str, Any]):
+        with self._lock_cache:
+            self._cache_periodos.pop(clave, None)
+            while len(self._cache_periodos) >= self.MAX_PERIODOS_CACHE:
+                # Se descarta el más antiguo (orden de inserción)
+                self._cache_periodos.pop(next(iter(self._cache_periodos)))
+            self._cache_periodos[clave] = entrada
+    
+    def _invalidar_periodos_abiertos(self):
+        """Tras un movimiento nuevo: los períodos que incluían el presente se recalculan"""
+        with self._lock_cache:
+            for clave in [c for c, e in self._cache_periodos.items() if e['fin'] > e['calculado']]:
+                del self._cache_periodos[clave]
+    
+    def _periodos_adyacentes(self) -> List[tuple]:
+        """Mes anterior y siguiente (año anterior y siguiente en la vista anual) sin incluir futuros"""
+        periodo, ano, mes = self._periodo_actual, self._ano_seleccionado, self._mes_seleccionado
+        if periodo == "año":
+            candidatos = [self._clave_periodo(periodo, ano - 1, mes), self._clave_periodo(periodo, ano + 1, mes)]
+        else:
+            anterior = (ano - 1, 12) if mes == 1 else (ano, mes - 1)
+            siguiente = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+            candidatos = [(periodo,) + anterior, (periodo,) + siguiente]
+        ahora = datetime.now()
+        return [c for c in candidatos if self._obtener_rango_fechas(*c)[0] <= ahora]
+    
+    def _programar_prefetch(self):
+        """Precarga en segundo plano los períodos vecinos que no estén en caché"""
+        with self._lock_cache:
+            self._cola_prefetch = [c for c in self._periodos_adyacentes() if c not in self._cache_periodos]
+            if not self._cola_prefetch or self._hilo_prefetch is not None:
+                return  # nada que precargar, o el hilo en curso tomará la cola nueva
+            self._hilo_prefetch = threading.Thread(
+                target=self._prefetch_periodos, name="DashboardPrefetch", daemon=True
+            )
+            self._hilo_prefetch.start()
+    
+    def _prefetch_periodos(self):
+        while True:
+            with self._lock_cache:
+                if not self._cola_prefetch:
+                    self._hilo_prefetch = None
+                    return
+                clave = self._cola_prefetch.pop(0)
+                if clave in self._cache_periodos:
+                    continue
             try:
-                filtros = {
-                    'fechaDesde': fecha_inicio_str,
-                    'fechaHasta': fecha_fin_str
-                }
-                procedimientos = self.enfermeria_repo.obtener_procedimientos_enfermeria(filtros)
+                self._guardar_periodo(clave, self._calcular_periodo(*clave))
+                print(f"⚡ Dashboard - Período {clave} precargado")
             except Exception as e:
-                print(f"Error obteniendo procedimientos: {e}")
-                procedimientos = []
-            
-            total = 0.00
-            for proc in procedimientos:
-                # CORREGIDO: Manejar diferentes formatos de precio
-                precio_str = str(proc.get('precioTotal', '0'))
-                
-                # Limpiar formato boliviano
-                precio_limpio = precio_str.replace('Bs', '').replace(',', '').strip()
-                
-                try:
-                    precio = float(precio_limpio)
-                    total += precio
-                except (ValueError, TypeError):
-                    # Intentar con otros campos
-                    precio_alt = (proc.get('precio') or 
-                                proc.get('Precio_Total') or 
-                                proc.get('precio_unitario', 0))
-                    if precio_alt:
-                        total += round(float(precio_alt), 2)
-            
-            print(f"🩹 Dashboard - Enfermería calculada: Bs {total:.2f} ({len(procedimientos)} procedimientos)")
-            
-            # ✅ Siempre actualizar y emitir
-            self._enfermeria_total = round(total, 2)
-            self.enfermeriaDataChanged.emit()
-                
-        except Exception as e:
-            print(f"❌ Error actualizando enfermería en dashboard: {e}")
-            self._enfermeria_total = 0.00
-            self.enfermeriaDataChanged.emit()
-    
-    def _actualizar_servicios_basicos_data(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """✅ CORREGIDO: Calcula egresos totales (gastos + compras)"""
-        try:
-            total_gastos = 0.00
-            total_compras = 0.00
-            
-            # 1. Sumar GASTOS (servicios básicos)
-            if self.gasto_repo:
-                print(f"🔍 Dashboard - Buscando gastos entre {fecha_inicio.strftime('%Y-%m-%d')} y {fecha_fin.strftime('%Y-%m-%d')}")
-                gastos = self.gasto_repo.get_expenses_by_date_range(fecha_inicio, fecha_fin)
-                
-                for gasto in gastos:
-                    monto = float(gasto.get('Monto', 0))
-                    if monto > 0:
-                        total_gastos += monto
-                
-                print(f"⚡ Dashboard - Gastos calculados: Bs {total_gastos:.2f} ({len(gastos)} gastos)")
-            else:
-                print("⚠️ GastoRepository no disponible")
-            
-            # 2. Sumar COMPRAS
-            if self.compra_repo:
-                print(f"🔍 Dashboard - Buscando compras entre {fecha_inicio.strftime('%Y-%m-%d')} y {fecha_fin.strftime('%Y-%m-%d')}")
-                
-                # Usar get_compras_con_detalles con el campo correcto
-                compras = self.compra_repo.get_compras_con_detalles(
-                    fecha_desde=fecha_inicio.strftime('%Y-%m-%d'),
-                    fecha_hasta=fecha_fin.strftime('%Y-%m-%d')
-                )
-                
-                for compra in compras:
-                    # ✅ CORREGIDO: El campo es "Compra_Total", no "Total"
-                    monto = float(compra.get('Compra_Total', 0))
-                    if monto > 0:
-                        total_compras += monto
-                
-                print(f"📦 Dashboard - Compras calculadas: Bs {total_compras:.2f} ({len(compras)} compras)")
-            else:
-                print("⚠️ CompraRepository no disponible")
-            
-            # 3. Sumar TODO
-            total_egresos = total_gastos + total_compras
-            print(f"💰 Dashboard - EGRESOS TOTALES: Bs {total_egresos:.2f} (Gastos: {total_gastos:.2f} + Compras: {total_compras:.2f})")
-            
-            # ✅ Siempre actualizar y emitir
-            self._servicios_basicos_total = round(total_egresos, 2)
-            self.serviciosBasicosDataChanged.emit()
-                
-        except Exception as e:
-            print(f"❌ Error actualizando egresos en dashboard: {e}")
-            self._servicios_basicos_total = 0.00
-            self.serviciosBasicosDataChanged.emit()
-    
-    
-    def _actualizar_datos_grafico(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Actualiza datos para gráficos de tendencias"""
+                print(f"⚠️ Error precargando período {clave}: {e}")
+
+    def _obtener_resumen_financiero(self, fecha_inicio: datetime, fecha_fin: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Totales por categoría desde ResumenFinancieroHora.
+        None si el resumen no está disponible (cada módulo consulta entonces su repositorio).
+        """
+        if not self.resumen_financiero_repo:
+            return None
         try:
-            # Generar datos de tendencias según el período
-            if self._periodo_actual == "hoy":
-                self._generar_datos_por_horas(fecha_inicio, fecha_fin)
-            elif self._periodo_actual == "semana":
-                self._generar_datos_por_dias_semana(fecha_inicio, fecha_fin)
-            elif self._periodo_actual == "mes":
-                self._generar_datos_por_semanas_mes(fecha_inicio, fecha_fin)
-            elif self._periodo_actual == "año":
-                self._generar_datos_por_meses_ano(fecha_inicio, fecha_fin)
-            
-            self.graficoDataChanged.emit()
-            
+            return self.resumen_financiero_repo.get_totales_por_categoria(fecha_inicio, fecha_fin) or None
         except Exception as e:
-            print(f"❌ Error actualizando gráfico: {e}")
-            self._grafico_ingresos = []
-            self._grafico_egresos = []
-            self.graficoDataChanged.emit()
+            print(f"⚠️ Resumen financiero no disponible, se consultan los repositorios: {e}")
+            return None
+    # ===============================
+    # TOTALES DEL PERÍODO - UNA CONSULTA, UNA ACTUALIZACIÓN
+    # ===============================
     
-    def _generar_datos_por_meses_ano(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Genera datos del gráfico por meses del año"""
-        ingresos_mes = []
-        egresos_mes = []
-        
-        # Dividir el año en 12 meses
-        for mes in range(1, 13):
+    def _cargar_totales_periodo(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, float]:
+        """
+        Totales de todos los módulos del período en un solo viaje a la BD (resumen financiero).
+        Si el resumen no está disponible se consulta cada repositorio.
+        """
+        resumen = self._obtener_resumen_financiero(fecha_inicio, fecha_fin)
+        if resumen:
+            print(f"📒 Dashboard - Totales del período desde el resumen financiero (1 consulta)")
+            return {
+                'farmacia': resumen['FARMACIA']['total'],
+                'consultas': resumen['CONSULTAS']['total'],
+                'laboratorio': resumen['LABORATORIO']['total'],
+                'enfermeria': resumen['ENFERMERIA']['total'],
+                'gastos': resumen['GASTOS']['total'],
+                'compras': resumen['COMPRAS']['total']
+            }
+        return self._totales_desde_repositorios(fecha_inicio, fecha_fin)
+    
+    def _totales_desde_repositorios(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, float]:
+        """Respaldo: total de cada módulo con su propio repositorio (0 si no está disponible)"""
+        consultas_totales = [
+            ('farmacia', self.venta_repo, 'get_totales_ventas'),
+            ('consultas', self.consulta_repo, 'get_totales_consultas'),
+            ('laboratorio', self.laboratorio_repo, 'get_totales_laboratorio'),
+            ('enfermeria', self.enfermeria_repo, 'get_totales_procedimientos'),
+            ('gastos', self.gasto_repo, 'get_totales_gastos'),
+            ('compras', self.compra_repo, 'get_totales_compras'),
+        ]
+        totales = {}
+        for clave, repo, metodo in consultas_totales:
             try:
-                inicio_mes = datetime(self._ano_seleccionado, mes, 1)
-                if mes == 12:
-                    fin_mes = datetime(self._ano_seleccionado + 1, 1, 1)
-                else:
-                    fin_mes = datetime(self._ano_seleccionado, mes + 1, 1)
-                
-                # Calcular proporción de ingresos/egresos para este mes
-                proporcion = 1.0 / 12.0
-                ingreso_mes = self.totalIngresos * proporcion
-                egreso_mes = self.totalEgresos * proporcion
-                
-                ingresos_mes.append(round(float(ingreso_mes), 2)) 
-                egresos_mes.append(round(float(egreso_mes), 2))    
-                
+                totales[clave] = float(getattr(repo, metodo)(fecha_inicio, fecha_fin)['total']) if repo else 0.0
             except Exception as e:
-                print(f"❌ Error procesando mes {mes}: {e}")
-                ingresos_mes.append(0.00)
-                egresos_mes.append(0.00)
-        
-        self._grafico_ingresos = ingresos_mes
-        self._grafico_egresos = egresos_mes
-        print(f"📊 Gráfico anual generado: {len(ingresos_mes)} puntos")
-    
-    def _generar_datos_por_semanas_mes(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Genera datos del gráfico por semanas del mes"""
-        ingresos_sem = []
-        egresos_sem = []
-        
-        # 4 semanas aproximadas
-        for semana in range(4):
-            proporcion = 0.25
-            ingreso_sem = self.totalIngresos * proporcion
-            egreso_sem = self.totalEgresos * proporcion
-            
-            ingresos_sem.append(round(float(ingreso_sem), 2))
-            egresos_sem.append(round(float(egreso_sem), 2))
-        
-        self._grafico_ingresos = ingresos_sem
-        self._grafico_egresos = egresos_sem
-    
-    def _generar_datos_por_dias_semana(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Genera datos del gráfico por días de la semana"""
-        ingresos_dia = []
-        egresos_dia = []
+                print(f"❌ Error obteniendo total de {clave} en dashboard: {e}")
+                totales[clave] = 0.0
+        return totales
+    
+    def _aplicar_totales_periodo(self, totales: Dict[str, float]):
+        """Asigna todos los totales de una vez (la notificación la hace dashboardUpdated)"""
+        self._farmacia_total = round(totales.get('farmacia', 0.0), 2)
+        self._consultas_total = round(totales.get('consultas', 0.0), 2)
+        self._laboratorio_total = round(totales.get('laboratorio', 0.0), 2)
+        self._enfermeria_total = round(totales.get('enfermeria', 0.0), 2)
+        # ✅ Egresos = gastos + compras
+        self._servicios_basicos_total = round(totales.get('gastos', 0.0) + totales.get('compras', 0.0), 2)
         
-        # 7 días de la semana
-        for dia in range(7):
-            proporcion = 1.0 / 7.0
-            ingreso_dia = self.totalIngresos * proporcion
-            egreso_dia = self.totalEgresos * proporcion
-            
-            ingresos_dia.append(round(float(ingreso_dia), 2))
-            egresos_dia.append(round(float(egreso_dia), 2))
-        
-        self._grafico_ingresos = ingresos_dia
-        self._grafico_egresos = egresos_dia
-    
-    def _generar_datos_por_horas(self, fecha_inicio: datetime, fecha_fin: datetime):
-        """Genera datos del gráfico por horas del día"""
-        horas_activas = [8, 9, 10, 11, 14, 15, 16, 17]  # Horarios típicos
-        
-        ingresos_hora = []
-        egresos_hora = []
-        
-        for hora in range(24):
-            if hora in horas_activas:
-                proporcion = 1.0 / len(horas_activas)
-                ingreso_hora_val = self.totalIngresos * proporcion
-                egreso_hora_val = self.totalEgresos * proporcion
-            else:
-                ingreso_hora_val = 0.00
-                egreso_hora_val = 0.00
-            
-            ingresos_hora.append(round(float(ingreso_hora_val), 2))
-            egresos_hora.append(round(float(egreso_hora_val), 2))
-        
-        self._grafico_ingresos = ingresos_hora
-        self._grafico_egresos = egresos_hora
-    
-    def _actualizar_alertas(self):
-        """Actualiza alertas de vencimientos - SIMPLIFICADO"""
+        print(f"💰 Dashboard - Farmacia: Bs {self._farmacia_total:.2f} | Consultas: Bs {self._consultas_total:.2f} | "
+              f"Laboratorio: Bs {self._laboratorio_total:.2f} | Enfermería: Bs {self._enfermeria_total:.2f} | "
+              f"Egresos: Bs {self._servicios_basicos_total:.2f}")
+    
+    
+    def _calcular_datos_grafico(self, periodo: str, fecha_inicio: datetime, fecha_fin: datetime):
+        """
+        Series reales de ingresos/egresos por tramo del período (hora, día, semana o mes)
+        leídas del resumen financiero con una consulta agrupada. Los tramos ya cerrados
+        no cambian: se guardan en caché y solo se consulta desde el primer tramo abierto.
+        Retorna (ingresos, egresos).
+        """
         try:
-            # Datos simulados por ahora
-            alertas = [
-                {
-                    'producto': 'Amoxicilina 500mg',
-                    'cantidad': '45 unid.',
-                    'fecha': '20/07/2025',
-                    'urgencia': 'urgent'
-                }
-            ]
-            
-            self._alertas_vencimientos = alertas
-            self.alertasChanged.emit()
-            print(f"⚠️ Alertas actualizadas: {len(alertas)} productos")
+            agrupacion, tramos = self._tramos_grafico(fecha_inicio, fecha_fin, periodo)
+            clave = (periodo, fecha_inicio)
+            ahora = datetime.now()
+            cerrados = sum(1 for _, fin_tramo in tramos if fin_tramo <= ahora)
+            
+            with self._lock_cache:
+                cache = self._cache_grafico.get(clave)
+            desde = cache['cerrados'] if cache else 0
+            ingresos = (cache['ingresos'][:desde] if cache else []) + [0.0] * (len(tramos) - desde)
+            egresos = (cache['egresos'][:desde] if cache else []) + [0.0] * (len(tramos) - desde)
+            
+            if desde < len(tramos):
+                if self.resumen_financiero_repo:
+                    serie = self.resumen_financiero_repo.get_serie(tramos[desde][0], fecha_fin, agrupar_por=agrupacion)
+                else:
+                    print("⚠️ Resumen financiero no disponible, gráfico sin datos")
+                    serie = []
+                inicios = [inicio_tramo for inicio_tramo, _ in tramos]
+                for fila in serie:
+                    inicio_fila = fila['periodo']
+                    if not isinstance(inicio_fila, datetime):
+                        inicio_fila = datetime.combine(inicio_fila, datetime.min.time())
+                    indice = bisect_right(inicios, inicio_fila) - 1
+                    if indice < desde:
+                        continue
+                    destino = ingresos if fila['Tipo'] == 'INGRESO' else egresos
+                    destino[indice] += float(fila.get('total') or 0)
+            
+            ingresos = [round(v, 2) for v in ingresos]
+            egresos = [round(v, 2) for v in egresos]
+            
+            with self._lock_cache:
+                if len(self._cache_grafico) >= self.MAX_PERIODOS_CACHE_GRAFICO and clave not in self._cache_grafico:
+                    self._cache_grafico.clear()
+                self._cache_grafico[clave] = {'ingresos': ingresos, 'egresos': egresos, 'cerrados': cerrados}
+            
+            print(f"📊 Gráfico '{periodo}': {len(tramos)} tramos "
+                  f"({desde} desde caché, {len(tramos) - desde} consultados)")
+            return ingresos, egresos
             
         except Exception as e:
-            print(f"❌ Error actualizando alertas: {e}")
-            self._alertas_vencimientos = []
-            self.alertasChanged.emit()
+            print(f"❌ Error actualizando gráfico: {e}")
+            return [], []
+    
+    def _tramos_grafico(self, fecha_inicio: datetime, fecha_fin: datetime, periodo: str = None):
+        """
+        (agrupación del resumen, [(inicio, fin)] de cada tramo) según el período:
+        hoy → 24 horas, semana → 7 días, mes → 4 semanas (la última hasta fin de mes), año → 12 meses
+        """
+        periodo = periodo or self._periodo_actual
+        if periodo == "hoy":
+            return 'hora', [(fecha_inicio + timedelta(hours=h), fecha_inicio + timedelta(hours=h + 1)) for h in range(24)]
+        if periodo == "semana":
+            return 'dia', [(fecha_inicio + timedelta(days=d), fecha_inicio + timedelta(days=d + 1)) for d in range(7)]
+        if periodo == "año":
+            inicios = [datetime(fecha_inicio.year, mes, 1) for mes in range(1, 13)] + [fecha_fin]
+            return 'mes', list(zip(inicios[:-1], inicios[1:]))
+        # mes: días 1-7, 8-14, 15-21 y 22 a fin de mes
+        inicios = [fecha_inicio + timedelta(days=7 * semana) for semana in range(4)] + [fecha_fin]
+        return 'dia', list(zip(inicios[:-1], inicios[1:]))
     
-    def _actualizar_alertas_inventario(self):
-        """Actualiza alertas de inventario - OPTIMIZADO sin crear instancias múltiples"""
+    def _actualizar_alertas(self):
+        """
+        Pide al hilo de alertas un snapshot nuevo (vencimientos, stock bajo y valor del inventario).
+        No bloquea: el resultado llega por _alertasSnapshotListo al hilo de la interfaz.
+        """
         try:
-            print("🔄 Dashboard: Actualizando alertas de inventario...")
-            
-            # ✅ Usar repositorios existentes en lugar de crear nuevos
             if not hasattr(self, '_producto_repo_alertas'):
+                # Configura el motor y el cálculo del hilo de alertas
                 from backend.repositories.producto_repository import ProductoRepository
                 self._producto_repo_alertas = ProductoRepository()
-            
-            # ✅ CORREGIDO: Usar el método correcto
-            try:
-                productos_bajo_stock = self._producto_repo_alertas.get_productos_bajo_stock(10) or []
-                self._alertas_inventario = productos_bajo_stock  # Reutilizar como alertas
-                self._productos_bajo_stock = productos_bajo_stock
-                print(f"📦 Dashboard: {len(productos_bajo_stock)} productos bajo stock")
-            except Exception as e:
-                print(f"⚠️ Error obteniendo productos bajo stock: {e}")
-                self._alertas_inventario = []
-                self._productos_bajo_stock = []
-            
-            # Emitir signal de actualización
-            self.alertasInventarioChanged.emit()
-            print("✅ Dashboard: Alertas actualizadas (sin crear instancias nuevas)")
-            
+            self._hilo_alertas.solicitar()
         except Exception as e:
-            print(f"❌ Error actualizando alertas de inventario: {e}")
-            self._alertas_inventario = []
-            self._productos_bajo_stock = []
-            self.alertasInventarioChanged.emit()
+            print(f"❌ Error solicitando alertas: {e}")
+    
+    def _publicar_snapshot_alertas(self, snapshot):
+        """Suscriptor del hilo de alertas: se ejecuta en ese hilo, solo reemite encolado"""
+        self._alertasSnapshotListo.emit(snapshot)
+    
+    @Slot(object)
+    def _aplicar_snapshot_alertas(self, snapshot):
+        """Reemplaza las alertas (hilo de la interfaz) solo si el contenido cambió"""
+        if snapshot['hash'] == self._hash_alertas:
+            return
+        self._hash_alertas = snapshot['hash']
+        
+        alertas = []
+        for lote in tuple(snapshot['lotes_vencidos']) + tuple(snapshot['lotes_por_vencer']):
+            fecha = lote.get('Fecha_Vencimiento')
+            dias = lote.get('Dias_Para_Vencer', -lote.get('Dias_Vencido', 0))
+            alertas.append({
+                'producto': lote.get('Producto_Nombre', ''),
+                'cantidad': f"{lote.get('Stock_Lote', 0)} unid.",
+                'fecha': fecha.strftime('%d/%m/%Y') if hasattr(fecha, 'strftime') else str(fecha or ''),
+                'urgencia': 'urgent' if dias <= 30 else 'warning'
+            })
+        self._alertas_vencimientos = alertas
+        
+        productos_bajo_stock = [dict(producto) for producto in snapshot['productos_bajo_stock']]
+        self._alertas_inventario = productos_bajo_stock  # Reutilizar como alertas
+        self._productos_bajo_stock = productos_bajo_stock
+        self._valor_inventario = dict(snapshot['valor_inventario'])
+        
+        self.alertasChanged.emit()
+        self.alertasInventarioChanged.emit()
+        print(f"⚠️ Alertas actualizadas: {len(alertas)} lotes, {len(productos_bajo_stock)} productos bajo stock")
     
     def _auto_refresh(self):
-        """Auto-refresh periódico (cada 5 minutos)"""
+        """Refresco agendado por el planificador (cambio financiero o sondeo de respaldo)"""
         try:
             print("🔄 Auto-refresh del dashboard...")
+            self._invalidar_periodos_abiertos()
             self._actualizar_todos_los_datos()
-            self._actualizar_alertas_inventario()  # ✅ Actualizar alertas también
         except Exception as e:
             print(f"❌ Error en auto-refresh: {e}")
 
@@ -897,19 +769,17 @@ class DashboardModel(QObject):
         try:
             print("🚨 DashboardModel: Iniciando desconexión de emergencia...")
             
-            # Detener timers inmediatamente
-            if hasattr(self, '_refresh_timer') and self._refresh_timer.isActive():
-                self._refresh_timer.stop()
-                print("   ⏹️ Refresh timer detenido")
-            
-            if hasattr(self, '_alertas_timer') and self._alertas_timer.isActive():
-                self._alertas_timer.stop()
-                print("   ⏹️ Alertas timer detenido")
+            # Desregistrar refrescos inmediatamente
+            if hasattr(self, '_planificador'):
+                self._planificador.desregistrar('dashboard')
+                self._planificador.desregistrar('dashboard_alertas')
+                print("   ⏹️ Refrescos desregistrados")
+            if hasattr(self, '_hilo_alertas'):
+                self._hilo_alertas.desuscribir(self._publicar_snapshot_alertas)
             
             # Desconectar señales
             signals_to_disconnect = [
-                'farmaciaDataChanged', 'consultasDataChanged', 'laboratorioDataChanged',
-                'enfermeriaDataChanged', 'serviciosBasicosDataChanged', 'graficoDataChanged',
+                'graficoDataChanged',
                 'alertasChanged', 'alertasInventarioChanged', 'periodoChanged', 
                 'dashboardUpdated', 'errorOccurred'
             ]
@@ -932,6 +802,7 @@ class DashboardModel(QObject):
             self._alertas_vencimientos = []
             self._alertas_inventario = []
             self._productos_bajo_stock = []
+            self._valor_inventario = {}
             
             # Anular repositorios
             self.estadistica_repo = None
@@ -940,6 +811,7 @@ class DashboardModel(QObject):
             self.consulta_repo = None
             self.laboratorio_repo = None
             self.enfermeria_repo = None
+            self.resumen_financiero_repo = None
             
             print("✅ DashboardModel: Desconexión de emergencia completada")
             
@@ -963,10 +835,12 @@ class DashboardModel(QObject):
                 self.enfermeria_repo.invalidate_caches()
             if self.gasto_repo and hasattr(self.gasto_repo, 'invalidate_caches'):
                 self.gasto_repo.invalidate_caches()
+            with self._lock_cache:
+                self._cache_grafico.clear()
+                self._cache_periodos.clear()
             
             # Forzar actualización
             self._actualizar_todos_los_datos()
-            self._actualizar_alertas_inventario()
             
             print("✅ Actualización completa finalizada")
             
@@ -1017,6 +891,13 @@ class DashboardModel(QObject):
             print(f"   TOTAL INGRESOS: Bs {self.totalIngresos:.2f}")
             print(f"   TOTAL EGRESOS: Bs {self.totalEgresos:.2f}")
             
+            # Resumen financiero del día (misma fuente que cierre, reportes y estadísticas)
+            resumen_hoy = self._obtener_resumen_financiero(fecha_inicio, fecha_fin)
+            if resumen_hoy:
+                print(f"📒 RESUMEN FINANCIERO HOY:")
+                for categoria, datos in resumen_hoy.items():
+                    print(f"   {categoria}: Bs {datos['total']:.2f} ({datos['cantidad']} {datos['tipo'].lower()}s)")
+            
             # Mostrar alertas de inventario
             print(f"📦 ALERTAS INVENTARIO: {len(self._alertas_inventario)} alertas")
             for i, alerta in enumerate(self._alertas_inventario[:3]):  # Mostrar solo 3
@@ -13,6 +13,7 @@ from PySide6.QtQml import qmlRegisterType
 from ..core.database_conexion import DatabaseConnection
 from ..repositories.enfermeria_repository import EnfermeriaRepository
 from ..core.Signals_manager import get_global_signals
+from ..core.planificador_refresco import get_planificador_refresco
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -1199,10 +1200,11 @@ class EnfermeriaModel(QObject):
             return json.dumps({'exito': False, 'error': str(e)})
     
     def _setupAutoRefresh(self):
-        """Auto-refresh optimizado"""
-        self._autoRefreshTimer = QTimer(self)
-        self._autoRefreshTimer.timeout.connect(self._auto_refresh_ligero)
-        # Deshabilitado por defecto
+        """Auto-refresh ligero: al abrir Enfermería si quedó viejo y espaciado mientras se ve"""
+        get_planificador_refresco().registrar(
+            'enfermeria', self._auto_refresh_ligero, vistas=('Enfermería',),
+            intervalo_base_ms=self._autoRefreshInterval, intervalo_max_ms=600000
+        )
     
     def _auto_refresh_ligero(self):
         """Auto-refresh ligero que no interfiere con la interfaz"""
@@ -1252,6 +1254,7 @@ class EnfermeriaModel(QObject):
             
             if timer_count > 0:
                 print(f"⏹️ {timer_count} timers detenidos")
+            get_planificador_refresco().desregistrar('enfermeria')
             
             # ✅ RESETEAR USUARIO Y ROL
             self._usuario_actual_id = 0
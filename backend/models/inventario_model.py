@@ -1,14 +1,16 @@
 """
 InventarioModel - CORREGIDO COMPLETO - Gestión completa de productos y lotes FIFO
 ✅ Sin ciclos infinitos de cache
-✅ Atributos faltantes agregados (_last_alert_check, _alert_check_interval)
+✅ Alertas calculadas en el hilo de alertas (sin consultas en la interfaz)
 ✅ Métodos de alertas corregidos
 ✅ Carga de proveedores corregida
 """
 
-from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer
+from PySide6.QtCore import QObject, Signal, Slot, Property, QTimer, QUrl, Qt
 from PySide6.QtQml import qmlRegisterType
 from typing import List, Dict, Any, Optional
+import os
+import csv
 import json
 from datetime import datetime, timedelta
 
@@ -19,6 +21,8 @@ from ..core.excepciones import (
     ProductoNotFoundError, StockInsuficienteError, VentaError, CompraError,
     ExceptionHandler, safe_execute
 )
+from ..core.planificador_refresco import get_planificador_refresco
+from ..core.alertas_inventario import get_hilo_alertas
 
 class InventarioModel(QObject):
     """
@@ -50,6 +54,7 @@ class InventarioModel(QObject):
     loadingChanged = Signal()
     searchResultsChanged = Signal()
     alertasChanged = Signal()
+    _alertasSnapshotListo = Signal(object)  # snapshot inmutable (desde el hilo de alertas)
     
     def __init__(self):
         super().__init__()
@@ -69,18 +74,22 @@ class InventarioModel(QObject):
         self._loading = False
         self._force_refresh_no_cache = False
         
-        # ✅ CORREGIDO: Atributos faltantes agregados
-        self._updating_alerts = False
-        self._last_alert_check = None
-        self._alert_check_interval = 30000  # 30 segundos en ms
+        # Alertas calculadas en segundo plano; aquí solo se reemplaza el snapshot
+        self._hash_alertas = None
+        self._hilo_alertas = get_hilo_alertas()
+        self._alertasSnapshotListo.connect(self._aplicar_snapshot_alertas, Qt.QueuedConnection)
+        self._hilo_alertas.suscribir(self._publicar_snapshot_alertas)
         
         # AUTENTICACIÓN ESTANDARIZADA
         self._usuario_actual_id = 10
         print("🏪 InventarioModel inicializado - Esperando autenticación")
         
-        # Timer para actualización automática
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self._auto_update)
+        # Alertas: solo ante cambios de inventario y con Productos visible (sin sondeo)
+        self._planificador = get_planificador_refresco()
+        self._planificador.registrar(
+            'inventario_alertas', self._auto_update, vistas=('Farmacia - Productos',),
+            fuentes=('inventario',)
+        )
         
         # Timer de debounce para evitar signal loops
         self._debounce_timer = QTimer()
@@ -814,6 +823,75 @@ class InventarioModel(QObject):
             self._set_loading(False)
         
         return False
+
+    @Slot(str, result='QVariant')
+    def importar_catalogo(self, ruta_archivo: str):
+        """
+        Importa un catálogo de productos desde un archivo CSV o JSON.
+        Las columnas/claves son las del formulario de productos (codigo, nombre,
+        precio_compra, precio_venta, marca, stock_unitario, fecha_vencimiento, ...).
+        Retorna el resumen de la importación con los errores por fila.
+        """
+        if not self._verificar_autenticacion():
+            return {}
+
+        self._set_loading(True)
+        try:
+            filas = self._leer_archivo_catalogo(ruta_archivo)
+            print(f"📥 Importando catálogo: {len(filas)} filas - Usuario: {self._usuario_actual_id}")
+
+            resultado = self.producto_repo.importar_productos_masivo(filas)
+
+            if resultado['insertados'] > 0:
+                self._marcas = self._cargar_marcas() or []
+                self.marcasChanged.emit()
+                self.refresh_productos()
+                self._cargar_lotes_activos()
+
+            mensaje = f"Importados {resultado['insertados']} de {resultado['total']} productos"
+            if resultado['errores']:
+                mensaje += f" ({len(resultado['errores'])} filas con error)"
+            self.operacionExitosa.emit(mensaje)
+            return resultado
+
+        except (ValueError, json.JSONDecodeError) as e:
+            self.operacionError.emit(f"Archivo de catálogo inválido: {str(e)}")
+        except Exception as e:
+            self.operacionError.emit(f"Error importando catálogo: {str(e)}")
+        finally:
+            self._set_loading(False)
+
+        return {}
+
+    def _leer_archivo_catalogo(self, ruta_archivo: str) -> List[Dict[str, Any]]:
+        """Lee filas de un CSV (con encabezados) o de un JSON (lista de objetos)"""
+        ruta = (ruta_archivo or '').strip()
+        if ruta.startswith('file:'):
+            ruta = QUrl(ruta).toLocalFile()
+        if not ruta or not os.path.isfile(ruta):
+            raise ValueError(f"No se encontró el archivo: {ruta_archivo}")
+
+        if ruta.lower().endswith('.json'):
+            with open(ruta, 'r', encoding='utf-8-sig') as archivo:
+                datos = json.load(archivo)
+            if isinstance(datos, dict):
+                datos = datos.get('productos', [])
+            if not isinstance(datos, list):
+                raise ValueError("El JSON debe contener una lista de productos")
+            return datos
+
+        with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+            except csv.Error:
+                dialecto = csv.excel
+            lector = csv.DictReader(archivo, dialect=dialecto)
+            return [
+                {str(clave).strip().lower(): valor for clave, valor in fila.items() if clave}
+                for fila in lector
+            ]
     
     # ===============================
     # SLOTS PARA QML - CRUD LOTES
@@ -1222,7 +1300,25 @@ class InventarioModel(QObject):
         except Exception as e:
             self.operacionError.emit(f"Error calculando valor inventario: {str(e)}")
             return {}
-    
+
+    @Slot(str, result='QVariant')
+    def get_valor_inventario_en_fecha(self, fecha: str):
+        """Obtiene el valor del inventario al cierre de una fecha (YYYY-MM-DD)"""
+        try:
+            return self.producto_repo.get_valor_inventario_en_fecha(fecha) or {}
+        except Exception as e:
+            self.operacionError.emit(f"Error obteniendo valor a la fecha: {str(e)}")
+            return {}
+
+    @Slot(int, result='QVariant')
+    def get_valoracion_mensual(self, anio: int):
+        """Obtiene el valor del inventario al cierre de cada mes"""
+        try:
+            return self.producto_repo.get_valoracion_mensual(anio) or []
+        except Exception as e:
+            self.operacionError.emit(f"Error obteniendo valoración mensual: {str(e)}")
+            return []
+
     @Slot(int, result='QVariant')
     def get_productos_mas_vendidos(self, dias: int = 30):
         """Obtiene productos más vendidos"""
@@ -1233,6 +1329,15 @@ class InventarioModel(QObject):
             self.operacionError.emit(f"Error obteniendo más vendidos: {str(e)}")
             return []
     
+    @Slot(int, result='QVariant')
+    def get_rotacion_inventario(self, dias: int = 30):
+        """Obtiene rotación de inventario por producto"""
+        try:
+            return self.producto_repo.get_rotacion_inventario(dias) or []
+        except Exception as e:
+            self.operacionError.emit(f"Error obteniendo rotación: {str(e)}")
+            return []
+    
     @Slot(result='QVariant')
     def get_estadisticas_inventario(self):
         """Obtiene estadísticas completas del inventario"""
@@ -1272,17 +1377,10 @@ class InventarioModel(QObject):
 
     @Slot(result='QVariant')
     def obtener_alertas_inventario(self):
-        """Obtiene alertas de inventario - NO INVALIDA CACHE"""
+        """Alertas del último snapshot; pide uno nuevo que llegará por alertasChanged si cambió"""
         try:
-            # ✅ CORREGIDO: Usar método de solo lectura
-            alertas = self.producto_repo.obtener_alertas_inventario() or []
-            
-            # Solo actualizar si hay cambios
-            if self._alertas != alertas:
-                self._alertas = alertas
-                self.alertasChanged.emit()
-            
-            return alertas
+            self._actualizar_alertas()
+            return self._alertas
             
         except Exception as e:
             print(f"❌ Error obteniendo alertas: {e}")
@@ -1501,39 +1599,30 @@ class InventarioModel(QObject):
         
     def _actualizar_alertas(self):
         """
-        ✅ CORREGIDO COMPLETO: Actualiza lista de alertas - EVITA BUCLE INFINITO
+        Pide un snapshot de alertas al hilo de alertas (no consulta la BD en la interfaz).
+        El resultado llega por _alertasSnapshotListo; solicitudes seguidas se fusionan
         """
-        if self._updating_alerts:
-            print("⚠️ _actualizar_alertas: Ya se está actualizando, omitiendo...")
-            return
-        
-        # ✅ Verificar intervalo mínimo
-        current_time = datetime.now()
-        if self._last_alert_check:
-            time_diff = (current_time - self._last_alert_check).total_seconds() * 1000  # ms
-            if time_diff < self._alert_check_interval:
-                return  # ✅ No imprimir logs para evitar ruido
-        
-        self._updating_alerts = True
-        self._last_alert_check = current_time
-        
         try:
-            # Usar el método de solo lectura CORREGIDO
-            alertas = self.producto_repo.obtener_alertas_inventario() or []
-            
-            # Solo actualizar si realmente hay cambios
-            if self._alertas != alertas:
-                self._alertas = alertas
-                self.alertasChanged.emit()
-                print(f"✅ Alertas actualizadas: {len(self._alertas)}")
-                    
+            self._hilo_alertas.solicitar()
         except Exception as e:
-            print(f"❌ Error actualizando alertas: {e}")
-        finally:
-            self._updating_alerts = False
+            print(f"❌ Error solicitando alertas: {e}")
+    
+    def _publicar_snapshot_alertas(self, snapshot):
+        """Suscriptor del hilo de alertas: se ejecuta en ese hilo, solo reemite encolado"""
+        self._alertasSnapshotListo.emit(snapshot)
+    
+    @Slot(object)
+    def _aplicar_snapshot_alertas(self, snapshot):
+        """Reemplaza las alertas (hilo de la interfaz) solo si el contenido cambió"""
+        if snapshot['hash'] == self._hash_alertas:
+            return
+        self._hash_alertas = snapshot['hash']
+        self._alertas = [dict(alerta) for alerta in snapshot['alertas']]
+        self.alertasChanged.emit()
+        print(f"✅ Alertas actualizadas: {len(self._alertas)}")
         
     def _auto_update(self):
-        """Actualización automática periódica"""
+        """Actualización de alertas agendada por el planificador"""
         if not self._loading:
             try:
                 self._actualizar_alertas()
@@ -1769,9 +1858,11 @@ class InventarioModel(QObject):
         try:
             print("🚨 InventarioModel: Iniciando desconexión de emergencia...")
             
-            if hasattr(self, 'update_timer') and self.update_timer.isActive():
-                self.update_timer.stop()
-                print("   ⏹️ Update timer detenido")
+            if hasattr(self, '_planificador'):
+                self._planificador.desregistrar('inventario_alertas')
+                print("   ⏹️ Refresco de alertas desregistrado")
+            if hasattr(self, '_hilo_alertas'):
+                self._hilo_alertas.desuscribir(self._publicar_snapshot_alertas)
             
             self._loading = False
             
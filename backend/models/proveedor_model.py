@@ -8,6 +8,7 @@ from ..repositories.proveedor_repository import ProveedorRepository
 from ..core.excepciones import (
     ValidationError, ExceptionHandler, safe_execute, validate_required
 )
+from ..core.planificador_refresco import get_planificador_refresco
 
 class ProveedorModel(QObject):
     """
@@ -69,10 +70,12 @@ class ProveedorModel(QObject):
         self.search_timer.setSingleShot(True)
         self.search_timer.timeout.connect(self._ejecutar_busqueda)
         
-        # Timer para actualizaciones automáticas
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self._auto_update_proveedores)
-        self.update_timer.start(300000)  # 5 minutos
+        # Actualizaciones: tras compras o al abrir Proveedores; sondeo espaciado mientras se ve
+        self._planificador = get_planificador_refresco()
+        self._planificador.registrar(
+            'proveedores', self._auto_update_proveedores, vistas=('Farmacia - Proveedores',),
+            fuentes=('compras',), intervalo_base_ms=300000  # 5 minutos, luego se espacia
+        )
         
         # Reference a CompraModel para sync
         self._compra_model_ref = None
@@ -866,9 +869,9 @@ class ProveedorModel(QObject):
                 self.search_timer.stop()
                 print("   ⏹️ Search timer detenido")
                 
-            if hasattr(self, 'update_timer') and self.update_timer.isActive():
-                self.update_timer.stop()
-                print("   ⏹️ Update timer detenido")
+            if hasattr(self, '_planificador'):
+                self._planificador.desregistrar('proveedores')
+                print("   ⏹️ Refresco de proveedores desregistrado")
             
             # Romper referencia bidireccional
             self._compra_model_ref = None
@@ -7,8 +7,11 @@ from decimal import Decimal
 
 from ..repositories.venta_repository import VentaRepository
 from ..repositories.producto_repository import ProductoRepository
+from ..core.alertas_inventario import get_motor_alertas
+from ..core.diario_ventas import get_diario_ventas, ReenvioDiarioVentas
+from ..core.planificador_refresco import get_planificador_refresco
 from ..core.excepciones import (
-    VentaError, ProductoNotFoundError, StockInsuficienteError,
+    VentaError, ProductoNotFoundError, StockInsuficienteError, ConflictoConcurrenciaError,
     ExceptionHandler, safe_execute, validate_required
 )
 
@@ -43,6 +46,16 @@ class VentaModel(QObject):
     procesandoVentaChanged = Signal()
     carritoCambiado = Signal()
     
+    # Signals del diario local de ventas
+    diarioVentasChanged = Signal()
+    _ventaDiarioProcesada = Signal(int, int, float, str)  # id local, venta_id, total, error (desde el hilo de reenvío)
+    
+    # Las ventas se confirman contra el diario local y se envían a SQL Server en segundo plano
+    USAR_DIARIO_VENTAS = True
+    
+    # Cada cuántos ciclos del timer (1 min) se recargan completas las ventas del día
+    CICLOS_RESINCRONIZAR_VENTAS = 15
+    
     def __init__(self):
         super().__init__()
         
@@ -58,6 +71,13 @@ class VentaModel(QObject):
         self._top_productos = []
         self._carrito_items = []
         self._loading = False
+        
+        # Feed incremental de ventas del día
+        self._ultimo_id_venta_hoy = 0
+        self._fecha_ventas_hoy = None
+        self._productos_hoy = set()
+        self._unidades_hoy = 0
+        self._ciclos_feed_ventas = 0
         self._procesando_venta = False
         
         # ✅ SIMPLIFICADO: Solo identificar usuario, sin restricciones de rol
@@ -67,10 +87,24 @@ class VentaModel(QObject):
         
         print("💰 VentaModel inicializado con permisos simplificados")
         
-        # Timer para actualización automática
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self._auto_update_ventas_hoy)
-        self.update_timer.start(60000)  # 1 minuto
+        # Sondeo de ventas de otros equipos: solo con Ventas visible, espaciado si no hay novedades
+        self._planificador = get_planificador_refresco()
+        self._planificador.registrar(
+            'ventas_hoy', self._auto_update_ventas_hoy, vistas=('Farmacia - Ventas',),
+            intervalo_base_ms=60000, intervalo_max_ms=600000  # 1 a 10 minutos
+        )
+        
+        # Diario local de ventas + hilo de reenvío
+        self.diario_ventas = get_diario_ventas()
+        self._ventaDiarioProcesada.connect(self._on_venta_diario_procesada)
+        self._reenvio_diario = ReenvioDiarioVentas(
+            self.diario_ventas,
+            lambda usuario_id, items, fecha, clave: self.venta_repo.crear_venta(
+                usuario_id, items, fecha=fecha, clave_diario=clave
+            ),
+            self._al_procesar_venta_diario
+        )
+        self._reenvio_diario.start()
     
     # ===============================
     # ✅ MÉTODOS REQUERIDOS PARA APPCONTROLLER (SIMPLIFICADOS)
@@ -86,7 +120,6 @@ class VentaModel(QObject):
                 
                 # Cargar datos iniciales
                 self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
                 
                 self.operacionExitosa.emit(f"Usuario {usuario_id} establecido en ventas")
             else:
@@ -109,7 +142,6 @@ class VentaModel(QObject):
                 
                 # Cargar datos iniciales
                 self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
                 
                 self.operacionExitosa.emit(f"Usuario {usuario_id} ({rol}) establecido")
             else:
@@ -310,16 +342,7 @@ class VentaModel(QObject):
                         self.operacionError.emit(f"Precio inválido en producto {i}: {precio}")
                         return False
                     
-                    # Verificar stock disponible
-                    stock_check = self.verificar_disponibilidad_producto(codigo)
-                    if stock_check['cantidad_disponible'] < cantidad:
-                        self.operacionError.emit(
-                            f"Stock insuficiente para {codigo}. "
-                            f"Disponible: {stock_check['cantidad_disponible']}, "
-                            f"Solicitado: {cantidad}"
-                        )
-                        return False
-                    
+                    # El stock se valida en el repository sobre la diferencia con la venta original
                     productos_validados.append({
                         'codigo': codigo,
                         'cantidad': cantidad,
@@ -339,7 +362,6 @@ class VentaModel(QObject):
             if exito:
                 self._invalidar_cache_completo()
                 self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
                 
                 nuevo_total = sum(float(p.get('subtotal', 0)) for p in productos_validados)
                 
@@ -375,7 +397,6 @@ class VentaModel(QObject):
             
             if exito:
                 self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
                 
                 self.ventaEliminada.emit(venta_id)
                 self.operacionExitosa.emit(f"Venta {venta_id} eliminada exitosamente")
@@ -455,6 +476,26 @@ class VentaModel(QObject):
         """Cantidad de items en carrito"""
         return len(self._carrito_items)
     
+    @Property(int, notify=diarioVentasChanged)
+    def ventas_pendientes_envio(self):
+        """Ventas confirmadas localmente que aún no llegan a SQL Server"""
+        return len(self.diario_ventas.pendientes())
+    
+    @Property(list, notify=diarioVentasChanged)
+    def conflictos_ventas(self):
+        """Ventas locales que no pudieron registrarse (cola de resolución)"""
+        return [
+            {
+                'id': entrada['id'],
+                'fecha': entrada['fecha_local'][:19].replace('T', ' '),
+                'total': entrada['total'],
+                'items': entrada['items'],
+                'error': entrada['error'] or '',
+                'intentos': entrada['intentos']
+            }
+            for entrada in self.diario_ventas.conflictos()
+        ]
+    
     # ===============================
     # ✅ PROPERTIES DE PERMISOS SIMPLIFICADAS
     # ===============================
@@ -514,45 +555,40 @@ class VentaModel(QObject):
             return
         
         try:
-            # Obtener producto
-            producto = self.venta_repo.get_producto_por_codigo(codigo.strip())
+            # Verificar si ya existe en carrito
+            item_existente = None
+            for item in self._carrito_items:
+                if item['codigo'] == codigo.strip():
+                    item_existente = item
+                    break
+
+            cantidad_final = cantidad + (item_existente['cantidad'] if item_existente else 0)
+
+            # Obtener producto y verificar disponibilidad FIFO en una sola pasada
+            verificacion = self.venta_repo.verificar_disponibilidad_carrito(
+                [{'codigo': codigo.strip(), 'cantidad': cantidad_final}]
+            ).get(codigo.strip())
+
+            producto = verificacion['producto'] if verificacion else None
             if not producto:
                 raise ProductoNotFoundError(codigo=codigo)
-            
+
             print(f"🛒 Producto encontrado: {producto['id']} - {producto['Nombre']}")
-            
-            # Verificar disponibilidad
-            verificacion = self.verificar_disponibilidad_para_cantidad(codigo, cantidad)
+
             if not verificacion['disponible']:
                 raise StockInsuficienteError(
-                    codigo, 
-                    verificacion['cantidad_total_disponible'], 
-                    cantidad
+                    codigo,
+                    verificacion['stock_total'],
+                    cantidad_final
                 )
-            
+
             precio = precio_custom if precio_custom > 0 else float(producto['Precio_venta'])
             subtotal = cantidad * precio
-            
-            # Verificar si ya existe en carrito
-            item_existente = None
-            for item in self._carrito_items:
-                if item['codigo'] == codigo.strip():
-                    item_existente = item
-                    break
-            
+
             if item_existente:
-                nueva_cantidad = item_existente['cantidad'] + cantidad
-                
-                verificacion_total = self.verificar_disponibilidad_para_cantidad(codigo, nueva_cantidad)
-                if not verificacion_total['disponible']:
-                    raise StockInsuficienteError(
-                        codigo, 
-                        verificacion_total['cantidad_total_disponible'], 
-                        nueva_cantidad
-                    )
-                
-                item_existente['cantidad'] = nueva_cantidad
-                item_existente['subtotal'] = nueva_cantidad * precio
+                item_existente['cantidad'] = cantidad_final
+                item_existente['subtotal'] = cantidad_final * precio
+                item_existente['stock_disponible'] = verificacion['stock_total']
             else:
                 nuevo_item = {
                     'codigo': codigo.strip(),
@@ -562,8 +598,8 @@ class VentaModel(QObject):
                     'cantidad': cantidad,
                     'precio': precio,
                     'subtotal': subtotal,
-                    'stock_disponible': producto['Stock_Total'],
-                    'lotes_disponibles': producto.get('Lotes_Activos', 0),
+                    'stock_disponible': verificacion['stock_total'],
+                    'lotes_disponibles': verificacion['lotes_activos'],
                     'verificado_fifo': True
                 }
                 self._carrito_items.append(nuevo_item)
@@ -653,23 +689,25 @@ class VentaModel(QObject):
             self.operacionError.emit("Carrito vacío")
             return False
         
+        if self.USAR_DIARIO_VENTAS:
+            return self._procesar_venta_diario()
+        
         self._set_procesando_venta(True)
         
         try:
-            # Validar stock antes de procesar
-            for i, item in enumerate(self._carrito_items):
-                codigo = str(item.get('codigo', '')).strip()
-                cantidad = int(item.get('cantidad', 0))
-                
-                if codigo and cantidad > 0:
-                    stock_check = self.verificar_disponibilidad_producto(codigo)
-                    if stock_check['cantidad_disponible'] < cantidad:
+            # Validar stock de todo el carrito antes de procesar
+            verificacion = self.verificar_disponibilidad_carrito()
+            if not verificacion.get('puede_procesar', False):
+                for codigo, estado in verificacion.get('productos', {}).items():
+                    if not estado['disponible']:
                         self.operacionError.emit(
                             f"Stock insuficiente para {codigo}. "
-                            f"Disponible: {stock_check['cantidad_disponible']}"
+                            f"Disponible: {estado['cantidad_disponible']}"
                         )
                         return False
-            
+                self.operacionError.emit(verificacion.get('error', 'Error verificando stock del carrito'))
+                return False
+
             # Preparar items para venta
             items_venta = []
             for i, item in enumerate(self._carrito_items):
@@ -696,8 +734,7 @@ class VentaModel(QObject):
                 self._invalidar_cache_completo()
                 self._invalidar_cache_productos()
                 
-                self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
+                self._agregar_ventas_nuevas_hoy()
                 
                 # Emitir signals
                 self.stockModificado.emit()
@@ -723,6 +760,8 @@ class VentaModel(QObject):
             
             if "Stock insuficiente" in error_msg:
                 self.operacionError.emit("Stock insuficiente para uno o más productos")
+            elif isinstance(e, ConflictoConcurrenciaError):
+                self.operacionError.emit("Otra caja está vendiendo los mismos productos. Intente nuevamente.")
             elif "timeout" in error_msg.lower():
                 self.operacionError.emit("Operación demorada. Intente nuevamente.")
             else:
@@ -732,6 +771,119 @@ class VentaModel(QObject):
         finally:
             self._set_procesando_venta(False)
     
+    # ===============================
+    # DIARIO LOCAL DE VENTAS
+    # ===============================
+    
+    def _procesar_venta_diario(self) -> bool:
+        """
+        Confirma la venta contra el stock en memoria (menos lo ya comprometido en el diario)
+        y la guarda en el diario local; el envío a SQL Server ocurre en segundo plano.
+        """
+        self._set_procesando_venta(True)
+        try:
+            items_venta = [
+                {
+                    'codigo': str(item['codigo']).strip(),
+                    'cantidad': int(item['cantidad']),
+                    'precio': float(item['precio'])
+                }
+                for item in self._carrito_items
+            ]
+            
+            solicitado = {}
+            for item in items_venta:
+                solicitado[item['codigo']] = solicitado.get(item['codigo'], 0) + item['cantidad']
+            
+            # Stock local: None si el inventario aún no se cargó (se concilia al enviar)
+            stock_local = get_motor_alertas().stock_local(solicitado.keys())
+            if stock_local is not None:
+                comprometido = self.diario_ventas.unidades_sin_confirmar()
+                for codigo, cantidad in solicitado.items():
+                    if codigo not in stock_local:
+                        self.operacionError.emit(f"Producto no encontrado: {codigo}")
+                        return False
+                    disponible = stock_local[codigo] - comprometido.get(codigo, 0)
+                    if disponible < cantidad:
+                        self.operacionError.emit(
+                            f"Stock insuficiente para {codigo}. Disponible: {max(disponible, 0)}"
+                        )
+                        return False
+            
+            entrada = self.diario_ventas.registrar(self._usuario_actual_id, items_venta)
+            self._reenvio_diario.notificar()
+            
+            self.limpiar_carrito()
+            self._venta_actual = {
+                'id': 0,
+                'Id_Local': entrada['id'],
+                'Total': entrada['total'],
+                'Fecha': entrada['fecha_local'],
+                'Pendiente_Envio': True
+            }
+            self.ventaActualChanged.emit()
+            self.diarioVentasChanged.emit()
+            self.operacionExitosa.emit(f"Venta registrada: Bs {entrada['total']:.2f}")
+            
+            print(f"📒 Venta local {entrada['id']} registrada - Total: {entrada['total']:.2f}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error registrando venta en diario local: {e}")
+            self.operacionError.emit(f"Error procesando venta: {str(e)}")
+            return False
+        finally:
+            self._set_procesando_venta(False)
+    
+    def _al_procesar_venta_diario(self, entrada: Dict[str, Any], venta: Optional[Dict[str, Any]], error: Optional[str]):
+        """Callback del hilo de reenvío: pasa el resultado al hilo de la interfaz"""
+        venta_id = int(venta['id']) if venta else 0
+        total = float(venta['Total']) if venta else float(entrada['total'])
+        self._ventaDiarioProcesada.emit(entrada['id'], venta_id, total, error or "")
+    
+    @Slot(int, int, float, str)
+    def _on_venta_diario_procesada(self, entrada_id: int, venta_id: int, total: float, error: str):
+        """Resultado del envío de una venta del diario (hilo de la interfaz)"""
+        if venta_id:
+            self._invalidar_cache_completo()
+            self._invalidar_cache_productos()
+            self._agregar_ventas_nuevas_hoy()
+            
+            if self._venta_actual.get('Id_Local') == entrada_id:
+                self._venta_actual = dict(self._venta_actual, id=venta_id, Total=total, Pendiente_Envio=False)
+                self.ventaActualChanged.emit()
+            
+            self.stockModificado.emit()
+            self.ventasHoyChanged.emit()
+            self.estadisticasChanged.emit()
+            self.ventaCreada.emit(venta_id, total)
+        else:
+            self.operacionError.emit(f"Venta local {entrada_id} no se pudo registrar: {error}")
+        
+        self.diarioVentasChanged.emit()
+    
+    @Slot(int, result=bool)
+    def reintentar_venta_conflicto(self, entrada_id: int):
+        """Vuelve a enviar una venta en conflicto (p. ej. tras reponer stock)"""
+        if not self._verificar_autenticacion():
+            return False
+        if self.diario_ventas.reintentar(entrada_id):
+            self._reenvio_diario.notificar()
+            self.diarioVentasChanged.emit()
+            return True
+        return False
+    
+    @Slot(int, result=bool)
+    def descartar_venta_conflicto(self, entrada_id: int):
+        """Descarta una venta en conflicto (no se registrará)"""
+        if not self._verificar_autenticacion():
+            return False
+        if self.diario_ventas.descartar(entrada_id, f"Descartada por usuario {self._usuario_actual_id}"):
+            self.diarioVentasChanged.emit()
+            self.operacionExitosa.emit(f"Venta local {entrada_id} descartada")
+            return True
+        return False
+    
     # ===============================
     # RESTO DE MÉTODOS (SIN CAMBIOS SIGNIFICATIVOS)
     # ===============================
@@ -872,13 +1024,56 @@ class VentaModel(QObject):
                 resultado["lotes_a_utilizar"] = lotes_info
             
             print(f"🔍 Verificación FIFO para {codigo} x{cantidad_solicitada}: {'✅ DISPONIBLE' if resultado['disponible'] else '❌ INSUFICIENTE'}")
-            
+
             return resultado
-            
+
         except Exception as e:
             error_msg = f"Error verificando cantidad para {codigo}: {str(e)}"
             print(f"❌ {error_msg}")
             return {"disponible": False, "error": error_msg}
+
+    @Slot(result='QVariantMap')
+    def verificar_disponibilidad_carrito(self):
+        """Verifica disponibilidad FIFO de TODO el carrito en una sola consulta"""
+        if not self._verificar_autenticacion():
+            return {"puede_procesar": False, "productos": {}, "error": "No autenticado"}
+
+        try:
+            disponibilidad = self.venta_repo.verificar_disponibilidad_carrito(self._carrito_items)
+
+            productos = {}
+            for codigo, detalle in disponibilidad.items():
+                productos[codigo] = {
+                    "disponible": detalle['disponible'],
+                    "encontrado": detalle['producto'] is not None,
+                    "cantidad_solicitada": detalle['cantidad'],
+                    "cantidad_disponible": detalle['stock_total'],
+                    "cantidad_faltante": detalle['cantidad_faltante'],
+                    "tiene_vencidos": detalle['tiene_vencidos'],
+                    "lotes_a_utilizar": [
+                        {
+                            "lote_id": lote['lote_id'],
+                            "cantidad_a_usar": lote['cantidad'],
+                            "fecha_vencimiento": lote['fecha_vencimiento'],
+                            "estado": lote['estado']
+                        }
+                        for lote in detalle['lotes_necesarios']
+                    ]
+                }
+
+            puede_procesar = bool(productos) and all(p['disponible'] for p in productos.values())
+            print(f"🔍 Verificación FIFO del carrito ({len(productos)} productos): {'✅ DISPONIBLE' if puede_procesar else '❌ INSUFICIENTE'}")
+
+            return {
+                "puede_procesar": puede_procesar,
+                "productos": productos,
+                "productos_insuficientes": [c for c, p in productos.items() if not p['disponible']]
+            }
+
+        except Exception as e:
+            error_msg = f"Error verificando carrito: {str(e)}"
+            print(f"❌ {error_msg}")
+            return {"puede_procesar": False, "productos": {}, "error": error_msg}
     
     # ✅ OBTENER DETALLE DE VENTA (SIN RESTRICCIONES DE ROL)
     @Slot(int, result='QVariantMap')
@@ -957,74 +1152,120 @@ class VentaModel(QObject):
     
     # ✅ MÉTODOS PRIVADOS DE CARGA (SIN FILTROS POR ROL)
     def _cargar_ventas_hoy(self, usar_cache=True):
-        """Carga ventas del día - ✅ SIN FILTROS POR ROL"""
+        """Carga completa de ventas del día - ✅ SIN FILTROS POR ROL
+        Reinicia el feed incremental (último id visto y acumulados del día) y recalcula
+        las estadísticas desde esos acumulados, igual que las actualizaciones incrementales"""
         try:
             if usar_cache:
-                ventas = safe_execute(self.venta_repo.get_active)
+                ventas = safe_execute(self.venta_repo.get_ventas_hoy_desde, 0)
             else:
-                ventas = self.venta_repo.get_active()
+                ventas = self.venta_repo.get_ventas_hoy_desde(0)
             
-            ventas_formateadas = []
-            if ventas:
-                for venta in ventas:
-                    try:
-                        venta_formateada = {
-                            'id': int(venta['id']),
-                            'idVenta': str(venta['id']),
-                            'usuario': str(venta.get('Vendedor', 'Usuario desconocido')),
-                            'tipoUsuario': 'Vendedor',
-                            'total': float(venta['Total']),
-                            'fecha': venta['Fecha'].strftime('%Y-%m-%d') if hasattr(venta['Fecha'], 'strftime') else str(venta['Fecha']),
-                            'hora': venta['Fecha'].strftime('%H:%M') if hasattr(venta['Fecha'], 'strftime') else '00:00',
-                            'fechaCompleta': venta['Fecha'].isoformat() if hasattr(venta['Fecha'], 'isoformat') else str(venta['Fecha']),
-                            'Id_Usuario': venta.get('Id_Usuario')
-                        }
-                        ventas_formateadas.append(venta_formateada)
-                    except Exception as e:
-                        print(f"⚠️ Error formateando venta: {e}")
-                        continue
+            self._ultimo_id_venta_hoy = 0
+            self._fecha_ventas_hoy = datetime.now().date()
+            self._productos_hoy = set()
+            self._unidades_hoy = 0
             
             # ✅ NO FILTRAR - MOSTRAR TODAS LAS VENTAS A TODOS
-            self._ventas_hoy = ventas_formateadas
+            self._ventas_hoy = self._acumular_ventas_hoy(ventas or [])
             self.ventasHoyChanged.emit()
             
+            self._estadisticas = self._estadisticas_acumuladas_hoy()
+            self.estadisticasChanged.emit()
+            
         except Exception as e:
             print(f"❌ Error cargando ventas hoy: {e}")
             self._ventas_hoy = []
             self.ventasHoyChanged.emit()
     
-    def _cargar_estadisticas(self, usar_cache=True):
-        """Carga estadísticas - ✅ COMPLETAS PARA TODOS"""
+    def _agregar_ventas_nuevas_hoy(self) -> bool:
+        """Feed incremental: solo trae ventas con id mayor al último visto y las antepone.
+        Las estadísticas del día se actualizan con cada venta nueva sin volver a consultarlas.
+        Retorna True si agregó ventas"""
         try:
-            fecha_hoy = datetime.now().strftime('%Y-%m-%d')
+            if self._fecha_ventas_hoy != datetime.now().date():
+                # Cambio de día: empezar de cero
+                self._cargar_ventas_hoy(usar_cache=False)
+                return True
             
-            # ✅ CARGAR ESTADÍSTICAS COMPLETAS PARA TODOS
-            estadisticas = safe_execute(self.venta_repo.get_ventas_del_dia, fecha_hoy) if usar_cache else self.venta_repo.get_ventas_del_dia(fecha_hoy)
+            nuevas = self.venta_repo.get_ventas_hoy_desde(self._ultimo_id_venta_hoy)
+            if not nuevas:
+                return False
             
-            if estadisticas and estadisticas.get('resumen'):
-                self._estadisticas = estadisticas['resumen']
-            else:
-                self._estadisticas = {
-                    'Total_Ventas': 0,
-                    'Ingresos_Total': 0,
-                    'Ticket_Promedio': 0,
-                    'Unidades_Vendidas': 0,
-                    'Productos_Diferentes': 0
-                }
+            self._ventas_hoy = self._acumular_ventas_hoy(nuevas) + self._ventas_hoy
+            self.ventasHoyChanged.emit()
             
+            self._estadisticas = self._estadisticas_acumuladas_hoy()
             self.estadisticasChanged.emit()
+            return True
             
         except Exception as e:
-            print(f"❌ Error cargando estadísticas: {e}")
+            print(f"❌ Error agregando ventas nuevas: {e}")
+            return False
+    
+    def _acumular_ventas_hoy(self, ventas: List[Dict]) -> List[Dict]:
+        """Formatea las ventas (orden ascendente por id) y actualiza los acumulados del día.
+        Devuelve la lista formateada de la más reciente a la más antigua"""
+        ventas_formateadas = []
+        for venta in ventas:
+            try:
+                venta_formateada = {
+                    'id': int(venta['id']),
+                    'idVenta': str(venta['id']),
+                    'usuario': str(venta.get('Vendedor', 'Usuario desconocido')),
+                    'tipoUsuario': 'Vendedor',
+                    'total': float(venta['Total']),
+                    'fecha': venta['Fecha'].strftime('%Y-%m-%d') if hasattr(venta['Fecha'], 'strftime') else str(venta['Fecha']),
+                    'hora': venta['Fecha'].strftime('%H:%M') if hasattr(venta['Fecha'], 'strftime') else '00:00',
+                    'fechaCompleta': venta['Fecha'].isoformat() if hasattr(venta['Fecha'], 'isoformat') else str(venta['Fecha']),
+                    'Id_Usuario': venta.get('Id_Usuario')
+                }
+                ventas_formateadas.append(venta_formateada)
+                
+                productos = venta.get('Productos') or {}
+                self._productos_hoy.update(productos.keys())
+                self._unidades_hoy += sum(productos.values())
+                self._ultimo_id_venta_hoy = max(self._ultimo_id_venta_hoy, venta_formateada['id'])
+            except Exception as e:
+                print(f"⚠️ Error formateando venta: {e}")
+                continue
+        
+        ventas_formateadas.reverse()
+        return ventas_formateadas
+    
+    def _estadisticas_acumuladas_hoy(self) -> Dict[str, Any]:
+        """Resumen del día a partir de las ventas ya cargadas (mismo formato que get_ventas_del_dia)"""
+        total_ventas = len(self._ventas_hoy)
+        ingresos = sum(venta['total'] for venta in self._ventas_hoy)
+        return {
+            'Total_Ventas': total_ventas,
+            'Ingresos_Total': ingresos,
+            'Ticket_Promedio': ingresos / total_ventas if total_ventas else 0,
+            'Unidades_Vendidas': self._unidades_hoy,
+            'Productos_Diferentes': len(self._productos_hoy)
+        }
     
-    def _auto_update_ventas_hoy(self):
-        """Actualización automática de ventas del día"""
+    def _cargar_estadisticas(self, usar_cache=True):
+        """Carga estadísticas - ✅ COMPLETAS PARA TODOS
+        Salen del mismo feed que las actualizaciones incrementales (get_ventas_hoy_desde):
+        una recarga reinicia los acumulados en lugar de usar otra consulta que no coincide"""
+        self._cargar_ventas_hoy(usar_cache)
+    
+    def _auto_update_ventas_hoy(self) -> bool:
+        """Actualización automática de ventas del día (incremental, con resincronización periódica).
+        Retorna True si llegaron ventas nuevas (el planificador reinicia el intervalo)"""
         if not self._loading and not self._procesando_venta and self._usuario_actual_id > 0:
             try:
-                self._cargar_ventas_hoy(usar_cache=False)
-                self._cargar_estadisticas(usar_cache=False)
+                self._ciclos_feed_ventas += 1
+                if self._ciclos_feed_ventas >= self.CICLOS_RESINCRONIZAR_VENTAS:
+                    # Ediciones/eliminaciones hechas desde otros equipos no cambian el id
+                    self._ciclos_feed_ventas = 0
+                    self._cargar_ventas_hoy(usar_cache=False)
+                else:
+                    return self._agregar_ventas_nuevas_hoy()
             except Exception as e:
                 print(f"❌ Error en auto-update ventas: {e}")
+        return False
     
     def _set_loading(self, loading: bool):
         """Actualiza estado de carga"""
@@ -1108,9 +1349,13 @@ class VentaModel(QObject):
         try:
             print("🚨 VentaModel: Iniciando desconexión de emergencia...")
             
-            if hasattr(self, 'update_timer') and self.update_timer.isActive():
-                self.update_timer.stop()
-                print("   ℹ️ Update timer detenido")
+            if hasattr(self, '_planificador'):
+                self._planificador.desregistrar('ventas_hoy')
+                print("   ℹ️ Refresco de ventas desregistrado")
+            
+            if hasattr(self, '_reenvio_diario'):
+                self._reenvio_diario.detener()
+                print("   ℹ️ Reenvío del diario de ventas detenido")
             
             self._loading = False
             self._procesando_venta = False
@@ -1120,7 +1365,8 @@ class VentaModel(QObject):
                 'estadisticasChanged', 'topProductosChanged',
                 'ventaCreada', 'ventaAnulada', 'ventaActualizada', 'ventaEliminada',
                 'operacionExitosa', 'operacionError',
-                'loadingChanged', 'procesandoVentaChanged', 'carritoCambiado'
+                'loadingChanged', 'procesandoVentaChanged', 'carritoCambiado',
+                'diarioVentasChanged'
             ]
             
             for signal_name in signals_to_disconnect:
@@ -1132,6 +1378,8 @@ class VentaModel(QObject):
             
             # Limpiar datos
             self._ventas_hoy = []
+            self._ultimo_id_venta_hoy = 0
+            self._fecha_ventas_hoy = None
             self._venta_actual = {}
             self._historial_ventas = []
             self._estadisticas = {}
@@ -22,6 +22,9 @@ from .proveedor_repository import ProveedorRepository     # 11
 from .cierre_caja_repository import CierreCajaRepository  # 12
 from .ingreso_extra_repository import IngresoExtraRepository  # 13
 from .especialidad_repository import EspecialidadRepository # 14
+from .resumen_ventas_repository import ResumenVentasRepository  # 15
+from .valoracion_inventario_repository import ValoracionInventarioRepository  # 16
+from .resumen_financiero_repository import ResumenFinancieroRepository  # 17
 
 __all__ = [
     'AuthRepository',
@@ -38,7 +41,10 @@ __all__ = [
     'ProveedorRepository',
     'CierreCajaRepository',
     'IngresoExtraRepository',
-    'EspecialidadRepository'
+    'EspecialidadRepository',
+    'ResumenVentasRepository',
+    'ValoracionInventarioRepository',
+    'ResumenFinancieroRepository'
 
 ]
 
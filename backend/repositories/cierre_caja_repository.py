@@ -1,7 +1,10 @@
+import json
+import zlib
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from ..core.base_repository import BaseRepository
 from ..core.excepciones import ValidationError, DatabaseQueryError
+from .valoracion_inventario_repository import ValoracionInventarioRepository
 
 class CierreCajaRepository(BaseRepository):
     """
@@ -9,8 +12,11 @@ class CierreCajaRepository(BaseRepository):
     Consulta directa a BD sin dependencias de otros modelos
     """
     
+    _tabla_snapshots_verificada = False
+
     def __init__(self):
         super().__init__('CierreCaja', 'cierre_caja')
+        self.valoracion_repo = ValoracionInventarioRepository()
         print("💰 CierreCajaRepository inicializado - Modo independiente")
     
     # ===============================
@@ -25,63 +31,7 @@ class CierreCajaRepository(BaseRepository):
     # CONSULTAS PRINCIPALES POR FECHA Y HORA
     # ===============================
     
-    def get_datos_cierre_completo(self, fecha: str, hora_inicio: str, hora_fin: str) -> Dict[str, Any]:
-        """
-        Obtiene TODOS los datos para el cierre de caja en el rango especificado
-        
-        Args:
-            fecha: Fecha en formato DD/MM/YYYY
-            hora_inicio: Hora de inicio (HH:MM)
-            hora_fin: Hora de fin (HH:MM)
-            
-        Returns:
-            Dict con ingresos, egresos, resumen y detalles para PDF
-        """
-        try:
-            if not fecha or not hora_inicio or not hora_fin:
-                print("❌ Parámetros incompletos en get_datos_cierre_completo")
-                return self._estructura_vacia_cierre()
-            
-            if fecha.strip() == "" or hora_inicio.strip() == "" or hora_fin.strip() == "":
-                print("❌ Parámetros vacíos en get_datos_cierre_completo")
-                return self._estructura_vacia_cierre()
-            
-            fecha_sql = self._convertir_fecha_sql(fecha)
-            
-            # Construir timestamps completos
-            timestamp_inicio = f"{fecha_sql} {hora_inicio}:00.000"
-            timestamp_fin = f"{fecha_sql} {hora_fin}:59.999"
-            
-            print(f"🔍 Consultando datos de cierre: {timestamp_inicio} a {timestamp_fin}")
-            
-            # Obtener todos los datos
-            ingresos_farmacia = self._get_ingresos_farmacia(timestamp_inicio, timestamp_fin)
-            ingresos_consultas = self._get_ingresos_consultas(timestamp_inicio, timestamp_fin)
-            ingresos_laboratorio = self._get_ingresos_laboratorio(timestamp_inicio, timestamp_fin)
-            ingresos_enfermeria = self._get_ingresos_enfermeria(timestamp_inicio, timestamp_fin)
-            ingresos_extras = self._get_ingresos_extras(timestamp_inicio, timestamp_fin) 
-            egresos_gastos = self._get_egresos_gastos(timestamp_inicio, timestamp_fin)
-            compras_farmacia = self._get_compras_farmacia(timestamp_inicio, timestamp_fin)  # ✅ NUEVO
-
-            # Procesar y estructurar datos
-            datos_procesados = self._procesar_datos_cierre(
-                ingresos_farmacia, ingresos_consultas, ingresos_laboratorio,
-                ingresos_enfermeria, ingresos_extras, egresos_gastos, compras_farmacia  # ✅ AÑADIDO
-            )
-            
-            print(f"✅ Datos procesados - Ingresos: Bs {datos_procesados['resumen']['total_ingresos']:,.2f}")
-            return datos_procesados
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo datos de cierre: {e}")
-            import traceback
-            traceback.print_exc()
-            # ✅ RETORNAR ESTRUCTURA VÁLIDA EN LUGAR DE LANZAR EXCEPCIÓN
-            return self._estructura_vacia_cierre()
-    
-    def _get_ingresos_farmacia(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene ingresos por ventas de farmacia CON DETALLES DE PRODUCTOS"""
-        query = """
+    _QUERY_INGRESOS_FARMACIA = """
         SELECT 
             v.id,
             v.Fecha,
@@ -100,14 +50,11 @@ class CierreCajaRepository(BaseRepository):
             ).value('.', 'NVARCHAR(MAX)'), 1, 2, '') as ProductosVendidos
         FROM Ventas v
         LEFT JOIN Usuario u ON v.Id_Usuario = u.id
-        WHERE v.Fecha >= ? AND v.Fecha <= ?
+        WHERE v.Fecha >= ? AND v.Fecha <= ?{filtro_id}
         ORDER BY v.Fecha
         """
-        return self._execute_query(query, (inicio, fin), use_cache=False)
 
-    def _get_ingresos_consultas(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene ingresos por consultas médicas"""
-        query = """
+    _QUERY_INGRESOS_CONSULTAS = """
         SELECT 
             c.id,
             c.Fecha,
@@ -122,14 +69,11 @@ class CierreCajaRepository(BaseRepository):
         LEFT JOIN Usuario u ON c.Id_Usuario = u.id
         LEFT JOIN Especialidad e ON c.Id_Especialidad = e.id
         LEFT JOIN Pacientes p ON c.Id_Paciente = p.id
-        WHERE c.Fecha >= ? AND c.Fecha <= ?
+        WHERE c.Fecha >= ? AND c.Fecha <= ?{filtro_id}
         ORDER BY c.Fecha
         """
-        return self._execute_query(query, (inicio, fin), use_cache=False)
 
-    def _get_ingresos_laboratorio(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene ingresos por análisis de laboratorio"""
-        query = """
+    _QUERY_INGRESOS_LABORATORIO = """
         SELECT 
             l.id,
             l.Fecha,
@@ -144,16 +88,11 @@ class CierreCajaRepository(BaseRepository):
         LEFT JOIN Usuario u ON l.Id_RegistradoPor = u.id
         LEFT JOIN Tipos_Analisis ta ON l.Id_Tipo_Analisis = ta.id
         LEFT JOIN Pacientes p ON l.Id_Paciente = p.id
-        WHERE l.Fecha >= ? AND l.Fecha <= ?
+        WHERE l.Fecha >= ? AND l.Fecha <= ?{filtro_id}
         ORDER BY l.Fecha
         """
-        return self._execute_query(query, (inicio, fin), use_cache=False)
 
-    def _get_egresos_gastos(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene egresos por gastos - FILTRADO POR HORA"""
-        
-        # ✅ USAR LOS TIMESTAMPS COMPLETOS (no extraer solo la fecha)
-        query = """
+    _QUERY_EGRESOS_GASTOS = """
         SELECT 
             g.id,
             g.Fecha,
@@ -166,15 +105,11 @@ class CierreCajaRepository(BaseRepository):
         FROM Gastos g
         LEFT JOIN Usuario u ON g.Id_RegistradoPor = u.id
         LEFT JOIN Tipo_Gastos tg ON g.ID_Tipo = tg.id
-        WHERE g.Fecha >= ? AND g.Fecha <= ?
+        WHERE g.Fecha >= ? AND g.Fecha <= ?{filtro_id}
         ORDER BY g.Fecha
         """
-        # ✅ Pasar los timestamps completos (inicio, fin) sin modificar
-        return self._execute_query(query, (inicio, fin), use_cache=False)
-    
-    def _get_ingresos_enfermeria(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene ingresos por procedimientos de enfermería"""
-        query = """
+
+    _QUERY_INGRESOS_ENFERMERIA = """
         SELECT 
             e.id,
             e.Fecha,
@@ -189,17 +124,11 @@ class CierreCajaRepository(BaseRepository):
         LEFT JOIN Usuario u ON e.Id_RegistradoPor = u.id
         LEFT JOIN Tipos_Procedimientos tp ON e.Id_Procedimiento = tp.id
         LEFT JOIN Pacientes p ON e.Id_Paciente = p.id
-        WHERE e.Fecha >= ? AND e.Fecha <= ?
+        WHERE e.Fecha >= ? AND e.Fecha <= ?{filtro_id}
         ORDER BY e.Fecha
         """
-        return self._execute_query(query, (inicio, fin), use_cache=False)
-    
-    def _get_ingresos_extras(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene ingresos extras"""
-        # Extraer solo la fecha del timestamp inicio
-        fecha_sql = inicio.split(' ')[0]  # "2025-10-07 08:00:00.000" → "2025-10-07"
-        
-        query = """
+
+    _QUERY_INGRESOS_EXTRAS = """
         SELECT 
             ie.id,
             ie.fecha as Fecha,
@@ -211,14 +140,11 @@ class CierreCajaRepository(BaseRepository):
             ie.descripcion as Descripcion
         FROM IngresosExtras ie
         LEFT JOIN Usuario u ON ie.id_registradoPor = u.id
-        WHERE CAST(ie.fecha AS DATE) = ?
+        WHERE CAST(ie.fecha AS DATE) = ?{filtro_id}
         ORDER BY ie.fecha
         """
-        return self._execute_query(query, (fecha_sql,), use_cache=False)
-    
-    def _get_compras_farmacia(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
-        """Obtiene compras de farmacia con detalles de productos - CORREGIDO FIFO 2.0"""
-        query = """
+
+    _QUERY_COMPRAS_FARMACIA = """
         SELECT 
             c.id,
             c.Fecha,
@@ -238,11 +164,230 @@ class CierreCajaRepository(BaseRepository):
         FROM Compra c
         LEFT JOIN Usuario u ON c.Id_Usuario = u.id
         LEFT JOIN Proveedor prov ON c.Id_Proveedor = prov.id
-        WHERE c.Fecha >= ? AND c.Fecha <= ?
+        WHERE c.Fecha >= ? AND c.Fecha <= ?{filtro_id}
         ORDER BY c.Fecha
         """
+
+    def get_datos_cierre_completo(self, fecha: str, hora_inicio: str, hora_fin: str) -> Dict[str, Any]:
+        """
+        Obtiene TODOS los datos para el cierre de caja en el rango especificado
+        
+        Args:
+            fecha: Fecha en formato DD/MM/YYYY
+            hora_inicio: Hora de inicio (HH:MM)
+            hora_fin: Hora de fin (HH:MM)
+            
+        Returns:
+            Dict con ingresos, egresos, resumen y detalles para PDF
+        """
+        try:
+            if not fecha or not hora_inicio or not hora_fin:
+                print("❌ Parámetros incompletos en get_datos_cierre_completo")
+                return self._estructura_vacia_cierre()
+            
+            if fecha.strip() == "" or hora_inicio.strip() == "" or hora_fin.strip() == "":
+                print("❌ Parámetros vacíos en get_datos_cierre_completo")
+                return self._estructura_vacia_cierre()
+            
+            fecha_sql = self._convertir_fecha_sql(fecha)
+            
+            # Construir timestamps completos
+            timestamp_inicio = f"{fecha_sql} {hora_inicio}:00.000"
+            timestamp_fin = f"{fecha_sql} {hora_fin}:59.999"
+            
+            print(f"🔍 Consultando datos de cierre: {timestamp_inicio} a {timestamp_fin}")
+            
+            # Obtener todos los datos en un solo viaje a la BD
+            fuentes = self._consultar_fuentes_cierre(timestamp_inicio, timestamp_fin)
+
+            # Procesar y estructurar datos
+            datos_procesados = self.armar_datos_cierre(fuentes)
+            
+            print(f"✅ Datos procesados - Ingresos: Bs {datos_procesados['resumen']['total_ingresos']:,.2f}")
+            return datos_procesados
+            
+        except Exception as e:
+            print(f"❌ Error obteniendo datos de cierre: {e}")
+            import traceback
+            traceback.print_exc()
+            # ✅ RETORNAR ESTRUCTURA VÁLIDA EN LUGAR DE LANZAR EXCEPCIÓN
+            return self._estructura_vacia_cierre()
+    
+    def _fuentes_cierre(self, inicio: str, fin: str, desde_ids: Dict[str, int] = None) -> List[tuple]:
+        """
+        (clave, query, params) de cada fuente del cierre, en el orden del lote.
+        Con desde_ids solo trae los movimientos con id mayor al último ya conocido.
+        """
+        fecha_sql = inicio.split(' ')[0]
+        fuentes = [
+            ('farmacia', self._QUERY_INGRESOS_FARMACIA, 'v', (inicio, fin)),
+            ('consultas', self._QUERY_INGRESOS_CONSULTAS, 'c', (inicio, fin)),
+            ('laboratorio', self._QUERY_INGRESOS_LABORATORIO, 'l', (inicio, fin)),
+            ('enfermeria', self._QUERY_INGRESOS_ENFERMERIA, 'e', (inicio, fin)),
+            ('ingresos_extras', self._QUERY_INGRESOS_EXTRAS, 'ie', (fecha_sql,)),
+            ('gastos', self._QUERY_EGRESOS_GASTOS, 'g', (inicio, fin)),
+            ('compras', self._QUERY_COMPRAS_FARMACIA, 'c', (inicio, fin)),
+        ]
+        if desde_ids is None:
+            return [(clave, self._sin_filtro_id(query), params) for clave, query, _, params in fuentes]
+        return [
+            (clave, query.replace('{filtro_id}', f" AND {alias}.id > ?"), params + (int(desde_ids.get(clave, 0)),))
+            for clave, query, alias, params in fuentes
+        ]
+
+    @staticmethod
+    def _sin_filtro_id(query: str) -> str:
+        return query.replace('{filtro_id}', '')
+
+    def _consultar_fuentes_cierre(self, inicio: str, fin: str,
+                                  desde_ids: Dict[str, int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Ejecuta las 7 consultas del cierre como UN lote con varios result sets
+        (cursor.nextset), así la latencia es un solo viaje y no la suma de siete.
+        Si el lote falla, se cae a las consultas individuales.
+        """
+        fuentes = self._fuentes_cierre(inicio, fin, desde_ids)
+        query = "SET NOCOUNT ON;\n" + ";\n".join(q.strip() for _, q, _ in fuentes)
+        params = tuple(p for _, _, ps in fuentes for p in ps)
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+
+            resultados = {}
+            for clave, _, _ in fuentes:
+                # Saltar conteos/mensajes hasta el siguiente result set con columnas
+                while cursor.description is None:
+                    if not cursor.nextset():
+                        raise DatabaseQueryError(f"Falta el result set '{clave}'", query="cierre_caja_lote")
+                resultados[clave] = [self._row_to_dict(cursor, row) for row in cursor.fetchall()]
+                cursor.nextset()
+
+            return resultados
+
+        except Exception as e:
+            print(f"⚠️ Lote de cierre falló, consultando por separado: {e}")
+            return {
+                clave: self._execute_query(q, ps, use_cache=False)
+                for clave, q, ps in fuentes
+            }
+        finally:
+            if conn:
+                conn.close()
+
+    def _get_ingresos_farmacia(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene ingresos por ventas de farmacia CON DETALLES DE PRODUCTOS"""
+        query = self._sin_filtro_id(self._QUERY_INGRESOS_FARMACIA)
+        return self._execute_query(query, (inicio, fin), use_cache=False)
+
+    def _get_ingresos_consultas(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene ingresos por consultas médicas"""
+        query = self._sin_filtro_id(self._QUERY_INGRESOS_CONSULTAS)
+        return self._execute_query(query, (inicio, fin), use_cache=False)
+
+    def _get_ingresos_laboratorio(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene ingresos por análisis de laboratorio"""
+        query = self._sin_filtro_id(self._QUERY_INGRESOS_LABORATORIO)
+        return self._execute_query(query, (inicio, fin), use_cache=False)
+
+    def _get_egresos_gastos(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene egresos por gastos - FILTRADO POR HORA"""
+        
+        # ✅ USAR LOS TIMESTAMPS COMPLETOS (no extraer solo la fecha)
+        query = self._sin_filtro_id(self._QUERY_EGRESOS_GASTOS)
+        # ✅ Pasar los timestamps completos (inicio, fin) sin modificar
+        return self._execute_query(query, (inicio, fin), use_cache=False)
+    
+    def _get_ingresos_enfermeria(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene ingresos por procedimientos de enfermería"""
+        query = self._sin_filtro_id(self._QUERY_INGRESOS_ENFERMERIA)
+        return self._execute_query(query, (inicio, fin), use_cache=False)
+    
+    def _get_ingresos_extras(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene ingresos extras"""
+        # Extraer solo la fecha del timestamp inicio
+        fecha_sql = inicio.split(' ')[0]  # "2025-10-07 08:00:00.000" → "2025-10-07"
+        
+        query = self._sin_filtro_id(self._QUERY_INGRESOS_EXTRAS)
+        return self._execute_query(query, (fecha_sql,), use_cache=False)
+    
+    def _get_compras_farmacia(self, inicio: str, fin: str) -> List[Dict[str, Any]]:
+        """Obtiene compras de farmacia con detalles de productos - CORREGIDO FIFO 2.0"""
+        query = self._sin_filtro_id(self._QUERY_COMPRAS_FARMACIA)
         return self._execute_query(query, (inicio, fin), use_cache=False)
     
+    # ===============================
+    # LIBRO DE CAJA DEL TURNO ABIERTO
+    # ===============================
+
+    def _rango_turno(self, fecha: str, hora_inicio: str) -> tuple:
+        """El turno abierto va desde la hora de inicio hasta el final del día"""
+        fecha_sql = self._convertir_fecha_sql(fecha)
+        return f"{fecha_sql} {hora_inicio}:00.000", f"{fecha_sql} 23:59:59.999"
+
+    def get_movimientos_turno(self, fecha: str, hora_inicio: str,
+                              desde_ids: Dict[str, int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Movimientos del turno abierto por fuente; con desde_ids solo los nuevos (búsqueda por PK)"""
+        inicio, fin = self._rango_turno(fecha, hora_inicio)
+        return self._consultar_fuentes_cierre(inicio, fin, desde_ids)
+
+    def get_checksum_turno(self, fecha: str, hora_inicio: str) -> Dict[str, Dict[str, Any]]:
+        """Cantidad, suma e id máximo por fuente (sin traer filas) para verificar el libro de caja"""
+        inicio, fin = self._rango_turno(fecha, hora_inicio)
+        query = """
+        SELECT 'farmacia' as Fuente, COUNT(*) as Cantidad, ISNULL(SUM(v.Total), 0) as Total, ISNULL(MAX(v.id), 0) as UltimoId
+        FROM Ventas v WHERE v.Fecha >= ? AND v.Fecha <= ?
+        UNION ALL
+        SELECT 'consultas', COUNT(*),
+               ISNULL(SUM(COALESCE(CASE WHEN c.Tipo_Consulta = 'Emergencia' THEN e.Precio_Emergencia ELSE e.Precio_Normal END, 0)), 0),
+               ISNULL(MAX(c.id), 0)
+        FROM Consultas c LEFT JOIN Especialidad e ON c.Id_Especialidad = e.id
+        WHERE c.Fecha >= ? AND c.Fecha <= ?
+        UNION ALL
+        SELECT 'laboratorio', COUNT(*),
+               ISNULL(SUM(COALESCE(CASE WHEN l.Tipo = 'Emergencia' THEN ta.Precio_Emergencia ELSE ta.Precio_Normal END, 0)), 0),
+               ISNULL(MAX(l.id), 0)
+        FROM Laboratorio l LEFT JOIN Tipos_Analisis ta ON l.Id_Tipo_Analisis = ta.id
+        WHERE l.Fecha >= ? AND l.Fecha <= ?
+        UNION ALL
+        SELECT 'enfermeria', COUNT(*),
+               ISNULL(SUM(e.Cantidad * COALESCE(CASE WHEN e.Tipo = 'Emergencia' THEN tp.Precio_Emergencia ELSE tp.Precio_Normal END, 0)), 0),
+               ISNULL(MAX(e.id), 0)
+        FROM Enfermeria e LEFT JOIN Tipos_Procedimientos tp ON e.Id_Procedimiento = tp.id
+        WHERE e.Fecha >= ? AND e.Fecha <= ?
+        UNION ALL
+        SELECT 'ingresos_extras', COUNT(*), ISNULL(SUM(ie.monto), 0), ISNULL(MAX(ie.id), 0)
+        FROM IngresosExtras ie WHERE CAST(ie.fecha AS DATE) = ?
+        UNION ALL
+        SELECT 'gastos', COUNT(*), ISNULL(SUM(g.Monto), 0), ISNULL(MAX(g.id), 0)
+        FROM Gastos g WHERE g.Fecha >= ? AND g.Fecha <= ?
+        UNION ALL
+        SELECT 'compras', COUNT(*), ISNULL(SUM(c.Total), 0), ISNULL(MAX(c.id), 0)
+        FROM Compra c WHERE c.Fecha >= ? AND c.Fecha <= ?
+        """
+        fecha_sql = inicio.split(' ')[0]
+        params = (inicio, fin) * 4 + (fecha_sql,) + (inicio, fin) * 2
+        filas = self._execute_query(query, params, use_cache=False) or []
+        return {
+            fila['Fuente']: {
+                'transacciones': int(fila['Cantidad']),
+                'total': round(float(fila['Total']), 2),
+                'ultimo_id': int(fila['UltimoId'])
+            }
+            for fila in filas
+        }
+
+    def armar_datos_cierre(self, fuentes: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Estructura completa del cierre (con resumen por categorías) a partir de las listas por fuente"""
+        datos = self._procesar_datos_cierre(
+            fuentes['farmacia'], fuentes['consultas'], fuentes['laboratorio'],
+            fuentes['enfermeria'], fuentes['ingresos_extras'], fuentes['gastos'], fuentes['compras']
+        )
+        datos['resumen_categorias'] = self.construir_resumen_por_categorias(datos)
+        return datos
+
     def _procesar_datos_cierre(self, farmacia: List, consultas: List, laboratorio: List, 
                             enfermeria: List, ingresos_extras: List, gastos: List, 
                             compras: List) -> Dict[str, Any]:  # ✅ AÑADIR compras
@@ -325,14 +470,14 @@ class CierreCajaRepository(BaseRepository):
                 # Verificar por horario específico - permite múltiples cierres por día
                 query = """
                 SELECT COUNT(*) as count FROM CierreCaja 
-                WHERE CAST(Fecha AS DATE) = ? 
+                WHERE Fecha = ? 
                 AND HoraInicio = ? AND HoraFin = ?
                 """
                 result = self._execute_query(query, (fecha_sql, hora_inicio, hora_fin), fetch_one=True, use_cache=False)
                 print(f"🔍 Verificando cierre previo para {fecha} {hora_inicio}-{hora_fin}: {result['count'] if result else 0}")
             else:
                 # Fallback: verificar solo por fecha (para compatibilidad)
-                query = "SELECT COUNT(*) as count FROM CierreCaja WHERE CAST(Fecha AS DATE) = ?"
+                query = "SELECT COUNT(*) as count FROM CierreCaja WHERE Fecha = ?"
                 result = self._execute_query(query, (fecha_sql,), fetch_one=True, use_cache=False)
                 
             return result['count'] > 0 if result else False
@@ -340,17 +485,28 @@ class CierreCajaRepository(BaseRepository):
             print(f"❌ Error verificando cierre previo: {e}")
             return False
     
-    def guardar_cierre_caja(self, datos_cierre: Dict[str, Any]) -> bool:
-        """Guarda el cierre de caja en la base de datos"""
+    def guardar_cierre_caja(self, datos_cierre: Dict[str, Any], datos_movimientos: Dict[str, Any] = None) -> bool:
+        """
+        Guarda el cierre de caja y, en la misma transacción, su snapshot inmutable
+        (totales, categorías y movimientos) para no volver a recalcular ese período.
+        """
+        self._ensure_tabla_snapshots()
+        conn = None
         try:
-            query = """
+            if not datos_movimientos:
+                datos_movimientos = self.get_datos_cierre_completo(
+                    datos_cierre['Fecha'], datos_cierre['HoraInicio'], datos_cierre['HoraFin']
+                )
+
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
             INSERT INTO CierreCaja (
                 Fecha, HoraInicio, HoraFin, EfectivoReal, SaldoTeorico, 
                 Diferencia, IdUsuario, FechaCierre, Observaciones
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            params = (
+            ) OUTPUT INSERTED.id
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
                 datos_cierre['Fecha'],
                 datos_cierre['HoraInicio'],
                 datos_cierre['HoraFin'],
@@ -360,20 +516,31 @@ class CierreCajaRepository(BaseRepository):
                 datos_cierre['IdUsuario'],
                 datos_cierre['FechaCierre'],
                 datos_cierre['Observaciones']
-            )
-            
-            affected_rows = self._execute_query(query, params, fetch_all=False, use_cache=False)
-            success = affected_rows > 0
-            
-            if success:
-                print(f" -- Cierre guardado en BD - Efectivo: Bs {datos_cierre['EfectivoReal']:,.2f}")
-            
-            return success
+            ))
+            cierre_id = int(cursor.fetchone()[0])
+            self._insertar_snapshot(cursor, cierre_id, datos_movimientos)
+            conn.commit()
+
+            print(f" -- Cierre guardado en BD - Efectivo: Bs {datos_cierre['EfectivoReal']:,.2f} (snapshot {cierre_id})")
+            self._registrar_valoracion_inventario()
+            return True
             
         except Exception as e:
+            if conn:
+                conn.rollback()
             print(f"❌ Error guardando cierre: {e}")
             return False
+        finally:
+            if conn:
+                conn.close()
     
+    def _registrar_valoracion_inventario(self):
+        """Snapshot del valor del inventario del día, calculado en la BD al cerrar caja (no crítico)"""
+        try:
+            self.valoracion_repo.registrar_snapshot()
+        except Exception as e:
+            print(f"⚠️ Error registrando valoración de inventario: {e}")
+
     def get_cierres_por_fecha(self, fecha: str) -> List[Dict[str, Any]]:
         """Obtiene cierres realizados en una fecha"""
         try:
@@ -392,7 +559,7 @@ class CierreCajaRepository(BaseRepository):
                 CONCAT(u.Nombre, ' ', u.Apellido_Paterno) as NombreUsuario
             FROM CierreCaja cc
             LEFT JOIN Usuario u ON cc.IdUsuario = u.id
-            WHERE CAST(cc.Fecha AS DATE) = ?
+            WHERE cc.Fecha = ?
             ORDER BY cc.FechaCierre DESC
             """
             return self._execute_query(query, (fecha_sql,), use_cache=False)
@@ -428,7 +595,7 @@ class CierreCajaRepository(BaseRepository):
                 CONCAT(u.Nombre, ' ', u.Apellido_Paterno) as NombreUsuario
             FROM CierreCaja cc
             LEFT JOIN Usuario u ON cc.IdUsuario = u.id
-            WHERE CAST(cc.Fecha AS DATE) = ?
+            WHERE cc.Fecha = ?
             ORDER BY cc.HoraFin DESC, cc.FechaCierre DESC
             """
             
@@ -609,6 +776,7 @@ class CierreCajaRepository(BaseRepository):
             
             inicio_semana = fecha_obj - timedelta(days=fecha_obj.weekday())
             fin_semana = inicio_semana + timedelta(days=6)
+            self._ensure_tabla_snapshots()
             
             # SQL COMPATIBLE con todas las bases de datos
             query = """
@@ -624,10 +792,13 @@ class CierreCajaRepository(BaseRepository):
                 cc.Observaciones,
                 u.Nombre as NombreUsuario,
                 u.Apellido_Paterno as ApellidoUsuario,
-                cc.IdUsuario
+                cc.IdUsuario,
+                s.Total_Ingresos,
+                s.Total_Egresos
             FROM CierreCaja cc
             LEFT JOIN Usuario u ON cc.IdUsuario = u.id
-            WHERE CAST(cc.Fecha AS DATE) BETWEEN ? AND ?
+            LEFT JOIN CierreCajaSnapshot s ON s.Id_Cierre = cc.id
+            WHERE cc.Fecha BETWEEN ? AND ?
             ORDER BY cc.Fecha DESC, cc.FechaCierre DESC
             """
             
@@ -691,7 +862,9 @@ class CierreCajaRepository(BaseRepository):
                         'FechaCierre': cierre.get('FechaCierre'),
                         'Observaciones': cierre.get('Observaciones'),
                         'NombreUsuario': f"{cierre.get('NombreUsuario', '')} {cierre.get('ApellidoUsuario', '')}".strip(),
-                        'HoraCierre': self._extraer_hora_cierre(cierre.get('FechaCierre'))
+                        'HoraCierre': self._extraer_hora_cierre(cierre.get('FechaCierre')),
+                        'TotalIngresos': cierre.get('Total_Ingresos'),
+                        'TotalEgresos': cierre.get('Total_Egresos')
                     }
                     cierres_procesados.append(cierre_procesado)
                 except Exception as proc_error:
@@ -796,9 +969,12 @@ class CierreCajaRepository(BaseRepository):
 
     def get_resumen_por_categorias(self, fecha: str, hora_inicio: str, hora_fin: str) -> Dict[str, Any]:
         """Obtiene resumen organizado por categorías para el QML"""
+        datos_completos = self.get_datos_cierre_completo(fecha, hora_inicio, hora_fin)
+        return datos_completos.get('resumen_categorias') or self.construir_resumen_por_categorias(datos_completos)
+
+    def construir_resumen_por_categorias(self, datos_completos: Dict[str, Any]) -> Dict[str, Any]:
+        """Arma el resumen por categorías en memoria a partir de datos de cierre ya consultados"""
         try:
-            datos_completos = self.get_datos_cierre_completo(fecha, hora_inicio, hora_fin)
-            
             # Organizar ingresos por categoría
             ingresos_por_categoria = [
                 {
@@ -946,18 +1122,148 @@ class CierreCajaRepository(BaseRepository):
         except:
             return str(fecha_str)
         
+    # ===============================
+    # SNAPSHOTS INMUTABLES DE CIERRES
+    # ===============================
+
+    def _ensure_tabla_snapshots(self):
+        """Crea la tabla de snapshots de cierres si no existe"""
+        if CierreCajaRepository._tabla_snapshots_verificada:
+            return
+
+        create_table_query = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='CierreCajaSnapshot' AND xtype='U')
+        CREATE TABLE CierreCajaSnapshot (
+            Id_Cierre INT NOT NULL PRIMARY KEY,
+            Total_Ingresos DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            Total_Egresos DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            Saldo_Teorico DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            Transacciones INT NOT NULL DEFAULT 0,
+            Datos VARBINARY(MAX) NOT NULL,
+            Fecha_Registro DATETIME NOT NULL DEFAULT GETDATE()
+        )
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(create_table_query)
+            conn.commit()
+            CierreCajaRepository._tabla_snapshots_verificada = True
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"⚠️ Error verificando tabla CierreCajaSnapshot: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    @staticmethod
+    def _comprimir_snapshot(datos_movimientos: Dict[str, Any]) -> bytes:
+        """JSON comprimido con las listas por fuente (el resto se rearma al leer)"""
+        ingresos = datos_movimientos.get('ingresos', {})
+        egresos = datos_movimientos.get('egresos', {})
+        fuentes = {
+            'farmacia': ingresos.get('farmacia', []),
+            'consultas': ingresos.get('consultas', []),
+            'laboratorio': ingresos.get('laboratorio', []),
+            'enfermeria': ingresos.get('enfermeria', []),
+            'ingresos_extras': ingresos.get('ingresos_extras', []),
+            'gastos': egresos.get('gastos', []),
+            'compras': egresos.get('compras', []),
+        }
+        contenido = json.dumps({'version': 1, 'fuentes': fuentes}, default=str, ensure_ascii=False)
+        return zlib.compress(contenido.encode('utf-8'), 6)
+
+    def _insertar_snapshot(self, cursor, cierre_id: int, datos_movimientos: Dict[str, Any]):
+        resumen = datos_movimientos.get('resumen', {})
+        cursor.execute("""
+            INSERT INTO CierreCajaSnapshot (Id_Cierre, Total_Ingresos, Total_Egresos, Saldo_Teorico, Transacciones, Datos)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            cierre_id,
+            resumen.get('total_ingresos', 0), resumen.get('total_egresos', 0), resumen.get('saldo_teorico', 0),
+            int(resumen.get('transacciones_ingresos', 0)) + int(resumen.get('transacciones_egresos', 0)),
+            self._comprimir_snapshot(datos_movimientos)
+        ))
+
+    def _leer_snapshot(self, datos: bytes) -> Optional[Dict[str, Any]]:
+        """Rearma la estructura completa del cierre desde el snapshot"""
+        try:
+            contenido = json.loads(zlib.decompress(bytes(datos)).decode('utf-8'))
+            fuentes = contenido['fuentes']
+            for movimientos in fuentes.values():
+                for movimiento in movimientos:
+                    fecha = movimiento.get('Fecha')
+                    if isinstance(fecha, str):
+                        try:
+                            movimiento['Fecha'] = datetime.fromisoformat(fecha)
+                        except ValueError:
+                            pass
+            return self.armar_datos_cierre(fuentes)
+        except Exception as e:
+            print(f"⚠️ Snapshot de cierre ilegible: {e}")
+            return None
+
+    def guardar_snapshot_cierre(self, cierre_id: int, datos_movimientos: Dict[str, Any]) -> bool:
+        """Guarda el snapshot de un cierre que aún no lo tiene (cierres anteriores a los snapshots)"""
+        self._ensure_tabla_snapshots()
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM CierreCajaSnapshot WHERE Id_Cierre = ?", (cierre_id,))
+            if cursor.fetchone() is None:
+                self._insertar_snapshot(cursor, cierre_id, datos_movimientos)
+            conn.commit()
+            return True
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"⚠️ Error guardando snapshot del cierre {cierre_id}: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def get_cierre_con_snapshot(self, fecha: str, hora_inicio: str, hora_fin: str) -> Optional[Dict[str, Any]]:
+        """Cierre guardado y su snapshot en una sola lectura por índice (Fecha, HoraInicio, HoraFin)"""
+        self._ensure_tabla_snapshots()
+        query = """
+        SELECT TOP 1
+            cc.id, cc.Fecha, cc.HoraInicio, cc.HoraFin, cc.EfectivoReal, cc.SaldoTeorico,
+            cc.Diferencia, cc.IdUsuario, cc.FechaCierre, cc.Observaciones, cc.pdf_filepath,
+            s.Datos as SnapshotDatos
+        FROM CierreCaja cc
+        LEFT JOIN CierreCajaSnapshot s ON s.Id_Cierre = cc.id
+        WHERE cc.Fecha = ? AND cc.HoraInicio = ? AND cc.HoraFin = ?
+        ORDER BY cc.FechaCierre DESC
+        """
+        return self._execute_query(
+            query, (self._convertir_fecha_sql(fecha), hora_inicio, hora_fin), fetch_one=True, use_cache=False
+        )
+
     def get_cierre_completo_con_efectivo(self, fecha: str, hora_inicio: str, hora_fin: str) -> Dict[str, Any]:
         """
-        ✅ CORREGIDO: Obtiene datos completos del cierre INCLUYENDO el efectivo real guardado en BD
+        Datos completos de un cierre guardado INCLUYENDO el efectivo real.
+        Se leen del snapshot del cierre; si es un cierre anterior a los snapshots,
+        se recalcula una vez y se guarda su snapshot.
         """
         try:
             print(f"🔍 Buscando cierre guardado: {fecha} {hora_inicio}-{hora_fin}")
             
-            # 1. Obtener movimientos y cálculos
-            datos_movimientos = self.get_datos_cierre_completo(fecha, hora_inicio, hora_fin)
+            cierre_guardado = self.get_cierre_con_snapshot(fecha, hora_inicio, hora_fin)
+            
+            datos_movimientos = None
+            if cierre_guardado and cierre_guardado.get('SnapshotDatos'):
+                datos_movimientos = self._leer_snapshot(cierre_guardado['SnapshotDatos'])
+                if datos_movimientos:
+                    print(f"📸 Cierre {cierre_guardado['id']} leído desde su snapshot")
             
-            # 2. Obtener el cierre guardado en BD para recuperar efectivo_real
-            cierre_guardado = self.get_cierre_por_rango_horario(fecha, hora_inicio, hora_fin)
+            if datos_movimientos is None:
+                datos_movimientos = self.get_datos_cierre_completo(fecha, hora_inicio, hora_fin)
+                if cierre_guardado:
+                    self.guardar_snapshot_cierre(cierre_guardado['id'], datos_movimientos)
             
             if cierre_guardado:
                 # ✅ Recuperar el efectivo real que fue guardado
@@ -1024,7 +1330,7 @@ class CierreCajaRepository(BaseRepository):
                 Observaciones,
                 pdf_filepath
             FROM CierreCaja
-            WHERE CAST(Fecha AS DATE) = CAST(? AS DATE)
+            WHERE Fecha = ?
             AND HoraInicio = ?
             AND HoraFin = ?
             ORDER BY FechaCierre DESC
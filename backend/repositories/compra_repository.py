@@ -12,6 +12,9 @@ from datetime import datetime, timedelta
 from decimal import Decimal
 import hashlib
 import json
+import difflib
+import re
+import unicodedata
 
 from ..core.base_repository import BaseRepository
 from ..core.excepciones import (
@@ -19,6 +22,7 @@ from ..core.excepciones import (
     ExceptionHandler, validate_required, validate_positive_number
 )
 from .producto_repository import ProductoRepository
+from .resumen_financiero_repository import ResumenFinancieroRepository
 from ..core.config_fifo import config_fifo
 
 class CompraRepository(BaseRepository):
@@ -27,6 +31,7 @@ class CompraRepository(BaseRepository):
     def __init__(self):
         super().__init__('Compra', 'compras')
         self.producto_repo = ProductoRepository()
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("🛒 CompraRepository v2.0 inicializado - Sin márgenes, con precio total, sin duplicación")
     
     def get_active(self) -> List[Dict[str, Any]]:
@@ -122,6 +127,19 @@ class CompraRepository(BaseRepository):
         
         return resultado
     
+    def get_totales_compras(self, fecha_inicio: datetime, fecha_fin: datetime,
+                            agrupar_por: str = None):
+        """
+        Total, cantidad y promedio de compras en [fecha_inicio, fecha_fin) calculados en SQL.
+        agrupar_por: None, 'dia', 'hora', 'mes', 'usuario' o 'tipo' (proveedor)
+        """
+        return self._get_agregados(
+            'c.Total', 'Compra c', 'c.Fecha', fecha_inicio, fecha_fin,
+            agrupaciones={'usuario': 'c.Id_Usuario', 'tipo': 'c.Id_Proveedor'},
+            agrupar_por=agrupar_por,
+            where_extra='c.Total > 0'
+        )
+    
     def get_compra_completa(self, compra_id: int) -> Dict[str, Any]:
         """Obtiene compra con todos sus detalles (SIN Id_Lote)"""
         validate_required(compra_id, "compra_id")
@@ -308,6 +326,267 @@ class CompraRepository(BaseRepository):
     def crear_compra(self, proveedor_id: int, usuario_id: int, items: List[Dict[str, Any]]) -> Optional[int]:
         """
         Crea una compra completa con todos sus elementos - GUARDA PRECIO TOTAL EN LOTE
+        Con USE_COMPRA_SP toda la factura se registra en un único lote SQL (una transacción)
+        """
+        if not config_fifo.USE_COMPRA_SP:
+            compra_id = self._crear_compra_por_item(proveedor_id, usuario_id, items)
+        else:
+            try:
+                compra_id = self.registrar_compra_lote(proveedor_id, usuario_id, items)['compra_id']
+            except (ValidationError, ProductoNotFoundError):
+                raise
+            except Exception as e:
+                if not config_fifo.AUTO_FALLBACK_TO_LEGACY:
+                    raise CompraError(f"Error al crear compra: {str(e)}", proveedor_id)
+                print(f"⚠️ Registro en lote falló ({e}), usando registro por item")
+                compra_id = self._crear_compra_por_item(proveedor_id, usuario_id, items)
+        
+        if compra_id:
+            self.resumen_financiero_repo.registrar_movimiento('COMPRAS', compra_id)
+        return compra_id
+    
+    # ===============================
+    # REGISTRO DE COMPRA EN UN SOLO LOTE SQL
+    # ===============================
+    
+    # Las líneas viajan como JSON y se procesan por conjuntos: Compra, Lote (OUTPUT de ids),
+    # DetalleCompra y precios de Productos en la misma transacción y un solo envío.
+    _QUERY_REGISTRAR_COMPRA = """
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+    
+    DECLARE @Lineas TABLE (
+        Fila INT NOT NULL,
+        Codigo NVARCHAR(50) NOT NULL,
+        Cantidad INT NOT NULL,
+        Precio_Total DECIMAL(12, 2) NOT NULL,
+        Vencimiento DATE NULL,
+        Precio_Venta DECIMAL(10, 2) NULL,
+        Id_Producto INT NULL
+    );
+    
+    INSERT INTO @Lineas (Fila, Codigo, Cantidad, Precio_Total, Vencimiento, Precio_Venta)
+    SELECT Fila, Codigo, Cantidad, Precio_Total, TRY_CAST(Vencimiento AS DATE), Precio_Venta
+    FROM OPENJSON(?) WITH (
+        Fila INT '$.fila',
+        Codigo NVARCHAR(50) '$.codigo',
+        Cantidad INT '$.cantidad',
+        Precio_Total DECIMAL(12, 2) '$.precio_total',
+        Vencimiento NVARCHAR(10) '$.vencimiento',
+        Precio_Venta DECIMAL(10, 2) '$.precio_venta'
+    );
+    
+    UPDATE li SET Id_Producto = p.id
+    FROM @Lineas li
+    INNER JOIN Productos p ON p.Codigo = li.Codigo;
+    
+    DECLARE @Faltantes NVARCHAR(2000) = (
+        SELECT STRING_AGG(Codigo, ',') FROM @Lineas WHERE Id_Producto IS NULL
+    );
+    IF @Faltantes IS NOT NULL
+    BEGIN
+        SET @Faltantes = N'PRODUCTOS_NO_ENCONTRADOS:' + @Faltantes;
+        THROW 50001, @Faltantes, 1;
+    END
+    
+    DECLARE @Fecha DATETIME = ?;
+    DECLARE @Id_Compra INT;
+    DECLARE @Lotes TABLE (Id_Lote INT, Id_Producto INT);
+    
+    INSERT INTO Compra (Id_Proveedor, Id_Usuario, Fecha, Total)
+    SELECT ?, ?, @Fecha, SUM(Precio_Total) FROM @Lineas;
+    SET @Id_Compra = SCOPE_IDENTITY();
+    
+    INSERT INTO Lote (
+        Id_Producto, Cantidad_Unitario, Precio_Compra, Fecha_Vencimiento,
+        Fecha_Compra, Id_Compra, Estado, Fecha_Creacion, Usuario_Creacion
+    )
+    OUTPUT inserted.id, inserted.Id_Producto INTO @Lotes (Id_Lote, Id_Producto)
+    SELECT Id_Producto, Cantidad, Precio_Total, Vencimiento,
+        CAST(@Fecha AS DATE), @Id_Compra, 'Activo', GETDATE(), ?
+    FROM @Lineas;
+    
+    INSERT INTO DetalleCompra (Id_Compra, Id_Producto, Cantidad_Unitario, Precio_Unitario)
+    SELECT @Id_Compra, Id_Producto, Cantidad, Precio_Total / Cantidad
+    FROM @Lineas;
+    
+    UPDATE p SET
+        Precio_compra = li.Precio_Total / li.Cantidad,
+        Precio_venta = CASE WHEN li.Precio_Venta > 0 THEN li.Precio_Venta ELSE p.Precio_venta END
+    FROM Productos p
+    INNER JOIN @Lineas li ON li.Id_Producto = p.id;
+    
+    SELECT @Id_Compra as Id_Compra, li.Codigo, lo.Id_Lote, lo.Id_Producto, li.Precio_Total
+    FROM @Lotes lo
+    INNER JOIN @Lineas li ON li.Id_Producto = lo.Id_Producto
+    ORDER BY li.Fila;
+    """
+    
+    def registrar_compra_lote(self, proveedor_id: int, usuario_id: int,
+                              items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Registra toda la factura en una transacción con un único envío a SQL Server.
+        Retorna {'compra_id', 'total', 'lotes': {codigo: id_lote}}
+        """
+        lineas = self._agrupar_items_compra(items)
+        fecha_actual = datetime.now()
+        
+        print(f"🛒 Registrando compra en lote - Proveedor: {proveedor_id}, Líneas: {len(lineas)}")
+        
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._QUERY_REGISTRAR_COMPRA, (
+                    json.dumps(lineas), fecha_actual, proveedor_id, usuario_id, usuario_id
+                ))
+            except Exception as e:
+                mensaje = str(e)
+                if 'PRODUCTOS_NO_ENCONTRADOS:' in mensaje:
+                    codigos = mensaje.split('PRODUCTOS_NO_ENCONTRADOS:', 1)[1].split(' (50001)')[0]
+                    raise ProductoNotFoundError(codigo=codigos.strip())
+                raise
+            
+            filas = cursor.fetchall()
+            conn.commit()
+        except Exception:
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn:
+                conn.close()
+        
+        if not filas:
+            raise CompraError("No se pudo crear el registro de compra", proveedor_id)
+        
+        compra_id = int(filas[0][0])
+        lotes = {str(fila[1]): int(fila[2]) for fila in filas}
+        total = float(sum(Decimal(str(fila[4] or 0)) for fila in filas))
+        
+        # La transacción corrió en su propia conexión: limpiar caches de compras y productos/lotes/stock
+        self._invalidate_cache_after_modification()
+        self.producto_repo._invalidate_cache_after_modification()
+        self.producto_repo._registrar_cambio_lotes(list({int(fila[3]) for fila in filas}))
+        
+        print(f"🎉 Compra {compra_id} registrada en un solo lote - {len(lotes)} lotes, Total: Bs {total:.2f}")
+        return {'compra_id': compra_id, 'total': total, 'lotes': lotes}
+    
+    def _agrupar_items_compra(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Valida los items y une las líneas repetidas de un mismo producto (un lote por producto y compra)"""
+        if not items:
+            raise ValidationError("items", items, "La compra no tiene productos")
+        
+        lineas = {}
+        for item in items:
+            codigo = str(item.get('producto_codigo') or '').strip()
+            cantidad = int(item.get('cantidad') or 0)
+            precio_total = float(item.get('precio_total') or 0)
+            
+            if not codigo or cantidad <= 0 or precio_total <= 0:
+                raise ValidationError("item", item, "Item incompleto")
+            
+            vencimiento = item.get('vencimiento') or None
+            precio_venta = float(item.get('precio_venta') or 0)
+            
+            linea = lineas.get(codigo)
+            if linea is None:
+                lineas[codigo] = {
+                    'fila': len(lineas) + 1,
+                    'codigo': codigo,
+                    'cantidad': cantidad,
+                    'precio_total': round(precio_total, 2),
+                    'vencimiento': str(vencimiento)[:10] if vencimiento else None,
+                    'precio_venta': precio_venta if precio_venta > 0 else None
+                }
+                continue
+            
+            linea['cantidad'] += cantidad
+            linea['precio_total'] = round(linea['precio_total'] + precio_total, 2)
+            if vencimiento and (not linea['vencimiento'] or str(vencimiento)[:10] < linea['vencimiento']):
+                linea['vencimiento'] = str(vencimiento)[:10]
+            if precio_venta > 0:
+                linea['precio_venta'] = precio_venta
+        
+        return list(lineas.values())
+    
+    # ===============================
+    # IMPORTACIÓN DE FACTURAS DE PROVEEDOR
+    # ===============================
+    
+    # Similitud mínima (0-1) para aceptar un producto por nombre cuando el código no coincide
+    SIMILITUD_MINIMA_NOMBRE = 0.8
+    # Números del nombre con su unidad ('500MG', '5 ML', '0,5%'): concentración y presentación
+    PATRON_DOSIS = re.compile(r'(?<![\d.,])\d+(?:[.,]\d+)?\s*(?:MCG|MG|ML|UI|G|L|%)?(?![A-Z])')
+    
+    def emparejar_lineas_factura(self, lineas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Empareja las líneas de una factura con los productos activos usando una sola consulta.
+        Primero por código exacto; si no coincide, por nombre aproximado entre los productos
+        con exactamente las mismas cifras y unidades (500MG no empareja con 250MG).
+        Retorna {'emparejadas': [linea + producto] por código,
+                 'por_confirmar': [linea + producto] por nombre (el usuario debe confirmarlas),
+                 'no_encontradas': [linea]}
+        """
+        query = """
+        SELECT p.id, p.Codigo, p.Nombre, p.Precio_venta, p.Unidad_Medida
+        FROM Productos p
+        WHERE p.Activo = 1
+        """
+        productos = self._execute_query(query, use_cache=False) or []
+        
+        por_codigo = {str(p['Codigo']).strip().upper(): p for p in productos if p.get('Codigo')}
+        por_nombre = {}
+        nombres_por_dosis = {}
+        for producto in productos:
+            nombre = self._normalizar_nombre(producto.get('Nombre'))
+            if nombre not in por_nombre:
+                por_nombre[nombre] = producto
+                nombres_por_dosis.setdefault(self._dosis_nombre(nombre), []).append(nombre)
+        
+        emparejadas = []
+        por_confirmar = []
+        no_encontradas = []
+        for linea in lineas:
+            codigo = str(linea.get('codigo') or '').strip().upper()
+            producto = por_codigo.get(codigo) if codigo else None
+            if producto:
+                emparejadas.append(dict(linea, producto=producto, emparejado_por='codigo'))
+                continue
+            
+            if linea.get('nombre'):
+                nombre = self._normalizar_nombre(linea['nombre'])
+                cercanos = difflib.get_close_matches(
+                    nombre, nombres_por_dosis.get(self._dosis_nombre(nombre), []), n=1,
+                    cutoff=self.SIMILITUD_MINIMA_NOMBRE
+                )
+                if cercanos:
+                    por_confirmar.append(dict(linea, producto=por_nombre[cercanos[0]], emparejado_por='nombre'))
+                    continue
+            
+            no_encontradas.append(linea)
+        
+        print(f"🔗 Factura emparejada: {len(emparejadas)} por código, {len(por_confirmar)} por nombre "
+              f"(a confirmar), {len(no_encontradas)} sin producto")
+        return {'emparejadas': emparejadas, 'por_confirmar': por_confirmar, 'no_encontradas': no_encontradas}
+    
+    def _normalizar_nombre(self, nombre) -> str:
+        """Nombre en mayúsculas, sin tildes ni espacios repetidos (para comparar)"""
+        texto = unicodedata.normalize('NFKD', str(nombre or ''))
+        texto = ''.join(c for c in texto if not unicodedata.combining(c))
+        return ' '.join(texto.upper().split())
+    
+    def _dosis_nombre(self, nombre_normalizado: str) -> tuple:
+        """Cifras con unidad de un nombre normalizado, ordenadas: ('100ML', '500MG')"""
+        return tuple(sorted(
+            re.sub(r'\s+', '', cifra).replace(',', '.')
+            for cifra in self.PATRON_DOSIS.findall(nombre_normalizado)
+        ))
+    
+    def _crear_compra_por_item(self, proveedor_id: int, usuario_id: int, items: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Registro por item (sistema anterior): varias consultas por producto
         """
         try:
             print(f"🛒 Creando compra - Proveedor: {proveedor_id}, Usuario: {usuario_id}, Items: {len(items)}")
@@ -495,6 +774,8 @@ class CompraRepository(BaseRepository):
             if resultado and resultado['ventas'] > 0:
                 raise ValidationError("No se puede eliminar: tiene ventas asociadas")
             
+            compra = self._execute_query("SELECT Fecha FROM Compra WHERE id = ?", (compra_id,), fetch_one=True, use_cache=False)
+            
             # Eliminar detalles y lotes
             query_delete_detalles = "DELETE FROM DetalleCompra WHERE Id_Compra = ?"
             self._execute_query(query_delete_detalles, (compra_id,), fetch_all=False, use_cache=False)
@@ -509,6 +790,9 @@ class CompraRepository(BaseRepository):
             query_delete_compra = "DELETE FROM Compra WHERE id = ?"
             self._execute_query(query_delete_compra, (compra_id,), fetch_all=False, use_cache=False)
             
+            if compra:
+                self.resumen_financiero_repo.recalcular_dias('COMPRAS', [compra.get('Fecha')])
+            
             print(f"🗑️ Compra {compra_id} eliminada correctamente")
             return True
             
@@ -752,209 +1036,185 @@ class CompraRepository(BaseRepository):
 
     def actualizar_compra(self, compra_id: int, proveedor_id: int, usuario_id: int, items: List[Dict[str, Any]]) -> bool:
         """
-        Actualiza una compra existente - ACTUALIZA LOTES EXISTENTES EN LUGAR DE CREAR NUEVOS
+        Actualiza una compra existente comparando con sus lotes guardados (una transacción):
+        líneas iguales no se tocan, las modificadas se actualizan en bloque y las quitadas
+        se eliminan en una sola sentencia. Los lotes con ventas no pueden modificarse ni quitarse.
         """
+        conn = None
         try:
             print(f"✏️ Actualizando compra existente - ID: {compra_id}")
             
-            # 1. Verificar si hay ventas de los lotes de esta compra
-            query_check = """
-            SELECT COUNT(*) as ventas
-            FROM DetallesVentas dv
-            INNER JOIN Lote l ON dv.Id_Lote = l.id
-            WHERE l.Id_Compra = ?
-            """
-            resultado = self._execute_query(query_check, (compra_id,), fetch_one=True)
-            
-            if resultado and resultado['ventas'] > 0:
-                raise ValidationError("No se puede editar: tiene ventas asociadas")
-            
-            # 2. Obtener compra actual para validar
-            compra_actual = self._execute_query(
-                "SELECT * FROM Compra WHERE id = ?", 
-                (compra_id,), 
-                fetch_one=True
-            )
-            
-            if not compra_actual:
-                raise CompraError(f"Compra {compra_id} no encontrada")
-            
-            # 3. Obtener lotes existentes de esta compra
-            lotes_existentes = self._obtener_lotes_por_compra(compra_id)
-            print(f"📦 Lotes existentes en compra {compra_id}: {len(lotes_existentes)} lotes")
-            
-            # 4. Eliminar detalles de la compra (siempre)
-            print(f"🗑️ Eliminando detalles de compra {compra_id}")
-            query_delete_detalles = "DELETE FROM DetalleCompra WHERE Id_Compra = ?"
-            self._execute_query(query_delete_detalles, (compra_id,), fetch_all=False, use_cache=False)
-            
-            # 5. Actualizar datos básicos de la compra
-            query_update_compra = """
-            UPDATE Compra 
-            SET Id_Proveedor = ?, Id_Usuario = ?, Fecha = GETDATE()
-            WHERE id = ?
-            """
-            self._execute_query(
-                query_update_compra, 
-                (proveedor_id, usuario_id, compra_id), 
-                fetch_all=False, 
-                use_cache=False
-            )
-            
-            total_compra = 0.0
-            fecha_actual = datetime.now()
+            lineas = {linea['codigo'].upper(): linea for linea in self._agrupar_items_compra(items)}
             
-            # 6. Procesar cada item
-            for i, item in enumerate(items):
-                producto_codigo = item.get('producto_codigo')
-                cantidad = item.get('cantidad')
-                precio_total = item.get('precio_total')
-                vencimiento = item.get('vencimiento')
-                precio_venta = item.get('precio_venta')
-                
-                # Validaciones
-                if not producto_codigo or not cantidad or not precio_total:
-                    raise ValidationError(f"Item incompleto: {item}")
-                
-                # Obtener producto
-                producto = self.producto_repo.get_by_codigo(producto_codigo)
-                if not producto:
-                    raise ProductoNotFoundError(f"Producto {producto_codigo} no encontrado")
-                
-                producto_id = producto.get('id')
-                
-                # Calcular precio unitario
-                precio_unitario = precio_total / cantidad if cantidad > 0 else 0
-                print(f"📊 Actualización {i+1}/{len(items)} - Producto: {producto_codigo}, Cantidad: {cantidad}, Precio TOTAL: {precio_total}")
-                
-                # 7. Actualizar precio de compra en la tabla Productos
-                self._actualizar_precio_compra_producto(producto_id, precio_unitario)
-                
-                # 8. Verificar si ya existe un lote para este producto en esta compra
-                lote_existente = self._obtener_lote_por_producto_y_compra(producto_id, compra_id)
-                
-                if lote_existente:
-                    # ✅ ACTUALIZAR LOTE EXISTENTE
-                    lote_id = lote_existente['id']
-                    print(f"✏️ Actualizando lote existente ID {lote_id} para producto {producto_codigo}")
-                    
-                    self._actualizar_lote(
-                        lote_id=lote_id,
-                        cantidad=cantidad,
-                        precio_total=precio_total,
-                        vencimiento=vencimiento
-                    )
-                    
-                    print(f"✅ Lote {lote_id} actualizado: cantidad={cantidad}, precio_total={precio_total}")
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            
+            # 1. Datos básicos de la compra (también verifica que exista)
+            cursor.execute("SELECT Fecha FROM Compra WHERE id = ?", (compra_id,))
+            fila_compra = cursor.fetchone()
+            fecha_anterior = fila_compra[0] if fila_compra else None
+            cursor.execute("""
+                UPDATE Compra SET Id_Proveedor = ?, Id_Usuario = ?, Fecha = GETDATE()
+                WHERE id = ?
+            """, (proveedor_id, usuario_id, compra_id))
+            if cursor.rowcount == 0:
+                raise CompraError(f"Compra {compra_id} no encontrada", proveedor_id)
+            
+            # 2. Lotes guardados con lo comprado y lo ya vendido de cada uno, en una lectura
+            cursor.execute("""
+                SELECT l.id, l.Id_Producto, p.Codigo, l.Precio_Compra, l.Fecha_Vencimiento,
+                    ISNULL(dc.Cantidad_Unitario, l.Cantidad_Unitario) as Cantidad_Comprada,
+                    ISNULL(v.Vendidas, 0) as Vendidas
+                FROM Lote l WITH (UPDLOCK)
+                INNER JOIN Productos p ON l.Id_Producto = p.id
+                OUTER APPLY (
+                    SELECT TOP 1 d.Cantidad_Unitario FROM DetalleCompra d
+                    WHERE d.Id_Compra = l.Id_Compra AND d.Id_Producto = l.Id_Producto
+                ) dc
+                OUTER APPLY (
+                    SELECT SUM(dv.Cantidad_Unitario) as Vendidas FROM DetallesVentas dv
+                    WHERE dv.Id_Lote = l.id
+                ) v
+                WHERE l.Id_Compra = ?
+                ORDER BY l.id
+            """, (compra_id,))
+            columnas = [col[0] for col in cursor.description]
+            lotes_guardados = {}
+            lotes_quitados = []
+            for fila in cursor.fetchall():
+                lote = dict(zip(columnas, fila))
+                codigo = str(lote['Codigo']).strip().upper()
+                if codigo in lineas and codigo not in lotes_guardados:
+                    lotes_guardados[codigo] = lote
                 else:
-                    # ❌ Si no existe lote, crear uno nuevo (caso raro, pero puede pasar)
-                    print(f"⚠️ No se encontró lote para producto {producto_codigo} en compra {compra_id}")
-                    lote_id = self._crear_lote(
-                        producto_id=producto_id,
-                        cantidad=cantidad,
-                        precio_total=precio_total,
-                        vencimiento=vencimiento,
-                        compra_id=compra_id,
-                        fecha_compra=fecha_actual
+                    lotes_quitados.append(lote)
+            
+            # 3. Productos de las líneas nuevas (una consulta)
+            codigos_nuevos = [codigo for codigo in lineas if codigo not in lotes_guardados]
+            productos_nuevos = {}
+            if codigos_nuevos:
+                placeholders = ','.join('?' for _ in codigos_nuevos)
+                cursor.execute(
+                    f"SELECT id, Codigo FROM Productos WHERE UPPER(Codigo) IN ({placeholders})",
+                    codigos_nuevos
+                )
+                productos_nuevos = {str(fila[1]).strip().upper(): int(fila[0]) for fila in cursor.fetchall()}
+                faltantes = [lineas[c]['codigo'] for c in codigos_nuevos if c not in productos_nuevos]
+                if faltantes:
+                    raise ProductoNotFoundError(codigo=', '.join(faltantes))
+            
+            # 4. Diferencias
+            con_ventas = [str(l['Codigo']) for l in lotes_quitados if l['Vendidas']]
+            lotes_modificados = []
+            detalles_modificados = []
+            precios_producto = []
+            for codigo, lote in lotes_guardados.items():
+                linea = lineas[codigo]
+                vencimiento_guardado = str(lote['Fecha_Vencimiento'])[:10] if lote['Fecha_Vencimiento'] else None
+                sin_cambios = (
+                    int(lote['Cantidad_Comprada']) == linea['cantidad']
+                    and round(float(lote['Precio_Compra'] or 0), 2) == linea['precio_total']
+                    and vencimiento_guardado == linea['vencimiento']
+                )
+                if not sin_cambios:
+                    if lote['Vendidas']:
+                        con_ventas.append(linea['codigo'])
+                        continue
+                    lotes_modificados.append(
+                        (linea['cantidad'], linea['precio_total'], linea['vencimiento'], lote['id'])
                     )
-                    print(f"📦 Nuevo lote creado: ID {lote_id} para {producto_codigo}")
-                
-                # 9. Crear detalle de compra
-                self._crear_detalle_compra(
-                    compra_id=compra_id,
-                    producto_id=producto_id,
-                    cantidad=cantidad,
-                    precio_unitario=precio_unitario
+                    detalles_modificados.append(
+                        (linea['cantidad'], linea['precio_total'] / linea['cantidad'], compra_id, lote['Id_Producto'])
+                    )
+                if not sin_cambios or linea['precio_venta']:
+                    precios_producto.append((lote['Id_Producto'], linea))
+            
+            if con_ventas:
+                raise ValidationError(
+                    "items", ', '.join(con_ventas),
+                    "No se puede modificar ni quitar productos de lotes con ventas asociadas"
                 )
-                
-                # 10. Si hay precio de venta, actualizar producto
-                if precio_venta and float(precio_venta) > 0:
-                    self._actualizar_precio_venta_producto(producto_id, float(precio_venta))
-                    print(f"💰 Precio venta actualizado: {producto_codigo} = Bs {precio_venta:.2f}")
-                
-                total_compra += precio_total
             
-            # 11. Eliminar lotes de productos que ya no están en la compra
-            self._eliminar_lotes_sin_productos(compra_id, items)
+            # 5. Aplicar cambios en bloque
+            if lotes_modificados:
+                cursor.executemany("""
+                    UPDATE Lote SET Cantidad_Unitario = ?, Precio_Compra = ?, Fecha_Vencimiento = ?, Estado = 'Activo'
+                    WHERE id = ?
+                """, lotes_modificados)
+                cursor.executemany("""
+                    UPDATE DetalleCompra SET Cantidad_Unitario = ?, Precio_Unitario = ?
+                    WHERE Id_Compra = ? AND Id_Producto = ?
+                """, detalles_modificados)
+            
+            if codigos_nuevos:
+                fecha_compra = datetime.now().date()
+                nuevos = [(productos_nuevos[c], lineas[c]) for c in codigos_nuevos]
+                cursor.executemany("""
+                    INSERT INTO Lote (
+                        Id_Producto, Cantidad_Unitario, Precio_Compra, Fecha_Vencimiento,
+                        Fecha_Compra, Id_Compra, Estado, Fecha_Creacion, Usuario_Creacion
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, 'Activo', GETDATE(), ?)
+                """, [(pid, l['cantidad'], l['precio_total'], l['vencimiento'], fecha_compra, compra_id, usuario_id)
+                      for pid, l in nuevos])
+                cursor.executemany("""
+                    INSERT INTO DetalleCompra (Id_Compra, Id_Producto, Cantidad_Unitario, Precio_Unitario)
+                    VALUES (?, ?, ?, ?)
+                """, [(compra_id, pid, l['cantidad'], l['precio_total'] / l['cantidad']) for pid, l in nuevos])
+                precios_producto.extend(nuevos)
+            
+            if lotes_quitados:
+                ids_lote = [l['id'] for l in lotes_quitados]
+                ids_producto = list({l['Id_Producto'] for l in lotes_quitados
+                                     if str(l['Codigo']).strip().upper() not in lineas})
+                cursor.execute(
+                    f"DELETE FROM Lote WHERE id IN ({','.join('?' for _ in ids_lote)})", ids_lote
+                )
+                if ids_producto:
+                    cursor.execute(
+                        f"DELETE FROM DetalleCompra WHERE Id_Compra = ? AND Id_Producto IN ({','.join('?' for _ in ids_producto)})",
+                        [compra_id] + ids_producto
+                    )
             
-            # 12. Actualizar total de compra
-            self._actualizar_total_compra(compra_id, total_compra)
+            if precios_producto:
+                cursor.executemany("""
+                    UPDATE Productos SET
+                        Precio_compra = ?,
+                        Precio_venta = CASE WHEN ? > 0 THEN ? ELSE Precio_venta END
+                    WHERE id = ?
+                """, [(l['precio_total'] / l['cantidad'], l['precio_venta'] or 0, l['precio_venta'] or 0, pid)
+                      for pid, l in precios_producto])
             
-            # 13. Verificar y corregir lotes
-            self.verificar_y_corregir_lotes(compra_id)
-            self.verificar_y_eliminar_lotes_duplicados(compra_id)
+            total_compra = round(sum(linea['precio_total'] for linea in lineas.values()), 2)
+            cursor.execute("UPDATE Compra SET Total = ? WHERE id = ?", (total_compra, compra_id))
             
-            print(f"✅ Compra {compra_id} actualizada exitosamente - Total: Bs {total_compra:.2f}")
-            return True
+            conn.commit()
             
-        except Exception as e:
-            print(f"❌ Error en actualizar_compra: {e}")
-            import traceback
-            traceback.print_exc()
-            raise CompraError(f"Error al actualizar compra: {str(e)}")
-
-    def _obtener_lotes_por_compra(self, compra_id: int) -> List[Dict[str, Any]]:
-        """Obtiene todos los lotes de una compra"""
-        query = """
-        SELECT l.*, p.Codigo, p.Nombre
-        FROM Lote l
-        INNER JOIN Productos p ON l.Id_Producto = p.id
-        WHERE l.Id_Compra = ?
-        ORDER BY l.Id_Producto
-        """
-        return self._execute_query(query, (compra_id,), use_cache=False)
-
-    def _obtener_lote_por_producto_y_compra(self, producto_id: int, compra_id: int) -> Optional[Dict[str, Any]]:
-        """Obtiene un lote específico por producto y compra"""
-        query = """
-        SELECT TOP 1 *
-        FROM Lote
-        WHERE Id_Producto = ? AND Id_Compra = ?
-        ORDER BY id
-        """
-        return self._execute_query(query, (producto_id, compra_id), fetch_one=True, use_cache=False)
-
-    def _actualizar_lote(self, lote_id: int, cantidad: int, precio_total: float, vencimiento: str = None):
-        """Actualiza un lote existente"""
-        query = """
-        UPDATE Lote 
-        SET Cantidad_Unitario = ?, 
-            Precio_Compra = ?, 
-            Fecha_Vencimiento = ?,
-            Estado = 'Activo'
-        WHERE id = ?
-        """
-        self._execute_query(query, (cantidad, precio_total, vencimiento, lote_id), fetch_all=False, use_cache=False)
-
-    def _eliminar_lotes_sin_productos(self, compra_id: int, items_actualizados: List[Dict[str, Any]]):
-        """Elimina lotes de productos que ya no están en la compra actualizada"""
-        try:
-            # Obtener IDs de productos en la compra actualizada
-            producto_ids = []
-            for item in items_actualizados:
-                producto_codigo = item.get('producto_codigo')
-                producto = self.producto_repo.get_by_codigo(producto_codigo)
-                if producto:
-                    producto_ids.append(producto.get('id'))
+            # La transacción corrió en su propia conexión: limpiar caches de compras y productos/lotes/stock
+            self._invalidate_cache_after_modification()
+            self.producto_repo._invalidate_cache_after_modification()
             
-            if not producto_ids:
-                print("⚠️ No hay productos en la compra actualizada")
-                return
+            productos_afectados = (
+                [int(l[3]) for l in detalles_modificados]
+                + [productos_nuevos[c] for c in codigos_nuevos]
+                + [int(l['Id_Producto']) for l in lotes_quitados]
+            )
+            if productos_afectados:
+                self.producto_repo._registrar_cambio_lotes(list(set(productos_afectados)))
+            self.resumen_financiero_repo.recalcular_dias('COMPRAS', [fecha_anterior, datetime.now()])
             
-            # Eliminar lotes que no están en la lista actualizada
-            placeholders = ','.join(['?' for _ in producto_ids])
-            query = f"""
-            DELETE FROM Lote
-            WHERE Id_Compra = ? 
-            AND Id_Producto NOT IN ({placeholders})
-            """
-            params = [compra_id] + producto_ids
+            print(f"✅ Compra {compra_id} actualizada - {len(lotes_modificados)} modificados, "
+                  f"{len(codigos_nuevos)} nuevos, {len(lotes_quitados)} quitados - Total: Bs {total_compra:.2f}")
+            return True
             
-            eliminados = self._execute_non_query(query, tuple(params))
-            if eliminados:
-                print(f"🗑️ Eliminados {eliminados} lotes de productos que ya no están en la compra")
-            else:
-                print("✅ No hay lotes para eliminar")
-                
         except Exception as e:
-            print(f"❌ Error eliminando lotes sin productos: {e}")
\ No newline at end of file
+            if conn:
+                conn.rollback()
+            print(f"❌ Error en actualizar_compra: {e}")
+            if isinstance(e, CompraError):
+                raise
+            raise CompraError(f"Error al actualizar compra: {str(e)}", proveedor_id)
+        finally:
+            if conn:
+                conn.close()
@@ -11,12 +11,14 @@ from ..core.utils import (
     get_date_range_query, validate_required_string, safe_float
 )
 from .paciente_repository import PacienteRepository 
+from .resumen_financiero_repository import ResumenFinancieroRepository
 class ConsultaRepository(BaseRepository):
     """Repository para gestión de Consultas Médicas - CORREGIDO con nombres reales de BD"""
     
     def __init__(self):
         super().__init__('Consultas', 'consultas')
         self.paciente_repo = PacienteRepository()
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("🩺 ConsultaRepository inicializado con gestión de pacientes")
     
     # ===============================
@@ -176,6 +178,7 @@ class ConsultaRepository(BaseRepository):
         if consultation_id:
             # AGREGAR: Invalidar cache inmediatamente después de crear
             self.invalidate_consultation_caches()
+            self.resumen_financiero_repo.registrar_movimiento('CONSULTAS', consultation_id)
             print(f"🔄 Cache de consultas invalidado después de crear consulta {consultation_id}")
             print(f"🩺 Consulta creada: Paciente ID {paciente_id} - Médico ID {trabajador_id} - Consulta ID: {consultation_id}")
         
@@ -186,7 +189,8 @@ class ConsultaRepository(BaseRepository):
                    fecha: datetime = None) -> bool:
         """Actualiza consulta existente"""
         # Verificar existencia
-        if not self.get_by_id(consulta_id):
+        consulta_actual = self.get_by_id(consulta_id)
+        if not consulta_actual:
             raise ValidationError("consulta_id", consulta_id, "Consulta no encontrada")
         
         update_data = {}
@@ -239,11 +243,22 @@ class ConsultaRepository(BaseRepository):
         if success:
             # Invalidar cache después de actualizar
             self.invalidate_consultation_caches()
+            self.resumen_financiero_repo.recalcular_dias(
+                'CONSULTAS', [consulta_actual.get('Fecha'), update_data.get('Fecha')]
+            )
             print(f"🔄 Cache invalidado después de actualizar consulta {consulta_id}")
             print(f"🩺 Consulta actualizada: ID {consulta_id}")
-        
+
         return success
-    
+
+    def delete(self, record_id: int) -> bool:
+        """Elimina la consulta y recalcula el resumen financiero de su día"""
+        consulta = self.get_by_id(record_id)
+        success = super().delete(record_id)
+        if success and consulta:
+            self.resumen_financiero_repo.recalcular_dias('CONSULTAS', [consulta.get('Fecha')])
+        return success
+
     # ===============================
     # CONSULTAS CON RELACIONES COMPLETAS - TOTALMENTE CORREGIDO
     # ===============================
@@ -391,6 +406,21 @@ class ConsultaRepository(BaseRepository):
             ORDER BY c.Fecha DESC
             """
         return self._execute_query(query, (start_date, end_date))
+
+    def get_totales_consultas(self, fecha_inicio: datetime, fecha_fin: datetime,
+                              agrupar_por: str = None):
+        """
+        Ingresos por consultas (precio de la especialidad según tipo) calculados en SQL.
+        agrupar_por: None, 'dia', 'hora', 'mes', 'usuario' o 'tipo'
+        """
+        precio = """CASE WHEN c.Tipo_Consulta = 'Emergencia'
+            THEN ISNULL(e.Precio_Emergencia, 0) ELSE ISNULL(e.Precio_Normal, 0) END"""
+        return self._get_agregados(
+            precio, 'Consultas c LEFT JOIN Especialidad e ON c.Id_Especialidad = e.id',
+            'c.Fecha', fecha_inicio, fecha_fin,
+            agrupaciones={'usuario': 'c.Id_Usuario', 'tipo': 'c.Tipo_Consulta'},
+            agrupar_por=agrupar_por
+        )
     
     @cached_query('consultas_hoy', ttl=60)
     def get_today_consultations(self) -> List[Dict[str, Any]]:
@@ -1782,6 +1812,7 @@ class ConsultaRepository(BaseRepository):
         
         # Invalidar cachés
         self.invalidate_consultation_caches()
+        self.resumen_financiero_repo.registrar_movimiento('CONSULTAS', consultation_id)
         
         print(f"✅ Consulta creada: ID {consultation_id} - Médico: {trabajador_id} - Especialidad: {especialidad_id}")
         
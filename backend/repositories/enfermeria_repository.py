@@ -13,6 +13,9 @@ from datetime import datetime, date
 from decimal import Decimal
 import re
 from difflib import SequenceMatcher
+
+from ..core.base_repository import construir_query_agregados
+from .resumen_financiero_repository import ResumenFinancieroRepository
 from typing import List, Dict, Optional, Any
 
 
@@ -28,6 +31,7 @@ class EnfermeriaRepository:
             db_connection: Instancia de DatabaseConnection
         """
         self.db = db_connection
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
     
     # ===============================
     # ✅ MÉTODO EXISTENTE: buscar_paciente_por_cedula_exacta
@@ -469,6 +473,42 @@ class EnfermeriaRepository:
             logger.error(f"Error obteniendo procedimientos de enfermería: {e}")
             return []
     
+    def get_totales_procedimientos(self, fecha_inicio: datetime, fecha_fin: datetime,
+                                   agrupar_por: Optional[str] = None):
+        """
+        Ingresos de enfermería (cantidad x precio según tipo) calculados en SQL.
+        agrupar_por: None, 'dia', 'hora', 'mes', 'usuario' o 'tipo'
+        """
+        precio = """e.Cantidad * CASE WHEN e.Tipo = 'Emergencia'
+            THEN ISNULL(tp.Precio_Emergencia, 0) ELSE ISNULL(tp.Precio_Normal, 0) END"""
+        query = construir_query_agregados(
+            precio, 'Enfermeria e LEFT JOIN Tipos_Procedimientos tp ON e.Id_Procedimiento = tp.id',
+            'e.Fecha', {'usuario': 'e.Id_RegistradoPor', 'tipo': 'e.Tipo'}, agrupar_por
+        )
+        try:
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, (fecha_inicio, fecha_fin))
+                columnas = [col[0] for col in cursor.description]
+                filas = [
+                    {col: (float(valor) if isinstance(valor, Decimal) else valor) for col, valor in zip(columnas, row)}
+                    for row in cursor.fetchall()
+                ]
+
+            if agrupar_por:
+                return filas
+
+            resultado = filas[0] if filas else {}
+            return {
+                'total': round(float(resultado.get('total') or 0), 2),
+                'cantidad': int(resultado.get('cantidad') or 0),
+                'promedio': round(float(resultado.get('promedio') or 0), 2)
+            }
+
+        except Exception as e:
+            logger.error(f"Error obteniendo totales de enfermería: {e}")
+            return [] if agrupar_por else {'total': 0.0, 'cantidad': 0, 'promedio': 0.0}
+
     def crear_procedimiento_enfermeria(self, datos: Dict[str, Any]) -> Optional[int]:
         """Crea un nuevo procedimiento de enfermería"""
         try:
@@ -501,7 +541,9 @@ class EnfermeriaRepository:
                 
                 conn.commit()
                 logger.info(f"Procedimiento de enfermería creado con ID: {procedimiento_id}")
-                return int(procedimiento_id)
+
+            self.resumen_financiero_repo.registrar_movimiento('ENFERMERIA', int(procedimiento_id))
+            return int(procedimiento_id)
                 
         except Exception as e:
             logger.error(f"Error creando procedimiento de enfermería: {e}")
@@ -512,6 +554,7 @@ class EnfermeriaRepository:
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
+                fecha_procedimiento = self._fecha_procedimiento(cursor, id_procedimiento)
                 
                 # ✅ SI ES ANÓNIMO, NO ACTUALIZAR PACIENTE
                 if datos.get('esAnonimo', False):
@@ -553,6 +596,7 @@ class EnfermeriaRepository:
                 if cursor.rowcount > 0:
                     conn.commit()
                     logger.info(f"Procedimiento de enfermería actualizado: {id_procedimiento}")
+                    self.resumen_financiero_repo.recalcular_dias('ENFERMERIA', [fecha_procedimiento])
                     return True
                 else:
                     logger.warning(f"No se encontró el procedimiento con ID: {id_procedimiento}")
@@ -567,11 +611,13 @@ class EnfermeriaRepository:
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
+                fecha_procedimiento = self._fecha_procedimiento(cursor, id_procedimiento)
                 cursor.execute("DELETE FROM Enfermeria WHERE id = ?", (id_procedimiento,))
                 
                 if cursor.rowcount > 0:
                     conn.commit()
                     logger.info(f"Procedimiento de enfermería eliminado: {id_procedimiento}")
+                    self.resumen_financiero_repo.recalcular_dias('ENFERMERIA', [fecha_procedimiento])
                     return True
                 else:
                     logger.warning(f"No se encontró el procedimiento con ID: {id_procedimiento}")
@@ -580,6 +626,12 @@ class EnfermeriaRepository:
         except Exception as e:
             logger.error(f"Error eliminando procedimiento de enfermería: {e}")
             return False
+
+    def _fecha_procedimiento(self, cursor, id_procedimiento: int):
+        """Fecha actual del procedimiento (para recalcular su día en el resumen financiero)"""
+        cursor.execute("SELECT Fecha FROM Enfermeria WHERE id = ?", (id_procedimiento,))
+        fila = cursor.fetchone()
+        return fila[0] if fila else None
     
     # ===============================
     # OPERACIONES DE PACIENTES (mejoradas)
@@ -4,6 +4,8 @@ from decimal import Decimal
 
 from ..core.base_repository import BaseRepository
 from ..core.cache_system import cached_query
+from .resumen_ventas_repository import ResumenVentasRepository
+from .resumen_financiero_repository import ResumenFinancieroRepository
 from ..core.utils import (
     get_current_datetime, calculate_percentage, safe_float
 )
@@ -13,6 +15,8 @@ class EstadisticaRepository(BaseRepository):
     
     def __init__(self):
         super().__init__('', 'estadisticas')  # No tiene tabla principal
+        self.resumen_ventas_repo = ResumenVentasRepository()
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("📊 EstadisticaRepository inicializado")
     
     # ===============================
@@ -84,98 +88,81 @@ class EstadisticaRepository(BaseRepository):
     
     @cached_query('finanzas_resumen', ttl=600)
     def get_financial_summary(self, months: int = 12) -> Dict[str, Any]:
-        """Resumen financiero completo"""
-        
-        fecha_inicio = datetime.now() - timedelta(days=months*30)
-        
-        # Ingresos por ventas
-        ingresos_query = """
-        SELECT 
-            SUM(Total) as total_ingresos,
-            COUNT(*) as total_ventas,
-            AVG(Total) as venta_promedio
-        FROM Ventas 
-        WHERE Fecha >= ?
         """
-        
-        # Gastos totales
-        gastos_query = """
-        SELECT 
-            SUM(Monto) as total_gastos,
-            COUNT(*) as total_transacciones,
-            AVG(Monto) as gasto_promedio
-        FROM Gastos 
-        WHERE Fecha >= ?
+        Resumen financiero completo (desde el resumen financiero por hora).
+        ingresos, resumen y tendencia_mensual conservan su definición: ventas de farmacia
+        frente a gastos operativos. Los ingresos de todas las áreas (consultas, laboratorio,
+        enfermería, etc.) y el balance que además descuenta compras van en 'clinica'.
         """
         
-        # Gastos en compras
-        compras_query = """
-        SELECT 
-            SUM(Total) as total_compras,
-            COUNT(*) as numero_compras,
-            AVG(Total) as compra_promedio
-        FROM Compra 
-        WHERE Fecha >= ?
-        """
+        fecha_inicio = (datetime.now() - timedelta(days=months*30)).replace(hour=0, minute=0, second=0, microsecond=0)
+        fecha_fin = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
         
-        # Ingresos por consultas (estimado)
-        consultas_query = """
-        SELECT 
-            SUM(e.Precio_Normal) as ingresos_consultas_estimados,
-            COUNT(c.id) as total_consultas
-        FROM Consultas c
-        INNER JOIN Especialidad e ON c.Id_Especialidad = e.id
-        WHERE c.Fecha >= ?
-        """
+        por_categoria = self.resumen_financiero_repo.get_totales_por_categoria(fecha_inicio, fecha_fin)
+        serie_mensual = self.resumen_financiero_repo.get_serie(
+            fecha_inicio, fecha_fin, agrupar_por='mes', por_categoria=True
+        )
         
-        # Tendencia mensual
-        tendencia_query = """
-        SELECT 
-            FORMAT(fecha_mes, 'yyyy-MM') as mes,
-            COALESCE(ingresos, 0) as ingresos_mes,
-            COALESCE(gastos, 0) as gastos_mes,
-            COALESCE(ingresos, 0) - COALESCE(gastos, 0) as balance_mes
-        FROM (
-            SELECT DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1) as fecha_mes,
-                   SUM(Total) as ingresos,
-                   0 as gastos
-            FROM Ventas 
-            WHERE Fecha >= ?
-            GROUP BY YEAR(Fecha), MONTH(Fecha)
-            
-            UNION ALL
-            
-            SELECT DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1) as fecha_mes,
-                   0 as ingresos,
-                   SUM(Monto) as gastos
-            FROM Gastos 
-            WHERE Fecha >= ?
-            GROUP BY YEAR(Fecha), MONTH(Fecha)
-        ) movimientos
-        GROUP BY fecha_mes
-        ORDER BY fecha_mes DESC
-        """
+        def promedio(datos: Dict[str, Any]) -> float:
+            return round(datos['total'] / datos['cantidad'], 2) if datos['cantidad'] else 0.0
         
-        ingresos = self._execute_query(ingresos_query, (fecha_inicio,), fetch_one=True)
-        gastos = self._execute_query(gastos_query, (fecha_inicio,), fetch_one=True)
-        compras = self._execute_query(compras_query, (fecha_inicio,), fetch_one=True)
-        consultas = self._execute_query(consultas_query, (fecha_inicio,), fetch_one=True)
-        tendencia = self._execute_query(tendencia_query, (fecha_inicio, fecha_inicio))
+        farmacia = por_categoria['FARMACIA']
+        gastos_operativos = por_categoria['GASTOS']
+        compras = por_categoria['COMPRAS']
+        consultas = por_categoria['CONSULTAS']
         
-        # Calcular métricas
-        total_ingresos = safe_float(ingresos.get('total_ingresos', 0))
-        total_gastos = safe_float(gastos.get('total_gastos', 0))
-        total_compras = safe_float(compras.get('total_compras', 0))
+        # Métricas (farmacia frente a gastos operativos)
+        total_ingresos = farmacia['total']
+        total_gastos = gastos_operativos['total']
+        total_compras = compras['total']
         
         balance_neto = total_ingresos - total_gastos
         margen_beneficio = calculate_percentage(balance_neto, total_ingresos) if total_ingresos > 0 else 0
         
+        # Toda la clínica: ingresos de todas las categorías menos gastos y compras
+        ingresos_clinica = round(sum(v['total'] for v in por_categoria.values() if v['tipo'] == 'INGRESO'), 2)
+        balance_clinica = round(ingresos_clinica - total_gastos - total_compras, 2)
+        
+        # Tendencia mensual (más reciente primero): ventas de farmacia frente a gastos operativos
+        meses: Dict[Any, Dict[str, float]] = {}
+        for fila in serie_mensual:
+            mes = meses.setdefault(fila['periodo'], {'ingresos_mes': 0.0, 'gastos_mes': 0.0})
+            if fila['Categoria'] == 'FARMACIA':
+                mes['ingresos_mes'] += safe_float(fila.get('total', 0))
+            elif fila['Categoria'] == 'GASTOS':
+                mes['gastos_mes'] += safe_float(fila.get('total', 0))
+        tendencia = [
+            {
+                'mes': fecha_mes.strftime('%Y-%m'),
+                'ingresos_mes': round(valores['ingresos_mes'], 2),
+                'gastos_mes': round(valores['gastos_mes'], 2),
+                'balance_mes': round(valores['ingresos_mes'] - valores['gastos_mes'], 2)
+            }
+            for fecha_mes, valores in sorted(meses.items(), reverse=True)
+        ]
+        
         return {
             'periodo_meses': months,
-            'ingresos': ingresos,
-            'gastos_operativos': gastos,
-            'gastos_compras': compras,
-            'ingresos_consultas': consultas,
+            'ingresos': {
+                'total_ingresos': total_ingresos,
+                'total_ventas': farmacia['cantidad'],
+                'venta_promedio': promedio(farmacia)
+            },
+            'gastos_operativos': {
+                'total_gastos': total_gastos,
+                'total_transacciones': gastos_operativos['cantidad'],
+                'gasto_promedio': promedio(gastos_operativos)
+            },
+            'gastos_compras': {
+                'total_compras': total_compras,
+                'numero_compras': compras['cantidad'],
+                'compra_promedio': promedio(compras)
+            },
+            'ingresos_consultas': {
+                'ingresos_consultas_estimados': consultas['total'],
+                'total_consultas': consultas['cantidad']
+            },
+            'ingresos_por_categoria': por_categoria,
             'resumen': {
                 'total_ingresos': total_ingresos,
                 'total_gastos': total_gastos,
@@ -183,6 +170,10 @@ class EstadisticaRepository(BaseRepository):
                 'balance_neto': balance_neto,
                 'margen_beneficio': margen_beneficio
             },
+            'clinica': {
+                'total_ingresos_clinica': ingresos_clinica,
+                'balance_clinica': balance_clinica
+            },
             'tendencia_mensual': tendencia
         }
     
@@ -320,27 +311,6 @@ class EstadisticaRepository(BaseRepository):
         FROM Productos
         """
         
-        # Productos más vendidos (últimos 30 días)
-        mas_vendidos_query = """
-        SELECT TOP 15
-            p.Codigo,
-            p.Nombre as producto_nombre,
-            m.Nombre as marca_nombre,
-            SUM(dv.Cantidad_Unitario) as unidades_vendidas,
-            SUM(dv.Cantidad_Unitario * dv.Precio_Unitario) as ingresos_producto,
-            COUNT(DISTINCT v.id) as numero_ventas,
-            AVG(dv.Precio_Unitario) as precio_promedio,
-            (p.Stock_Caja + p.Stock_Unitario) as stock_actual
-        FROM Productos p
-        INNER JOIN Marca m ON p.ID_Marca = m.id
-        INNER JOIN Lote l ON p.id = l.Id_Producto
-        INNER JOIN DetallesVentas dv ON l.id = dv.Id_Lote
-        INNER JOIN Ventas v ON dv.Id_Venta = v.id
-        WHERE v.Fecha >= DATEADD(DAY, -30, GETDATE())
-        GROUP BY p.id, p.Codigo, p.Nombre, m.Nombre, p.Stock_Caja, p.Stock_Unitario
-        ORDER BY unidades_vendidas DESC
-        """
-        
         # Análisis de vencimientos
         vencimientos_query = """
         SELECT 
@@ -367,7 +337,8 @@ class EstadisticaRepository(BaseRepository):
         """
         
         inventario = self._execute_query(inventario_query, fetch_one=True)
-        mas_vendidos = self._execute_query(mas_vendidos_query)
+        # Productos más vendidos (últimos 30 días) con margen, desde el resumen diario
+        mas_vendidos = self.resumen_ventas_repo.get_margenes_productos(30, 15)
         vencimientos = self._execute_query(vencimientos_query, fetch_one=True)
         marcas = self._execute_query(marcas_query)
         
@@ -10,12 +10,14 @@ from ..core.utils import (
     get_current_datetime, format_date_for_db, get_date_range_query,
     validate_required_string, validate_positive_number, safe_float
 )
+from .resumen_financiero_repository import ResumenFinancieroRepository
 
 class GastoRepository(BaseRepository):
     """Repository para gestión de Gastos y Tipos de Gastos"""
     
     def __init__(self):
         super().__init__('Gastos', 'gastos')
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("💸 GastoRepository inicializado")
     
     # ===============================
@@ -122,6 +124,7 @@ class GastoRepository(BaseRepository):
         if proveedor_id and proveedor_id > 0:
             self.increment_provider_gasto_usage(proveedor_id)
         
+        self.resumen_financiero_repo.registrar_movimiento('GASTOS', gasto_id)
         print(f"💸 Gasto creado: Tipo ID {tipo_gasto_id}, Monto ${monto} - ID: {gasto_id}")
         
         return gasto_id
@@ -131,7 +134,8 @@ class GastoRepository(BaseRepository):
                       proveedor_id: int = None) -> bool:
         """Actualiza gasto existente - ACTUALIZADO CON ID_Proveedor"""
         # Verificar existencia
-        if not self.get_by_id(gasto_id):
+        gasto_actual = self.get_by_id(gasto_id)
+        if not gasto_actual:
             raise ValidationError("gasto_id", gasto_id, "Gasto no encontrado")
         
         update_data = {}
@@ -167,6 +171,10 @@ class GastoRepository(BaseRepository):
         
         success = self.update(gasto_id, update_data)
         if success:
+            if 'Monto' in update_data or 'Fecha' in update_data:
+                self.resumen_financiero_repo.recalcular_dias(
+                    'GASTOS', [gasto_actual.get('Fecha'), update_data.get('Fecha')]
+                )
             print(f"💸 Gasto actualizado: ID {gasto_id}")
         
         return success
@@ -247,6 +255,20 @@ class GastoRepository(BaseRepository):
         result = self._execute_query(query, (start_date, end_date))
         return self._format_dates_in_results(result)
     
+    def get_totales_gastos(self, fecha_inicio: datetime, fecha_fin: datetime,
+                           agrupar_por: str = None):
+        """
+        Total, cantidad y promedio de gastos en [fecha_inicio, fecha_fin) calculados en SQL.
+        agrupar_por: None, 'dia', 'hora', 'mes', 'usuario' o 'tipo'
+        """
+        return self._get_agregados(
+            'g.Monto', 'Gastos g INNER JOIN Tipo_Gastos tg ON g.ID_Tipo = tg.id',
+            'g.Fecha', fecha_inicio, fecha_fin,
+            agrupaciones={'usuario': 'g.Id_RegistradoPor', 'tipo': 'tg.Nombre'},
+            agrupar_por=agrupar_por,
+            where_extra='g.Monto > 0'
+        )
+    
     def get_gastos_del_mes(self, año: int = None, mes: int = None) -> List[Dict[str, Any]]:
         """Obtiene gastos del mes específico - ACTUALIZADO"""
         if not año:
@@ -446,12 +468,15 @@ class GastoRepository(BaseRepository):
     def delete_expense(self, gasto_id: int) -> bool:
         """Elimina un gasto por ID"""
         try:
+            gasto = self.get_by_id(gasto_id)
             query = "DELETE FROM Gastos WHERE id = ?"
             result = self._execute_query(query, (gasto_id,), fetch_one=False)
             
             if result is not None:
                 if hasattr(self, '_cache_manager'):
                     self._cache_manager.clear()
+                if gasto:
+                    self.resumen_financiero_repo.recalcular_dias('GASTOS', [gasto.get('Fecha')])
                 print(f"✅ Gasto {gasto_id} eliminado exitosamente")
                 return True
             return False
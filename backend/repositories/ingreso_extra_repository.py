@@ -3,6 +3,7 @@ from datetime import datetime
 
 from ..core.base_repository import BaseRepository
 from ..core.database_conexion import DatabaseConnection
+from .resumen_financiero_repository import ResumenFinancieroRepository
 
 class IngresoExtraRepository(BaseRepository):
     """Repository para gestión de Ingresos Extras"""
@@ -11,6 +12,7 @@ class IngresoExtraRepository(BaseRepository):
         # ✅ Pasar table_name y cache_type al constructor base
         super().__init__("IngresosExtras", "ingresos_extras")
         self.db = DatabaseConnection()
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("💰 IngresoExtraRepository inicializado")
     
     def agregar_ingreso_extra(self, descripcion: str, monto: float, fecha: str, id_usuario: int) -> Tuple[bool, Any]:
@@ -32,6 +34,8 @@ class IngresoExtraRepository(BaseRepository):
             cursor.close()
             conn.close()
             
+            self.resumen_financiero_repo.recalcular_dias('INGRESOS_EXTRAS', [fecha])
+            
             print(f"✅ Ingreso extra agregado exitosamente")
             return True, "Ingreso extra agregado correctamente"
                 
@@ -55,11 +59,14 @@ class IngresoExtraRepository(BaseRepository):
             
             conn = self.db.get_connection()
             cursor = conn.cursor()
+            fecha_anterior = self._fecha_ingreso(cursor, id_ingreso)
             cursor.execute(query, params)
             conn.commit()
             cursor.close()
             conn.close()
             
+            self.resumen_financiero_repo.recalcular_dias('INGRESOS_EXTRAS', [fecha_anterior, fecha])
+            
             print(f"✅ Ingreso extra actualizado ID: {id_ingreso}")
             return True, "Ingreso extra actualizado correctamente"
                 
@@ -79,11 +86,14 @@ class IngresoExtraRepository(BaseRepository):
             
             conn = self.db.get_connection()
             cursor = conn.cursor()
+            fecha_anterior = self._fecha_ingreso(cursor, id_ingreso)
             cursor.execute(query, params)
             conn.commit()
             cursor.close()
             conn.close()
             
+            self.resumen_financiero_repo.recalcular_dias('INGRESOS_EXTRAS', [fecha_anterior])
+            
             print(f"✅ Ingreso extra eliminado ID: {id_ingreso}")
             return True, "Ingreso extra eliminado correctamente"
                 
@@ -93,6 +103,12 @@ class IngresoExtraRepository(BaseRepository):
             traceback.print_exc()
             return False, f"Error inesperado: {str(e)}"
     
+    def _fecha_ingreso(self, cursor, id_ingreso: int):
+        """Fecha actual del ingreso (para recalcular su día en el resumen financiero)"""
+        cursor.execute("SELECT fecha FROM IngresosExtras WHERE id = ?", (id_ingreso,))
+        fila = cursor.fetchone()
+        return fila[0] if fila else None
+    
     def obtener_todos_ingresos_extras(self) -> Tuple[bool, List[Dict[str, Any]]]:
         """Obtiene todos los ingresos extras con información del usuario"""
         try:
@@ -9,12 +9,14 @@ from ..core.cache_system import cached_query
 from ..core.utils import (
     validate_required_string, validate_positive_number, safe_float
 )
+from .resumen_financiero_repository import ResumenFinancieroRepository
 
 class LaboratorioRepository(BaseRepository):
     """Repository para gestión de Exámenes de Laboratorio con paginación SQL"""
     
     def __init__(self):
         super().__init__('Laboratorio', 'laboratorio')
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
     
     # ===============================
     # IMPLEMENTACIÓN ABSTRACTA
@@ -205,6 +207,22 @@ class LaboratorioRepository(BaseRepository):
                 'error': str(e)
             }
     
+    def get_totales_laboratorio(self, fecha_inicio: datetime, fecha_fin: datetime,
+                                agrupar_por: str = None):
+        """
+        Ingresos de laboratorio (precio del análisis según tipo) calculados en SQL,
+        con el mismo precio que el cierre de caja: Emergencia o, si no, Normal.
+        agrupar_por: None, 'dia', 'hora', 'mes', 'usuario' o 'tipo'
+        """
+        precio = """COALESCE(CASE WHEN l.Tipo = 'Emergencia'
+            THEN ta.Precio_Emergencia ELSE ta.Precio_Normal END, 0)"""
+        return self._get_agregados(
+            precio, 'Laboratorio l LEFT JOIN Tipos_Analisis ta ON l.Id_Tipo_Analisis = ta.id',
+            'l.Fecha', fecha_inicio, fecha_fin,
+            agrupaciones={'usuario': 'l.Id_RegistradoPor', 'tipo': 'l.tipo'},
+            agrupar_por=agrupar_por
+        )
+    
     def get_exam_count_with_filters(self, search_term: str = "", tipo_analisis: str = "",
                                tipo_servicio: str = "", fecha_desde: str = "",
                                fecha_hasta: str = "") -> int:
@@ -558,6 +576,8 @@ class LaboratorioRepository(BaseRepository):
         }
         
         lab_id = self.insert(lab_data)
+        if lab_id:
+            self.resumen_financiero_repo.registrar_movimiento('LABORATORIO', lab_id)
         print(f"🧪 Examen creado - ID {lab_id}")
         return lab_id
     
@@ -595,9 +615,19 @@ class LaboratorioRepository(BaseRepository):
         
         success = self.update(lab_id, update_data)
         if success:
+            if 'Id_Tipo_Analisis' in update_data or 'tipo' in update_data:
+                self.resumen_financiero_repo.recalcular_dias('LABORATORIO', [existing_exam.get('Fecha')])
             print(f"🔬 Examen de laboratorio actualizado: ID {lab_id}")
         
         return success
+
+    def delete(self, record_id: int) -> bool:
+        """Elimina el examen y recalcula el resumen financiero de su día"""
+        examen = self.get_by_id(record_id)
+        success = super().delete(record_id)
+        if success and examen:
+            self.resumen_financiero_repo.recalcular_dias('LABORATORIO', [examen.get('Fecha')])
+        return success
     
     def assign_worker_to_exam(self, lab_id: int, trabajador_id: int) -> bool:
         """Asigna trabajador a examen de laboratorio"""
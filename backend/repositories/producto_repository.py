@@ -10,12 +10,17 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
 import traceback
+import threading
 
 from ..core.config_fifo import config_fifo
 from ..core.base_repository import BaseRepository
+from ..core.alertas_inventario import get_motor_alertas, get_hilo_alertas
+from ..core.utils import parsear_numero
+from .resumen_ventas_repository import ResumenVentasRepository
+from .valoracion_inventario_repository import ValoracionInventarioRepository
 from ..core.excepciones import (
-    ProductoNotFoundError, StockInsuficienteError, ProductoVencidoError,
-    ValidationError, ExceptionHandler, validate_required, validate_positive_number
+    ProductoNotFoundError, StockInsuficienteError, ProductoVencidoError, ConflictoConcurrenciaError,
+    ValidationError, ExceptionHandler, validate_required, validate_positive_number, es_error_concurrencia
 )
 
 class ProductoRepository(BaseRepository):
@@ -23,6 +28,10 @@ class ProductoRepository(BaseRepository):
     
     def __init__(self):
         super().__init__('Productos', 'productos')
+        get_motor_alertas().configurar_cargador(self._cargar_datos_alertas)
+        get_hilo_alertas().configurar_calculo(self.calcular_alertas)
+        self.resumen_ventas_repo = ResumenVentasRepository()
+        self.valoracion_repo = ValoracionInventarioRepository()
         print("📦 ProductoRepository inicializado - CORREGIDO COMPLETO")
     
     def get_active(self) -> List[Dict[str, Any]]:
@@ -148,19 +157,8 @@ class ProductoRepository(BaseRepository):
         return resultados if resultados else []
     
     def get_productos_bajo_stock(self, stock_minimo: int = 10) -> List[Dict[str, Any]]:
-        """Obtiene productos con stock bajo"""
-        query = """
-        SELECT 
-            p.*, m.Nombre as Marca_Nombre,
-            ISNULL((SELECT SUM(l.Cantidad_Unitario) FROM Lote l WHERE l.Id_Producto = p.id), 0) as Stock_Total
-        FROM Productos p
-        INNER JOIN Marca m ON p.ID_Marca = m.id
-        WHERE (SELECT ISNULL(SUM(l.Cantidad_Unitario), 0) 
-            FROM Lote l WHERE l.Id_Producto = p.id) <= ?
-        ORDER BY (SELECT ISNULL(SUM(l.Cantidad_Unitario), 0) 
-                FROM Lote l WHERE l.Id_Producto = p.id)
-        """
-        return self._execute_query(query, (stock_minimo,), use_cache=False)
+        """Obtiene productos con stock bajo (desde el motor de alertas)"""
+        return get_motor_alertas().productos_bajo_stock(stock_minimo)
     
     def get_lotes_producto(self, producto_id: int, solo_activos: bool = True) -> List[Dict[str, Any]]:
         """Obtiene lotes de un producto ordenados por FIFO"""
@@ -289,64 +287,139 @@ class ProductoRepository(BaseRepository):
             return None
     
     def get_lotes_por_vencer(self, dias_adelante: int = 90) -> List[Dict[str, Any]]:
-        """Obtiene lotes que vencen en X días"""
-        query = """
-        SELECT l.*, p.Codigo, p.Nombre as Producto_Nombre, m.Nombre as Marca_Nombre,
-            l.Cantidad_Unitario as Stock_Lote,
-            DATEDIFF(DAY, GETDATE(), l.Fecha_Vencimiento) as Dias_Para_Vencer
-        FROM Lote l
-        INNER JOIN Productos p ON l.Id_Producto = p.id
-        INNER JOIN Marca m ON p.ID_Marca = m.id
-        WHERE l.Fecha_Vencimiento <= DATEADD(DAY, ?, GETDATE())
-        AND l.Fecha_Vencimiento >= GETDATE()
-        AND l.Cantidad_Unitario > 0
-        ORDER BY l.Fecha_Vencimiento ASC
-        """
-        
+        """Obtiene lotes que vencen en X días (desde el motor de alertas)"""
         try:
-            return self._execute_query(query, (dias_adelante,), use_cache=False) or []
+            return get_motor_alertas().lotes_por_vencer(dias_adelante)
         except Exception:
             return []
         
     def get_lotes_vencidos(self) -> List[Dict[str, Any]]:
-        """Obtiene lotes vencidos con stock"""
-        query = """
-        SELECT l.*, p.Codigo, p.Nombre as Producto_Nombre, m.Nombre as Marca_Nombre,
-            l.Cantidad_Unitario as Stock_Lote,
-            DATEDIFF(DAY, l.Fecha_Vencimiento, GETDATE()) as Dias_Vencido
+        """Obtiene lotes vencidos con stock (desde el motor de alertas)"""
+        try:
+            return get_motor_alertas().lotes_vencidos()
+        except Exception:
+            return []
+    
+    def _cargar_datos_alertas(self, producto_ids: Optional[List[int]] = None):
+        """
+        Cargador del motor de alertas: productos y lotes con stock.
+        Con producto_ids solo relee esos productos (evento de lotes).
+        """
+        filtro_productos = ""
+        filtro_lotes = ""
+        params = ()
+        if producto_ids:
+            placeholders = ', '.join('?' * len(producto_ids))
+            filtro_productos = f"WHERE p.id IN ({placeholders})"
+            filtro_lotes = f"AND l.Id_Producto IN ({placeholders})"
+            params = tuple(producto_ids)
+        
+        query_productos = f"""
+        SELECT p.*, m.Nombre as Marca_Nombre
+        FROM Productos p
+        LEFT JOIN Marca m ON p.ID_Marca = m.id
+        {filtro_productos}
+        """
+        query_lotes = f"""
+        SELECT l.*
         FROM Lote l
-        INNER JOIN Productos p ON l.Id_Producto = p.id
-        INNER JOIN Marca m ON p.ID_Marca = m.id
-        WHERE l.Fecha_Vencimiento < GETDATE()
-        AND l.Cantidad_Unitario > 0
-        ORDER BY l.Fecha_Vencimiento ASC
+        WHERE l.Cantidad_Unitario > 0
+        {filtro_lotes}
         """
         
+        # Conexión propia: un error debe distinguirse de "sin resultados"
+        conn = None
         try:
-            return self._execute_query(query, use_cache=False) or []
-        except Exception:
-            return []
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(query_productos, params)
+            productos = [self._row_to_dict(cursor, row) for row in cursor.fetchall()]
+            
+            cursor.execute(query_lotes, params)
+            lotes = [self._row_to_dict(cursor, row) for row in cursor.fetchall()]
+            
+            return productos, lotes
+        except Exception as e:
+            print(f"❌ Error cargando datos de alertas: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+    
+    def _registrar_cambio_lotes(self, producto_ids: Optional[List[int]] = None):
+        """Notifica al motor de alertas que cambiaron lotes (None = todos)"""
+        try:
+            get_motor_alertas().registrar_cambio_lotes(producto_ids)
+        except Exception as e:
+            print(f"⚠️ Error notificando cambio de lotes: {e}")
     
     def verificar_disponibilidad_fifo(self, producto_id: int, cantidad_necesaria: int) -> Dict[str, Any]:
         """Verifica disponibilidad de stock usando FIFO"""
-        lotes = self.get_lotes_producto(producto_id, solo_activos=True)
-        
+        resultado = self.verificar_disponibilidad_fifo_multiple({producto_id: cantidad_necesaria})
+        return resultado.get(producto_id) or self._asignar_lotes_fifo([], cantidad_necesaria)
+
+    def verificar_disponibilidad_fifo_multiple(self, cantidades: Dict[int, int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Verifica disponibilidad FIFO de un carrito completo en UNA sola consulta
+
+        Args:
+            cantidades: {producto_id: cantidad_necesaria}
+
+        Returns:
+            {producto_id: {disponible, lotes_necesarios, cantidad_total_disponible,
+                           tiene_vencidos, cantidad_faltante}}
+        """
+        cantidades = {
+            int(producto_id): int(cantidad)
+            for producto_id, cantidad in (cantidades or {}).items()
+            if producto_id and int(cantidad) > 0
+        }
+        if not cantidades:
+            return {}
+
+        placeholders = ', '.join(['?' for _ in cantidades])
+        query = f"""
+        SELECT l.id, l.Id_Producto, l.Fecha_Vencimiento,
+               l.Cantidad_Unitario as Stock_Lote,
+               CASE
+                   WHEN l.Fecha_Vencimiento < GETDATE() THEN 'VENCIDO'
+                   WHEN l.Fecha_Vencimiento < DATEADD(MONTH, 3, GETDATE()) THEN 'POR_VENCER'
+                   ELSE 'VIGENTE'
+               END as Estado_Vencimiento
+        FROM Lote l
+        WHERE l.Id_Producto IN ({placeholders}) AND l.Cantidad_Unitario > 0
+        ORDER BY l.Id_Producto, l.Fecha_Vencimiento ASC, l.id ASC
+        """
+        lotes = self._execute_query(query, tuple(cantidades.keys()), use_cache=False) or []
+
+        lotes_por_producto = {producto_id: [] for producto_id in cantidades}
+        for lote in lotes:
+            lotes_por_producto.setdefault(lote['Id_Producto'], []).append(lote)
+
+        return {
+            producto_id: self._asignar_lotes_fifo(lotes_por_producto[producto_id], cantidad)
+            for producto_id, cantidad in cantidades.items()
+        }
+
+    def _asignar_lotes_fifo(self, lotes: List[Dict[str, Any]], cantidad_necesaria: int) -> Dict[str, Any]:
+        """Reparte la cantidad necesaria entre lotes ya ordenados por FIFO"""
         cantidad_restante = cantidad_necesaria
         lotes_a_usar = []
         cantidad_total = 0
         tiene_vencidos = False
-        
+
         for lote in lotes:
             if cantidad_restante <= 0:
                 break
-            
+
             stock_lote = lote['Stock_Lote']
             cantidad_total += stock_lote
-            
+
             if lote['Estado_Vencimiento'] == 'VENCIDO':
                 tiene_vencidos = True
                 continue
-            
+
             cantidad_a_tomar = min(cantidad_restante, stock_lote)
             lotes_a_usar.append({
                 'lote_id': lote['id'],
@@ -354,100 +427,152 @@ class ProductoRepository(BaseRepository):
                 'fecha_vencimiento': lote['Fecha_Vencimiento'],
                 'estado': lote['Estado_Vencimiento']
             })
-            
+
             cantidad_restante -= cantidad_a_tomar
-        
+
         return {
             'disponible': cantidad_restante <= 0,
             'lotes_necesarios': lotes_a_usar,
             'cantidad_total_disponible': cantidad_total,
             'tiene_vencidos': tiene_vencidos,
-            'cantidad_faltante': max(0, cantidad_restante)
+            'cantidad_faltante': max(0, cantidad_restante),
+            'stock_total': sum(lote['Stock_Lote'] for lote in lotes),
+            'lotes_activos': len(lotes)
         }
     
+    # ===============================
+    # DESCUENTO FIFO CONCURRENTE (varias cajas)
+    # ===============================
+    
+    # Reintentos cuando otra caja consumió el lote entre la lectura y el descuento.
+    # Sin espera entre intentos: la transacción sigue abierta y retiene los bloqueos ya tomados.
+    MAX_REINTENTOS_FIFO = 3
+    
+    _metricas_fifo = {'descuentos': 0, 'conflictos': 0, 'reintentos': 0, 'agotados': 0}
+    _metricas_fifo_lock = threading.Lock()
+    
     @ExceptionHandler.handle_exception
-    def reducir_stock_fifo(self, producto_id: int, cantidad: int) -> List[Dict[str, Any]]:
-        """Reduce stock usando método FIFO"""
+    def reducir_stock_fifo(self, producto_id: int, cantidad: int, conn=None) -> List[Dict[str, Any]]:
+        """
+        Reduce stock usando método FIFO con concurrencia optimista.
+        Cada lote se descuenta de forma relativa y condicionada
+        (Cantidad_Unitario = Cantidad_Unitario - n WHERE Cantidad_Unitario >= n);
+        si otra caja lo consumió antes, se deshace el intento y se reintenta con lotes frescos.
+        Con `conn` se trabaja dentro de la transacción del llamador (sin commit).
+        StockInsuficienteError solo si el stock releído no alcanza; los conflictos agotados
+        y los deadlocks salen como ConflictoConcurrenciaError y el resto de errores de BD se propagan.
+        """
         validate_required(producto_id, "producto_id")
         validate_positive_number(cantidad, "cantidad")
         
-        disponibilidad = self.verificar_disponibilidad_fifo(producto_id, cantidad)
-        if not disponibilidad['disponible']:
-            raise StockInsuficienteError(
-                f"Producto ID {producto_id}", 
-                disponibilidad['cantidad_total_disponible'], 
-                cantidad
-            )
-        
-        conn = None
+        conexion_propia = conn is None
         lotes_afectados = []
         
         try:
-            conn = self._get_connection()
+            if conexion_propia:
+                conn = self._get_connection()
             cursor = conn.cursor()
             
-            query_lotes = """
-            SELECT l.id, l.Cantidad_Unitario, l.Fecha_Vencimiento
-            FROM Lote l
-            WHERE l.Id_Producto = ? AND l.Cantidad_Unitario > 0
-            ORDER BY l.Fecha_Vencimiento ASC, l.id ASC
-            """
-            
-            cursor.execute(query_lotes, (producto_id,))
-            lotes_disponibles = cursor.fetchall()
-            
-            if not lotes_disponibles:
-                raise StockInsuficienteError(f"Producto ID {producto_id}", 0, cantidad)
-            
-            cantidad_restante = cantidad
-            
-            for lote in lotes_disponibles:
-                if cantidad_restante <= 0:
+            for intento in range(self.MAX_REINTENTOS_FIFO + 1):
+                lotes_afectados = self._descontar_lotes_fifo(cursor, producto_id, cantidad, intento)
+                if lotes_afectados is not None:
                     break
-                
-                lote_id = lote[0]
-                stock_lote = lote[1]
-                fecha_vencimiento = lote[2]
-                
-                cantidad_a_reducir = min(cantidad_restante, stock_lote)
-                nuevo_stock_lote = stock_lote - cantidad_a_reducir
-                
-                cursor.execute("UPDATE Lote SET Cantidad_Unitario = ? WHERE id = ?", 
-                             (nuevo_stock_lote, lote_id))
-                
-                lotes_afectados.append({
-                    'lote_id': lote_id,
-                    'cantidad_original': stock_lote,
-                    'cantidad_reducida': cantidad_a_reducir,
-                    'cantidad_final': nuevo_stock_lote,
-                    'fecha_vencimiento': fecha_vencimiento
-                })
-                
-                cantidad_restante -= cantidad_a_reducir
-            
-            if cantidad_restante > 0:
-                raise StockInsuficienteError(
-                    f"Producto ID {producto_id}", 
-                    cantidad - cantidad_restante, 
-                    cantidad
+                if intento < self.MAX_REINTENTOS_FIFO:
+                    self._sumar_metrica_fifo('reintentos')
+            else:
+                self._sumar_metrica_fifo('agotados')
+                raise ConflictoConcurrenciaError(
+                    f"Lotes del producto ID {producto_id} consumidos por otra caja en cada intento",
+                    operation="reducir_stock_fifo"
                 )
             
-            conn.commit()
-            self._invalidate_cache_after_modification()
+            self._sumar_metrica_fifo('descuentos')
+            
+            if conexion_propia:
+                conn.commit()
+                self._invalidate_cache_after_modification()
+                self._registrar_cambio_lotes([producto_id])
             
             return lotes_afectados
             
         except Exception as e:
-            if conn:
+            if conexion_propia and conn:
                 conn.rollback()
-            raise StockInsuficienteError(
-                f"Producto ID {producto_id}", 
-                cantidad - cantidad_restante, 
-                cantidad
-            )
+            if not isinstance(e, (StockInsuficienteError, ConflictoConcurrenciaError)):
+                print(f"❌ Error en descuento FIFO de producto {producto_id}: {e}")
+                if es_error_concurrencia(e):
+                    raise ConflictoConcurrenciaError(
+                        f"Deadlock descontando producto ID {producto_id}",
+                        operation="reducir_stock_fifo", original_error=e
+                    ) from e
+            raise
         finally:
-            if conn:
+            if conexion_propia and conn:
                 conn.close()
+    
+    def _descontar_lotes_fifo(self, cursor, producto_id: int, cantidad: int, intento: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Un intento de descuento FIFO dentro de un savepoint.
+        Retorna los lotes usados, o None si hubo conflicto (el savepoint ya se deshizo).
+        """
+        cursor.execute("""
+            SELECT l.id, l.Cantidad_Unitario, l.Fecha_Vencimiento
+            FROM Lote l
+            WHERE l.Id_Producto = ? AND l.Cantidad_Unitario > 0
+            ORDER BY l.Fecha_Vencimiento ASC, l.id ASC
+        """, (producto_id,))
+        lotes_disponibles = cursor.fetchall()
+        
+        disponible = sum(lote[1] for lote in lotes_disponibles)
+        if disponible < cantidad:
+            raise StockInsuficienteError(f"Producto ID {producto_id}", disponible, cantidad)
+        
+        savepoint = f"fifo_{intento}"
+        cursor.execute(f"SAVE TRANSACTION {savepoint}")
+        
+        lotes_afectados = []
+        cantidad_restante = cantidad
+        for lote_id, stock_lote, fecha_vencimiento in lotes_disponibles:
+            if cantidad_restante <= 0:
+                break
+            
+            cantidad_a_reducir = min(cantidad_restante, stock_lote)
+            cursor.execute("""
+                UPDATE Lote SET Cantidad_Unitario = Cantidad_Unitario - ?
+                WHERE id = ? AND Cantidad_Unitario >= ?
+            """, (cantidad_a_reducir, lote_id, cantidad_a_reducir))
+            
+            if cursor.rowcount == 0:
+                # Otra caja descontó de este lote después de nuestra lectura
+                cursor.execute(f"ROLLBACK TRANSACTION {savepoint}")
+                self._sumar_metrica_fifo('conflictos')
+                print(f"⚠️ Conflicto de concurrencia en lote {lote_id} (producto {producto_id}), intento {intento + 1}")
+                return None
+            
+            lotes_afectados.append({
+                'lote_id': lote_id,
+                'cantidad_original': stock_lote,
+                'cantidad_reducida': cantidad_a_reducir,
+                'cantidad_final': stock_lote - cantidad_a_reducir,
+                'fecha_vencimiento': fecha_vencimiento
+            })
+            cantidad_restante -= cantidad_a_reducir
+        
+        return lotes_afectados
+    
+    @classmethod
+    def _sumar_metrica_fifo(cls, nombre: str):
+        with cls._metricas_fifo_lock:
+            cls._metricas_fifo[nombre] += 1
+    
+    @classmethod
+    def get_metricas_concurrencia(cls) -> Dict[str, Any]:
+        """Contadores de descuentos FIFO: exitosos, conflictos, reintentos y agotados (sin éxito tras reintentar)"""
+        with cls._metricas_fifo_lock:
+            metricas = dict(cls._metricas_fifo)
+        intentos = metricas['descuentos'] + metricas['conflictos']
+        metricas['tasa_conflicto'] = round(metricas['conflictos'] / intentos, 4) if intentos else 0.0
+        return metricas
 
     @ExceptionHandler.handle_exception
     def crear_producto_con_lote_inicial(self, datos_producto: dict, datos_lote: dict) -> int:
@@ -525,6 +650,7 @@ class ProductoRepository(BaseRepository):
 
             conn.commit()
             self._invalidate_cache_after_modification()
+            self._registrar_cambio_lotes([producto_id])
             
             return producto_id
             
@@ -601,6 +727,7 @@ class ProductoRepository(BaseRepository):
             
             # Commit de toda la transacción
             conn.commit()
+            self._registrar_cambio_lotes([producto_id])
             
             # Limpiar cache
             try:
@@ -623,6 +750,7 @@ class ProductoRepository(BaseRepository):
         """Método auxiliar para eliminar lote en caso de rollback"""
         try:
             self._execute_query("DELETE FROM Lote WHERE id = ?", (lote_id,), fetch_all=False, use_cache=False)
+            self._registrar_cambio_lotes()
         except Exception:
             pass
     
@@ -656,6 +784,7 @@ class ProductoRepository(BaseRepository):
             
             if filas_afectadas > 0:
                 self._invalidate_cache_after_modification()
+                self._registrar_cambio_lotes([producto_id])
                 return True
             else:
                 return False
@@ -686,6 +815,7 @@ class ProductoRepository(BaseRepository):
             if productos_eliminados > 0:
                 conn.commit()
                 self._invalidate_cache_after_modification()
+                self._registrar_cambio_lotes([producto_id])
                 return True
             else:
                 raise Exception("Producto no encontrado")
@@ -716,6 +846,7 @@ class ProductoRepository(BaseRepository):
             
             if filas_afectadas > 0:
                 self._invalidate_cache_after_modification()
+                self._registrar_cambio_lotes([producto_id])
                 return True
             else:
                 return False
@@ -757,6 +888,7 @@ class ProductoRepository(BaseRepository):
             
             if filas_afectadas > 0:
                 self._invalidate_cache_after_modification()
+                self._registrar_cambio_lotes([producto_id])
                 return True
             else:
                 return False
@@ -778,43 +910,27 @@ class ProductoRepository(BaseRepository):
         }
     
     def get_productos_mas_vendidos(self, dias: int = 30) -> List[Dict[str, Any]]:
-        """Productos más vendidos en X días"""
-        query = """
-        SELECT TOP 20
-            p.id, p.Codigo, p.Nombre, m.Nombre as Marca_Nombre,
-            SUM(dv.Cantidad_Unitario) as Total_Vendido,
-            COUNT(dv.id) as Num_Ventas,
-            AVG(dv.Precio_Unitario) as Precio_Promedio,
-            (SELECT ISNULL(SUM(l2.Cantidad_Unitario), 0) FROM Lote l2 WHERE l2.Id_Producto = p.id) as Stock_Actual
-        FROM Productos p
-        INNER JOIN Marca m ON p.ID_Marca = m.id
-        INNER JOIN Lote l ON p.id = l.Id_Producto
-        INNER JOIN DetallesVentas dv ON l.id = dv.Id_Lote
-        INNER JOIN Ventas v ON dv.Id_Venta = v.id
-        WHERE v.Fecha >= DATEADD(DAY, -?, GETDATE())
-        GROUP BY p.id, p.Codigo, p.Nombre, m.Nombre
-        ORDER BY Total_Vendido DESC
-        """
-        return self._execute_query(query, (dias,))
+        """Productos más vendidos en X días (desde el resumen diario de ventas)"""
+        return self.resumen_ventas_repo.get_productos_mas_vendidos(dias, 20)
+    
+    def get_rotacion_inventario(self, dias: int = 30) -> List[Dict[str, Any]]:
+        """Rotación de inventario por producto (desde el resumen diario de ventas)"""
+        return self.resumen_ventas_repo.get_rotacion_productos(dias)
     
     def get_valor_inventario(self) -> Dict[str, Any]:
-        """Valor total del inventario"""
-        query = """
-        SELECT 
-            SUM(stock_calculado.Stock_Real * p.Precio_compra) as Valor_Compra,
-            SUM(stock_calculado.Stock_Real * p.Precio_venta) as Valor_Venta,
-            COUNT(*) as Total_Productos,
-            SUM(stock_calculado.Stock_Real) as Total_Unidades
-        FROM Productos p
-        INNER JOIN (
-            SELECT l.Id_Producto, 
-                SUM(l.Cantidad_Unitario) as Stock_Real
-            FROM Lote l
-            GROUP BY l.Id_Producto
-            HAVING SUM(l.Cantidad_Unitario) > 0
-        ) stock_calculado ON p.id = stock_calculado.Id_Producto
         """
-        return self._execute_query(query, fetch_one=True) or {}
+        Valor total del inventario desde los totales acumulados del motor de inventario.
+        Solo lectura: el snapshot diario se registra al guardar el cierre de caja.
+        """
+        return get_motor_alertas().valoracion()
+
+    def get_valor_inventario_en_fecha(self, fecha) -> Dict[str, Any]:
+        """Valor del inventario al cierre de una fecha (último snapshot disponible)"""
+        return self.valoracion_repo.get_valor_en_fecha(fecha) or {}
+
+    def get_valoracion_mensual(self, anio: int) -> List[Dict[str, Any]]:
+        """Valor del inventario al cierre de cada mes del año"""
+        return self.valoracion_repo.get_cierres_mensuales(anio)
     
     @ExceptionHandler.handle_exception
     def crear_producto(self, datos_producto: dict) -> int:
@@ -854,6 +970,7 @@ class ProductoRepository(BaseRepository):
             producto_id = resultado[0]
             conn.commit()
             self._invalidate_cache_after_modification()
+            self._registrar_cambio_lotes([producto_id])
             
             return producto_id
             
@@ -929,6 +1046,231 @@ class ProductoRepository(BaseRepository):
             traceback.print_exc()
             return -1
     
+    # ===============================
+    # IMPORTACIÓN MASIVA DE CATÁLOGO
+    # ===============================
+
+    TAMANO_LOTE_IMPORTACION = 500  # Filas por bloque (límite de 2100 parámetros en IN)
+
+    def importar_productos_masivo(self, filas: List[Dict[str, Any]],
+                                  tamano_lote: int = None) -> Dict[str, Any]:
+        """
+        Importa una lista de productos (con stock inicial opcional) en una sola transacción.
+
+        Cada fila usa las mismas claves que el formulario de productos:
+        codigo, nombre, detalles, precio_compra, precio_venta, unidad_medida,
+        marca / id_marca, stock_minimo, stock_unitario, fecha_vencimiento.
+
+        Las marcas se resuelven en una pasada, los productos y lotes iniciales se
+        insertan por bloques y el cache se invalida una sola vez al final.
+        Una fila inválida no detiene la importación: se reporta en 'errores'.
+
+        Returns:
+            {'total', 'insertados', 'lotes_creados', 'marcas_creadas', 'errores': [{'fila', 'codigo', 'error'}]}
+        """
+        tamano_lote = tamano_lote or self.TAMANO_LOTE_IMPORTACION
+        resultado = {
+            'total': len(filas or []),
+            'insertados': 0,
+            'lotes_creados': 0,
+            'marcas_creadas': 0,
+            'errores': []
+        }
+        if not filas:
+            return resultado
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+
+            # 1. Códigos existentes y marcas en una sola lectura cada uno
+            cursor.execute("SELECT Codigo FROM Productos")
+            codigos_usados = {str(row[0]).strip().upper() for row in cursor.fetchall() if row[0]}
+
+            cursor.execute("SELECT id, Nombre FROM Marca")
+            marcas = {str(row[1]).strip().lower(): row[0] for row in cursor.fetchall() if row[1]}
+            ids_marca = set(marcas.values())
+
+            # 2. Validar y normalizar filas
+            validas = []
+            for numero, fila in enumerate(filas, start=1):
+                try:
+                    producto = self._normalizar_fila_importacion(fila)
+                    clave = producto['Codigo'].upper()
+                    if clave in codigos_usados:
+                        raise ValueError(f"El código {producto['Codigo']} ya existe")
+                    codigos_usados.add(clave)
+                    validas.append((numero, producto))
+                except Exception as e:
+                    resultado['errores'].append({
+                        'fila': numero,
+                        'codigo': str((fila or {}).get('codigo', '')).strip(),
+                        'error': str(e)
+                    })
+
+            # 3. Crear en una pasada las marcas que no existen
+            nuevas_marcas = {}
+            for _, producto in validas:
+                nombre_marca = producto.pop('_marca', '')
+                if nombre_marca and nombre_marca.lower() not in marcas:
+                    nuevas_marcas.setdefault(nombre_marca.lower(), nombre_marca)
+                producto['_clave_marca'] = nombre_marca.lower()
+
+            if nuevas_marcas:
+                cursor.executemany(
+                    "INSERT INTO Marca (Nombre, Detalles) VALUES (?, ?)",
+                    [(nombre, "Marca creada en importación") for nombre in nuevas_marcas.values()]
+                )
+                cursor.execute("SELECT id, Nombre FROM Marca")
+                marcas = {str(row[1]).strip().lower(): row[0] for row in cursor.fetchall() if row[1]}
+                ids_marca = set(marcas.values())
+                resultado['marcas_creadas'] = len(nuevas_marcas)
+
+            for _, producto in validas:
+                clave_marca = producto.pop('_clave_marca')
+                if clave_marca:
+                    producto['ID_Marca'] = marcas.get(clave_marca, 1)
+                elif producto['ID_Marca'] not in ids_marca:
+                    producto['ID_Marca'] = 1
+
+            # 4. Insertar productos y lotes por bloques
+            for inicio in range(0, len(validas), tamano_lote):
+                bloque = validas[inicio:inicio + tamano_lote]
+                self._importar_bloque(cursor, bloque, resultado)
+
+            conn.commit()
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            raise Exception(f"Error en importación masiva: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+
+        resultado['errores'].sort(key=lambda error: error['fila'])
+        if resultado['insertados'] > 0:
+            self._invalidate_cache_after_modification()
+            self._registrar_cambio_lotes()
+
+        print(f"📥 Importación masiva: {resultado['insertados']}/{resultado['total']} productos, "
+              f"{resultado['lotes_creados']} lotes, {len(resultado['errores'])} errores")
+        return resultado
+
+    def _importar_bloque(self, cursor, bloque: List[Tuple[int, Dict[str, Any]]], resultado: Dict[str, Any]):
+        """
+        Inserta un bloque dentro de un savepoint. Si el bloque falla, se reintenta
+        fila por fila para aislar y reportar las filas con error.
+        """
+        cursor.execute("SAVE TRANSACTION bloque_importacion")
+        try:
+            self._insertar_productos_importados(cursor, [producto for _, producto in bloque])
+            resultado['insertados'] += len(bloque)
+            resultado['lotes_creados'] += sum(1 for _, p in bloque if p['_stock'] > 0)
+            return
+        except Exception as e:
+            cursor.execute("ROLLBACK TRANSACTION bloque_importacion")
+            print(f"⚠️ Bloque de importación falló ({e}), reintentando fila por fila")
+
+        for numero, producto in bloque:
+            cursor.execute("SAVE TRANSACTION fila_importacion")
+            try:
+                self._insertar_productos_importados(cursor, [producto])
+                resultado['insertados'] += 1
+                if producto['_stock'] > 0:
+                    resultado['lotes_creados'] += 1
+            except Exception as e:
+                cursor.execute("ROLLBACK TRANSACTION fila_importacion")
+                resultado['errores'].append({'fila': numero, 'codigo': producto['Codigo'], 'error': str(e)})
+
+    def _insertar_productos_importados(self, cursor, productos: List[Dict[str, Any]]):
+        """Inserta productos y sus lotes iniciales con executemany"""
+        cursor.executemany("""
+            INSERT INTO Productos (Codigo, Nombre, Detalles, Precio_compra, Precio_venta,
+                                Unidad_Medida, ID_Marca, Stock_Minimo, Activo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """, [(
+            p['Codigo'], p['Nombre'], p['Detalles'], p['Precio_compra'], p['Precio_venta'],
+            p['Unidad_Medida'], p['ID_Marca'], p['Stock_Minimo']
+        ) for p in productos])
+
+        con_stock = [p for p in productos if p['_stock'] > 0]
+        if not con_stock:
+            return
+
+        # Recuperar los IDs generados por código
+        placeholders = ', '.join('?' for _ in con_stock)
+        cursor.execute(
+            f"SELECT id, Codigo FROM Productos WHERE Codigo IN ({placeholders})",
+            [p['Codigo'] for p in con_stock]
+        )
+        ids_por_codigo = {str(row[1]).upper(): row[0] for row in cursor.fetchall()}
+
+        cursor.executemany("""
+            INSERT INTO Lote (Id_Producto, Cantidad_Unitario, Fecha_Vencimiento, Precio_Compra, Fecha_Compra)
+            VALUES (?, ?, ?, ?, GETDATE())
+        """, [(
+            ids_por_codigo[p['Codigo'].upper()], p['_stock'], p['_fecha_vencimiento'], p['Precio_compra']
+        ) for p in con_stock])
+
+    def _normalizar_fila_importacion(self, fila: Dict[str, Any]) -> Dict[str, Any]:
+        """Valida una fila del catálogo (mismas reglas que el formulario) y la mapea a columnas"""
+        if not isinstance(fila, dict):
+            raise ValueError("Fila con formato inválido")
+
+        def numero(clave, tipo, defecto=0):
+            valor = fila.get(clave)
+            if valor is None or str(valor).strip() == '':
+                return defecto
+            try:
+                return tipo(parsear_numero(valor, entero=tipo is int))
+            except (ValueError, TypeError):
+                raise ValueError(f"Valor inválido en '{clave}': {valor}")
+
+        codigo = str(fila.get('codigo') or '').strip()
+        nombre = str(fila.get('nombre') or '').strip()
+        validate_required(codigo, "codigo")
+        if len(nombre) < 3:
+            raise ValueError("Nombre debe tener al menos 3 caracteres")
+
+        precio_compra = numero('precio_compra', float)
+        precio_venta = numero('precio_venta', float)
+        if precio_compra > 0 or precio_venta > 0:
+            if precio_compra <= 0 or precio_venta <= 0:
+                raise ValueError("Debe especificar precio de compra y de venta válidos")
+            if precio_venta <= precio_compra:
+                raise ValueError("Precio de venta debe ser mayor al precio de compra")
+
+        stock = numero('stock_unitario', int)
+        if stock < 0:
+            raise ValueError("El stock no puede ser negativo")
+
+        fecha_vencimiento = str(fila.get('fecha_vencimiento') or '').strip()
+        if not fecha_vencimiento or fecha_vencimiento.lower() == 'sin vencimiento':
+            fecha_vencimiento = None
+        else:
+            try:
+                datetime.strptime(fecha_vencimiento, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"Formato de fecha de vencimiento inválido: {fecha_vencimiento}")
+
+        nombre_marca = str(fila.get('marca') or '').strip()
+        return {
+            'Codigo': codigo,
+            'Nombre': nombre,
+            'Detalles': str(fila.get('detalles') or ''),
+            'Precio_compra': precio_compra,
+            'Precio_venta': precio_venta,
+            'Unidad_Medida': str(fila.get('unidad_medida') or 'Tabletas'),
+            'ID_Marca': numero('id_marca', int, 1) or 1,
+            'Stock_Minimo': numero('stock_minimo', int, 10),
+            '_marca': nombre_marca if len(nombre_marca) >= 2 else '',
+            '_stock': stock,
+            '_fecha_vencimiento': fecha_vencimiento
+        }
+
     # ===============================
     # 🚀 MÉTODOS FIFO 2.0 - CORREGIDOS COMPLETAMENTE
     # ===============================
@@ -997,77 +1339,30 @@ class ProductoRepository(BaseRepository):
             traceback.print_exc()
             return []
     
+    def calcular_alertas(self) -> Dict[str, Any]:
+        """
+        Datos del snapshot de alertas que publica el hilo de alertas (corre fuera de la interfaz):
+        alertas del inventario, stock bajo, lotes vencidos/por vencer y valor del inventario
+        """
+        motor = get_motor_alertas()
+        return {
+            'alertas': motor.obtener_alertas(),
+            'productos_bajo_stock': motor.productos_bajo_stock(10),
+            'lotes_vencidos': motor.lotes_vencidos(),
+            'lotes_por_vencer': motor.lotes_por_vencer(config_fifo.DIAS_ALERTA_VENCIMIENTO),
+            'valor_inventario': self.get_valor_inventario()
+        }
+    
     def obtener_alertas_inventario(self) -> List[Dict[str, Any]]:
         """
-        ✅ CORREGIDO COMPLETO: Obtiene alertas SIN CICLOS INFINITOS
+        ✅ Obtiene alertas desde el snapshot precalculado del motor de alertas
+        (se recalcula solo con eventos de lotes o cambio de día)
         """
         try:
-            # ❌ REMOVIDO: Comentarios al inicio que impedían que la query fuera reconocida como SELECT
-            query = """
-            SELECT 
-                'STOCK BAJO' AS Tipo_Alerta,
-                p.Codigo,
-                p.Nombre AS Producto,
-                p.Stock_Minimo,
-                ISNULL((SELECT SUM(l.Cantidad_Unitario) 
-                        FROM Lote l 
-                        WHERE l.Id_Producto = p.id), 0) AS Stock_Actual,
-                CONCAT('Stock actual: ', 
-                    ISNULL((SELECT SUM(l.Cantidad_Unitario) FROM Lote l WHERE l.Id_Producto = p.id), 0),
-                    ' unidades (mínimo: ', p.Stock_Minimo, ')') AS Detalle,
-                2 AS Prioridad
-            FROM Productos p
-            WHERE p.Activo = 1
-            AND ISNULL((SELECT SUM(l.Cantidad_Unitario) FROM Lote l WHERE l.Id_Producto = p.id), 0) <= p.Stock_Minimo
-            AND ISNULL((SELECT SUM(l.Cantidad_Unitario) FROM Lote l WHERE l.Id_Producto = p.id), 0) > 0
-
-            UNION ALL
-
-            SELECT 
-                'PRODUCTO PRÓXIMO A VENCER' AS Tipo_Alerta,
-                p.Codigo,
-                p.Nombre AS Producto,
-                p.Stock_Minimo,
-                l.Cantidad_Unitario AS Stock_Actual,
-                CONCAT('Vence el ', FORMAT(l.Fecha_Vencimiento, 'dd/MM/yyyy'), 
-                    ' (', DATEDIFF(DAY, GETDATE(), l.Fecha_Vencimiento), ' días)') AS Detalle,
-                2 AS Prioridad
-            FROM Lote l
-            INNER JOIN Productos p ON l.Id_Producto = p.id
-            WHERE l.Cantidad_Unitario > 0
-            AND l.Fecha_Vencimiento IS NOT NULL
-            AND l.Fecha_Vencimiento >= GETDATE()
-            AND l.Fecha_Vencimiento <= DATEADD(DAY, 30, GETDATE())
-
-            UNION ALL
-
-            SELECT 
-                'PRODUCTO VENCIDO' AS Tipo_Alerta,
-                p.Codigo,
-                p.Nombre AS Producto,
-                p.Stock_Minimo,
-                l.Cantidad_Unitario AS Stock_Actual,
-                CONCAT('Venció el ', FORMAT(l.Fecha_Vencimiento, 'dd/MM/yyyy'), 
-                    ' (', ABS(DATEDIFF(DAY, GETDATE(), l.Fecha_Vencimiento)), ' días atrás)') AS Detalle,
-                3 AS Prioridad
-            FROM Lote l
-            INNER JOIN Productos p ON l.Id_Producto = p.id
-            WHERE l.Cantidad_Unitario > 0
-            AND l.Fecha_Vencimiento IS NOT NULL
-            AND l.Fecha_Vencimiento < GETDATE()
-
-            ORDER BY Prioridad DESC, Tipo_Alerta
-            """
-            
-            # ✅ USAR MÉTODO READONLY CORREGIDO
-            alertas = self._execute_readonly_query(query, fetch_one=False)
-            
-            # ✅ Validación robusta
-            if not isinstance(alertas, list):
-                return []  # ✅ Retorna lista vacía en lugar de imprimir warnings
+            alertas = get_motor_alertas().obtener_alertas()
             
             if alertas:
-                print(f"✅ {len(alertas)} alertas de inventario (sin ciclos)")
+                print(f"✅ {len(alertas)} alertas de inventario (snapshot)")
             else:
                 print("✅ No hay alertas de inventario")
             
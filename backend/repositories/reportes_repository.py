@@ -7,12 +7,14 @@ from ..core.excepciones import (
     ExceptionHandler, validate_required
 )
 from ..core.cache_system import cached_query, invalidate_after_update
+from .resumen_financiero_repository import ResumenFinancieroRepository
 
 class ReportesRepository(BaseRepository):
     """Repository para generación de reportes del sistema"""
     
     def __init__(self):
         super().__init__('reportes_temp', 'reportes')  # Tabla temporal para cachés
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("📊 ReportesRepository inicializado")
     
     # ===============================
@@ -308,7 +310,8 @@ class ReportesRepository(BaseRepository):
     @cached_query('reporte_ingresos_egresos', ttl=300)
     def get_reporte_ingresos_egresos(self, fecha_desde: str, fecha_hasta: str) -> List[Dict[str, Any]]:
         """
-        ✅ REPORTE: Ingresos y Egresos - CORREGIDO según estructura real
+        ✅ REPORTE: Ingresos y Egresos - un registro por transacción (número, descripción y usuario)
+        Los totales del período salen del resumen financiero (get_resumen_periodo)
         """
         fecha_desde_sql = self._convertir_fecha_sql(fecha_desde, es_fecha_final=False)
         fecha_hasta_sql = self._convertir_fecha_sql(fecha_hasta, es_fecha_final=True)
@@ -330,6 +333,57 @@ class ReportesRepository(BaseRepository):
         
         UNION ALL
         
+        -- ✅ INGRESOS: Consultas (mismos precios que el cierre de caja y el resumen financiero)
+        SELECT 
+            FORMAT(c.Fecha, 'dd/MM/yyyy') as fecha,
+            c.Fecha as fecha_ordenar,
+            'INGRESO' as tipo,
+            'Consultas' as categoria,
+            'CO' + RIGHT('000' + CAST(c.id AS VARCHAR), 3) as numero,
+            CONCAT('Consulta - ', e.Nombre) as descripcion,
+            CASE WHEN c.Tipo_Consulta = 'Emergencia' THEN ISNULL(e.Precio_Emergencia, 0) ELSE ISNULL(e.Precio_Normal, 0) END as monto,
+            COALESCE(u.Nombre + ' ' + u.Apellido_Paterno, 'Sin usuario') as usuario
+        FROM Consultas c
+        LEFT JOIN Especialidad e ON c.Id_Especialidad = e.id
+        LEFT JOIN Usuario u ON c.Id_Usuario = u.id
+        WHERE c.Fecha >= ? AND c.Fecha <= ?
+        
+        UNION ALL
+        
+        -- ✅ INGRESOS: Laboratorio
+        SELECT 
+            FORMAT(l.Fecha, 'dd/MM/yyyy') as fecha,
+            l.Fecha as fecha_ordenar,
+            'INGRESO' as tipo,
+            'Laboratorio' as categoria,
+            'LA' + RIGHT('000' + CAST(l.id AS VARCHAR), 3) as numero,
+            CONCAT('Análisis - ', ta.Nombre) as descripcion,
+            CASE WHEN l.Tipo = 'Emergencia' THEN ISNULL(ta.Precio_Emergencia, 0) ELSE ISNULL(ta.Precio_Normal, 0) END as monto,
+            COALESCE(u.Nombre + ' ' + u.Apellido_Paterno, 'Sin usuario') as usuario
+        FROM Laboratorio l
+        LEFT JOIN Tipos_Analisis ta ON l.Id_Tipo_Analisis = ta.id
+        LEFT JOIN Usuario u ON l.Id_RegistradoPor = u.id
+        WHERE l.Fecha >= ? AND l.Fecha <= ?
+        
+        UNION ALL
+        
+        -- ✅ INGRESOS: Enfermería
+        SELECT 
+            FORMAT(en.Fecha, 'dd/MM/yyyy') as fecha,
+            en.Fecha as fecha_ordenar,
+            'INGRESO' as tipo,
+            'Enfermería' as categoria,
+            'EN' + RIGHT('000' + CAST(en.id AS VARCHAR), 3) as numero,
+            CONCAT('Procedimiento - ', tp.Nombre, ' (Cant: ', en.Cantidad, ')') as descripcion,
+            en.Cantidad * CASE WHEN en.Tipo = 'Emergencia' THEN ISNULL(tp.Precio_Emergencia, 0) ELSE ISNULL(tp.Precio_Normal, 0) END as monto,
+            COALESCE(u.Nombre + ' ' + u.Apellido_Paterno, 'Sin usuario') as usuario
+        FROM Enfermeria en
+        LEFT JOIN Tipos_Procedimientos tp ON en.Id_Procedimiento = tp.id
+        LEFT JOIN Usuario u ON en.Id_RegistradoPor = u.id
+        WHERE en.Fecha >= ? AND en.Fecha <= ?
+        
+        UNION ALL
+        
         -- ✅ INGRESOS EXTRAS (de tabla IngresosExtras)
         SELECT 
             FORMAT(ie.fecha, 'dd/MM/yyyy') as fecha,
@@ -398,12 +452,17 @@ class ReportesRepository(BaseRepository):
         ORDER BY fecha_ordenar DESC, tipo ASC, categoria ASC
         """
         
-        # ✅ 4 pares de parámetros (fecha_desde, fecha_hasta) para cada UNION
-        # ✅ 5 pares de parámetros (fecha_desde, fecha_hasta) para 5 UNION
-        params = (fecha_desde_sql, fecha_hasta_sql) * 5
+        # ✅ 8 pares de parámetros (fecha_desde, fecha_hasta) para 8 UNION
+        params = (fecha_desde_sql, fecha_hasta_sql) * 8
         
         return self._execute_query(query, params)
     
+    def _rango_resumen_financiero(self, fecha_desde: str, fecha_hasta: str):
+        """Convierte DD/MM/YYYY (ambos inclusive) al rango [inicio, fin) del resumen financiero"""
+        inicio = datetime.strptime(self._convertir_fecha_sql(fecha_desde)[:10], '%Y-%m-%d')
+        fin = datetime.strptime(self._convertir_fecha_sql(fecha_hasta, es_fecha_final=True)[:10], '%Y-%m-%d')
+        return inicio, fin + timedelta(days=1)
+    
     # ===============================
     # ✅ ANÁLISIS FINANCIERO AVANZADO
     # ===============================
@@ -655,43 +714,15 @@ class ReportesRepository(BaseRepository):
     def get_resumen_periodo(self, fecha_desde: str, fecha_hasta: str) -> Dict[str, Any]:
         """Obtiene resumen general del período"""
         try:
-            fecha_desde_sql = self._convertir_fecha_sql(fecha_desde)
-            fecha_hasta_sql = self._convertir_fecha_sql(fecha_hasta)
+            inicio, fin = self._rango_resumen_financiero(fecha_desde, fecha_hasta)
+            resumen = self.resumen_financiero_repo.get_resumen_periodo(inicio, fin)
             
-            query = """
-            SELECT 
-                -- INGRESOS
-                COALESCE(SUM(CASE WHEN tipo_operacion = 'INGRESO' THEN monto ELSE 0 END), 0) as total_ingresos,
-                -- EGRESOS  
-                COALESCE(SUM(CASE WHEN tipo_operacion = 'EGRESO' THEN monto ELSE 0 END), 0) as total_egresos,
-                -- TRANSACCIONES
-                COUNT(*) as total_transacciones
-            FROM (
-                SELECT 'INGRESO' as tipo_operacion, Total as monto FROM Ventas WHERE Fecha >= ? AND Fecha <= ?
-                UNION ALL
-                SELECT 'EGRESO' as tipo_operacion, Total as monto FROM Compra WHERE Fecha >= ? AND Fecha <= ?
-                UNION ALL
-                SELECT 'EGRESO' as tipo_operacion, Monto as monto FROM Gastos WHERE Fecha >= ? AND Fecha <= ?
-            ) consolidado
-            """
-            
-            params = (fecha_desde_sql, fecha_hasta_sql) * 3
-            resultado = self._execute_query(query, params, fetch_one=True)
-            
-            if resultado:
-                return {
-                    'total_ingresos': float(resultado.get('total_ingresos', 0)),
-                    'total_egresos': float(resultado.get('total_egresos', 0)),
-                    'utilidad_neta': float(resultado.get('total_ingresos', 0)) - float(resultado.get('total_egresos', 0)),
-                    'total_transacciones': int(resultado.get('total_transacciones', 0))
-                }
-            else:
-                return {
-                    'total_ingresos': 0.0,
-                    'total_egresos': 0.0,
-                    'utilidad_neta': 0.0,
-                    'total_transacciones': 0
-                }
+            return {
+                'total_ingresos': resumen['total_ingresos'],
+                'total_egresos': resumen['total_egresos'],
+                'utilidad_neta': resumen['balance'],
+                'total_transacciones': resumen['transacciones_ingresos'] + resumen['transacciones_egresos']
+            }
                 
         except Exception as e:
             print(f"⚠️ Error obteniendo resumen del período: {e}")
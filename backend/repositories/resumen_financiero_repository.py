@@ -0,0 +1,356 @@
+"""
+resumen_financiero_repository.py - Resumen por hora de ingresos y egresos por categoría
+Tabla ResumenFinancieroHora (Fecha, Hora, Categoria): tipo (INGRESO/EGRESO), total y transacciones.
+Se actualiza incrementalmente al registrar movimientos y puede reconstruirse por rango de fechas.
+Dashboard, reportes y estadísticas leen este resumen en lugar de sumar las tablas de movimientos;
+el resumen diario es la suma de las horas del día.
+"""
+
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime, date, timedelta
+
+from ..core.base_repository import BaseRepository
+from ..core.excepciones import ExceptionHandler, validate_required
+
+# categoría -> (tipo, origen, monto, columna fecha, columna id, condición fija)
+# Los montos usan las mismas definiciones que el cierre de caja
+_FUENTES_FINANCIERAS = {
+    'FARMACIA': (
+        'INGRESO', 'Ventas v', 'v.Total', 'v.Fecha', 'v.id', None
+    ),
+    'CONSULTAS': (
+        'INGRESO', 'Consultas c LEFT JOIN Especialidad e ON c.Id_Especialidad = e.id',
+        "CASE WHEN c.Tipo_Consulta = 'Emergencia' THEN ISNULL(e.Precio_Emergencia, 0) ELSE ISNULL(e.Precio_Normal, 0) END",
+        'c.Fecha', 'c.id', None
+    ),
+    'LABORATORIO': (
+        'INGRESO', 'Laboratorio l LEFT JOIN Tipos_Analisis ta ON l.Id_Tipo_Analisis = ta.id',
+        "CASE WHEN l.Tipo = 'Emergencia' THEN ISNULL(ta.Precio_Emergencia, 0) ELSE ISNULL(ta.Precio_Normal, 0) END",
+        'l.Fecha', 'l.id', None
+    ),
+    'ENFERMERIA': (
+        'INGRESO', 'Enfermeria e LEFT JOIN Tipos_Procedimientos tp ON e.Id_Procedimiento = tp.id',
+        "e.Cantidad * CASE WHEN e.Tipo = 'Emergencia' THEN ISNULL(tp.Precio_Emergencia, 0) ELSE ISNULL(tp.Precio_Normal, 0) END",
+        'e.Fecha', 'e.id', None
+    ),
+    'INGRESOS_EXTRAS': (
+        'INGRESO', 'IngresosExtras ie', 'ie.monto', 'ie.fecha', 'ie.id', None
+    ),
+    'GASTOS': (
+        'EGRESO', 'Gastos g', 'g.Monto', 'g.Fecha', 'g.id', 'g.Monto > 0'
+    ),
+    'COMPRAS': (
+        'EGRESO', 'Compra c', 'c.Total', 'c.Fecha', 'c.id', 'c.Total > 0'
+    ),
+}
+
+CATEGORIAS_FINANCIERAS = tuple(_FUENTES_FINANCIERAS.keys())
+
+_COLUMNAS_RESUMEN = "Fecha, Hora, Categoria, Tipo, Total, Transacciones"
+
+
+def _agregado_financiero_sql(categoria: str, filtro: str = '') -> str:
+    """
+    Agregado por día y hora de una categoría.
+    filtro: '' (todo el histórico), 'id' (un movimiento) o 'rango' (Fecha en [?, ?))
+    """
+    tipo, origen, monto, fecha, columna_id, condicion = _FUENTES_FINANCIERAS[categoria]
+    condiciones = [f"{fecha} IS NOT NULL"]
+    if condicion:
+        condiciones.append(condicion)
+    if filtro == 'id':
+        condiciones.append(f"{columna_id} = ?")
+    elif filtro == 'rango':
+        condiciones.append(f"{fecha} >= ? AND {fecha} < ?")
+
+    return f"""
+    SELECT
+        CAST({fecha} AS DATE) AS Fecha,
+        CAST(DATEPART(HOUR, {fecha}) AS TINYINT) AS Hora,
+        '{categoria}' AS Categoria,
+        '{tipo}' AS Tipo,
+        SUM({monto}) AS Total,
+        COUNT(*) AS Transacciones
+    FROM {origen}
+    WHERE {' AND '.join(condiciones)}
+    GROUP BY CAST({fecha} AS DATE), DATEPART(HOUR, {fecha})
+    """
+
+
+class ResumenFinancieroRepository(BaseRepository):
+    """Repository del resumen financiero por hora y categoría"""
+
+    _tabla_verificada = False
+
+    def __init__(self):
+        super().__init__('ResumenFinancieroHora', 'resumen_financiero')
+
+    def get_active(self) -> List[Dict[str, Any]]:
+        """Resumen del día actual"""
+        self._ensure_tabla_resumen()
+        query = """
+        SELECT * FROM ResumenFinancieroHora
+        WHERE Fecha = CAST(GETDATE() AS DATE)
+        ORDER BY Hora, Categoria
+        """
+        return self._execute_query(query, use_cache=False) or []
+
+    # ===============================
+    # MANTENIMIENTO DEL RESUMEN
+    # ===============================
+
+    def _ensure_tabla_resumen(self) -> bool:
+        """
+        Crea la tabla del resumen (y la llena con el histórico) si no existe.
+        Retorna True si en esta llamada se creó y llenó: el histórico ya incluye todo lo confirmado.
+        """
+        if ResumenFinancieroRepository._tabla_verificada:
+            return False
+
+        backfill = '\n            UNION ALL\n'.join(
+            _agregado_financiero_sql(categoria) for categoria in CATEGORIAS_FINANCIERAS
+        )
+        create_table_query = f"""
+        SET NOCOUNT ON;
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='ResumenFinancieroHora' AND xtype='U')
+        BEGIN
+            CREATE TABLE ResumenFinancieroHora (
+                Fecha DATE NOT NULL,
+                Hora TINYINT NOT NULL,
+                Categoria VARCHAR(20) NOT NULL,
+                Tipo VARCHAR(7) NOT NULL,
+                Total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                Transacciones INT NOT NULL DEFAULT 0,
+                CONSTRAINT PK_ResumenFinancieroHora PRIMARY KEY (Fecha, Hora, Categoria)
+            );
+
+            INSERT INTO ResumenFinancieroHora ({_COLUMNAS_RESUMEN})
+            {backfill};
+
+            SELECT CAST(1 AS BIT) AS Creada;
+        END
+        ELSE
+            SELECT CAST(0 AS BIT) AS Creada;
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(create_table_query)
+            fila = cursor.fetchone()
+            conn.commit()
+            ResumenFinancieroRepository._tabla_verificada = True
+            return bool(fila and fila[0])
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"⚠️ Error verificando tabla ResumenFinancieroHora: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def registrar_movimiento(self, categoria: str, movimiento_id: int) -> bool:
+        """
+        Suma incrementalmente un movimiento recién creado a su hora en el resumen.
+        No lanza excepciones: un fallo aquí no debe afectar la operación.
+        """
+        try:
+            if categoria not in _FUENTES_FINANCIERAS or not movimiento_id:
+                return False
+            if self._ensure_tabla_resumen():
+                # El llenado inicial ya sumó este movimiento (se confirmó antes)
+                return True
+
+            # HOLDLOCK: dos cajas en la misma hora no pueden insertar la misma fila a la vez
+            query = f"""
+            MERGE ResumenFinancieroHora WITH (HOLDLOCK) AS r
+            USING ({_agregado_financiero_sql(categoria, 'id')}) AS s
+            ON r.Fecha = s.Fecha AND r.Hora = s.Hora AND r.Categoria = s.Categoria
+            WHEN MATCHED THEN UPDATE SET
+                r.Total = r.Total + s.Total,
+                r.Transacciones = r.Transacciones + s.Transacciones
+            WHEN NOT MATCHED THEN
+                INSERT ({_COLUMNAS_RESUMEN})
+                VALUES (s.Fecha, s.Hora, s.Categoria, s.Tipo, s.Total, s.Transacciones);
+            """
+            self._execute_query(query, (int(movimiento_id),), fetch_all=False, use_cache=False)
+            print(f"📈 Resumen financiero actualizado: {categoria} {movimiento_id}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Error actualizando resumen financiero ({categoria} {movimiento_id}): {e}")
+            return False
+
+    @ExceptionHandler.handle_exception
+    def reconstruir_rango(self, fecha_desde, fecha_hasta=None, categoria: Optional[str] = None) -> int:
+        """
+        Reconstruye el resumen para [fecha_desde, fecha_hasta] (días completos).
+        Sin categoría recalcula todas; usado tras editar/eliminar movimientos y a demanda.
+        """
+        validate_required(fecha_desde, "fecha_desde")
+        self._ensure_tabla_resumen()
+
+        desde = self._normalizar_fecha(fecha_desde)
+        hasta = self._normalizar_fecha(fecha_hasta) if fecha_hasta else desde
+        categorias = [categoria] if categoria else list(CATEGORIAS_FINANCIERAS)
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            inicio = datetime.combine(desde, datetime.min.time())
+            fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+            filas = 0
+
+            for cat in categorias:
+                cursor.execute(
+                    "DELETE FROM ResumenFinancieroHora WHERE Fecha BETWEEN ? AND ? AND Categoria = ?",
+                    (desde, hasta, cat)
+                )
+                cursor.execute(
+                    f"INSERT INTO ResumenFinancieroHora ({_COLUMNAS_RESUMEN}) {_agregado_financiero_sql(cat, 'rango')}",
+                    (inicio, fin)
+                )
+                filas += max(cursor.rowcount, 0)
+
+            conn.commit()
+            self._invalidate_cache_after_modification()
+
+            print(f"🔁 Resumen financiero reconstruido {desde} → {hasta} ({', '.join(categorias)}): {filas} filas")
+            return filas
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            raise Exception(f"Error reconstruyendo resumen financiero: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+
+    def recalcular_dias(self, categoria: str, fechas: Iterable) -> bool:
+        """
+        Reconstruye los días afectados por una edición/eliminación (fecha anterior y nueva).
+        No lanza excepciones: un fallo aquí no debe afectar la operación.
+        """
+        try:
+            dias = sorted({self._normalizar_fecha(f) for f in fechas if f})
+            for dia in dias:
+                self.reconstruir_rango(dia, categoria=categoria)
+            return True
+        except Exception as e:
+            print(f"⚠️ Error recalculando resumen financiero ({categoria}): {e}")
+            return False
+
+    def _normalizar_fecha(self, fecha) -> date:
+        """Acepta date, datetime, 'YYYY-MM-DD[ HH:MM...]' o 'DD/MM/YYYY'"""
+        if isinstance(fecha, datetime):
+            return fecha.date()
+        if isinstance(fecha, date):
+            return fecha
+        texto = str(fecha).strip()
+        if '/' in texto[:10]:
+            return datetime.strptime(texto[:10], '%d/%m/%Y').date()
+        return datetime.strptime(texto[:10], '%Y-%m-%d').date()
+
+    # ===============================
+    # CONSULTAS SOBRE EL RESUMEN
+    # ===============================
+
+    def _filtro_rango(self, fecha_inicio: datetime, fecha_fin: datetime):
+        """
+        WHERE y parámetros para [fecha_inicio, fecha_fin) con resolución de una hora.
+        Filtra por Fecha (clave del índice) y recorta por Hora solo en los días extremos.
+        """
+        inicio = fecha_inicio if isinstance(fecha_inicio, datetime) else datetime.combine(fecha_inicio, datetime.min.time())
+        fin = fecha_fin if isinstance(fecha_fin, datetime) else datetime.combine(fecha_fin, datetime.min.time())
+        where = """
+        WHERE Fecha >= ? AND Fecha <= ?
+          AND (Fecha > ? OR Hora >= ?)
+          AND (Fecha < ? OR Hora < ?)
+        """
+        params = (
+            inicio.date(), fin.date(),
+            inicio.date(), inicio.hour,
+            fin.date(), fin.hour
+        )
+        return where, params
+
+    def get_totales_por_categoria(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Dict[str, Any]]:
+        """
+        Total y transacciones por categoría en [fecha_inicio, fecha_fin).
+        Retorna {categoria: {'tipo', 'total', 'cantidad'}} con todas las categorías (0 si no hubo).
+        """
+        self._ensure_tabla_resumen()
+        where, params = self._filtro_rango(fecha_inicio, fecha_fin)
+        query = f"""
+        SELECT Categoria, SUM(Total) as total, SUM(Transacciones) as cantidad
+        FROM ResumenFinancieroHora
+        {where}
+        GROUP BY Categoria
+        """
+        filas = self._execute_query(query, params, use_cache=False) or []
+
+        totales = {
+            categoria: {'tipo': fuente[0], 'total': 0.0, 'cantidad': 0}
+            for categoria, fuente in _FUENTES_FINANCIERAS.items()
+        }
+        for fila in filas:
+            categoria = fila.get('Categoria')
+            if categoria in totales:
+                totales[categoria]['total'] = round(float(fila.get('total') or 0), 2)
+                totales[categoria]['cantidad'] = int(fila.get('cantidad') or 0)
+        return totales
+
+    def get_resumen_periodo(self, fecha_inicio: datetime, fecha_fin: datetime) -> Dict[str, Any]:
+        """Ingresos, egresos, balance y transacciones de [fecha_inicio, fecha_fin)"""
+        por_categoria = self.get_totales_por_categoria(fecha_inicio, fecha_fin)
+        ingresos = [v for v in por_categoria.values() if v['tipo'] == 'INGRESO']
+        egresos = [v for v in por_categoria.values() if v['tipo'] == 'EGRESO']
+
+        total_ingresos = round(sum(v['total'] for v in ingresos), 2)
+        total_egresos = round(sum(v['total'] for v in egresos), 2)
+        return {
+            'total_ingresos': total_ingresos,
+            'total_egresos': total_egresos,
+            'balance': round(total_ingresos - total_egresos, 2),
+            'transacciones_ingresos': sum(v['cantidad'] for v in ingresos),
+            'transacciones_egresos': sum(v['cantidad'] for v in egresos),
+            'por_categoria': por_categoria
+        }
+
+    def get_serie(self, fecha_inicio: datetime, fecha_fin: datetime,
+                  agrupar_por: str = 'dia', por_categoria: bool = False) -> List[Dict[str, Any]]:
+        """
+        Serie de totales en [fecha_inicio, fecha_fin) ordenada por período.
+        agrupar_por: 'hora' (Fecha + Hora), 'dia' (Fecha) o 'mes' (primer día del mes).
+        Cada fila trae periodo, Tipo, total y cantidad (y Categoria si por_categoria).
+        """
+        periodos = {
+            'hora': ("DATEADD(HOUR, Hora, CAST(Fecha AS DATETIME))", "Fecha, Hora"),
+            'dia': ("Fecha", "Fecha"),
+            'mes': ("DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1)", "YEAR(Fecha), MONTH(Fecha)"),
+        }
+        if agrupar_por not in periodos:
+            raise ValueError(f"Agrupación no soportada: {agrupar_por}")
+
+        self._ensure_tabla_resumen()
+        expresion, agrupacion = periodos[agrupar_por]
+        columna_categoria = ", Categoria" if por_categoria else ""
+        where, params = self._filtro_rango(fecha_inicio, fecha_fin)
+        query = f"""
+        SELECT {expresion} as periodo, Tipo{columna_categoria},
+            SUM(Total) as total, SUM(Transacciones) as cantidad
+        FROM ResumenFinancieroHora
+        {where}
+        GROUP BY {agrupacion}, Tipo{columna_categoria}
+        ORDER BY periodo, Tipo{columna_categoria}
+        """
+        return self._execute_query(query, params, use_cache=False) or []
+
+
+# ===============================
+# UTILIDADES Y EXPORTACIÓN
+# ===============================
+
+__all__ = ['ResumenFinancieroRepository', 'CATEGORIAS_FINANCIERAS']
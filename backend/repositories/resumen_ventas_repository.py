@@ -0,0 +1,296 @@
+"""
+resumen_ventas_repository.py - Resumen diario de ventas por producto
+Tabla VentasDiariasProducto (Fecha, Id_Producto): unidades, ingresos, costo y número de ventas.
+Se actualiza incrementalmente al registrar ventas y puede reconstruirse por rango de fechas.
+Más vendidos, rotación y márgenes leen este resumen en lugar de DetallesVentas.
+"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime, date, timedelta
+
+from ..core.base_repository import BaseRepository
+from ..core.excepciones import ExceptionHandler, validate_required
+
+# Agregado por día y producto a partir del detalle de ventas.
+# Costo por unidad: Costo_Unitario del detalle si existe; en lotes de compra Lote.Precio_Compra
+# es el TOTAL del lote, así que se usa el precio unitario de DetalleCompra; los lotes
+# cargados a mano guardan en Precio_Compra el precio unitario del producto.
+_AGREGADO_VENTAS_SQL = """
+SELECT
+    CAST(v.Fecha AS DATE) AS Fecha,
+    l.Id_Producto,
+    SUM(dv.Cantidad_Unitario) AS Unidades,
+    SUM(dv.Cantidad_Unitario * dv.Precio_Unitario) AS Ingresos,
+    SUM(dv.Cantidad_Unitario * COALESCE(
+        dv.Costo_Unitario,
+        CASE WHEN l.Id_Compra IS NULL THEN l.Precio_Compra ELSE dc.Precio_Unitario END,
+        0
+    )) AS Costo,
+    COUNT(DISTINCT v.id) AS Num_Ventas
+FROM DetallesVentas dv
+INNER JOIN Lote l ON dv.Id_Lote = l.id
+INNER JOIN Ventas v ON dv.Id_Venta = v.id
+OUTER APPLY (
+    SELECT TOP 1 d.Precio_Unitario
+    FROM DetalleCompra d
+    WHERE d.Id_Compra = l.Id_Compra AND d.Id_Producto = l.Id_Producto
+) dc
+{where_clause}
+GROUP BY CAST(v.Fecha AS DATE), l.Id_Producto
+"""
+
+
+class ResumenVentasRepository(BaseRepository):
+    """Repository del resumen diario de ventas por producto"""
+
+    _tabla_verificada = False
+
+    def __init__(self):
+        super().__init__('VentasDiariasProducto', 'resumen_ventas')
+
+    def get_active(self) -> List[Dict[str, Any]]:
+        """Resumen del día actual"""
+        self._ensure_tabla_resumen()
+        query = """
+        SELECT * FROM VentasDiariasProducto
+        WHERE Fecha = CAST(GETDATE() AS DATE)
+        ORDER BY Unidades DESC
+        """
+        return self._execute_query(query, use_cache=False) or []
+
+    # ===============================
+    # MANTENIMIENTO DEL RESUMEN
+    # ===============================
+
+    def _ensure_tabla_resumen(self) -> bool:
+        """
+        Crea la tabla del resumen (y la llena con el histórico) si no existe.
+        Retorna True si en esta llamada se creó y llenó: el histórico ya incluye todo lo confirmado.
+        """
+        if ResumenVentasRepository._tabla_verificada:
+            return False
+
+        create_table_query = f"""
+        SET NOCOUNT ON;
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='VentasDiariasProducto' AND xtype='U')
+        BEGIN
+            CREATE TABLE VentasDiariasProducto (
+                Fecha DATE NOT NULL,
+                Id_Producto INT NOT NULL,
+                Unidades INT NOT NULL DEFAULT 0,
+                Ingresos DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                Costo DECIMAL(14, 2) NOT NULL DEFAULT 0,
+                Num_Ventas INT NOT NULL DEFAULT 0,
+                CONSTRAINT PK_VentasDiariasProducto PRIMARY KEY (Fecha, Id_Producto)
+            );
+
+            CREATE NONCLUSTERED INDEX IX_VentasDiariasProducto_Producto
+            ON VentasDiariasProducto (Id_Producto, Fecha)
+            INCLUDE (Unidades, Ingresos, Costo, Num_Ventas);
+
+            INSERT INTO VentasDiariasProducto (Fecha, Id_Producto, Unidades, Ingresos, Costo, Num_Ventas)
+            {_AGREGADO_VENTAS_SQL.format(where_clause='')};
+
+            SELECT CAST(1 AS BIT) AS Creada;
+        END
+        ELSE
+            SELECT CAST(0 AS BIT) AS Creada;
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(create_table_query)
+            fila = cursor.fetchone()
+            conn.commit()
+            ResumenVentasRepository._tabla_verificada = True
+            return bool(fila and fila[0])
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"⚠️ Error verificando tabla VentasDiariasProducto: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def registrar_venta(self, venta_id: int) -> bool:
+        """
+        Suma incrementalmente una venta recién confirmada al resumen del día.
+        No lanza excepciones: un fallo aquí no debe afectar la venta.
+        """
+        try:
+            if self._ensure_tabla_resumen():
+                # El llenado inicial ya sumó esta venta (se confirmó antes)
+                return True
+
+            # HOLDLOCK: dos cajas vendiendo el mismo producto no pueden insertar la misma fila a la vez
+            query = f"""
+            MERGE VentasDiariasProducto WITH (HOLDLOCK) AS r
+            USING ({_AGREGADO_VENTAS_SQL.format(where_clause='WHERE v.id = ?')}) AS s
+            ON r.Fecha = s.Fecha AND r.Id_Producto = s.Id_Producto
+            WHEN MATCHED THEN UPDATE SET
+                r.Unidades = r.Unidades + s.Unidades,
+                r.Ingresos = r.Ingresos + s.Ingresos,
+                r.Costo = r.Costo + s.Costo,
+                r.Num_Ventas = r.Num_Ventas + s.Num_Ventas
+            WHEN NOT MATCHED THEN
+                INSERT (Fecha, Id_Producto, Unidades, Ingresos, Costo, Num_Ventas)
+                VALUES (s.Fecha, s.Id_Producto, s.Unidades, s.Ingresos, s.Costo, s.Num_Ventas);
+            """
+            filas = self._execute_query(query, (venta_id,), fetch_all=False, use_cache=False)
+            print(f"📈 Resumen diario actualizado con venta {venta_id} ({filas} productos)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Error actualizando resumen con venta {venta_id}: {e}")
+            return False
+
+    @ExceptionHandler.handle_exception
+    def reconstruir_rango(self, fecha_desde, fecha_hasta=None) -> int:
+        """
+        Reconstruye el resumen desde DetallesVentas para [fecha_desde, fecha_hasta].
+        Usado tras editar/eliminar ventas y para recalcular a demanda.
+        """
+        validate_required(fecha_desde, "fecha_desde")
+        self._ensure_tabla_resumen()
+
+        desde = self._normalizar_fecha(fecha_desde)
+        hasta = self._normalizar_fecha(fecha_hasta) if fecha_hasta else desde
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "DELETE FROM VentasDiariasProducto WHERE Fecha BETWEEN ? AND ?",
+                (desde, hasta)
+            )
+
+            insert_query = f"""
+            INSERT INTO VentasDiariasProducto (Fecha, Id_Producto, Unidades, Ingresos, Costo, Num_Ventas)
+            {_AGREGADO_VENTAS_SQL.format(where_clause='WHERE v.Fecha >= ? AND v.Fecha < ?')}
+            """
+            # Rango sobre v.Fecha (aprovecha el índice): hasta el inicio del día siguiente
+            cursor.execute(insert_query, (desde, hasta + timedelta(days=1)))
+            filas = cursor.rowcount
+
+            conn.commit()
+            self._invalidate_cache_after_modification()
+
+            print(f"🔁 Resumen diario reconstruido {desde} → {hasta}: {filas} filas")
+            return filas
+
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            raise Exception(f"Error reconstruyendo resumen de ventas: {str(e)}")
+        finally:
+            if conn:
+                conn.close()
+
+    def _normalizar_fecha(self, fecha) -> date:
+        """Acepta date, datetime o 'YYYY-MM-DD'"""
+        if isinstance(fecha, datetime):
+            return fecha.date()
+        if isinstance(fecha, date):
+            return fecha
+        return datetime.strptime(str(fecha)[:10], '%Y-%m-%d').date()
+
+    # ===============================
+    # CONSULTAS SOBRE EL RESUMEN
+    # ===============================
+
+    def get_productos_mas_vendidos(self, dias: int = 30, limite: int = 20) -> List[Dict[str, Any]]:
+        """Top de productos por unidades vendidas en los últimos X días"""
+        self._ensure_tabla_resumen()
+        query = """
+        SELECT TOP (?)
+            p.id, p.Codigo, p.Nombre, m.Nombre as Marca_Nombre,
+            r.Total_Vendido, r.Num_Ventas, r.Ingresos, r.Costo,
+            CASE WHEN r.Total_Vendido > 0 THEN r.Ingresos / r.Total_Vendido ELSE 0 END as Precio_Promedio,
+            (SELECT ISNULL(SUM(l2.Cantidad_Unitario), 0) FROM Lote l2 WHERE l2.Id_Producto = p.id) as Stock_Actual
+        FROM (
+            SELECT Id_Producto,
+                SUM(Unidades) as Total_Vendido,
+                SUM(Num_Ventas) as Num_Ventas,
+                SUM(Ingresos) as Ingresos,
+                SUM(Costo) as Costo
+            FROM VentasDiariasProducto
+            WHERE Fecha >= CAST(DATEADD(DAY, -?, GETDATE()) AS DATE)
+            GROUP BY Id_Producto
+        ) r
+        INNER JOIN Productos p ON r.Id_Producto = p.id
+        INNER JOIN Marca m ON p.ID_Marca = m.id
+        ORDER BY r.Total_Vendido DESC
+        """
+        return self._execute_query(query, (limite, dias), use_cache=False) or []
+
+    def get_rotacion_productos(self, dias: int = 30) -> List[Dict[str, Any]]:
+        """Rotación de inventario (equivalente a vw_Rotacion_Inventario) desde el resumen"""
+        self._ensure_tabla_resumen()
+        query = """
+        SELECT
+            p.id, p.Codigo, p.Nombre, p.Unidad_Medida,
+            ISNULL(r.Unidades, 0) as Unidades_Vendidas,
+            ISNULL(s.Stock_Actual, 0) as Stock_Actual,
+            CASE WHEN ISNULL(s.Stock_Actual, 0) > 0
+                THEN CAST(ISNULL(r.Unidades, 0) AS FLOAT) / s.Stock_Actual
+                ELSE 0 END as Indice_Rotacion,
+            CASE WHEN ISNULL(r.Unidades, 0) > 0
+                THEN CAST(ISNULL(s.Stock_Actual, 0) AS FLOAT) * ? / r.Unidades
+                ELSE NULL END as Dias_Inventario
+        FROM Productos p
+        LEFT JOIN (
+            SELECT Id_Producto, SUM(Unidades) as Unidades
+            FROM VentasDiariasProducto
+            WHERE Fecha >= CAST(DATEADD(DAY, -?, GETDATE()) AS DATE)
+            GROUP BY Id_Producto
+        ) r ON r.Id_Producto = p.id
+        LEFT JOIN (
+            SELECT Id_Producto, SUM(Cantidad_Unitario) as Stock_Actual
+            FROM Lote
+            GROUP BY Id_Producto
+        ) s ON s.Id_Producto = p.id
+        WHERE p.Activo = 1
+        ORDER BY Indice_Rotacion DESC
+        """
+        return self._execute_query(query, (dias, dias), use_cache=False) or []
+
+    def get_margenes_productos(self, dias: int = 30, limite: int = 15) -> List[Dict[str, Any]]:
+        """Ingresos, costo y margen por producto en los últimos X días"""
+        self._ensure_tabla_resumen()
+        query = """
+        SELECT TOP (?)
+            p.Codigo, p.Nombre as producto_nombre, m.Nombre as marca_nombre,
+            r.unidades_vendidas, r.ingresos_producto, r.costo_producto, r.numero_ventas,
+            r.ingresos_producto - r.costo_producto as margen_producto,
+            CASE WHEN r.ingresos_producto > 0
+                THEN (r.ingresos_producto - r.costo_producto) * 100.0 / r.ingresos_producto
+                ELSE 0 END as margen_porcentaje,
+            CASE WHEN r.unidades_vendidas > 0
+                THEN r.ingresos_producto / r.unidades_vendidas
+                ELSE 0 END as precio_promedio,
+            (SELECT ISNULL(SUM(l.Cantidad_Unitario), 0) FROM Lote l WHERE l.Id_Producto = p.id) as stock_actual
+        FROM (
+            SELECT Id_Producto,
+                SUM(Unidades) as unidades_vendidas,
+                SUM(Ingresos) as ingresos_producto,
+                SUM(Costo) as costo_producto,
+                SUM(Num_Ventas) as numero_ventas
+            FROM VentasDiariasProducto
+            WHERE Fecha >= CAST(DATEADD(DAY, -?, GETDATE()) AS DATE)
+            GROUP BY Id_Producto
+        ) r
+        INNER JOIN Productos p ON r.Id_Producto = p.id
+        INNER JOIN Marca m ON p.ID_Marca = m.id
+        ORDER BY r.unidades_vendidas DESC
+        """
+        return self._execute_query(query, (limite, dias), use_cache=False) or []
+
+
+# ===============================
+# UTILIDADES Y EXPORTACIÓN
+# ===============================
+
+__all__ = ['ResumenVentasRepository']
@@ -0,0 +1,162 @@
+"""
+valoracion_inventario_repository.py - Snapshots diarios del valor del inventario
+Tabla ValorInventarioDiario (Fecha): valor a costo, valor a venta, productos y unidades.
+El valor actual lo mantiene el motor de inventario en memoria; aquí se guarda el
+cierre de cada día para consultar "valor al día X" sin reprocesar movimientos.
+El snapshot se calcula en SQL Server desde Lote y Productos (no desde la memoria de
+cada equipo) y se registra en un solo punto: al guardar el cierre de caja.
+"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime, date
+
+from ..core.base_repository import BaseRepository
+
+
+class ValoracionInventarioRepository(BaseRepository):
+    """Repository de snapshots diarios de valoración de inventario"""
+
+    _tabla_verificada = False
+
+    def __init__(self):
+        super().__init__('ValorInventarioDiario', 'valoracion_inventario')
+
+    def get_active(self) -> List[Dict[str, Any]]:
+        """Snapshots de los últimos 30 días"""
+        return self.get_historico()
+
+    # ===============================
+    # MANTENIMIENTO DE SNAPSHOTS
+    # ===============================
+
+    def _ensure_tabla_valoracion(self):
+        """Crea la tabla de snapshots si no existe"""
+        if ValoracionInventarioRepository._tabla_verificada:
+            return
+
+        create_table_query = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='ValorInventarioDiario' AND xtype='U')
+        CREATE TABLE ValorInventarioDiario (
+            Fecha DATE NOT NULL PRIMARY KEY,
+            Valor_Compra DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            Valor_Venta DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            Total_Productos INT NOT NULL DEFAULT 0,
+            Total_Unidades INT NOT NULL DEFAULT 0,
+            Fecha_Registro DATETIME NOT NULL DEFAULT GETDATE()
+        )
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(create_table_query)
+            conn.commit()
+            ValoracionInventarioRepository._tabla_verificada = True
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"⚠️ Error verificando tabla ValorInventarioDiario: {e}")
+        finally:
+            if conn:
+                conn.close()
+
+    def registrar_snapshot(self, fecha: Optional[date] = None) -> bool:
+        """
+        Guarda (o actualiza) el snapshot del día con la valoración calculada en la BD.
+        Mismo criterio que el motor de inventario: productos con stock > 0, stock por precio.
+        """
+        self._ensure_tabla_valoracion()
+        fecha = fecha or datetime.now().date()
+
+        query = """
+        MERGE ValorInventarioDiario WITH (HOLDLOCK) AS t
+        USING (
+            SELECT
+                ? AS Fecha,
+                ISNULL(SUM(st.Stock * ISNULL(p.Precio_compra, 0)), 0) AS Valor_Compra,
+                ISNULL(SUM(st.Stock * ISNULL(p.Precio_venta, 0)), 0) AS Valor_Venta,
+                COUNT(*) AS Total_Productos,
+                ISNULL(SUM(st.Stock), 0) AS Total_Unidades
+            FROM (
+                SELECT Id_Producto, SUM(Cantidad_Unitario) AS Stock
+                FROM Lote
+                WHERE Cantidad_Unitario > 0
+                GROUP BY Id_Producto
+            ) st
+            INNER JOIN Productos p ON p.id = st.Id_Producto
+        ) AS s
+        ON t.Fecha = s.Fecha
+        WHEN MATCHED THEN UPDATE SET
+            Valor_Compra = s.Valor_Compra, Valor_Venta = s.Valor_Venta,
+            Total_Productos = s.Total_Productos, Total_Unidades = s.Total_Unidades,
+            Fecha_Registro = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (Fecha, Valor_Compra, Valor_Venta, Total_Productos, Total_Unidades)
+            VALUES (s.Fecha, s.Valor_Compra, s.Valor_Venta, s.Total_Productos, s.Total_Unidades);
+        """
+        filas = self._execute_query(query, (fecha,), fetch_all=False, use_cache=False)
+        return bool(filas)
+
+    # ===============================
+    # CONSULTAS HISTÓRICAS
+    # ===============================
+
+    def get_valor_en_fecha(self, fecha) -> Optional[Dict[str, Any]]:
+        """Valor del inventario al cierre del día indicado (último snapshot <= fecha)"""
+        self._ensure_tabla_valoracion()
+        query = """
+        SELECT TOP 1 Fecha, Valor_Compra, Valor_Venta, Total_Productos, Total_Unidades
+        FROM ValorInventarioDiario
+        WHERE Fecha <= ?
+        ORDER BY Fecha DESC
+        """
+        return self._execute_query(query, (self._normalizar_fecha(fecha),), fetch_one=True, use_cache=False)
+
+    def get_historico(self, fecha_desde=None, fecha_hasta=None) -> List[Dict[str, Any]]:
+        """Snapshots entre dos fechas (por defecto, últimos 30 días)"""
+        self._ensure_tabla_valoracion()
+        hasta = self._normalizar_fecha(fecha_hasta) if fecha_hasta else datetime.now().date()
+        if fecha_desde:
+            desde = self._normalizar_fecha(fecha_desde)
+        else:
+            desde = date.fromordinal(hasta.toordinal() - 30)
+
+        query = """
+        SELECT Fecha, Valor_Compra, Valor_Venta, Total_Productos, Total_Unidades
+        FROM ValorInventarioDiario
+        WHERE Fecha BETWEEN ? AND ?
+        ORDER BY Fecha
+        """
+        return self._execute_query(query, (desde, hasta), use_cache=False) or []
+
+    def get_cierres_mensuales(self, anio: int) -> List[Dict[str, Any]]:
+        """Valor del inventario al último snapshot de cada mes del año"""
+        self._ensure_tabla_valoracion()
+        query = """
+        SELECT v.Fecha, MONTH(v.Fecha) as Mes, v.Valor_Compra, v.Valor_Venta,
+            v.Total_Productos, v.Total_Unidades
+        FROM ValorInventarioDiario v
+        INNER JOIN (
+            SELECT MAX(Fecha) as Fecha
+            FROM ValorInventarioDiario
+            WHERE YEAR(Fecha) = ?
+            GROUP BY MONTH(Fecha)
+        ) ultimos ON v.Fecha = ultimos.Fecha
+        ORDER BY v.Fecha
+        """
+        return self._execute_query(query, (anio,), use_cache=False) or []
+
+    def _normalizar_fecha(self, fecha) -> date:
+        """Acepta date, datetime o 'YYYY-MM-DD'"""
+        if isinstance(fecha, datetime):
+            return fecha.date()
+        if isinstance(fecha, date):
+            return fecha
+        return datetime.strptime(str(fecha)[:10], '%Y-%m-%d').date()
+
+
+# ===============================
+# UTILIDADES Y EXPORTACIÓN
+# ===============================
+
+__all__ = ['ValoracionInventarioRepository']
@@ -7,16 +7,22 @@ from ..core.base_repository import BaseRepository
 from ..core.excepciones import (
     VentaError, StockInsuficienteError, ProductoNotFoundError,
     ValidationError, ExceptionHandler, validate_required, validate_positive_number,
-    DatabaseTransactionError
+    DatabaseTransactionError, ConflictoConcurrenciaError, ClinicaBaseException, es_error_concurrencia
 )
 from .producto_repository import ProductoRepository
+from .resumen_ventas_repository import ResumenVentasRepository
+from .resumen_financiero_repository import ResumenFinancieroRepository
 
 class VentaRepository(BaseRepository):
     """Repository para ventas con integración FIFO automática"""
     
+    _tabla_diario_verificada = False
+    
     def __init__(self):
         super().__init__('Ventas', 'ventas')
         self.producto_repo = ProductoRepository()
+        self.resumen_repo = ResumenVentasRepository()
+        self.resumen_financiero_repo = ResumenFinancieroRepository()
         print("💰 VentaRepository inicializado con FIFO automático")
     
     def get_active(self) -> List[Dict[str, Any]]:
@@ -30,7 +36,50 @@ class VentaRepository(BaseRepository):
         """
         resultado = self._execute_query(query, use_cache=False)
         return resultado
-    
+
+    def get_ventas_hoy_desde(self, ultimo_id: int = 0) -> List[Dict[str, Any]]:
+        """
+        Ventas de hoy con id > ultimo_id (feed incremental), en orden ascendente de id.
+        Usa un rango sobre v.Fecha (aprovecha el índice) y trae las unidades por producto
+        de cada venta en 'Productos' {Id_Producto: unidades} para las estadísticas acumuladas.
+        """
+        hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        query = """
+        SELECT v.id, v.Fecha, v.Total, v.Id_Usuario,
+            u.Nombre + ' ' + u.Apellido_Paterno as Vendedor,
+            l.Id_Producto,
+            SUM(dv.Cantidad_Unitario) as Unidades
+        FROM Ventas v
+        INNER JOIN Usuario u ON v.Id_Usuario = u.id
+        LEFT JOIN DetallesVentas dv ON dv.Id_Venta = v.id
+        LEFT JOIN Lote l ON dv.Id_Lote = l.id
+        WHERE v.Fecha >= ? AND v.Fecha < ? AND v.id > ?
+        GROUP BY v.id, v.Fecha, v.Total, v.Id_Usuario, u.Nombre, u.Apellido_Paterno, l.Id_Producto
+        ORDER BY v.id
+        """
+        filas = self._execute_query(
+            query, (hoy, hoy + timedelta(days=1), int(ultimo_id or 0)), use_cache=False
+        ) or []
+
+        ventas = {}
+        for fila in filas:
+            venta = ventas.get(fila['id'])
+            if venta is None:
+                venta = {
+                    'id': fila['id'],
+                    'Fecha': fila['Fecha'],
+                    'Total': fila['Total'],
+                    'Id_Usuario': fila['Id_Usuario'],
+                    'Vendedor': fila['Vendedor'],
+                    'Productos': {}
+                }
+                ventas[fila['id']] = venta
+            if fila.get('Id_Producto') is not None:
+                venta['Productos'][fila['Id_Producto']] = int(fila.get('Unidades') or 0)
+
+        return list(ventas.values())
+
     def buscar_productos_para_venta(self, termino: str) -> List[Dict[str, Any]]:
         """
         ✅ CORREGIDO: Busca productos SIEMPRE sin cache
@@ -382,14 +431,106 @@ class VentaRepository(BaseRepository):
             print(f"❌ Error verificando disponibilidad sin cache para {codigo}: {e}")
             return {"cantidad_disponible": 0, "disponible": False}
 
+    def get_productos_por_codigos(self, codigos: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene varios productos activos por código en una sola consulta
+
+        Returns:
+            {codigo: producto}
+        """
+        codigos = list(dict.fromkeys(str(c).strip() for c in (codigos or []) if str(c).strip()))
+        if not codigos:
+            return {}
+
+        placeholders = ', '.join(['?' for _ in codigos])
+        query = f"""
+        SELECT p.id, p.Codigo, p.Nombre, p.Precio_venta, p.Unidad_Medida,
+               m.Nombre as Marca_Nombre
+        FROM Productos p
+        INNER JOIN Marca m ON p.ID_Marca = m.id
+        WHERE p.Codigo IN ({placeholders}) AND p.Activo = 1
+        """
+        productos = self._execute_query(query, tuple(codigos), use_cache=False) or []
+        return {producto['Codigo']: producto for producto in productos}
+
+    def verificar_disponibilidad_carrito(self, items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Valida el carrito completo: resuelve códigos y verifica FIFO en lote
+
+        Args:
+            items: [{'codigo': str, 'cantidad': int}, ...] (códigos repetidos se suman)
+
+        Returns:
+            {codigo: {'producto': dict|None, 'cantidad': int, **disponibilidad_fifo}}
+        """
+        cantidades_por_codigo = {}
+        for item in items or []:
+            codigo = str(item.get('codigo', '')).strip()
+            if codigo:
+                cantidades_por_codigo[codigo] = cantidades_por_codigo.get(codigo, 0) + int(item.get('cantidad', 0))
+
+        productos = self.get_productos_por_codigos(list(cantidades_por_codigo.keys()))
+        disponibilidad = self.producto_repo.verificar_disponibilidad_fifo_multiple({
+            productos[codigo]['id']: cantidad
+            for codigo, cantidad in cantidades_por_codigo.items()
+            if codigo in productos
+        })
+
+        resultado = {}
+        for codigo, cantidad in cantidades_por_codigo.items():
+            producto = productos.get(codigo)
+            detalle = disponibilidad.get(producto['id']) if producto else None
+            if not detalle:
+                detalle = {
+                    'disponible': False,
+                    'lotes_necesarios': [],
+                    'cantidad_total_disponible': 0,
+                    'tiene_vencidos': False,
+                    'cantidad_faltante': cantidad,
+                    'stock_total': 0,
+                    'lotes_activos': 0
+                }
+            resultado[codigo] = dict(detalle, producto=producto, cantidad=cantidad)
+
+        return resultado
+
     # ===== RESTO DE MÉTODOS SIN CAMBIOS =====
     # (crear_venta, actualizar_venta_completa, eliminar_venta, etc.)
     # Ya están correctos porque usan el sistema FIFO del ProductoRepository
     
     @ExceptionHandler.handle_exception
-    def crear_venta(self, usuario_id: int, items: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    def _ensure_tabla_diario(self):
+        """Crea si no existe la tabla que enlaza cada venta del diario local con la venta registrada"""
+        if VentaRepository._tabla_diario_verificada:
+            return
+        
+        create_table_query = """
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='VentasDiarioLocal' AND xtype='U')
+        BEGIN
+            CREATE TABLE VentasDiarioLocal (
+                Clave CHAR(32) NOT NULL CONSTRAINT PK_VentasDiarioLocal PRIMARY KEY,
+                Id_Venta INT NOT NULL
+            );
+        END
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(create_table_query)
+            conn.commit()
+            VentaRepository._tabla_diario_verificada = True
+        finally:
+            if conn:
+                conn.close()
+    
+    def crear_venta(self, usuario_id: int, items: List[Dict[str, Any]],
+                    fecha: Optional[datetime] = None, clave_diario: str = None) -> Optional[Dict[str, Any]]:
         """
         ✅ Crea venta usando sistema FIFO de lotes
+        fecha: hora real de la venta (ventas del diario local reenviadas); None = ahora en el servidor
+        clave_diario: clave única de la entrada del diario local; si ya hay una venta con esa clave
+        (el commit llegó al servidor pero se perdió la respuesta) se retorna esa venta sin registrar otra
         """
         validate_required(usuario_id, "usuario_id")
         validate_required(items, "items")
@@ -397,6 +538,9 @@ class VentaRepository(BaseRepository):
         if not items:
             raise VentaError("No hay items para vender")
         
+        if clave_diario:
+            self._ensure_tabla_diario()
+        
         conn = None
         venta_id = None
         lotes_afectados = []
@@ -405,39 +549,62 @@ class VentaRepository(BaseRepository):
             conn = self._get_connection()
             cursor = conn.cursor()
             
+            if clave_diario:
+                # El bloqueo de rango evita que dos envíos de la misma entrada se crucen
+                cursor.execute("""
+                    SELECT v.id, v.Id_Usuario, v.Fecha, v.Total
+                    FROM VentasDiarioLocal d WITH (UPDLOCK, HOLDLOCK)
+                    INNER JOIN Ventas v ON v.id = d.Id_Venta
+                    WHERE d.Clave = ?
+                """, (clave_diario,))
+                existente = cursor.fetchone()
+                if existente:
+                    conn.rollback()
+                    print(f"ℹ️ Venta del diario {clave_diario} ya registrada como venta {existente[0]}")
+                    return {
+                        'id': existente[0],
+                        'Id_Usuario': existente[1],
+                        'Fecha': existente[2],
+                        'Total': float(existente[3]),
+                        'Ya_Registrada': True
+                    }
+            
             # Validar items
             items_validados = []
             total_venta = 0
-            
+
             for i, item in enumerate(items):
                 codigo = str(item.get('codigo', '')).strip()
                 cantidad = int(item.get('cantidad', 0))
                 precio = float(item.get('precio', 0))
-                
+
                 if not codigo:
                     raise VentaError(f"Item {i}: Código requerido")
                 if cantidad <= 0:
                     raise VentaError(f"Item {i}: Cantidad debe ser mayor a 0")
                 if precio <= 0:
                     raise VentaError(f"Item {i}: Precio debe ser mayor a 0")
-                
-                # Obtener producto
-                producto = self.get_producto_por_codigo(codigo)
-                if not producto:
+
+            # Verificar disponibilidad FIFO de todo el carrito en una sola pasada
+            disponibilidad_carrito = self.verificar_disponibilidad_carrito(items)
+
+            for codigo, disponibilidad in disponibilidad_carrito.items():
+                if not disponibilidad['producto']:
                     raise ProductoNotFoundError(codigo=codigo)
-                
-                # Verificar disponibilidad FIFO
-                disponibilidad = self.producto_repo.verificar_disponibilidad_fifo(
-                    producto['id'], cantidad
-                )
-                
                 if not disponibilidad['disponible']:
                     raise StockInsuficienteError(
-                        codigo, 
-                        disponibilidad['cantidad_total_disponible'], 
-                        cantidad
+                        codigo,
+                        disponibilidad['cantidad_total_disponible'],
+                        disponibilidad['cantidad']
                     )
-                
+
+            for item in items:
+                codigo = str(item.get('codigo', '')).strip()
+                cantidad = int(item.get('cantidad', 0))
+                precio = float(item.get('precio', 0))
+                disponibilidad = disponibilidad_carrito[codigo]
+                producto = disponibilidad['producto']
+
                 subtotal = cantidad * precio
                 total_venta += subtotal
                 
@@ -454,11 +621,18 @@ class VentaRepository(BaseRepository):
             print(f"📋 Items validados: {len(items_validados)}, Total: ${total_venta:.2f}")
             
             # Crear venta
-            cursor.execute("""
-                INSERT INTO Ventas (Id_Usuario, Fecha, Total)
-                OUTPUT INSERTED.id
-                VALUES (?, GETDATE(), ?)
-            """, (usuario_id, total_venta))
+            if fecha is not None:
+                cursor.execute("""
+                    INSERT INTO Ventas (Id_Usuario, Fecha, Total)
+                    OUTPUT INSERTED.id
+                    VALUES (?, ?, ?)
+                """, (usuario_id, fecha, total_venta))
+            else:
+                cursor.execute("""
+                    INSERT INTO Ventas (Id_Usuario, Fecha, Total)
+                    OUTPUT INSERTED.id
+                    VALUES (?, GETDATE(), ?)
+                """, (usuario_id, total_venta))
             
             resultado = cursor.fetchone()
             if not resultado:
@@ -467,34 +641,34 @@ class VentaRepository(BaseRepository):
             venta_id = resultado[0]
             print(f"✅ Venta creada - ID: {venta_id}")
             
-            # Procesar cada item usando FIFO
-            for item in items_validados:
-                try:
-                    lotes_utilizados = self.producto_repo.reducir_stock_fifo(
-                        item['producto_id'], item['cantidad']
-                    )
-                    lotes_afectados.extend(lotes_utilizados)
-                    
-                    print(f"📦 FIFO aplicado para {item['codigo']}: {len(lotes_utilizados)} lotes")
-                    
-                    # Crear DetallesVentas
-                    for lote_usado in lotes_utilizados:
-                        cursor.execute("""
-                            INSERT INTO DetallesVentas 
-                            (Id_Venta, Id_Lote, Cantidad_Unitario, Precio_Unitario)
-                            VALUES (?, ?, ?, ?)
-                        """, (
-                            venta_id,
-                            lote_usado['lote_id'],
-                            lote_usado['cantidad_reducida'],
-                            item['precio']
-                        ))
-                        
-                except Exception as fifo_error:
-                    print(f"❌ Error en FIFO para {item['codigo']}: {fifo_error}")
-                    raise StockInsuficienteError(
-                        item['codigo'], 0, item['cantidad']
-                    )
+            if clave_diario:
+                cursor.execute(
+                    "INSERT INTO VentasDiarioLocal (Clave, Id_Venta) VALUES (?, ?)",
+                    (clave_diario, venta_id)
+                )
+            
+            # Procesar cada item usando FIFO, por id de producto: todas las cajas bloquean
+            # los lotes en el mismo orden y dos carritos cruzados no se interbloquean
+            for item in sorted(items_validados, key=lambda item: item['producto_id']):
+                lotes_utilizados = self.producto_repo.reducir_stock_fifo(
+                    item['producto_id'], item['cantidad'], conn=conn
+                )
+                lotes_afectados.extend(lotes_utilizados)
+                
+                print(f"📦 FIFO aplicado para {item['codigo']}: {len(lotes_utilizados)} lotes")
+                
+                # Crear DetallesVentas
+                for lote_usado in lotes_utilizados:
+                    cursor.execute("""
+                        INSERT INTO DetallesVentas 
+                        (Id_Venta, Id_Lote, Cantidad_Unitario, Precio_Unitario)
+                        VALUES (?, ?, ?, ?)
+                    """, (
+                        venta_id,
+                        lote_usado['lote_id'],
+                        lote_usado['cantidad_reducida'],
+                        item['precio']
+                    ))
             
             conn.commit()
             
@@ -502,11 +676,16 @@ class VentaRepository(BaseRepository):
             self._invalidate_cache_after_modification()
             if hasattr(self.producto_repo, '_invalidate_cache_after_modification'):
                 self.producto_repo._invalidate_cache_after_modification()
+            self.producto_repo._registrar_cambio_lotes(list({item['producto_id'] for item in items_validados}))
+            
+            # Resúmenes diario por producto y financiero por hora (incrementales)
+            self.resumen_repo.registrar_venta(venta_id)
+            self.resumen_financiero_repo.registrar_movimiento('FARMACIA', venta_id)
             
             venta_completa = {
                 'id': venta_id,
                 'Id_Usuario': usuario_id,
-                'Fecha': datetime.now(),
+                'Fecha': fecha or datetime.now(),
                 'Total': total_venta,
                 'items_procesados': len(items_validados),
                 'lotes_afectados': len(lotes_afectados)
@@ -522,10 +701,16 @@ class VentaRepository(BaseRepository):
                 conn.rollback()
                 print("🔄 Rollback ejecutado")
             
-            if isinstance(e, (VentaError, ProductoNotFoundError, StockInsuficienteError)):
-                raise e
-            else:
-                raise VentaError(f"Error procesando venta: {str(e)}")
+            if isinstance(e, ClinicaBaseException):
+                raise
+            if es_error_concurrencia(e):
+                raise ConflictoConcurrenciaError(
+                    "Deadlock registrando la venta", operation="crear_venta", original_error=e
+                ) from e
+            if isinstance(e, pyodbc.Error):
+                # Conexión caída, timeout, etc.: se propaga con el error original de pyodbc
+                raise
+            raise VentaError(f"Error procesando venta: {str(e)}") from e
             
         finally:
             if conn:
@@ -619,7 +804,14 @@ class VentaRepository(BaseRepository):
     
     @ExceptionHandler.handle_exception
     def actualizar_venta_completa(self, venta_id: int, nuevos_productos: List[Dict[str, Any]]) -> bool:
-        """Actualiza venta evitando deadlocks"""
+        """
+        Actualiza una venta aplicando solo la diferencia por línea (producto + precio):
+        - líneas sin cambios conservan sus lotes y detalles originales
+        - si baja la cantidad se devuelve stock a los últimos lotes asignados
+        - si sube (o es nueva) se asigna solo la diferencia por FIFO
+        - cambio de precio sin cambio de producto actualiza los detalles en sitio
+        Todo en una sola transacción.
+        """
         validate_required(venta_id, "venta_id")
         validate_required(nuevos_productos, "nuevos_productos")
         
@@ -634,118 +826,78 @@ class VentaRepository(BaseRepository):
             
             print(f"🔄 Iniciando actualización de venta {venta_id}")
             
-            # Restaurar stock
-            detalles_originales = self.get_detalles_venta_para_restauracion(venta_id)
-            if not detalles_originales:
+            cursor.execute("SELECT Fecha FROM Ventas WITH (UPDLOCK) WHERE id = ?", (venta_id,))
+            fila_venta = cursor.fetchone()
+            if not fila_venta:
                 raise VentaError(f"Venta {venta_id} no encontrada")
+            fecha_venta = fila_venta[0]
             
-            for detalle in detalles_originales:
-                cursor.execute("""
-                    UPDATE Lote 
-                    SET Cantidad_Unitario = Cantidad_Unitario + ?
-                    WHERE id = ?
-                """, (detalle['Cantidad_Unitario'], detalle['Id_Lote']))
-            
-            print(f"✅ Stock restaurado")
-            
-            # Eliminar detalles originales
-            cursor.execute("DELETE FROM DetallesVentas WHERE Id_Venta = ?", (venta_id,))
-            
-            # Validar nuevos productos
-            total_nueva_venta = 0
-            items_para_procesar = []
-            
-            for i, producto in enumerate(nuevos_productos):
-                codigo = str(producto.get('codigo', '')).strip()
-                cantidad = int(producto.get('cantidad', 0))
-                precio = float(producto.get('precio', 0))
-                
-                if not codigo or cantidad <= 0 or precio <= 0:
-                    raise VentaError(f"Producto {i}: Datos inválidos")
-                
-                # ✅ Verificar stock desde lotes
-                cursor.execute("""
-                    SELECT p.id, 
-                        ISNULL((
-                            SELECT SUM(l.Cantidad_Unitario) 
-                            FROM Lote l 
-                            WHERE l.Id_Producto = p.id 
-                              AND l.Estado = 'ACTIVO'
-                        ), 0) as Stock_Disponible
-                    FROM Productos p
-                    WHERE p.Codigo = ? AND p.Activo = 1
-                """, (codigo,))
-                
-                producto_result = cursor.fetchone()
-                if not producto_result:
-                    raise ProductoNotFoundError(codigo=codigo)
-                
-                producto_id, stock_disponible = producto_result[0], producto_result[1]
-                
-                if stock_disponible < cantidad:
-                    raise StockInsuficienteError(codigo, stock_disponible, cantidad)
-                
-                subtotal = cantidad * precio
-                total_nueva_venta += subtotal
-                
-                items_para_procesar.append({
-                    'producto_id': producto_id,
-                    'codigo': codigo,
-                    'cantidad': cantidad,
-                    'precio': precio
+            # Detalles actuales en orden de asignación
+            cursor.execute("""
+                SELECT dv.id, dv.Id_Lote, dv.Cantidad_Unitario, dv.Precio_Unitario,
+                       l.Id_Producto, p.Codigo
+                FROM DetallesVentas dv
+                INNER JOIN Lote l ON dv.Id_Lote = l.id
+                INNER JOIN Productos p ON l.Id_Producto = p.id
+                WHERE dv.Id_Venta = ?
+                ORDER BY dv.id
+            """, (venta_id,))
+            originales = {}
+            for detalle_id, lote_id, cantidad, precio, producto_id, codigo in cursor.fetchall():
+                linea = originales.setdefault((codigo.strip(), round(float(precio), 2)), {
+                    'producto_id': producto_id, 'detalles': []
                 })
+                linea['detalles'].append({'id': detalle_id, 'lote_id': lote_id, 'cantidad': cantidad})
             
-            print(f"✅ Productos validados: {len(items_para_procesar)}")
+            if not originales:
+                raise VentaError(f"Venta {venta_id} no encontrada")
             
-            # Aplicar nueva venta usando FIFO
-            for item in items_para_procesar:
-                cantidad_restante = item['cantidad']
-                
-                cursor.execute("""
-                    SELECT id, Cantidad_Unitario 
-                    FROM Lote 
-                    WHERE Id_Producto = ? 
-                      AND Cantidad_Unitario > 0 
-                      AND Estado = 'ACTIVO'
-                    ORDER BY 
-                        CASE WHEN Fecha_Vencimiento IS NOT NULL 
-                             THEN Fecha_Vencimiento 
-                             ELSE '9999-12-31' 
-                        END ASC,
-                        Fecha_Compra ASC,
-                        id ASC
-                """, (item['producto_id'],))
-                
-                lotes_disponibles = cursor.fetchall()
-                
-                for lote_id, cantidad_lote in lotes_disponibles:
-                    if cantidad_restante <= 0:
-                        break
-                    
-                    cantidad_a_usar = min(cantidad_restante, cantidad_lote)
-                    
-                    cursor.execute("""
-                        UPDATE Lote 
-                        SET Cantidad_Unitario = Cantidad_Unitario - ?
-                        WHERE id = ?
-                    """, (cantidad_a_usar, lote_id))
-                    
-                    cursor.execute("""
-                        INSERT INTO DetallesVentas 
-                        (Id_Venta, Id_Lote, Cantidad_Unitario, Precio_Unitario)
-                        VALUES (?, ?, ?, ?)
-                    """, (venta_id, lote_id, cantidad_a_usar, item['precio']))
-                    
-                    cantidad_restante -= cantidad_a_usar
-                
-                if cantidad_restante > 0:
-                    raise StockInsuficienteError(
-                        item['codigo'], 
-                        item['cantidad'] - cantidad_restante, 
-                        item['cantidad']
+            nuevas, total_nueva_venta = self._agrupar_lineas_venta(nuevos_productos)
+            self._aplicar_cambios_precio(cursor, originales, nuevas)
+            
+            productos_afectados = set()
+            por_asignar = []
+            
+            # 1. Liberar primero (líneas eliminadas o con menos cantidad)
+            for clave, linea in originales.items():
+                cantidad_original = sum(d['cantidad'] for d in linea['detalles'])
+                cantidad_nueva = nuevas.get(clave, 0)
+                if cantidad_nueva < cantidad_original:
+                    self._liberar_detalles(cursor, linea['detalles'], cantidad_original - cantidad_nueva)
+                    productos_afectados.add(linea['producto_id'])
+                elif cantidad_nueva > cantidad_original:
+                    por_asignar.append((clave, linea, cantidad_nueva - cantidad_original))
+            
+            # 2. Líneas nuevas: resolver productos en una consulta
+            codigos_nuevos = sorted({clave[0] for clave in nuevas if clave not in originales})
+            ids_por_codigo = {}
+            if codigos_nuevos:
+                placeholders = ', '.join('?' for _ in codigos_nuevos)
+                cursor.execute(
+                    f"SELECT id, Codigo FROM Productos WHERE Activo = 1 AND Codigo IN ({placeholders})",
+                    codigos_nuevos
+                )
+                ids_por_codigo = {codigo.strip(): producto_id for producto_id, codigo in cursor.fetchall()}
+            
+            for clave, cantidad in nuevas.items():
+                if clave in originales:
+                    continue
+                if clave[0] not in ids_por_codigo:
+                    raise ProductoNotFoundError(codigo=clave[0])
+                por_asignar.append((clave, {'producto_id': ids_por_codigo[clave[0]], 'detalles': []}, cantidad))
+            
+            # 3. Asignar solo las diferencias por FIFO
+            if por_asignar:
+                lotes_por_producto = self._obtener_lotes_fifo(
+                    cursor, {linea['producto_id'] for _, linea, _ in por_asignar}
+                )
+                for (codigo, precio), linea, cantidad in por_asignar:
+                    self._asignar_detalles(
+                        cursor, venta_id, codigo, precio, linea,
+                        lotes_por_producto.get(linea['producto_id'], []), cantidad
                     )
+                    productos_afectados.add(linea['producto_id'])
             
-            # Actualizar total
             cursor.execute(
                 "UPDATE Ventas SET Total = ? WHERE id = ?", 
                 (total_nueva_venta, venta_id)
@@ -754,20 +906,150 @@ class VentaRepository(BaseRepository):
             conn.commit()
             
             self._invalidate_cache_after_modification()
+            if productos_afectados:
+                self.producto_repo._registrar_cambio_lotes(list(productos_afectados))
+            self._reconstruir_resumen_dia(fecha_venta)
             
-            print(f"🎉 Venta {venta_id} actualizada exitosamente")
+            print(f"🎉 Venta {venta_id} actualizada - {len(productos_afectados)} productos con cambios de stock")
             return True
             
         except Exception as e:
             print(f"❌ Error actualizando venta: {e}")
             if conn:
                 conn.rollback()
-            raise VentaError(f"Error actualizando venta: {str(e)}")
+            raise VentaError(f"Error actualizando venta: {str(e)}") from e
         
         finally:
             if conn:
                 conn.close()
 
+    def _agrupar_lineas_venta(self, productos: List[Dict[str, Any]]) -> Tuple[Dict[Tuple[str, float], int], float]:
+        """Valida los productos y agrupa cantidades por (código, precio)"""
+        lineas = {}
+        total = 0
+        for i, producto in enumerate(productos):
+            codigo = str(producto.get('codigo', '')).strip()
+            cantidad = int(producto.get('cantidad', 0))
+            precio = round(float(producto.get('precio', 0)), 2)
+            
+            if not codigo or cantidad <= 0 or precio <= 0:
+                raise VentaError(f"Producto {i}: Datos inválidos")
+            
+            lineas[(codigo, precio)] = lineas.get((codigo, precio), 0) + cantidad
+            total += cantidad * precio
+        return lineas, total
+
+    def _aplicar_cambios_precio(self, cursor, originales: Dict, nuevas: Dict):
+        """
+        Si un producto tiene una sola línea antes y después y solo cambió el precio,
+        actualiza el precio de sus detalles y reasigna la clave para conservar los lotes.
+        """
+        por_codigo_original = {}
+        for clave in originales:
+            por_codigo_original.setdefault(clave[0], []).append(clave)
+        por_codigo_nuevo = {}
+        for clave in nuevas:
+            por_codigo_nuevo.setdefault(clave[0], []).append(clave)
+        
+        for codigo, claves_originales in por_codigo_original.items():
+            claves_nuevas = por_codigo_nuevo.get(codigo, [])
+            if len(claves_originales) != 1 or len(claves_nuevas) != 1:
+                continue
+            clave_original, clave_nueva = claves_originales[0], claves_nuevas[0]
+            if clave_original == clave_nueva:
+                continue
+            
+            linea = originales.pop(clave_original)
+            ids = [d['id'] for d in linea['detalles']]
+            placeholders = ', '.join('?' for _ in ids)
+            cursor.execute(
+                f"UPDATE DetallesVentas SET Precio_Unitario = ? WHERE id IN ({placeholders})",
+                [clave_nueva[1]] + ids
+            )
+            originales[clave_nueva] = linea
+
+    def _liberar_detalles(self, cursor, detalles: List[Dict[str, Any]], cantidad: int):
+        """Devuelve stock empezando por los últimos lotes asignados a la línea"""
+        restante = cantidad
+        for detalle in reversed(detalles):
+            if restante <= 0:
+                break
+            devolver = min(restante, detalle['cantidad'])
+            
+            cursor.execute(
+                "UPDATE Lote SET Cantidad_Unitario = Cantidad_Unitario + ? WHERE id = ?",
+                (devolver, detalle['lote_id'])
+            )
+            if devolver == detalle['cantidad']:
+                cursor.execute("DELETE FROM DetallesVentas WHERE id = ?", (detalle['id'],))
+            else:
+                cursor.execute(
+                    "UPDATE DetallesVentas SET Cantidad_Unitario = Cantidad_Unitario - ? WHERE id = ?",
+                    (devolver, detalle['id'])
+                )
+            detalle['cantidad'] -= devolver
+            restante -= devolver
+
+    def _obtener_lotes_fifo(self, cursor, producto_ids) -> Dict[int, List[List[int]]]:
+        """Lotes con stock de varios productos en orden FIFO, bloqueados para la transacción"""
+        ids = sorted(producto_ids)
+        placeholders = ', '.join('?' for _ in ids)
+        cursor.execute(f"""
+            SELECT id, Id_Producto, Cantidad_Unitario
+            FROM Lote WITH (UPDLOCK, ROWLOCK)
+            WHERE Id_Producto IN ({placeholders})
+              AND Cantidad_Unitario > 0
+              AND Estado = 'ACTIVO'
+            ORDER BY 
+                Id_Producto,
+                CASE WHEN Fecha_Vencimiento IS NOT NULL 
+                     THEN Fecha_Vencimiento 
+                     ELSE '9999-12-31' 
+                END ASC,
+                Fecha_Compra ASC,
+                id ASC
+        """, ids)
+        lotes = {}
+        for lote_id, producto_id, cantidad in cursor.fetchall():
+            lotes.setdefault(producto_id, []).append([lote_id, cantidad])
+        return lotes
+
+    def _asignar_detalles(self, cursor, venta_id: int, codigo: str, precio: float,
+                          linea: Dict[str, Any], lotes: List[List[int]], cantidad: int):
+        """Descuenta `cantidad` por FIFO y la agrega a los detalles de la línea"""
+        disponible = sum(lote[1] for lote in lotes)
+        if disponible < cantidad:
+            raise StockInsuficienteError(codigo, disponible, cantidad)
+        
+        detalle_por_lote = {d['lote_id']: d for d in linea['detalles'] if d['cantidad'] > 0}
+        restante = cantidad
+        for lote in lotes:
+            if restante <= 0:
+                break
+            lote_id, cantidad_lote = lote
+            if cantidad_lote <= 0:
+                continue
+            usar = min(restante, cantidad_lote)
+            
+            cursor.execute(
+                "UPDATE Lote SET Cantidad_Unitario = Cantidad_Unitario - ? WHERE id = ?",
+                (usar, lote_id)
+            )
+            if lote_id in detalle_por_lote:
+                cursor.execute(
+                    "UPDATE DetallesVentas SET Cantidad_Unitario = Cantidad_Unitario + ? WHERE id = ?",
+                    (usar, detalle_por_lote[lote_id]['id'])
+                )
+            else:
+                cursor.execute("""
+                    INSERT INTO DetallesVentas 
+                    (Id_Venta, Id_Lote, Cantidad_Unitario, Precio_Unitario)
+                    VALUES (?, ?, ?, ?)
+                """, (venta_id, lote_id, usar, precio))
+            
+            lote[1] -= usar
+            restante -= usar
+
     @ExceptionHandler.handle_exception
     def eliminar_venta(self, venta_id: int) -> bool:
         """Elimina venta y RESTAURA stock a lotes"""
@@ -786,6 +1068,9 @@ class VentaRepository(BaseRepository):
             if not detalles_venta:
                 raise VentaError(f"Venta {venta_id} no encontrada")
             
+            cursor.execute("SELECT Fecha FROM Ventas WHERE id = ?", (venta_id,))
+            fecha_venta = cursor.fetchone()[0]
+            
             # Restaurar stock a lotes
             for detalle in detalles_venta:
                 cursor.execute("""
@@ -808,6 +1093,8 @@ class VentaRepository(BaseRepository):
             conn.commit()
             
             self._invalidate_cache_after_modification()
+            self.producto_repo._registrar_cambio_lotes([d['Id_Producto'] for d in detalles_venta])
+            self._reconstruir_resumen_dia(fecha_venta)
             
             print(f"🎉 Venta {venta_id} eliminada - Stock restaurado")
             return True
@@ -818,7 +1105,7 @@ class VentaRepository(BaseRepository):
             if conn:
                 conn.rollback()
             
-            raise VentaError(f"Error eliminando venta: {str(e)}")
+            raise VentaError(f"Error eliminando venta: {str(e)}") from e
         
         finally:
             if conn:
@@ -852,6 +1139,14 @@ class VentaRepository(BaseRepository):
 
     # ===== MÉTODOS DE INVALIDACIÓN DE CACHE =====
     
+    def _reconstruir_resumen_dia(self, fecha):
+        """Recalcula los resúmenes del día tras editar/eliminar una venta (sin afectar la operación)"""
+        try:
+            self.resumen_repo.reconstruir_rango(fecha)
+        except Exception as e:
+            print(f"⚠️ Error recalculando resumen diario: {e}")
+        self.resumen_financiero_repo.recalcular_dias('FARMACIA', [fecha])
+
     def _invalidate_cache_after_modification(self):
         """Invalidación completa de cache"""
         try:
@@ -978,4 +1273,16 @@ class VentaRepository(BaseRepository):
             
         except Exception as e:
             print(f"❌ Error obteniendo ventas por rango: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def get_totales_ventas(self, fecha_inicio: datetime, fecha_fin: datetime,
+                           agrupar_por: str = None):
+        """
+        Total, cantidad y promedio de ventas en [fecha_inicio, fecha_fin) calculados en SQL.
+        agrupar_por: None, 'dia', 'hora', 'mes' o 'usuario'
+        """
+        return self._get_agregados(
+            'v.Total', 'Ventas v', 'v.Fecha', fecha_inicio, fecha_fin,
+            agrupaciones={'usuario': 'v.Id_Usuario'},
+            agrupar_por=agrupar_por
+        )
\ No newline at end of file
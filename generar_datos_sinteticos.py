@@ -0,0 +1,500 @@
+"""
+Generador de datos sintéticos a escala de clínica
+Sistema de Gestión Médica - Clínica María Inmaculada
+
+Puebla una base de PRUEBA creada con database_scripts/01_schema.sql (y los catálogos de
+02_datos_iniciales.sql) con volúmenes reales: pacientes, productos, lotes/compras, ventas
+con sus detalles, consultas, laboratorio, enfermería y gastos.
+
+- Ventas con estacionalidad (día de la semana, época del año, hora del día, tendencia)
+  y popularidad de productos tipo Zipf.
+- Lotes coherentes con FIFO: cada lote se compra antes del tramo de demanda que cubre y
+  los detalles de venta se asignan en el mismo orden que usa la aplicación
+  (Fecha_Vencimiento, id), así el stock final de cada lote es exacto.
+- Carga masiva con ids explícitos (IDENTITY_INSERT) y fast_executemany por bloques.
+
+Uso:
+    python generar_datos_sinteticos.py --base ClinicaPruebas
+    python generar_datos_sinteticos.py --base ClinicaPruebas --escala 0.05 --semilla 7
+"""
+
+import sys
+import time
+import math
+import random
+import argparse
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Tuple
+
+from simulador_cajas import preparar_entorno
+
+
+NOMBRES = [
+    'Juan', 'María', 'José', 'Ana', 'Luis', 'Carmen', 'Carlos', 'Rosa', 'Jorge', 'Patricia',
+    'Miguel', 'Lucía', 'Pedro', 'Elena', 'Mario', 'Sofía', 'Fernando', 'Gabriela', 'Ricardo', 'Daniela',
+    'Roberto', 'Valeria', 'Diego', 'Camila', 'Andrés', 'Paola', 'Sergio', 'Verónica', 'Raúl', 'Silvia'
+]
+APELLIDOS = [
+    'Mamani', 'Quispe', 'Flores', 'Rodríguez', 'Fernández', 'García', 'López', 'Choque', 'Gutiérrez',
+    'Vargas', 'Rojas', 'Condori', 'Pérez', 'Torrez', 'Morales', 'Gonzales', 'Chávez', 'Ramírez',
+    'Limachi', 'Apaza', 'Cruz', 'Herrera', 'Medina', 'Castro', 'Ortiz', 'Soliz', 'Vaca', 'Justiniano'
+]
+PRINCIPIOS = [
+    'Paracetamol', 'Ibuprofeno', 'Amoxicilina', 'Omeprazol', 'Loratadina', 'Metformina', 'Losartán',
+    'Diclofenaco', 'Azitromicina', 'Cetirizina', 'Salbutamol', 'Ranitidina', 'Naproxeno', 'Ciprofloxacino',
+    'Enalapril', 'Atorvastatina', 'Dexametasona', 'Clotrimazol', 'Metronidazol', 'Ambroxol'
+]
+PRESENTACIONES = [
+    ('Tabletas', 'Unidades'), ('Cápsulas', 'Unidades'), ('Jarabe', 'Frascos'),
+    ('Suspensión', 'Frascos'), ('Ampolla', 'Unidades'), ('Crema', 'Tubos'), ('Gotas', 'Frascos')
+]
+
+# Peso relativo por día de la semana (lunes=0 ... domingo=6)
+PESO_DIA_SEMANA = [1.15, 1.05, 1.0, 1.0, 1.1, 0.85, 0.4]
+# Peso relativo por hora (7:00 a 21:00)
+PESO_HORA = {7: 3, 8: 7, 9: 10, 10: 11, 11: 10, 12: 7, 13: 5, 14: 6, 15: 8, 16: 9, 17: 9, 18: 8, 19: 6, 20: 4, 21: 2}
+# Productos distintos por venta (1..6) y unidades por producto (1..5)
+PESO_ITEMS_VENTA = [35, 25, 18, 10, 7, 5]
+PESO_UNIDADES = [55, 22, 10, 8, 5]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos (solo base de pruebas)")
+    parser.add_argument('--base', required=True, help="Base de datos de pruebas (DB_DATABASE)")
+    parser.add_argument('--servidor', default=None, help="Servidor SQL (por defecto el de la configuración)")
+    parser.add_argument('--escala', type=float, default=1.0, help="Multiplica todos los volúmenes")
+    parser.add_argument('--dias', type=int, default=730, help="Días de historia hasta hoy")
+    parser.add_argument('--pacientes', type=int, default=100_000)
+    parser.add_argument('--productos', type=int, default=5_000)
+    parser.add_argument('--lotes', type=int, default=50_000)
+    parser.add_argument('--detalles-venta', type=int, default=2_000_000)
+    parser.add_argument('--consultas', type=int, default=200_000)
+    parser.add_argument('--laboratorio', type=int, default=80_000)
+    parser.add_argument('--enfermeria', type=int, default=60_000)
+    parser.add_argument('--gastos', type=int, default=15_000)
+    parser.add_argument('--tamano-bloque', type=int, default=10_000, help="Filas por executemany/commit")
+    parser.add_argument('--semilla', type=int, default=42)
+    return parser.parse_args()
+
+
+class GeneradorDatosSinteticos:
+    """Genera y carga los datos tabla por tabla"""
+
+    def __init__(self, conn, args):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.cursor.fast_executemany = True
+        self.args = args
+        self.azar = random.Random(args.semilla)
+        self.hoy = date.today()
+        self.inicio = self.hoy - timedelta(days=args.dias)
+
+        escala = max(args.escala, 0.0001)
+        self.volumen = {
+            clave: max(1, int(getattr(args, clave) * escala))
+            for clave in ('pacientes', 'productos', 'lotes', 'detalles_venta',
+                          'consultas', 'laboratorio', 'enfermeria', 'gastos')
+        }
+        self._preparar_calendario()
+
+    # ===============================
+    # UTILIDADES
+    # ===============================
+
+    def _preparar_calendario(self):
+        """Pesos acumulados por día: día de la semana x estacionalidad anual x tendencia"""
+        self.dias = [self.inicio + timedelta(days=i) for i in range(self.args.dias + 1)]
+        acumulado = 0.0
+        self.pesos_dias = []
+        for i, dia in enumerate(self.dias):
+            estacion = 1 + 0.2 * math.cos(2 * math.pi * (dia.timetuple().tm_yday - 190) / 365)
+            tendencia = 0.8 + 0.4 * i / max(1, len(self.dias) - 1)
+            acumulado += PESO_DIA_SEMANA[dia.weekday()] * estacion * tendencia
+            self.pesos_dias.append(acumulado)
+        self.horas = list(PESO_HORA.keys())
+        self.pesos_horas = list(PESO_HORA.values())
+
+    def _fechas(self, cantidad: int) -> List[datetime]:
+        """Fechas/horas con la estacionalidad del calendario, ordenadas"""
+        dias = self.azar.choices(self.dias, cum_weights=self.pesos_dias, k=cantidad)
+        horas = self.azar.choices(self.horas, weights=self.pesos_horas, k=cantidad)
+        fechas = [
+            datetime(d.year, d.month, d.day, h, self.azar.randrange(60), self.azar.randrange(60))
+            for d, h in zip(dias, horas)
+        ]
+        fechas.sort()
+        return fechas
+
+    def _siguiente_id(self, tabla: str) -> int:
+        self.cursor.execute(f"SELECT ISNULL(MAX(id), 0) + 1 FROM {tabla}")
+        return int(self.cursor.fetchone()[0])
+
+    def _ids(self, tabla: str) -> List[int]:
+        self.cursor.execute(f"SELECT id FROM {tabla}")
+        return [int(fila[0]) for fila in self.cursor.fetchall()]
+
+    def _insertar(self, tabla: str, columnas: List[str], filas: List[tuple]):
+        """Carga masiva con ids explícitos; commit por bloque"""
+        if not filas:
+            return
+        inicio = time.perf_counter()
+        marcadores = ', '.join('?' for _ in columnas)
+        query = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores})"
+        identidad = columnas[0] == 'id'
+
+        for desde in range(0, len(filas), self.args.tamano_bloque):
+            if identidad:
+                self.cursor.execute(f"SET IDENTITY_INSERT {tabla} ON")
+            self.cursor.executemany(query, filas[desde:desde + self.args.tamano_bloque])
+            if identidad:
+                self.cursor.execute(f"SET IDENTITY_INSERT {tabla} OFF")
+            self.conn.commit()
+
+        segundos = time.perf_counter() - inicio
+        print(f"   📥 {tabla}: {len(filas):,} filas en {segundos:.1f} s")
+
+    def _persona(self) -> Tuple[str, str, str]:
+        return (self.azar.choice(NOMBRES), self.azar.choice(APELLIDOS), self.azar.choice(APELLIDOS))
+
+    # ===============================
+    # CATÁLOGOS
+    # ===============================
+
+    def preparar_catalogos(self):
+        """Lee los catálogos de 02_datos_iniciales y completa los que falten"""
+        self.usuarios = self._ids('Usuario')
+        if not self.usuarios:
+            raise RuntimeError("La base no tiene usuarios: ejecute primero 02_datos_iniciales.sql")
+
+        self.especialidades = self._ids('Especialidad')
+        self.tipos_analisis = self._ids('Tipos_Analisis')
+        self.procedimientos = self._ids('Tipos_Procedimientos')
+        self.tipos_gasto = self._ids('Tipo_Gastos')
+        if not (self.especialidades and self.tipos_analisis and self.procedimientos and self.tipos_gasto):
+            raise RuntimeError("Faltan catálogos (especialidades, análisis, procedimientos o tipos de gasto)")
+
+        self.marcas = self._ids('Marca')
+        if len(self.marcas) < 20:
+            base = self._siguiente_id('Marca')
+            self._insertar('Marca', ['id', 'Nombre', 'Detalles'], [
+                (base + i, f"Laboratorio Sintético {base + i}", None) for i in range(20)
+            ])
+            self.marcas = self._ids('Marca')
+
+        self.proveedores = self._ids('Proveedor')
+        if len(self.proveedores) < 10:
+            base = self._siguiente_id('Proveedor')
+            self._insertar('Proveedor', ['id', 'Nombre', 'Direccion'], [
+                (base + i, f"Distribuidora Sintética {base + i}", "Sin dirección") for i in range(10)
+            ])
+            self.proveedores = self._ids('Proveedor')
+
+        self.proveedores_gastos = self._ids('Proveedor_Gastos')
+        if not self.proveedores_gastos:
+            base = self._siguiente_id('Proveedor_Gastos')
+            self._insertar('Proveedor_Gastos', ['id', 'Nombre'], [
+                (base + i, f"Proveedor de servicios {base + i}") for i in range(10)
+            ])
+            self.proveedores_gastos = self._ids('Proveedor_Gastos')
+
+        self.trabajadores = self._ids('Trabajadores')
+        if len(self.trabajadores) < 10:
+            tipos = self._ids('Tipo_Trabajadores')
+            if not tipos:
+                raise RuntimeError("Falta el catálogo Tipo_Trabajadores")
+            base = self._siguiente_id('Trabajadores')
+            self._insertar('Trabajadores', ['id', 'Nombre', 'Apellido_Paterno', 'Apellido_Materno', 'Id_Tipo_Trabajador'], [
+                (base + i, *self._persona(), self.azar.choice(tipos)) for i in range(30)
+            ])
+            self.trabajadores = self._ids('Trabajadores')
+
+    # ===============================
+    # PACIENTES Y PRODUCTOS
+    # ===============================
+
+    def generar_pacientes(self):
+        base = self._siguiente_id('Pacientes')
+        filas = []
+        for i in range(self.volumen['pacientes']):
+            cedula = str(1_000_000 + base + i) if self.azar.random() < 0.85 else None
+            filas.append((base + i, *self._persona(), cedula))
+        self._insertar('Pacientes', ['id', 'Nombre', 'Apellido_Paterno', 'Apellido_Materno', 'Cedula'], filas)
+        self.pacientes = list(range(base, base + len(filas)))
+
+    def generar_productos(self):
+        base = self._siguiente_id('Productos')
+        filas = []
+        self.productos = []
+        for i in range(self.volumen['productos']):
+            producto_id = base + i
+            presentacion, unidad = self.azar.choice(PRESENTACIONES)
+            costo = round(self.azar.lognormvariate(1.6, 0.8), 2) + 0.5
+            venta = round(costo * self.azar.uniform(1.2, 1.6), 2)
+            con_vencimiento = self.azar.random() < 0.85
+            filas.append((
+                producto_id, f"SIN{producto_id:07d}",
+                f"{self.azar.choice(PRINCIPIOS)} {self.azar.choice((50, 100, 250, 500, 750))}mg {presentacion}",
+                None, costo, venta, unidad, self.azar.choice(self.marcas),
+                self.azar.choice((5, 10, 20, 30)), 1
+            ))
+            self.productos.append({
+                'id': producto_id, 'costo': costo, 'precio': venta,
+                'vida_util': self.azar.randint(360, 1080) if con_vencimiento else None,
+                'stock_minimo': filas[-1][8]
+            })
+        self._insertar('Productos', [
+            'id', 'Codigo', 'Nombre', 'Detalles', 'Precio_compra', 'Precio_venta',
+            'Unidad_Medida', 'ID_Marca', 'Stock_Minimo', 'Activo'
+        ], filas)
+
+    # ===============================
+    # VENTAS, LOTES Y COMPRAS (FIFO)
+    # ===============================
+
+    def generar_ventas_y_lotes(self):
+        """
+        1. Demanda: ventas con fecha/hora y productos (popularidad Zipf).
+        2. Lotes por producto: cada uno se compra antes del tramo de demanda que cubre.
+        3. Asignación FIFO de cada línea de venta a lotes (mismo orden que la aplicación).
+        """
+        items_promedio = sum((i + 1) * p for i, p in enumerate(PESO_ITEMS_VENTA)) / sum(PESO_ITEMS_VENTA)
+        cantidad_ventas = max(1, int(self.volumen['detalles_venta'] / items_promedio))
+        print(f"🧾 Generando {cantidad_ventas:,} ventas (~{self.volumen['detalles_venta']:,} detalles)")
+
+        pesos_productos = list(_acumular(1 / (rango + 1) ** 0.9 for rango in range(len(self.productos))))
+        orden_popularidad = self.productos[:]
+        self.azar.shuffle(orden_popularidad)
+
+        fechas = self._fechas(cantidad_ventas)
+        ventas = []
+        demanda = defaultdict(list)  # producto_id -> [(indice_venta, unidades)]
+        for indice, fecha in enumerate(fechas):
+            cantidad_items = self.azar.choices(range(1, 7), weights=PESO_ITEMS_VENTA)[0]
+            elegidos = {}
+            for producto in self.azar.choices(orden_popularidad, cum_weights=pesos_productos, k=cantidad_items):
+                elegidos[producto['id']] = producto
+            lineas = []
+            for producto in elegidos.values():
+                unidades = self.azar.choices(range(1, 6), weights=PESO_UNIDADES)[0]
+                lineas.append((producto, unidades))
+                demanda[producto['id']].append((indice, unidades))
+            ventas.append((fecha, self.azar.choice(self.usuarios), lineas))
+
+        lotes_por_producto = self._planificar_lotes(demanda, fechas)
+        self._insertar_compras_y_lotes(lotes_por_producto)
+        self._insertar_ventas(ventas, lotes_por_producto)
+
+    def _planificar_lotes(self, demanda: Dict[int, List[Tuple[int, int]]], fechas: List[datetime]) -> Dict[int, List[Dict]]:
+        """Reparte los lotes según la demanda de cada producto; cada lote cubre un tramo de su demanda"""
+        total_unidades = sum(u for lineas in demanda.values() for _, u in lineas) or 1
+        lotes_extra = max(0, self.volumen['lotes'] - len(self.productos))
+        lotes_por_producto = {}
+
+        for producto in self.productos:
+            lineas = demanda.get(producto['id'], [])
+            unidades = sum(u for _, u in lineas)
+            cantidad_lotes = 1 + int(lotes_extra * unidades / total_unidades)
+            cantidad_lotes = max(1, min(cantidad_lotes, len(lineas) or 1))
+
+            # Cortes por cuantiles de demanda acumulada
+            tramos = [[] for _ in range(cantidad_lotes)]
+            acumulado = 0
+            for indice, u in lineas:
+                tramo = min(cantidad_lotes - 1, int(acumulado * cantidad_lotes / max(1, unidades)))
+                tramos[tramo].append((indice, u))
+                acumulado += u
+
+            lotes = []
+            fecha_anterior = datetime.combine(self.inicio - timedelta(days=self.azar.randint(5, 30)), datetime.min.time())
+            for numero, tramo in enumerate(tramos):
+                if numero == 0 or not tramo:
+                    fecha_compra = fecha_anterior
+                else:
+                    primera = fechas[tramo[0][0]]
+                    fecha_compra = max(fecha_anterior, primera - timedelta(days=self.azar.randint(1, 10)))
+                fecha_compra = fecha_compra.replace(hour=0, minute=0, second=0)
+                fecha_anterior = fecha_compra
+
+                necesarias = sum(u for _, u in tramo)
+                cantidad = int(necesarias * self.azar.uniform(1.05, 1.35)) + self.azar.randint(0, 10)
+                if numero == cantidad_lotes - 1:
+                    cantidad += producto['stock_minimo'] * self.azar.randint(1, 4)
+
+                vencimiento = None
+                if producto['vida_util']:
+                    vencimiento = (fecha_compra + timedelta(days=producto['vida_util'] + self.azar.randint(-60, 60))).date()
+
+                lotes.append({
+                    'producto': producto, 'fecha_compra': fecha_compra, 'vencimiento': vencimiento,
+                    'cantidad': max(1, cantidad), 'restante': max(1, cantidad),
+                    'costo': round(producto['costo'] * self.azar.uniform(0.95, 1.05), 2)
+                })
+            lotes_por_producto[producto['id']] = lotes
+
+        return lotes_por_producto
+
+    def _insertar_compras_y_lotes(self, lotes_por_producto: Dict[int, List[Dict]]):
+        """Una compra por día de reposición; ids de lote en orden de compra"""
+        todos = sorted(
+            (lote for lotes in lotes_por_producto.values() for lote in lotes),
+            key=lambda l: (l['fecha_compra'], l['producto']['id'])
+        )
+
+        base_compra = self._siguiente_id('Compra')
+        base_lote = self._siguiente_id('Lote')
+        compras = {}
+        for numero, lote in enumerate(todos):
+            lote['id'] = base_lote + numero
+            dia = lote['fecha_compra'].date()
+            if dia not in compras:
+                compras[dia] = {
+                    'id': base_compra + len(compras),
+                    'fecha': lote['fecha_compra'] + timedelta(hours=self.azar.randint(8, 17)),
+                    'proveedor': self.azar.choice(self.proveedores),
+                    'usuario': self.azar.choice(self.usuarios),
+                    'total': 0.0
+                }
+            lote['compra'] = compras[dia]
+            lote['precio_total'] = round(lote['cantidad'] * lote['costo'], 2)
+            compras[dia]['total'] += lote['precio_total']
+
+        self._insertar('Compra', ['id', 'Id_Proveedor', 'Id_Usuario', 'Fecha', 'Total'], [
+            (c['id'], c['proveedor'], c['usuario'], c['fecha'], round(c['total'], 2)) for c in compras.values()
+        ])
+        self._insertar('DetalleCompra', ['Id_Compra', 'Id_Producto', 'Cantidad_Unitario', 'Precio_Unitario'], [
+            (l['compra']['id'], l['producto']['id'], l['cantidad'], l['costo']) for l in todos
+        ])
+        self._lotes_ordenados = todos
+
+        # Orden FIFO de la aplicación: Fecha_Vencimiento ASC (NULL primero), id ASC
+        for lotes in lotes_por_producto.values():
+            lotes.sort(key=lambda l: (l['vencimiento'] is not None, l['vencimiento'] or date.min, l['id']))
+
+    def _insertar_ventas(self, ventas: List[tuple], lotes_por_producto: Dict[int, List[Dict]]):
+        base_venta = self._siguiente_id('Ventas')
+        filas_ventas = []
+        filas_detalles = []
+
+        for numero, (fecha, usuario, lineas) in enumerate(ventas):
+            venta_id = base_venta + numero
+            total = 0.0
+            for producto, unidades in lineas:
+                restantes = unidades
+                for lote in lotes_por_producto[producto['id']]:
+                    if restantes <= 0:
+                        break
+                    if lote['restante'] <= 0 or lote['fecha_compra'] > fecha:
+                        continue
+                    tomadas = min(restantes, lote['restante'])
+                    lote['restante'] -= tomadas
+                    restantes -= tomadas
+                    filas_detalles.append((venta_id, lote['id'], tomadas, producto['precio'], None, lote['costo']))
+                if restantes:
+                    raise RuntimeError(f"Planificación de lotes insuficiente para producto {producto['id']}")
+                total += unidades * producto['precio']
+            filas_ventas.append((venta_id, usuario, fecha, round(total, 2)))
+
+        # Los lotes van con su stock final (después de todas las ventas)
+        self._insertar('Lote', [
+            'id', 'Id_Producto', 'Cantidad_Unitario', 'Fecha_Vencimiento', 'Fecha_Compra',
+            'Precio_Compra', 'Estado', 'Fecha_Creacion', 'Usuario_Creacion', 'Id_Compra'
+        ], [
+            (l['id'], l['producto']['id'], l['restante'], l['vencimiento'], l['fecha_compra'].date(),
+             l['precio_total'], 'ACTIVO' if l['restante'] > 0 else 'AGOTADO', l['compra']['fecha'],
+             l['compra']['usuario'], l['compra']['id'])
+            for l in self._lotes_ordenados
+        ])
+        self._insertar('Ventas', ['id', 'Id_Usuario', 'Fecha', 'Total'], filas_ventas)
+        self._insertar('DetallesVentas', [
+            'Id_Venta', 'Id_Lote', 'Cantidad_Unitario', 'Precio_Unitario', 'Detalles', 'Costo_Unitario'
+        ], filas_detalles)
+
+    # ===============================
+    # SERVICIOS Y GASTOS
+    # ===============================
+
+    def _paciente(self) -> int:
+        # Pacientes frecuentes: sesgo hacia los primeros registrados
+        return self.pacientes[int(len(self.pacientes) * self.azar.random() ** 1.8)]
+
+    def _tipo_atencion(self) -> str:
+        return 'Emergencia' if self.azar.random() < 0.12 else 'Normal'
+
+    def generar_servicios(self):
+        self._insertar('Consultas', [
+            'Id_Usuario', 'Id_Paciente', 'Id_Especialidad', 'Fecha', 'Detalles', 'Tipo_Consulta', 'Id_Trabajador'
+        ], [
+            (self.azar.choice(self.usuarios), self._paciente(), self.azar.choice(self.especialidades),
+             fecha, "Consulta generada", self._tipo_atencion(), self.azar.choice(self.trabajadores))
+            for fecha in self._fechas(self.volumen['consultas'])
+        ])
+        self._insertar('Laboratorio', [
+            'Id_Paciente', 'Id_Trabajador', 'Id_Tipo_Analisis', 'Fecha', 'Id_RegistradoPor', 'Tipo', 'Detalles'
+        ], [
+            (self._paciente(), self.azar.choice(self.trabajadores), self.azar.choice(self.tipos_analisis),
+             fecha, self.azar.choice(self.usuarios), self._tipo_atencion(), None)
+            for fecha in self._fechas(self.volumen['laboratorio'])
+        ])
+        self._insertar('Enfermeria', [
+            'Id_Paciente', 'Id_Procedimiento', 'Cantidad', 'Fecha', 'Id_RegistradoPor', 'Id_Trabajador', 'Tipo'
+        ], [
+            (self._paciente(), self.azar.choice(self.procedimientos), self.azar.choice((1, 1, 1, 2, 3)),
+             fecha, self.azar.choice(self.usuarios), self.azar.choice(self.trabajadores), self._tipo_atencion())
+            for fecha in self._fechas(self.volumen['enfermeria'])
+        ])
+
+    def generar_gastos(self):
+        self._insertar('Gastos', [
+            'ID_Tipo', 'Descripcion', 'Monto', 'Fecha', 'Id_RegistradoPor', 'ID_Proveedor'
+        ], [
+            (self.azar.choice(self.tipos_gasto), "Gasto generado",
+             round(self.azar.lognormvariate(4.5, 1.0), 2), fecha,
+             self.azar.choice(self.usuarios), self.azar.choice(self.proveedores_gastos))
+            for fecha in self._fechas(self.volumen['gastos'])
+        ])
+
+    def ejecutar(self):
+        pasos = [
+            ("Catálogos", self.preparar_catalogos),
+            ("Pacientes", self.generar_pacientes),
+            ("Productos", self.generar_productos),
+            ("Ventas, lotes y compras", self.generar_ventas_y_lotes),
+            ("Consultas, laboratorio y enfermería", self.generar_servicios),
+            ("Gastos", self.generar_gastos),
+        ]
+        inicio = time.perf_counter()
+        for nombre, paso in pasos:
+            print(f"🔧 {nombre}...")
+            paso()
+        print(f"🎉 Datos sintéticos generados en {time.perf_counter() - inicio:.1f} s")
+
+
+def _acumular(valores):
+    total = 0.0
+    for valor in valores:
+        total += valor
+        yield total
+
+
+def main():
+    args = parse_args()
+    preparar_entorno(args)
+
+    from backend.core.database_conexion import DatabaseConnection
+
+    print(f"🧪 Generador de datos sintéticos - Base: {args.base}, Escala: {args.escala}, Semilla: {args.semilla}")
+    conn = DatabaseConnection().get_connection()
+    try:
+        GeneradorDatosSinteticos(conn, args).ejecutar()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error generando datos: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
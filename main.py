@@ -77,6 +77,7 @@ try:
     
     from setup_handler import SetupHandler
     from backend.core.config_manager import ConfigManager
+    from backend.core.planificador_refresco import get_planificador_refresco
     
     logger.info("✅ Imports del proyecto exitosos")
     
@@ -381,6 +382,9 @@ class AppController(QObject):
                     except Exception as e:
                         logger.error(f"⚠️ Error deteniendo timers en {type(model).__name__}: {e}")
             
+            # Planificador central de refrescos (suelta las tareas de los modelos)
+            get_planificador_refresco().detener()
+            
             logger.info(f"✅ FASE 1 COMPLETA: {timer_count} timers detenidos")
             
         except Exception as e:
@@ -667,6 +671,8 @@ class AppController(QObject):
                 # Solo establecer referencia para PDFs
                 self.cierre_caja_model.set_app_controller(self)
                 logger.info("✅ AppController conectado al CierreCajaModel para PDFs")
+                self._connect_libro_caja()
+            self._connect_planificador_refresco()
             if self.ingreso_extra_model:
                 if hasattr(self.ingreso_extra_model, 'errorOcurrido'):
                     self.ingreso_extra_model.errorOcurrido.connect(self._on_model_error)
@@ -974,6 +980,68 @@ class AppController(QObject):
             logger.info("="*60)
             logger.info("")
 
+    def _connect_libro_caja(self):
+        """Transacciones registradas → libro de caja del turno (solo movimientos nuevos)"""
+        if self.venta_model:
+            self.venta_model.ventaCreada.connect(self._on_transaccion_financiera)
+            self.venta_model.ventaActualizada.connect(lambda *_: self._invalidar_libro_caja("Venta editada"))
+            self.venta_model.ventaEliminada.connect(lambda *_: self._invalidar_libro_caja("Venta eliminada"))
+        if self.compra_model:
+            self.compra_model.compraCreada.connect(self._on_transaccion_financiera)
+        if self.consulta_model:
+            self.consulta_model.consultaCreada.connect(lambda *_: self._refresh_cierre_caja("Consulta"))
+            self.consulta_model.consultaActualizada.connect(lambda *_: self._invalidar_libro_caja("Consulta editada"))
+            self.consulta_model.consultaEliminada.connect(lambda *_: self._invalidar_libro_caja("Consulta eliminada"))
+        if self.laboratorio_model:
+            self.laboratorio_model.examenCreado.connect(lambda *_: self._refresh_cierre_caja("Laboratorio"))
+            self.laboratorio_model.examenActualizado.connect(lambda *_: self._invalidar_libro_caja("Laboratorio editado"))
+            self.laboratorio_model.examenEliminado.connect(lambda *_: self._invalidar_libro_caja("Laboratorio eliminado"))
+        if self.enfermeria_model:
+            self.enfermeria_model.procedimientoCreado.connect(lambda *_: self._refresh_cierre_caja("Enfermería"))
+            self.enfermeria_model.procedimientoActualizado.connect(lambda *_: self._invalidar_libro_caja("Enfermería editada"))
+            self.enfermeria_model.procedimientoEliminado.connect(lambda *_: self._invalidar_libro_caja("Enfermería eliminada"))
+        if self.gasto_model:
+            self.gasto_model.gastoCreado.connect(lambda ok, _: ok and self._refresh_cierre_caja("Gasto"))
+            self.gasto_model.gastoActualizado.connect(lambda ok, _: ok and self._invalidar_libro_caja("Gasto editado"))
+            self.gasto_model.gastoEliminado.connect(lambda ok, _: ok and self._invalidar_libro_caja("Gasto eliminado"))
+        if self.ingreso_extra_model and hasattr(self.ingreso_extra_model, 'ingresoExtraAgregado'):
+            self.ingreso_extra_model.ingresoExtraAgregado.connect(lambda: self._refresh_cierre_caja("Ingreso extra"))
+        logger.info("✅ Libro de caja conectado a las transacciones")
+
+    def _connect_planificador_refresco(self):
+        """Transacciones → eventos de cambio del planificador (reemplaza el sondeo por timers)"""
+        planificador = get_planificador_refresco()
+        financiero = lambda *_: planificador.marcar_cambio('financiero')
+        financiero_inventario = lambda *_: planificador.marcar_cambio('financiero', 'inventario')
+        if self.venta_model:
+            self.venta_model.ventaCreada.connect(financiero_inventario)
+            self.venta_model.ventaActualizada.connect(financiero_inventario)
+            self.venta_model.ventaEliminada.connect(financiero_inventario)
+        if self.compra_model:
+            self.compra_model.compraCreada.connect(lambda *_: planificador.marcar_cambio('financiero', 'inventario', 'compras'))
+            self.compra_model.compraActualizada.connect(lambda *_: planificador.marcar_cambio('financiero', 'inventario', 'compras'))
+        if self.inventario_model:
+            self.inventario_model.productoCreado.connect(lambda *_: planificador.marcar_cambio('inventario'))
+            self.inventario_model.productoEliminado.connect(lambda *_: planificador.marcar_cambio('inventario'))
+            self.inventario_model.stockActualizado.connect(lambda *_: planificador.marcar_cambio('inventario'))
+        for modelo, senales in (
+            (self.consulta_model, ('consultaCreada', 'consultaActualizada', 'consultaEliminada')),
+            (self.laboratorio_model, ('examenCreado', 'examenActualizado', 'examenEliminado')),
+            (self.enfermeria_model, ('procedimientoCreado', 'procedimientoActualizado', 'procedimientoEliminado')),
+            (self.gasto_model, ('gastoCreado', 'gastoActualizado', 'gastoEliminado')),
+            (self.ingreso_extra_model, ('ingresoExtraAgregado',)),
+        ):
+            for senal in senales:
+                if modelo and hasattr(modelo, senal):
+                    getattr(modelo, senal).connect(financiero)
+        # Pantalla inicial
+        planificador.vista_activa("Dashboard")
+        logger.info("✅ Planificador de refrescos conectado a las transacciones")
+
+    def _invalidar_libro_caja(self, mensaje: str):
+        if self.cierre_caja_model:
+            QTimer.singleShot(200, lambda: self.cierre_caja_model.invalidarLibroCaja(mensaje))
+
     # Handlers para eventos específicos de modelos
     @Slot(int, float)
     def _on_venta_creada(self, venta_id: int, total: float):
@@ -1074,8 +1142,8 @@ class AppController(QObject):
                 if hasattr(self.cierre_caja_model.repository, 'refresh_cache_immediately'):
                     self.cierre_caja_model.repository.refresh_cache_immediately()
                 
-                # 2. Forzar actualización del modelo
-                self.cierre_caja_model.forzarActualizacion()
+                # 2. Agregar al libro de caja solo los movimientos nuevos
+                self.cierre_caja_model.registrarTransaccion(mensaje)
                 
                 logger.info(f"✅ Cierre de caja actualizado: {mensaje}")
                 
@@ -1383,7 +1451,8 @@ class AppController(QObject):
     
     @Slot(str)
     def navigateToModule(self, module_name):
-        pass  # Implementación en QML
+        # La navegación es QML; aquí solo se avisa qué módulo quedó visible
+        get_planificador_refresco().vista_activa(module_name)
 
     # ===============================
     # MÉTODOS DE GENERACIÓN DE PDF (COMPLETOS)
@@ -878,13 +878,21 @@ ApplicationWindow {
             }
             
             currentIndex = index
-            Qt.callLater(function() {
-                if (appController && appController.navigateToModule) {
-                    appController.navigateToModule(getCurrentPageName())
-                }
-            })
+            notificarModuloActivo()
         }
     }
+    
+    // Las subsecciones de Farmacia y Servicios Básicos cambian de módulo sin cambiar de página
+    onFarmaciaSubsectionChanged: notificarModuloActivo()
+    onServiciosSubsectionChanged: notificarModuloActivo()
+    
+    function notificarModuloActivo() {
+        Qt.callLater(function() {
+            if (appController && appController.navigateToModule) {
+                appController.navigateToModule(getCurrentPageName())
+            }
+        })
+    }
         
     function getCurrentPageName() {
         if (currentIndex === 1) {
@@ -0,0 +1,352 @@
+"""
+Simulador de carga de cajas concurrentes
+Sistema de Gestión Médica - Clínica María Inmaculada
+
+Lanza N cajeros simulados (hilos) contra una base de datos de PRUEBA y ejecuta el
+flujo real de VentaRepository: búsqueda de productos, armado de carrito, cobro y,
+ocasionalmente, edición o eliminación de la venta.
+
+Reporta throughput, latencias p50/p95/p99 por operación, interbloqueos,
+reintentos/conflictos FIFO y violaciones de consistencia de stock.
+
+La base de pruebas puede poblarse con generar_datos_sinteticos.py.
+
+Uso:
+    python simulador_cajas.py --base ClinicaPruebas --cajas 8 --duracion 60
+    python simulador_cajas.py --base ClinicaPruebas --cajas 4 --ventas 500 --json resultado.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any
+
+from dotenv import dotenv_values
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulador de cajas concurrentes (solo base de pruebas)")
+    parser.add_argument('--base', required=True, help="Base de datos de pruebas (DB_DATABASE)")
+    parser.add_argument('--servidor', default=None, help="Servidor SQL (por defecto el de la configuración)")
+    parser.add_argument('--cajas', type=int, default=4, help="Cajeros simultáneos")
+    parser.add_argument('--duracion', type=float, default=60, help="Segundos de simulación")
+    parser.add_argument('--ventas', type=int, default=0, help="Detener al llegar a este total de ventas (0 = sin límite)")
+    parser.add_argument('--prob-edicion', type=float, default=0.05, help="Probabilidad de editar la venta recién hecha")
+    parser.add_argument('--prob-eliminacion', type=float, default=0.02, help="Probabilidad de eliminar la venta recién hecha")
+    parser.add_argument('--max-items', type=int, default=5, help="Máximo de productos por carrito")
+    parser.add_argument('--pausa', type=float, default=0.0, help="Pausa (s) entre ventas de un mismo cajero")
+    parser.add_argument('--semilla', type=int, default=None, help="Semilla aleatoria para repetir una corrida")
+    parser.add_argument('--json', default=None, help="Guardar el reporte en este archivo JSON")
+    return parser.parse_args()
+
+
+def preparar_entorno(args):
+    """Apunta la configuración a la base de pruebas ANTES de importar el backend"""
+    base_produccion = os.getenv('DB_DATABASE')
+    for nombre in ('.env', 'config.env'):
+        ruta = Path(__file__).resolve().parent / nombre
+        if not base_produccion and ruta.exists():
+            base_produccion = dotenv_values(ruta).get('DB_DATABASE')
+    base_produccion = base_produccion or 'ClinicaMariaInmaculada'
+
+    if args.base.strip().lower() == base_produccion.strip().lower():
+        print(f"❌ '{args.base}' es la base configurada de producción. Use una base de pruebas.")
+        sys.exit(2)
+
+    os.environ['DB_DATABASE'] = args.base
+    if args.servidor:
+        os.environ['DB_SERVER'] = args.servidor
+
+
+# ===============================
+# MÉTRICAS
+# ===============================
+
+class Metricas:
+    """Latencias y resultados por operación (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.interbloqueos = 0
+        self.rechazos_stock = 0
+        self.ventas_ok = 0
+
+    def registrar(self, operacion: str, segundos: float, error: Exception = None):
+        with self._lock:
+            self.latencias[operacion].append(segundos * 1000)
+            if error is None:
+                if operacion == 'venta':
+                    self.ventas_ok += 1
+                return
+            # Clasificación por tipo/SQLSTATE del error original (40001 / nativo 1205), no por texto
+            from backend.core.excepciones import StockInsuficienteError, es_error_concurrencia
+            if es_error_concurrencia(error):
+                self.interbloqueos += 1
+            elif isinstance(error, StockInsuficienteError):
+                self.rechazos_stock += 1
+            else:
+                self.errores[operacion] += 1
+
+    @staticmethod
+    def percentil(valores: List[float], p: float) -> float:
+        if not valores:
+            return 0.0
+        ordenados = sorted(valores)
+        indice = min(len(ordenados) - 1, max(0, math.ceil(p / 100 * len(ordenados)) - 1))
+        return round(ordenados[indice], 2)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            operaciones = {}
+            for operacion, valores in self.latencias.items():
+                operaciones[operacion] = {
+                    'cantidad': len(valores),
+                    'errores': self.errores.get(operacion, 0),
+                    'p50_ms': self.percentil(valores, 50),
+                    'p95_ms': self.percentil(valores, 95),
+                    'p99_ms': self.percentil(valores, 99),
+                    'max_ms': round(max(valores), 2) if valores else 0.0
+                }
+            return {
+                'operaciones': operaciones,
+                'ventas_ok': self.ventas_ok,
+                'interbloqueos': self.interbloqueos,
+                'rechazos_stock': self.rechazos_stock
+            }
+
+
+# ===============================
+# CAJERO SIMULADO
+# ===============================
+
+class CajeroSimulado(threading.Thread):
+    """Un cajero: busca, arma el carrito, cobra y a veces edita o elimina"""
+
+    def __init__(self, numero: int, args, usuario_id: int, catalogo: List[Dict[str, Any]],
+                 metricas: Metricas, fin: float, detener: threading.Event, semilla: int):
+        super().__init__(name=f"Caja-{numero}", daemon=True)
+        from backend.repositories.venta_repository import VentaRepository
+
+        self.args = args
+        self.usuario_id = usuario_id
+        self.catalogo = catalogo
+        self.metricas = metricas
+        self.fin = fin
+        self.detener = detener
+        self.azar = random.Random(semilla)
+        self.venta_repo = VentaRepository()
+
+    def _medir(self, operacion: str, funcion, *parametros):
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(*parametros)
+            self.metricas.registrar(operacion, time.perf_counter() - inicio)
+            return resultado
+        except Exception as e:
+            self.metricas.registrar(operacion, time.perf_counter() - inicio, e)
+            return None
+
+    def _armar_carrito(self) -> List[Dict[str, Any]]:
+        productos = self.azar.sample(self.catalogo, min(len(self.catalogo), self.azar.randint(1, self.args.max_items)))
+        carrito = []
+        for producto in productos:
+            # Búsqueda como la haría el cajero: por las primeras letras del nombre
+            termino = str(producto['Nombre'])[:self.azar.randint(3, 6)]
+            self._medir('busqueda', self.venta_repo.buscar_productos_para_venta, termino)
+            carrito.append({
+                'codigo': producto['Codigo'],
+                'cantidad': self.azar.randint(1, 3),
+                'precio': float(producto['Precio_venta'])
+            })
+        return carrito
+
+    def run(self):
+        while not self.detener.is_set() and time.time() < self.fin:
+            carrito = self._armar_carrito()
+            venta = self._medir('venta', self.venta_repo.crear_venta, self.usuario_id, carrito)
+
+            if venta and venta.get('id'):
+                sorteo = self.azar.random()
+                if sorteo < self.args.prob_eliminacion:
+                    self._medir('eliminacion', self.venta_repo.eliminar_venta, venta['id'])
+                elif sorteo < self.args.prob_eliminacion + self.args.prob_edicion:
+                    editado = [dict(item, cantidad=max(1, item['cantidad'] + self.azar.choice((-1, 1))))
+                               for item in carrito]
+                    self._medir('edicion', self.venta_repo.actualizar_venta_completa, venta['id'], editado)
+
+            if self.args.ventas and self.metricas.ventas_ok >= self.args.ventas:
+                self.detener.set()
+            if self.args.pausa:
+                time.sleep(self.args.pausa)
+
+
+# ===============================
+# ESTADO DE LA BASE (CONSISTENCIA)
+# ===============================
+
+def _consultar(db, query: str, params: tuple = ()) -> List[tuple]:
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def cargar_catalogo(db) -> List[Dict[str, Any]]:
+    """Productos activos con stock y precio de venta"""
+    filas = _consultar(db, """
+        SELECT p.Codigo, p.Nombre, p.Precio_venta
+        FROM Productos p
+        WHERE p.Activo = 1 AND p.Precio_venta > 0
+          AND EXISTS (SELECT 1 FROM Lote l WHERE l.Id_Producto = p.id AND l.Cantidad_Unitario > 0)
+    """)
+    return [{'Codigo': f[0], 'Nombre': f[1], 'Precio_venta': f[2]} for f in filas]
+
+
+def foto_stock(db) -> Dict[str, Any]:
+    """Stock por producto y último id de venta"""
+    stock = {int(f[0]): int(f[1] or 0) for f in _consultar(
+        db, "SELECT Id_Producto, SUM(Cantidad_Unitario) FROM Lote GROUP BY Id_Producto")}
+    ultimo = _consultar(db, "SELECT ISNULL(MAX(id), 0) FROM Ventas")[0][0]
+    return {'stock': stock, 'ultima_venta': int(ultimo)}
+
+
+def verificar_consistencia(db, inicial: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Invariante: stock_inicial - stock_final == unidades en DetallesVentas de las ventas
+    creadas durante la corrida (las eliminadas devuelven stock y borran sus detalles).
+    """
+    final = foto_stock(db)
+    vendidas = {int(f[0]): int(f[1] or 0) for f in _consultar(db, """
+        SELECT l.Id_Producto, SUM(dv.Cantidad_Unitario)
+        FROM DetallesVentas dv
+        INNER JOIN Lote l ON dv.Id_Lote = l.id
+        WHERE dv.Id_Venta > ?
+        GROUP BY l.Id_Producto
+    """, (inicial['ultima_venta'],))}
+    negativos = _consultar(db, "SELECT COUNT(*) FROM Lote WHERE Cantidad_Unitario < 0")[0][0]
+
+    violaciones = []
+    for producto_id in set(inicial['stock']) | set(final['stock']) | set(vendidas):
+        descontado = inicial['stock'].get(producto_id, 0) - final['stock'].get(producto_id, 0)
+        if descontado != vendidas.get(producto_id, 0):
+            violaciones.append({
+                'producto_id': producto_id,
+                'stock_descontado': descontado,
+                'unidades_vendidas': vendidas.get(producto_id, 0)
+            })
+
+    return {'lotes_negativos': int(negativos), 'violaciones': violaciones}
+
+
+# ===============================
+# PRINCIPAL
+# ===============================
+
+def main():
+    args = parse_args()
+    preparar_entorno(args)
+
+    from backend.core.database_conexion import DatabaseConnection
+    from backend.repositories.producto_repository import ProductoRepository
+
+    db = DatabaseConnection()
+    semilla = args.semilla if args.semilla is not None else int(time.time())
+    print(f"🧪 Simulador de cajas - Base: {args.base}, Cajas: {args.cajas}, Semilla: {semilla}")
+
+    usuario = _consultar(db, "SELECT TOP 1 id FROM Usuario ORDER BY id")
+    if not usuario:
+        print("❌ La base de pruebas no tiene usuarios")
+        return 1
+    catalogo = cargar_catalogo(db)
+    if not catalogo:
+        print("❌ La base de pruebas no tiene productos con stock (ver generar_datos_sinteticos.py)")
+        return 1
+
+    inicial = foto_stock(db)
+    metricas_fifo_inicio = ProductoRepository.get_metricas_concurrencia()
+
+    metricas = Metricas()
+    detener = threading.Event()
+    inicio = time.time()
+    cajeros = [
+        CajeroSimulado(i + 1, args, int(usuario[0][0]), catalogo, metricas,
+                       inicio + args.duracion, detener, semilla + i)
+        for i in range(args.cajas)
+    ]
+    for cajero in cajeros:
+        cajero.start()
+    try:
+        for cajero in cajeros:
+            cajero.join()
+    except KeyboardInterrupt:
+        print("⏹️ Deteniendo cajeros...")
+        detener.set()
+        for cajero in cajeros:
+            cajero.join()
+    duracion = time.time() - inicio
+
+    metricas_fifo_fin = ProductoRepository.get_metricas_concurrencia()
+    reporte = metricas.resumen()
+    reporte.update({
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'base': args.base,
+        'cajas': args.cajas,
+        'semilla': semilla,
+        'duracion_s': round(duracion, 2),
+        'ventas_por_segundo': round(reporte['ventas_ok'] / duracion, 2) if duracion else 0.0,
+        'fifo': {
+            clave: metricas_fifo_fin[clave] - metricas_fifo_inicio.get(clave, 0)
+            for clave in ('descuentos', 'conflictos', 'reintentos', 'agotados')
+        },
+        'consistencia': verificar_consistencia(db, inicial)
+    })
+
+    imprimir_reporte(reporte)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+        print(f"💾 Reporte guardado en {args.json}")
+
+    consistencia = reporte['consistencia']
+    return 1 if consistencia['violaciones'] or consistencia['lotes_negativos'] else 0
+
+
+def imprimir_reporte(reporte: Dict[str, Any]):
+    print("\n" + "=" * 60)
+    print(f"📊 RESULTADO - {reporte['cajas']} cajas, {reporte['duracion_s']} s")
+    print("=" * 60)
+    print(f"💰 Ventas confirmadas:   {reporte['ventas_ok']} ({reporte['ventas_por_segundo']} /s)")
+    print(f"🔒 Interbloqueos:        {reporte['interbloqueos']}")
+    print(f"📦 Rechazos por stock:   {reporte['rechazos_stock']}")
+    fifo = reporte['fifo']
+    print(f"🔁 FIFO: {fifo['conflictos']} conflictos, {fifo['reintentos']} reintentos, {fifo['agotados']} agotados")
+    print("-" * 60)
+    print(f"{'Operación':<12}{'Cant.':>8}{'Errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operacion, datos in sorted(reporte['operaciones'].items()):
+        print(f"{operacion:<12}{datos['cantidad']:>8}{datos['errores']:>9}"
+              f"{datos['p50_ms']:>10}{datos['p95_ms']:>10}{datos['p99_ms']:>10}")
+    print("-" * 60)
+    consistencia = reporte['consistencia']
+    if consistencia['violaciones'] or consistencia['lotes_negativos']:
+        print(f"❌ Consistencia: {len(consistencia['violaciones'])} productos con diferencias, "
+              f"{consistencia['lotes_negativos']} lotes negativos")
+    else:
+        print("✅ Consistencia de stock verificada")
+    print("=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())